@@ -0,0 +1,38 @@
+"""Add competition participant indexes for incremental standings
+
+Revision ID: add_competition_participant_indexes
+Revises: add_user_stats_rank_indexes
+Create Date: 2026-10-18 15:00:00.000000
+
+"""
+from alembic import op
+
+
+# revision identifiers, used by Alembic.
+revision = 'add_competition_participant_indexes'
+down_revision = 'add_user_stats_rank_indexes'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    # Keep the most advanced row where a user joined a competition twice
+    op.execute("""
+        DELETE FROM competition_participants p
+        USING competition_participants keep
+        WHERE p.competition_id = keep.competition_id
+          AND p.user_id = keep.user_id
+          AND (COALESCE(p.current_progress, 0), -p.id) < (COALESCE(keep.current_progress, 0), -keep.id)
+    """)
+
+    op.create_index('uq_competition_participants_user', 'competition_participants',
+                    ['competition_id', 'user_id'], unique=True)
+    op.create_index('ix_competition_participants_user_id', 'competition_participants', ['user_id'])
+    op.create_index('ix_competition_participants_standings', 'competition_participants',
+                    ['competition_id', 'current_progress'])
+
+
+def downgrade():
+    op.drop_index('ix_competition_participants_standings', table_name='competition_participants')
+    op.drop_index('ix_competition_participants_user_id', table_name='competition_participants')
+    op.drop_index('uq_competition_participants_user', table_name='competition_participants')
@@ -0,0 +1,26 @@
+"""Add content hash and preview flag to files
+
+Revision ID: add_file_preview_columns
+Revises: add_competition_participant_indexes
+Create Date: 2026-10-18 18:00:00.000000
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = 'add_file_preview_columns'
+down_revision = 'add_competition_participant_indexes'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    op.add_column('files', sa.Column('content_hash', sa.String(length=64), nullable=True))
+    op.add_column('files', sa.Column('has_preview', sa.Boolean(), nullable=False, server_default=sa.false()))
+
+
+def downgrade():
+    op.drop_column('files', 'has_preview')
+    op.drop_column('files', 'content_hash')
@@ -0,0 +1,36 @@
+"""Add daily KPI snapshots for the admin stats dashboard
+
+Revision ID: add_kpi_snapshots
+Revises: add_file_preview_columns
+Create Date: 2026-10-18 21:00:00.000000
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = 'add_kpi_snapshots'
+down_revision = 'add_file_preview_columns'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    op.create_table(
+        'kpi_snapshots',
+        sa.Column('snapshot_date', sa.Date(), nullable=False),
+        sa.Column('total_users', sa.Integer(), nullable=False, server_default='0'),
+        sa.Column('active_users_30d', sa.Integer(), nullable=False, server_default='0'),
+        sa.Column('total_requests', sa.Integer(), nullable=False, server_default='0'),
+        sa.Column('completed_requests', sa.Integer(), nullable=False, server_default='0'),
+        sa.Column('pending_requests', sa.Integer(), nullable=False, server_default='0'),
+        sa.Column('in_progress_requests', sa.Integer(), nullable=False, server_default='0'),
+        sa.Column('rejected_requests', sa.Integer(), nullable=False, server_default='0'),
+        sa.Column('updated_at', sa.DateTime(timezone=True), server_default=sa.text('now()'), nullable=True),
+        sa.PrimaryKeyConstraint('snapshot_date')
+    )
+
+
+def downgrade():
+    op.drop_table('kpi_snapshots')
@@ -0,0 +1,50 @@
+"""Add message listing indexes and unique conversation participants index
+
+Revision ID: add_message_conversation_indexes
+Revises: b661ffb013c5
+Create Date: 2026-10-18 10:00:00.000000
+
+"""
+from alembic import op
+
+
+# revision identifiers, used by Alembic.
+revision = 'add_message_conversation_indexes'
+down_revision = 'b661ffb013c5'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    # Inbox and sent pages filter by participant and order by created_at
+    op.create_index('ix_messages_recipient_created', 'messages', ['recipient_id', 'created_at'])
+    op.create_index('ix_messages_sender_created', 'messages', ['sender_id', 'created_at'])
+
+    # Normalize any conversation stored with participants out of min/max order
+    op.execute("""
+        UPDATE conversations
+        SET participant_1_id = participant_2_id, participant_2_id = participant_1_id
+        WHERE participant_1_id > participant_2_id
+    """)
+
+    # Keep the most recently updated conversation for each pair
+    op.execute("""
+        DELETE FROM conversations c
+        USING conversations newer
+        WHERE c.participant_1_id = newer.participant_1_id
+          AND c.participant_2_id = newer.participant_2_id
+          AND (COALESCE(c.updated_at, c.created_at), c.id) < (COALESCE(newer.updated_at, newer.created_at), newer.id)
+    """)
+
+    op.create_index(
+        'uq_conversations_participants',
+        'conversations',
+        ['participant_1_id', 'participant_2_id'],
+        unique=True
+    )
+
+
+def downgrade():
+    op.drop_index('uq_conversations_participants', table_name='conversations')
+    op.drop_index('ix_messages_sender_created', table_name='messages')
+    op.drop_index('ix_messages_recipient_created', table_name='messages')
@@ -0,0 +1,31 @@
+"""Add per-day request number counters
+
+Revision ID: add_request_number_counters
+Revises: add_message_conversation_indexes
+Create Date: 2026-10-18 12:00:00.000000
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = 'add_request_number_counters'
+down_revision = 'add_message_conversation_indexes'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    # Existing numbers use REQ-YYYYmmddHHMMSS, which cannot clash with the new
+    # REQ-YYYYMMDD-NNNNN format, so counters start empty
+    op.create_table(
+        'request_number_counters',
+        sa.Column('day', sa.Date(), nullable=False),
+        sa.Column('last_value', sa.Integer(), nullable=False),
+        sa.PrimaryKeyConstraint('day')
+    )
+
+
+def downgrade():
+    op.drop_table('request_number_counters')
@@ -0,0 +1,75 @@
+"""Add age indexes and monthly-partitioned archive tables for notifications and activities
+
+Revision ID: add_retention_archives
+Revises: add_kpi_snapshots
+Create Date: 2026-10-18 22:00:00.000000
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = 'add_retention_archives'
+down_revision = 'add_kpi_snapshots'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    # Per-user pages on the hot tables, and the retention job's age scans
+    op.create_index('ix_notifications_user_created', 'notifications', ['user_id', 'created_at'])
+    op.create_index('ix_notifications_created_at', 'notifications', ['created_at'])
+    op.create_index('ix_activities_user_created', 'activities', ['user_id', 'created_at'])
+    op.create_index('ix_activities_created_at', 'activities', ['created_at'])
+
+    # Partitions are created by the retention job for the months it archives
+    op.create_table(
+        'notifications_archive',
+        sa.Column('id', sa.Integer(), nullable=False),
+        sa.Column('created_at', sa.DateTime(timezone=True), nullable=False),
+        sa.Column('user_id', sa.Integer(), nullable=False),
+        sa.Column('type', sa.String(length=50), nullable=False),
+        sa.Column('priority', sa.String(length=20), nullable=False),
+        sa.Column('title', sa.String(length=255), nullable=False),
+        sa.Column('message', sa.Text(), nullable=False),
+        sa.Column('action_url', sa.String(length=500), nullable=True),
+        sa.Column('request_id', sa.Integer(), nullable=True),
+        sa.Column('related_user_id', sa.Integer(), nullable=True),
+        sa.Column('is_read', sa.Boolean(), nullable=False),
+        sa.Column('is_sent', sa.Boolean(), nullable=False),
+        sa.Column('sent_at', sa.DateTime(timezone=True), nullable=True),
+        sa.Column('read_at', sa.DateTime(timezone=True), nullable=True),
+        sa.Column('extra_data', sa.JSON(), nullable=True),
+        sa.Column('updated_at', sa.DateTime(timezone=True), nullable=True),
+        sa.Column('archived_at', sa.DateTime(timezone=True), server_default=sa.text('now()'), nullable=False),
+        sa.PrimaryKeyConstraint('id', 'created_at'),
+        postgresql_partition_by='RANGE (created_at)'
+    )
+    op.create_index('ix_notifications_archive_user_id', 'notifications_archive', ['user_id'])
+
+    op.create_table(
+        'activities_archive',
+        sa.Column('id', sa.Integer(), nullable=False),
+        sa.Column('created_at', sa.DateTime(timezone=True), nullable=False),
+        sa.Column('activity_type', sa.String(length=50), nullable=False),
+        sa.Column('description', sa.Text(), nullable=False),
+        sa.Column('details', sa.JSON(), nullable=True),
+        sa.Column('ip_address', sa.String(length=45), nullable=True),
+        sa.Column('user_agent', sa.Text(), nullable=True),
+        sa.Column('user_id', sa.Integer(), nullable=False),
+        sa.Column('archived_at', sa.DateTime(timezone=True), server_default=sa.text('now()'), nullable=False),
+        sa.PrimaryKeyConstraint('id', 'created_at'),
+        postgresql_partition_by='RANGE (created_at)'
+    )
+    op.create_index('ix_activities_archive_user_id', 'activities_archive', ['user_id'])
+
+
+def downgrade():
+    # Dropping the parents drops every partition with it
+    op.drop_table('activities_archive')
+    op.drop_table('notifications_archive')
+    op.drop_index('ix_activities_created_at', table_name='activities')
+    op.drop_index('ix_activities_user_created', table_name='activities')
+    op.drop_index('ix_notifications_created_at', table_name='notifications')
+    op.drop_index('ix_notifications_user_created', table_name='notifications')
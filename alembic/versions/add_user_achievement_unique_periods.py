@@ -0,0 +1,49 @@
+"""Add unique user achievement period indexes for progress upserts
+
+Revision ID: add_user_achievement_unique_periods
+Revises: add_request_number_counters
+Create Date: 2026-10-18 13:00:00.000000
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = 'add_user_achievement_unique_periods'
+down_revision = 'add_request_number_counters'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    # Concurrent get-or-create could insert the same user/achievement/period twice.
+    # Keep the most advanced row (completed first, then highest progress, then newest).
+    op.execute("""
+        DELETE FROM user_achievements ua
+        USING user_achievements keep
+        WHERE ua.user_id = keep.user_id
+          AND ua.achievement_id = keep.achievement_id
+          AND ua.period_start IS NOT DISTINCT FROM keep.period_start
+          AND (COALESCE(ua.is_completed, false)::int, COALESCE(ua.current_progress, 0), ua.id)
+            < (COALESCE(keep.is_completed, false)::int, COALESCE(keep.current_progress, 0), keep.id)
+    """)
+
+    op.create_index(
+        'uq_user_achievements_period',
+        'user_achievements',
+        ['user_id', 'achievement_id', 'period_start'],
+        unique=True
+    )
+    op.create_index(
+        'uq_user_achievements_lifetime',
+        'user_achievements',
+        ['user_id', 'achievement_id'],
+        unique=True,
+        postgresql_where=sa.text('period_start IS NULL')
+    )
+
+
+def downgrade():
+    op.drop_index('uq_user_achievements_lifetime', table_name='user_achievements')
+    op.drop_index('uq_user_achievements_period', table_name='user_achievements')
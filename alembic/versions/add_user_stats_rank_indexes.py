@@ -0,0 +1,27 @@
+"""Add user stats rank indexes for leaderboard pages
+
+Revision ID: add_user_stats_rank_indexes
+Revises: add_user_achievement_unique_periods
+Create Date: 2026-10-18 14:00:00.000000
+
+"""
+from alembic import op
+
+
+# revision identifiers, used by Alembic.
+revision = 'add_user_stats_rank_indexes'
+down_revision = 'add_user_achievement_unique_periods'
+branch_labels = None
+depends_on = None
+
+RANK_COLUMNS = ['global_rank', 'daily_rank', 'weekly_rank', 'monthly_rank']
+
+
+def upgrade():
+    for column in RANK_COLUMNS:
+        op.create_index(f'ix_user_stats_{column}', 'user_stats', [column])
+
+
+def downgrade():
+    for column in reversed(RANK_COLUMNS):
+        op.drop_index(f'ix_user_stats_{column}', table_name='user_stats')
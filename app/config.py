@@ -1,5 +1,5 @@
 from pydantic_settings import BaseSettings
-from typing import Optional, List
+from typing import Optional, List, Dict
 import os
 import secrets
 import logging
@@ -21,6 +21,23 @@ class Settings(BaseSettings):
     db_pool_timeout: int = 60
     db_pool_recycle: int = 3600
 
+    # Connection management
+    db_pool_mode: str = "direct"  # "direct", or "transaction_proxy" behind PgBouncer/pgcat in transaction pooling mode
+    db_connection_budget: Optional[int] = None  # Server connections for all workers; derives the pool sizes below
+    db_pre_ping: bool = True  # Direct mode only; the proxy mode reconnects on error instead
+
+    # Async Database Pool Settings (asyncpg, used by async route handlers)
+    async_database_url: Optional[str] = None  # Defaults to database_url with the asyncpg driver
+    async_db_pool_size: int = 10
+    async_db_max_overflow: int = 10
+
+    # Read Replica (optional, used by admin analytics and reports through get_read_db)
+    read_replica_url: Optional[str] = None
+    read_replica_pool_size: int = 5
+    read_replica_max_overflow: int = 10
+    read_replica_max_lag_seconds: float = 30  # More lag than this sends reads to the primary
+    read_replica_lag_check_interval: int = 10  # Seconds between lag checks per worker
+
     # Security
     secret_key: str = "your-secret-key-here-change-this-in-production"
     algorithm: str = "HS256"
@@ -30,6 +47,28 @@ class Settings(BaseSettings):
     max_file_size: int = 10485760  # 10MB
     allowed_file_types: str = "pdf,doc,docx,txt,jpg,jpeg,png,gif"
     upload_directory: str = "uploads"
+    file_serving_mode: str = "app"  # "app" streams from the worker, "x_accel" hands the file to nginx
+    x_accel_location: str = "/protected-files/"  # nginx internal location aliased to upload_directory
+
+    # Thumbnails and previews (process pool, see app.services.preview_service)
+    preview_enabled: bool = True
+    preview_workers: int = 2  # Processes per app worker, shared with avatar resizing
+    preview_thumbnail_size: int = 320  # Longest side in pixels
+    preview_max_size: int = 1280
+
+    # Leaderboards
+    leaderboard_scheduler_enabled: bool = True
+    leaderboard_refresh_interval: int = 300  # Seconds between full RANK() recomputations (background task)
+
+    # Competitions
+    competition_scheduler_enabled: bool = True
+    competition_scheduler_interval: int = 60  # Seconds between start/finalize passes per worker
+
+    # Admin KPI dashboard (daily snapshots, see app.services.kpi)
+    kpi_cache_ttl: int = 300  # Upper bound; request and user changes invalidate the cache on commit
+
+    # Request numbers (REQ-YYYYMMDD-NNNNN, counter reserved in the database)
+    request_number_block_size: int = 1  # >1 reserves blocks per worker: fewer round trips, numbers not in creation order
 
     # Application
     app_name: str = "إرشيف الدفاع المدني"
@@ -55,6 +94,10 @@ class Settings(BaseSettings):
     log_max_size: int = 10485760  # 10MB
     log_backup_count: int = 5
     log_format: str = "standard"  # standard or json
+    log_queue_size: int = 10000  # Records buffered for the writer thread (excess is dropped)
+    log_rate_limit_per_second: float = 50  # Per-logger INFO/DEBUG records per second, 0 disables
+    log_rate_limit_burst: int = 200
+    log_sample_rates: str = ""  # e.g. "app.models.file=0.1,app.services.activity_service=0.2"
 
     # Rate Limiting
     rate_limit_enabled: bool = False
@@ -67,6 +110,27 @@ class Settings(BaseSettings):
     vapid_public_key: Optional[str] = None
     vapid_email: str = "admin@company.com"
 
+    # Notification fan-out (see app.services.notification_fanout)
+    notification_copy_threshold: int = 1000  # Batches this large are written with COPY instead of INSERT
+    notification_push_workers: int = 4  # Threads per worker delivering push notifications
+
+    # Activity logging (write-behind, see app.services.activity_sink)
+    activity_write_behind: bool = True  # False inserts and commits each activity in the request
+    activity_flush_interval_ms: int = 500
+    activity_flush_batch_size: int = 200  # Flush early once this many events are buffered
+    activity_buffer_limit: int = 10000  # Events held while the database is unavailable; more are dropped
+    activity_strict_mode: bool = False  # Append events to a local WAL until committed, replayed after a crash
+    activity_wal_directory: str = "logs/activity-wal"
+
+    # Retention (notifications and activities move to monthly archive partitions, see app.services.retention)
+    retention_enabled: bool = True
+    retention_interval: int = 3600  # Seconds between retention passes per worker
+    retention_batch_size: int = 5000  # Rows moved per transaction
+    notification_retention_days: int = 90  # Read notifications
+    notification_unread_retention_days: int = 365
+    activity_retention_days: int = 365
+    archive_retention_days: int = 730  # Archive partitions past this are dropped, 0 keeps them
+
     # Session Configuration
     session_timeout: int = 1800  # 30 minutes
     remember_me_duration: int = 2592000  # 30 days
@@ -76,10 +140,34 @@ class Settings(BaseSettings):
     static_file_cache: int = 3600
     api_cache_ttl: int = 300
 
+    # Templates (see app.utils.template_cache)
+    template_bytecode_cache: bool = True
+    template_cache_directory: Optional[str] = None  # Shared by all workers; defaults to <tmp>/cmsvs-jinja
+    template_fragment_ttl: int = 60  # Default for {% cache %} blocks without a TTL
+    admin_fragment_ttl: int = 60  # Lazily loaded admin widgets (see app.utils.fragments)
+
+    # Request profiling (Server-Timing header and single-request profiles, see app.services.profiling)
+    server_timing_enabled: bool = False  # On every response; otherwise only on profiled requests (it reveals query counts and timings)
+    profiling_secret: Optional[str] = None  # X-Profile header value that profiles a request; unset disables the header
+    profiling_cookie_minutes: int = 30  # Lifetime of the cookie set by POST /performance/profiling
+    profiling_directory: str = "logs/profiles"
+
+    # Sampling profiler (GET /performance/profile, see app.services.sampling_profiler)
+    sampling_profiler_enabled: bool = True
+    sampling_profiler_directory: str = "logs/sampling"  # Must be shared by the workers of a host
+    sampling_profiler_interval_ms: int = 10
+    sampling_profiler_max_seconds: int = 60
+    sampling_profiler_poll_seconds: float = 1.0  # How often each worker looks for sampling requests
+
     # Monitoring
     health_check_enabled: bool = True
     metrics_enabled: bool = False
     prometheus_port: int = 9090
+    prometheus_multiproc_dir: Optional[str] = None  # Shared directory for multi-worker metrics
+    metrics_max_statement_labels: int = 200  # Distinct SQL statements tracked as labels
+    query_fingerprint_cache_size: int = 2000  # Cached statement -> fingerprint entries
+    query_stats_max_entries: int = 500  # Fingerprints kept in query stats (LRU)
+    n_plus_one_threshold: int = 10  # Same query more than this per request is reported
 
     # Email Configuration
     smtp_host: Optional[str] = None
@@ -128,6 +216,15 @@ class Settings(BaseSettings):
     def cors_origins_list(self) -> List[str]:
         return [origin.strip() for origin in self.cors_origins.split(",")]
 
+    @property
+    def log_sample_rates_map(self) -> Dict[str, float]:
+        rates = {}
+        for entry in self.log_sample_rates.split(","):
+            if "=" in entry:
+                name, rate = entry.split("=", 1)
+                rates[name.strip()] = float(rate)
+        return rates
+
     @property
     def is_production(self) -> bool:
         return self.environment.lower() == "production"
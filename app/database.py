@@ -1,25 +1,86 @@
-from sqlalchemy import create_engine
+import importlib.util
+import logging
+import threading
+import time
+import uuid
+from typing import Any, Dict
+
+from sqlalchemy import create_engine, event, text
+from sqlalchemy.exc import DBAPIError
 from sqlalchemy.ext.declarative import declarative_base
-from sqlalchemy.orm import sessionmaker
+from sqlalchemy.ext.asyncio import create_async_engine, async_sessionmaker, AsyncSession
+from sqlalchemy.orm import Session, sessionmaker
+from sqlalchemy.pool import NullPool
 from app.config import settings
 
+logger = logging.getLogger(__name__)
+
+# Behind a transaction-pooling proxy (PgBouncer, pgcat) consecutive transactions may run on
+# different server connections, so session state such as prepared statements cannot be relied on
+TRANSACTION_PROXY = settings.db_pool_mode == "transaction_proxy"
+ASYNC_DRIVER_AVAILABLE = importlib.util.find_spec("asyncpg") is not None
+
+
+def get_pool_sizes() -> Dict[str, int]:
+    """Per-worker pool limits: the explicit settings, or a share of db_connection_budget
+
+    With a budget, each of worker_processes workers gets an equal share, split 2:1 between
+    the sync and async engines, so all workers together never open more server connections
+    than the budget.
+    """
+    if not settings.db_connection_budget:
+        return {
+            "pool_size": settings.db_pool_size,
+            "max_overflow": settings.db_max_overflow,
+            "async_pool_size": settings.async_db_pool_size,
+            "async_max_overflow": settings.async_db_max_overflow,
+        }
+
+    per_worker = max(2, settings.db_connection_budget // max(1, settings.worker_processes))
+    sync_limit = max(1, per_worker * 2 // 3) if ASYNC_DRIVER_AVAILABLE else per_worker
+    async_limit = max(1, per_worker - sync_limit)
+
+    # Half of each share stays open, the rest is overflow closed again when idle
+    return {
+        "pool_size": (sync_limit + 1) // 2,
+        "max_overflow": sync_limit // 2,
+        "async_pool_size": (async_limit + 1) // 2,
+        "async_max_overflow": async_limit // 2,
+    }
+
+
+def _pool_arguments(pool_size: int, max_overflow: int) -> Dict[str, Any]:
+    """create_engine pool arguments; a pool size of 0 in proxy mode means no client-side pool"""
+    if TRANSACTION_PROXY and pool_size == 0:
+        # Every checkout opens a (cheap) connection to the proxy, which does the pooling
+        return {"poolclass": NullPool}
+    return {
+        "pool_size": pool_size,
+        "max_overflow": max_overflow,
+        "pool_timeout": settings.db_pool_timeout,
+        "pool_recycle": settings.db_pool_recycle,
+        # The proxy mode reconnects on error (see ReconnectingSession) instead of
+        # spending a round trip on every checkout
+        "pool_pre_ping": settings.db_pre_ping and not TRANSACTION_PROXY,
+    }
+
+
+POOL_SIZES = get_pool_sizes()
+
 # Create database engine with optimized connection pool settings
 engine = create_engine(
     settings.database_url,
     echo=settings.debug,
 
-    # Connection Pool Settings - Fix for TimeoutError
-    pool_size=settings.db_pool_size,        # Configurable pool size (default 20)
-    max_overflow=settings.db_max_overflow,  # Configurable overflow (default 30)
-    pool_timeout=settings.db_pool_timeout,  # Configurable timeout (default 60)
-    pool_recycle=settings.db_pool_recycle,  # Configurable recycle (default 3600)
-    pool_pre_ping=True,                     # Verify connections before use
+    # Connection Pool Settings (pool_size/max_overflow/timeout/recycle/pre-ping)
+    **_pool_arguments(POOL_SIZES["pool_size"], POOL_SIZES["max_overflow"]),
 
     # Connection Settings
     connect_args={
         "connect_timeout": 10,              # Connection timeout
         "application_name": "CMSVS_Internal_System",
-        "options": "-c timezone=UTC"
+        # Proxies reject the "options" startup parameter; the time zone is set on connect below
+        **({} if TRANSACTION_PROXY else {"options": "-c timezone=UTC"})
     },
 
     # Engine Settings
@@ -27,14 +88,170 @@ engine = create_engine(
     future=True                             # Use SQLAlchemy 2.0 style
 )
 
+if TRANSACTION_PROXY:
+    @event.listens_for(engine, "connect")
+    def _set_utc_timezone(dbapi_connection, connection_record):
+        # PgBouncer tracks TimeZone and restores it on whichever server connection it assigns
+        cursor = dbapi_connection.cursor()
+        cursor.execute("SET TIME ZONE 'UTC'")
+        cursor.close()
+        dbapi_connection.commit()
+
+
+class ReconnectingSession(Session):
+    """Session that retries the first statement of a transaction once after a lost connection
+
+    Optimistic alternative to pool pre-ping: a dead pooled connection surfaces as an
+    invalidated-connection error on first use, the pool drops its stale connections, and
+    since nothing ran in the transaction yet the statement is simply repeated on a new one.
+    """
+
+    def execute(self, *args, **kwargs):
+        if self.in_transaction():
+            return super().execute(*args, **kwargs)
+        try:
+            return super().execute(*args, **kwargs)
+        except DBAPIError as e:
+            if not e.connection_invalidated:
+                raise
+            logger.warning("Database connection was lost, retrying on a new connection")
+            self.rollback()
+            return super().execute(*args, **kwargs)
+
+
 # Create session factory with optimized settings
 SessionLocal = sessionmaker(
+    class_=ReconnectingSession,
     autocommit=False,
     autoflush=False,
     bind=engine,
     expire_on_commit=False  # Prevent lazy loading issues after commit
 )
 
+
+# Optional read replica for analytics and reports. Its sessions are read-only, and
+# get_read_db falls back to the primary when the replica is down or lagging
+if settings.read_replica_url:
+    read_engine = create_engine(
+        settings.read_replica_url,
+        echo=settings.debug,
+        pool_size=settings.read_replica_pool_size,
+        max_overflow=settings.read_replica_max_overflow,
+        pool_timeout=settings.db_pool_timeout,
+        pool_recycle=settings.db_pool_recycle,
+        pool_pre_ping=True,
+        connect_args={
+            "connect_timeout": 5,
+            "application_name": "CMSVS_Internal_System_replica",
+            "options": "-c timezone=UTC"
+        },
+        execution_options={"postgresql_readonly": True},
+        future=True
+    )
+    ReadSessionLocal = sessionmaker(
+        class_=ReconnectingSession,
+        autocommit=False,
+        autoflush=False,
+        bind=read_engine,
+        expire_on_commit=False
+    )
+else:
+    read_engine = None
+    ReadSessionLocal = None
+
+# Seconds the replica is behind the primary; 0 when it has replayed everything it received
+# or is not a standby at all (e.g. a second database used for testing)
+_REPLICA_LAG_SQL = text("""
+    SELECT CASE
+        WHEN NOT pg_is_in_recovery() THEN 0
+        WHEN pg_last_wal_receive_lsn() = pg_last_wal_replay_lsn() THEN 0
+        ELSE EXTRACT(EPOCH FROM now() - pg_last_xact_replay_timestamp())
+    END
+""")
+
+_replica_lock = threading.Lock()
+_replica_checked_at = 0.0
+_replica_usable = False
+
+
+def get_replica_lag() -> float:
+    """Replication lag in seconds measured on the replica (raises if it is unreachable)"""
+    with read_engine.connect() as conn:
+        lag = conn.execute(_REPLICA_LAG_SQL).scalar()
+    # No transaction replayed yet while WAL is pending: lag is unknown
+    return float("inf") if lag is None else float(lag)
+
+
+def read_replica_available() -> bool:
+    """Whether reads may go to the replica; the lag check is cached per worker"""
+    global _replica_checked_at, _replica_usable
+
+    if read_engine is None:
+        return False
+
+    now = time.monotonic()
+    if now - _replica_checked_at < settings.read_replica_lag_check_interval:
+        return _replica_usable
+
+    with _replica_lock:
+        if now - _replica_checked_at >= settings.read_replica_lag_check_interval:
+            try:
+                lag = get_replica_lag()
+                usable = lag <= settings.read_replica_max_lag_seconds
+                if not usable:
+                    logger.warning(f"Read replica lag {lag:.1f}s exceeds limit, reading from primary")
+            except Exception as e:
+                logger.warning(f"Read replica unavailable, reading from primary: {e}")
+                usable = False
+            _replica_usable = usable
+            _replica_checked_at = time.monotonic()
+
+    return _replica_usable
+
+
+def get_async_database_url(url: str) -> str:
+    """Convert a sync PostgreSQL URL to its asyncpg equivalent"""
+    for prefix in ("postgresql+psycopg2://", "postgresql://", "postgres://"):
+        if url.startswith(prefix):
+            return "postgresql+asyncpg://" + url[len(prefix):]
+    return url
+
+
+# Async engine for async route handlers, with its own pool so async and
+# threadpool work don't compete for the same connections
+try:
+    async_engine = create_async_engine(
+        settings.async_database_url or get_async_database_url(settings.database_url),
+        echo=settings.debug,
+        **_pool_arguments(POOL_SIZES["async_pool_size"], POOL_SIZES["async_max_overflow"]),
+        connect_args={
+            "timeout": 10,
+            "server_settings": {
+                "application_name": "CMSVS_Internal_System_async",
+                "timezone": "UTC"
+            },
+            # asyncpg prepares every statement; a proxy may run the next execution on a
+            # server connection that never saw the prepare, so disable both statement caches
+            # and give each prepared statement a unique name
+            **({
+                "statement_cache_size": 0,
+                "prepared_statement_cache_size": 0,
+                "prepared_statement_name_func": lambda: f"__asyncpg_{uuid.uuid4()}__"
+            } if TRANSACTION_PROXY else {})
+        }
+    )
+    AsyncSessionLocal = async_sessionmaker(
+        bind=async_engine,
+        class_=AsyncSession,
+        sync_session_class=ReconnectingSession,
+        autoflush=False,
+        expire_on_commit=False
+    )
+except ImportError:
+    # asyncpg not installed - async handlers are unavailable
+    async_engine = None
+    AsyncSessionLocal = None
+
 # Create base class for models
 Base = declarative_base()
 
@@ -65,6 +282,38 @@ def get_db():
             logger.error(f"Error closing database session: {close_error}")
 
 
+def get_read_db():
+    """Dependency to get a session for read-only analytics: the replica when it is healthy, else the primary"""
+    db = ReadSessionLocal() if read_replica_available() else SessionLocal()
+    try:
+        yield db
+    except Exception:
+        try:
+            db.rollback()
+        except Exception as rollback_error:
+            logger.error(f"Error during rollback: {rollback_error}")
+        raise
+    finally:
+        try:
+            db.close()
+        except Exception as close_error:
+            logger.error(f"Error closing database session: {close_error}")
+
+
+async def get_async_db():
+    """Dependency to get an async database session (does not block the event loop)"""
+    if AsyncSessionLocal is None:
+        raise RuntimeError("Async database support requires the asyncpg driver")
+
+    async with AsyncSessionLocal() as db:
+        try:
+            yield db
+        except Exception:
+            # Rollback on any exception to clean up the transaction
+            await db.rollback()
+            raise
+
+
 def create_tables():
     """Create all tables"""
     Base.metadata.create_all(bind=engine)
@@ -74,6 +323,19 @@ def get_pool_status():
     """Get connection pool status for monitoring"""
     try:
         pool = engine.pool
+        if isinstance(pool, NullPool):
+            # No client-side pool in transaction proxy mode; the proxy holds the connections
+            return {
+                "pool_size": 0,
+                "checked_in": 0,
+                "checked_out": 0,
+                "overflow": 0,
+                "total_connections": 0,
+                "available_connections": 0,
+                "max_overflow": 0,
+                "pool_timeout": 0,
+                "pool_mode": settings.db_pool_mode
+            }
         checked_in = pool.checkedin()
         checked_out = pool.checkedout()
         pool_size = pool.size()
@@ -107,6 +369,14 @@ def get_pool_status():
 def close_all_connections():
     """Close all database connections - useful for cleanup"""
     engine.dispose()
+    if read_engine is not None:
+        read_engine.dispose()
+
+
+async def close_async_connections():
+    """Close all async database connections"""
+    if async_engine is not None:
+        await async_engine.dispose()
 
 
 def test_connection():
@@ -114,7 +384,6 @@ def test_connection():
     try:
         with engine.connect() as conn:
             # Use text() for raw SQL in SQLAlchemy 2.0
-            from sqlalchemy import text
             result = conn.execute(text("SELECT 1"))
             row = result.fetchone()
             if row and row[0] == 1:
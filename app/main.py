@@ -1,17 +1,19 @@
-from fastapi import FastAPI, Request, Depends, HTTPException
+from fastapi import FastAPI, Request, Depends, HTTPException, Query
 from fastapi.staticfiles import StaticFiles
 
-from fastapi.responses import HTMLResponse, RedirectResponse, JSONResponse
+from fastapi.responses import HTMLResponse, RedirectResponse, JSONResponse, Response, PlainTextResponse
 from fastapi.middleware.cors import CORSMiddleware
 from fastapi.security import HTTPBearer
 from sqlalchemy.orm import Session
+from starlette.concurrency import run_in_threadpool
+import asyncio
 import os
 import logging
 import time
 from datetime import datetime as dt, timezone, timedelta
 
 from app.config import settings
-from app.database import create_tables, get_db, get_pool_status
+from app.database import create_tables, get_db, get_pool_status, close_async_connections
 from app.routes import auth, dashboard, admin, messages, achievements, avatar, notifications, mobile
 from app.routes import settings as settings_routes
 from app.services.user_service import UserService
@@ -20,103 +22,22 @@ from app.utils.auth import verify_token
 from app.middleware.database_monitor import DatabaseMonitorMiddleware, database_health_endpoint
 from app.middleware.security import add_security_middleware
 from app.services.performance import performance_metrics, db_query_monitor, RequestPerformanceMiddleware
+from app.services.profiling import RequestProfilingMiddleware, PROFILE_COOKIE, instrument_engine
+from app.services import sampling_profiler
+from app.utils.logging_pipeline import setup_logging, stop_logging
+from app.services.competitions import run_competition_scheduler
+from app.services.leaderboard import run_leaderboard_scheduler
+from app.services.retention import run_retention_scheduler
+from app.services.preview_service import PreviewService
+from app.services.notification_fanout import NotificationFanout
+from app.services.activity_sink import activity_sink
 
 # Import achievement models to ensure they're registered with SQLAlchemy
 from app.models import achievement
 from app.models import user_avatar  # Import avatar model
+from app.services import kpi  # noqa: F401 - KPI snapshot model and cache invalidation listeners
 
-# Configure logging based on environment
-def setup_logging():
-    """Configure logging for production and development"""
-    import logging.handlers
-    import json
-    import sys
-    from pathlib import Path
-
-    # Ensure log directory exists
-    log_dir = Path(settings.log_file).parent
-    log_dir.mkdir(parents=True, exist_ok=True)
-
-    # Configure log level
-    log_level = getattr(logging, settings.log_level.upper(), logging.INFO)
-
-    # Create formatters
-    if settings.log_format == "json":
-        # JSON formatter for production
-        class JSONFormatter(logging.Formatter):
-            def format(self, record):
-                log_entry = {
-                    "timestamp": self.formatTime(record, self.datefmt),
-                    "level": record.levelname,
-                    "logger": record.name,
-                    "message": record.getMessage(),
-                    "module": record.module,
-                    "function": record.funcName,
-                    "line": record.lineno
-                }
-
-                # Add exception info if present
-                if record.exc_info:
-                    log_entry["exception"] = self.formatException(record.exc_info)
-
-                # Add extra fields
-                for key, value in record.__dict__.items():
-                    if key not in ['name', 'msg', 'args', 'levelname', 'levelno', 'pathname',
-                                 'filename', 'module', 'lineno', 'funcName', 'created', 'msecs',
-                                 'relativeCreated', 'thread', 'threadName', 'processName',
-                                 'process', 'getMessage', 'exc_info', 'exc_text', 'stack_info']:
-                        log_entry[key] = value
-
-                return json.dumps(log_entry)
-
-        formatter = JSONFormatter()
-    else:
-        # Standard formatter for development
-        formatter = logging.Formatter(
-            "%(asctime)s - %(name)s - %(levelname)s - %(message)s"
-        )
-
-    # Configure root logger
-    root_logger = logging.getLogger()
-    root_logger.setLevel(log_level)
-
-    # Remove existing handlers
-    for handler in root_logger.handlers[:]:
-        root_logger.removeHandler(handler)
-
-    # Console handler
-    console_handler = logging.StreamHandler(sys.stdout)
-    console_handler.setFormatter(formatter)
-    console_handler.setLevel(log_level)
-    root_logger.addHandler(console_handler)
-
-    # File handler with rotation
-    if settings.log_file:
-        try:
-            # Ensure the log file exists and is writable
-            log_file_path = Path(settings.log_file)
-            if not log_file_path.exists():
-                log_file_path.touch(mode=0o666, exist_ok=True)
-
-            file_handler = logging.handlers.RotatingFileHandler(
-                settings.log_file,
-                maxBytes=settings.log_max_size,
-                backupCount=settings.log_backup_count
-            )
-            file_handler.setFormatter(formatter)
-            file_handler.setLevel(log_level)
-            root_logger.addHandler(file_handler)
-        except (PermissionError, OSError) as e:
-            # If we can't write to the log file, just log to console
-            console_handler.setLevel(logging.WARNING)
-            root_logger.warning(f"Could not create log file {settings.log_file}: {e}. Logging to console only.")
-
-    # Set specific logger levels
-    logging.getLogger("uvicorn.access").setLevel(logging.WARNING if settings.is_production else logging.INFO)
-    logging.getLogger("sqlalchemy.engine").setLevel(logging.WARNING if settings.is_production else logging.INFO)
-
-    return root_logger
-
+# Configure logging based on environment (queued, written by a background thread)
 logger = setup_logging()
 
 logger = logging.getLogger(__name__)
@@ -143,6 +64,9 @@ app.add_middleware(DatabaseMonitorMiddleware, log_interval=50)
 # Add performance monitoring middleware
 app.add_middleware(RequestPerformanceMiddleware)
 
+# Per-request Server-Timing breakdown and on-demand profiles (outside the middleware above)
+app.add_middleware(RequestProfilingMiddleware)
+
 # Add security middleware for production
 add_security_middleware(app)
 
@@ -177,6 +101,7 @@ app.mount("/static", CustomStaticFiles(directory="app/static"), name="static")
 
 # Import shared templates instance
 from app.utils.templates import templates
+from app.utils.template_cache import warm_templates
 
 # Security
 security = HTTPBearer(auto_error=False)
@@ -232,9 +157,18 @@ async def startup_event():
     create_tables()
     logger.info("Database tables created/verified")
 
+    # Compile every template now, or load it from the bytecode cache shared by workers
+    warm_templates(templates.env)
+
     # Set up database query monitoring
-    from app.database import engine
+    from app.database import engine, async_engine
     db_query_monitor.setup_query_monitoring(engine)
+    if async_engine is not None:
+        # Async sessions run their statements through the wrapped sync engine
+        db_query_monitor.setup_query_monitoring(async_engine.sync_engine)
+    instrument_engine(engine)
+    if async_engine is not None:
+        instrument_engine(async_engine.sync_engine)
     logger.info("Database query monitoring enabled")
 
     # Create avatar tables
@@ -264,10 +198,45 @@ async def startup_event():
         logger.error(f"Error creating admin user: {e}")
     finally:
         db.close()
-    
+
+    # Activities buffered by a worker that crashed in strict mode
+    if settings.activity_strict_mode:
+        activity_sink.recover()
+
+    # Start and finalize competitions on schedule
+    if settings.competition_scheduler_enabled:
+        app.state.competition_scheduler = asyncio.create_task(run_competition_scheduler())
+
+    # Recompute leaderboard ranks off the request path
+    if settings.leaderboard_scheduler_enabled:
+        app.state.leaderboard_scheduler = asyncio.create_task(run_leaderboard_scheduler())
+
+    # Move old notifications and activities to the archive tables
+    if settings.retention_enabled:
+        app.state.retention_scheduler = asyncio.create_task(run_retention_scheduler())
+
+    # Join sampling sessions started by GET /performance/profile in any worker
+    if settings.sampling_profiler_enabled and sampling_profiler.SAMPLING_AVAILABLE:
+        app.state.sampling_watcher = asyncio.create_task(sampling_profiler.run_sampling_watcher())
+
     logger.info("Application startup complete")
 
 
+@app.on_event("shutdown")
+async def shutdown_event():
+    """Flush background resources"""
+    logger.info("Shutting down CMSVS Internal System...")
+    for name in ("competition_scheduler", "leaderboard_scheduler", "retention_scheduler", "sampling_watcher"):
+        scheduler = getattr(app.state, name, None)
+        if scheduler is not None:
+            scheduler.cancel()
+    PreviewService.shutdown()
+    NotificationFanout.shutdown()
+    activity_sink.stop()
+    await close_async_connections()
+    stop_logging()
+
+
 @app.get("/", response_class=HTMLResponse)
 async def root(request: Request, db: Session = Depends(get_db)):
     """Root endpoint - redirect to appropriate dashboard"""
@@ -319,6 +288,21 @@ async def get_metrics():
         raise HTTPException(status_code=500, detail="Error collecting metrics")
 
 
+@app.get("/metrics/prometheus")
+async def get_prometheus_metrics():
+    """Get request, query, cache and upload metrics in Prometheus text format"""
+    if not settings.metrics_enabled:
+        raise HTTPException(status_code=404, detail="Metrics endpoint disabled")
+
+    try:
+        from app.services.metrics import prometheus_metrics
+        content, content_type = prometheus_metrics.render()
+        return Response(content=content, media_type=content_type)
+    except Exception as e:
+        logger.error(f"Error rendering Prometheus metrics: {e}")
+        raise HTTPException(status_code=500, detail="Error collecting metrics")
+
+
 @app.get("/health/detailed")
 async def detailed_health_check():
     """Detailed health check with all system components"""
@@ -393,6 +377,94 @@ async def optimize_database_performance(db: Session = Depends(get_db)):
 
 
 
+@app.post("/performance/profiling")
+async def enable_request_profiling(request: Request, db: Session = Depends(get_db)):
+    """Profile this browser's requests for profiling_cookie_minutes (admin only)"""
+    current_user = await get_current_user_from_cookie(request, db)
+    if not current_user or current_user.role != UserRole.ADMIN:
+        raise HTTPException(status_code=403, detail="Admin access required")
+
+    from app.utils.auth import create_access_token
+    token = create_access_token(
+        {"sub": current_user.username, "scope": "profile"},
+        timedelta(minutes=settings.profiling_cookie_minutes)
+    )
+    response = JSONResponse({
+        "status": "success",
+        "message": f"Requests from this browser are profiled for {settings.profiling_cookie_minutes} minutes",
+        "directory": settings.profiling_directory
+    })
+    response.set_cookie(
+        key=PROFILE_COOKIE,
+        value=token,
+        httponly=True,
+        max_age=settings.profiling_cookie_minutes * 60,
+        secure=request.url.scheme == "https" or request.headers.get("x-forwarded-proto") == "https",
+        samesite="lax",
+        path="/"
+    )
+    return response
+
+
+@app.delete("/performance/profiling")
+async def disable_request_profiling():
+    """Stop profiling this browser's requests"""
+    response = JSONResponse({"status": "success", "message": "Request profiling disabled"})
+    response.delete_cookie(key=PROFILE_COOKIE, path="/")
+    return response
+
+
+@app.get("/performance/profile")
+async def sample_workers(
+    request: Request,
+    seconds: float = Query(10, gt=0),
+    interval_ms: int = Query(None, ge=1, le=1000),
+    mode: str = Query("cpu", pattern="^(cpu|wall)$"),
+    format: str = Query("collapsed", pattern="^(collapsed|speedscope)$"),
+    all_workers: bool = True,
+    include_idle: bool = False,
+    db: Session = Depends(get_db)
+):
+    """Sample the Python stacks of the workers for a number of seconds (admin only)
+
+    mode=cpu counts CPU time only, so it shows what burns CPU; mode=wall also counts
+    time spent waiting on the database or the network. The result is collapsed stacks
+    (one "frame;frame count" line per stack) or a speedscope JSON file.
+    """
+    if not settings.sampling_profiler_enabled:
+        raise HTTPException(status_code=404, detail="Sampling profiler disabled")
+    if not sampling_profiler.SAMPLING_AVAILABLE:
+        raise HTTPException(status_code=501, detail="Signal-based sampling is not available on this platform")
+
+    current_user = await get_current_user_from_cookie(request, db)
+    if not current_user or current_user.role != UserRole.ADMIN:
+        raise HTTPException(status_code=403, detail="Admin access required")
+    # Do not hold a pooled connection while sampling
+    db.close()
+
+    seconds = min(seconds, settings.sampling_profiler_max_seconds)
+    interval_ms = interval_ms or settings.sampling_profiler_interval_ms
+
+    if all_workers:
+        session, end = sampling_profiler.request_session(seconds, interval_ms, mode, include_idle)
+        # Give the last worker to notice the request time to write its stacks
+        await asyncio.sleep(end - time.time() + settings.sampling_profiler_poll_seconds + 1)
+        results = await run_in_threadpool(sampling_profiler.collect_session, session)
+    else:
+        try:
+            results = {os.getpid(): await sampling_profiler.sample(seconds, interval_ms, mode, include_idle)}
+        except RuntimeError as e:
+            raise HTTPException(status_code=409, detail=str(e))
+
+    samples = sampling_profiler.merge(results)
+    headers = {"X-Profile-Workers": str(len(results)), "X-Profile-Samples": str(sum(samples.values()))}
+    if format == "speedscope":
+        name = f"cmsvs {mode} {dt.now():%Y%m%d-%H%M%S}"
+        headers["Content-Disposition"] = f'attachment; filename="cmsvs-{mode}-{dt.now():%Y%m%d-%H%M%S}.speedscope.json"'
+        return JSONResponse(sampling_profiler.speedscope(samples, name, interval_ms), headers=headers)
+    return PlainTextResponse(sampling_profiler.collapsed(samples), headers=headers)
+
+
 @app.get("/health/pool")
 async def pool_status():
     """Database pool status endpoint"""
@@ -1,4 +1,4 @@
-from sqlalchemy import Column, Integer, String, DateTime, ForeignKey, Boolean, Float, Text, Enum as SQLEnum
+from sqlalchemy import Column, Integer, String, DateTime, ForeignKey, Boolean, Float, Text, Index, Enum as SQLEnum, text
 from sqlalchemy.orm import relationship
 from sqlalchemy.sql import func
 from app.database import Base
@@ -48,6 +48,14 @@ class Achievement(Base):
 class UserAchievement(Base):
     """User achievement progress and completions"""
     __tablename__ = "user_achievements"
+    __table_args__ = (
+        # One row per user, achievement and period; progress is upserted against these
+        # (see AchievementService.update_user_progress)
+        Index("uq_user_achievements_period", "user_id", "achievement_id", "period_start", unique=True),
+        # Milestone and streak achievements have no period
+        Index("uq_user_achievements_lifetime", "user_id", "achievement_id", unique=True,
+              postgresql_where=text("period_start IS NULL")),
+    )
 
     id = Column(Integer, primary_key=True, index=True)
     user_id = Column(Integer, ForeignKey("users.id"), nullable=False)
@@ -106,6 +114,14 @@ class Competition(Base):
 class CompetitionParticipant(Base):
     """Competition participants and their progress"""
     __tablename__ = "competition_participants"
+    __table_args__ = (
+        # One row per user per competition; org-wide enrollment upserts on it
+        Index("uq_competition_participants_user", "competition_id", "user_id", unique=True),
+        # Progress events look up every competition of one user
+        Index("ix_competition_participants_user_id", "user_id"),
+        # Standings fallback without Redis reads participants in progress order
+        Index("ix_competition_participants_standings", "competition_id", "current_progress"),
+    )
 
     id = Column(Integer, primary_key=True, index=True)
     competition_id = Column(Integer, ForeignKey("competitions.id"), nullable=False)
@@ -128,6 +144,13 @@ class CompetitionParticipant(Base):
 class UserStats(Base):
     """User statistics and leaderboard data"""
     __tablename__ = "user_stats"
+    __table_args__ = (
+        # Leaderboard pages read users in rank order (see LeaderboardService)
+        Index("ix_user_stats_global_rank", "global_rank"),
+        Index("ix_user_stats_daily_rank", "daily_rank"),
+        Index("ix_user_stats_weekly_rank", "weekly_rank"),
+        Index("ix_user_stats_monthly_rank", "monthly_rank"),
+    )
 
     id = Column(Integer, primary_key=True, index=True)
     user_id = Column(Integer, ForeignKey("users.id"), nullable=False, unique=True)
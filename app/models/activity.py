@@ -1,4 +1,4 @@
-from sqlalchemy import Column, Integer, String, DateTime, ForeignKey, Text, Enum, JSON
+from sqlalchemy import Column, Integer, String, DateTime, ForeignKey, Text, Enum, JSON, Index
 from sqlalchemy.orm import relationship
 from sqlalchemy.sql import func
 from app.database import Base
@@ -29,6 +29,11 @@ class ActivityType(enum.Enum):
 
 class Activity(Base):
     __tablename__ = "activities"
+    __table_args__ = (
+        # Per-user activity pages filter by user; retention scans by age
+        Index("ix_activities_user_created", "user_id", "created_at"),
+        Index("ix_activities_created_at", "created_at"),
+    )
 
     id = Column(Integer, primary_key=True, index=True)
     activity_type = Column(Enum(ActivityType), nullable=False)
@@ -0,0 +1,55 @@
+"""
+Archive tables for notifications and activities moved out of the hot tables
+Both are range-partitioned by month of created_at; partitions are created on demand and
+dropped whole once past archive_retention_days (see app.services.retention). Enum
+columns are stored as their names so new enum members never break archiving.
+"""
+from sqlalchemy import Column, Integer, String, DateTime, Text, Boolean, JSON
+from sqlalchemy.sql import func
+from app.database import Base
+
+
+class NotificationArchive(Base):
+    """Notifications older than the retention period"""
+    __tablename__ = "notifications_archive"
+    __table_args__ = {"postgresql_partition_by": "RANGE (created_at)"}
+
+    id = Column(Integer, primary_key=True, autoincrement=False)
+    created_at = Column(DateTime(timezone=True), primary_key=True)
+    user_id = Column(Integer, nullable=False, index=True)
+    type = Column(String(50), nullable=False)
+    priority = Column(String(20), nullable=False)
+    title = Column(String(255), nullable=False)
+    message = Column(Text, nullable=False)
+    action_url = Column(String(500), nullable=True)
+    request_id = Column(Integer, nullable=True)
+    related_user_id = Column(Integer, nullable=True)
+    is_read = Column(Boolean, nullable=False)
+    is_sent = Column(Boolean, nullable=False)
+    sent_at = Column(DateTime(timezone=True), nullable=True)
+    read_at = Column(DateTime(timezone=True), nullable=True)
+    extra_data = Column(JSON, nullable=True)
+    updated_at = Column(DateTime(timezone=True), nullable=True)
+    archived_at = Column(DateTime(timezone=True), server_default=func.now(), nullable=False)
+
+    def __repr__(self):
+        return f"<NotificationArchive(id={self.id}, user_id={self.user_id})>"
+
+
+class ActivityArchive(Base):
+    """Activities older than the retention period"""
+    __tablename__ = "activities_archive"
+    __table_args__ = {"postgresql_partition_by": "RANGE (created_at)"}
+
+    id = Column(Integer, primary_key=True, autoincrement=False)
+    created_at = Column(DateTime(timezone=True), primary_key=True)
+    activity_type = Column(String(50), nullable=False)
+    description = Column(Text, nullable=False)
+    details = Column(JSON, nullable=True)
+    ip_address = Column(String(45))
+    user_agent = Column(Text)
+    user_id = Column(Integer, nullable=False, index=True)
+    archived_at = Column(DateTime(timezone=True), server_default=func.now(), nullable=False)
+
+    def __repr__(self):
+        return f"<ActivityArchive(id={self.id}, type='{self.activity_type}')>"
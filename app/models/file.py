@@ -1,7 +1,8 @@
-from sqlalchemy import Column, Integer, String, DateTime, ForeignKey, BigInteger
+from sqlalchemy import Column, Integer, String, DateTime, ForeignKey, BigInteger, Boolean
 from sqlalchemy.orm import relationship
-from sqlalchemy.sql import func
+from sqlalchemy.sql import func, expression
 from app.database import Base
+from app.utils.previews import HASH_PREFIX_LENGTH
 import uuid
 import os
 import threading
@@ -31,6 +32,8 @@ class File(Base):
     file_category = Column(String(100), nullable=False, default="general")  # Category for file organization
     request_id = Column(Integer, ForeignKey("requests.id"), nullable=False)
     uploaded_at = Column(DateTime(timezone=True), server_default=func.now())
+    content_hash = Column(String(64), nullable=True)  # sha256, set by the preview pipeline
+    has_preview = Column(Boolean, nullable=False, default=False, server_default=expression.false())
 
     # Relationships
     request = relationship("Request", back_populates="files")
@@ -88,7 +91,7 @@ class File(Base):
         with cls._filename_lock:
             try:
                 # Production logging
-                cls._logger.info(f"Generating filename for: original='{original_filename}', category='{category}', field_id='{field_id}', request='{request_number}'")
+                cls._logger.debug(f"Generating filename for: original='{original_filename}', category='{category}', field_id='{field_id}', request='{request_number}'")
 
                 # Validate inputs
                 is_valid, error_msg = cls.validate_filename_components(original_filename, category, field_id)
@@ -138,7 +141,7 @@ class File(Base):
                         unique_id = str(uuid.uuid4()).replace("-", "")[:6]
                         generated_filename = f"{category}{request_part}_{short_timestamp}_{unique_id}{ext}"
 
-                cls._logger.info(f"Generated filename: '{generated_filename}'")
+                cls._logger.debug(f"Generated filename: '{generated_filename}'")
                 return generated_filename
 
             except Exception as e:
@@ -154,3 +157,17 @@ class File(Base):
         if not self.file_size or self.file_size == 0:
             return 0.0
         return round(self.file_size / (1024 * 1024), 2)
+
+    def derivative_url(self, size: str) -> str:
+        """Thumbnail or preview URL (versioned by content hash), or the original until it exists"""
+        if self.has_preview and self.content_hash:
+            return f"/files/preview/{self.id}?size={size}&v={self.content_hash[:HASH_PREFIX_LENGTH]}"
+        return f"/files/view/{self.id}"
+
+    @property
+    def preview_url(self) -> str:
+        return self.derivative_url("preview")
+
+    @property
+    def thumbnail_url(self) -> str:
+        return self.derivative_url("thumb")
@@ -0,0 +1,21 @@
+from sqlalchemy import Column, Integer, Date, DateTime
+from sqlalchemy.sql import func
+from app.database import Base
+
+
+class KpiSnapshot(Base):
+    """Admin dashboard counters as of one Bahrain day (see KpiSnapshotService)"""
+    __tablename__ = "kpi_snapshots"
+
+    snapshot_date = Column(Date, primary_key=True)
+    total_users = Column(Integer, nullable=False, default=0)
+    active_users_30d = Column(Integer, nullable=False, default=0)  # Users updated in the 30 days before
+    total_requests = Column(Integer, nullable=False, default=0)
+    completed_requests = Column(Integer, nullable=False, default=0)
+    pending_requests = Column(Integer, nullable=False, default=0)
+    in_progress_requests = Column(Integer, nullable=False, default=0)
+    rejected_requests = Column(Integer, nullable=False, default=0)
+    updated_at = Column(DateTime(timezone=True), server_default=func.now(), onupdate=func.now())
+
+    def __repr__(self):
+        return f"<KpiSnapshot(date={self.snapshot_date}, requests={self.total_requests})>"
@@ -1,7 +1,7 @@
 """
 Message model for user-to-user messaging system
 """
-from sqlalchemy import Column, Integer, String, Text, Boolean, DateTime, ForeignKey
+from sqlalchemy import Column, Integer, String, Text, Boolean, DateTime, ForeignKey, Index
 from sqlalchemy.orm import relationship
 from sqlalchemy.sql import func
 from app.database import Base
@@ -10,6 +10,11 @@ from app.database import Base
 class Message(Base):
     """Message model for user-to-user communication"""
     __tablename__ = "messages"
+    __table_args__ = (
+        # Inbox / sent pages filter by one participant and order by date
+        Index("ix_messages_recipient_created", "recipient_id", "created_at"),
+        Index("ix_messages_sender_created", "sender_id", "created_at"),
+    )
 
     id = Column(Integer, primary_key=True, index=True)
     sender_id = Column(Integer, ForeignKey("users.id"), nullable=False)
@@ -74,6 +79,10 @@ class Message(Base):
 class Conversation(Base):
     """Conversation model for message threading"""
     __tablename__ = "conversations"
+    __table_args__ = (
+        # participant_1_id is always the smaller user id (see MessageService._update_conversation)
+        Index("uq_conversations_participants", "participant_1_id", "participant_2_id", unique=True),
+    )
 
     id = Column(Integer, primary_key=True, index=True)
     participant_1_id = Column(Integer, ForeignKey("users.id"), nullable=False)
@@ -1,4 +1,4 @@
-from sqlalchemy import Column, Integer, String, DateTime, ForeignKey, Enum, Text, Boolean, JSON
+from sqlalchemy import Column, Integer, String, DateTime, ForeignKey, Enum, Text, Boolean, JSON, Index
 from sqlalchemy.orm import relationship
 from sqlalchemy.sql import func
 from app.database import Base
@@ -25,6 +25,11 @@ class NotificationPriority(enum.Enum):
 class Notification(Base):
     """Notification model for push notifications and in-app notifications"""
     __tablename__ = "notifications"
+    __table_args__ = (
+        # Inbox pages and unread counts filter by user; retention scans by age
+        Index("ix_notifications_user_created", "user_id", "created_at"),
+        Index("ix_notifications_created_at", "created_at"),
+    )
 
     id = Column(Integer, primary_key=True, index=True)
     user_id = Column(Integer, ForeignKey("users.id"), nullable=False)
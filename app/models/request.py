@@ -1,4 +1,4 @@
-from sqlalchemy import Column, Integer, String, DateTime, ForeignKey, Enum, Text, Boolean
+from sqlalchemy import Column, Integer, String, DateTime, Date, ForeignKey, Enum, Text, Boolean
 from sqlalchemy.orm import relationship
 from sqlalchemy.sql import func
 from app.database import Base
@@ -59,12 +59,19 @@ class Request(Base):
 
     @classmethod
     def generate_request_number(cls) -> str:
-        """Generate unique request number"""
-        from datetime import datetime
-        timestamp = datetime.now().strftime("%Y%m%d%H%M%S")
-        return f"REQ-{timestamp}"
+        """Generate unique request number (REQ-YYYYMMDD-NNNNN) from the shared daily counter"""
+        from app.services.request_numbers import request_number_allocator
+        return request_number_allocator.allocate()
 
     @classmethod
     def generate_unique_code(cls) -> str:
         """Generate unique identification code"""
         return str(uuid.uuid4()).replace("-", "").upper()[:12]
+
+
+class RequestNumberCounter(Base):
+    """Last request number handed out per (Bahrain) day"""
+    __tablename__ = "request_number_counters"
+
+    day = Column(Date, primary_key=True)
+    last_value = Column(Integer, nullable=False, default=0)
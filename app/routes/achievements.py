@@ -2,7 +2,7 @@ from fastapi import APIRouter, Depends, Request, Form, HTTPException, Query
 from fastapi.responses import HTMLResponse, JSONResponse
 
 from sqlalchemy.orm import Session
-from sqlalchemy import desc
+from sqlalchemy import desc, func
 from typing import Optional
 from datetime import datetime, timedelta
 
@@ -168,24 +168,29 @@ async def competitions_page(
         competitions = db.query(Competition).order_by(desc(Competition.created_at)).limit(20).all()
     
     # Get user's participation status for each competition
+    progress_by_competition = dict(db.query(
+        CompetitionParticipant.competition_id, CompetitionParticipant.current_progress
+    ).filter(
+        CompetitionParticipant.user_id == current_user.id,
+        CompetitionParticipant.competition_id.in_([comp.id for comp in competitions])
+    ).all()) if competitions else {}
+
+    # Participant counts for all listed competitions in one grouped query
+    participant_counts = dict(db.query(
+        CompetitionParticipant.competition_id, func.count(CompetitionParticipant.id)
+    ).filter(
+        CompetitionParticipant.competition_id.in_([comp.id for comp in competitions])
+    ).group_by(CompetitionParticipant.competition_id).all()) if competitions else {}
+
     competitions_data = []
     for comp in competitions:
-        participant = db.query(CompetitionParticipant).filter(
-            CompetitionParticipant.competition_id == comp.id,
-            CompetitionParticipant.user_id == current_user.id
-        ).first()
-        
-        total_participants = db.query(CompetitionParticipant).filter(
-            CompetitionParticipant.competition_id == comp.id
-        ).count()
-        
         competitions_data.append({
             "competition": comp,
-            "is_participating": participant is not None,
-            "user_progress": participant.current_progress if participant else 0,
-            "total_participants": total_participants
+            "is_participating": comp.id in progress_by_competition,
+            "user_progress": progress_by_competition.get(comp.id) or 0,
+            "total_participants": participant_counts.get(comp.id, 0)
         })
-    
+
     return templates.TemplateResponse(
         "achievements/competitions.html",
         {
@@ -215,11 +220,12 @@ async def join_competition(
 @router.get("/competitions/{competition_id}/leaderboard", response_class=JSONResponse)
 async def get_competition_leaderboard(
     competition_id: int,
+    limit: int = Query(100, ge=1, le=1000, description="Number of leading participants"),
     current_user: User = Depends(get_current_user_cookie),
     db: Session = Depends(get_db)
 ):
     """Get leaderboard for a specific competition"""
-    leaderboard = AchievementService.get_competition_leaderboard(db, competition_id)
+    leaderboard = AchievementService.get_competition_leaderboard(db, competition_id, limit)
     return {"leaderboard": leaderboard}
 
 
@@ -253,6 +259,7 @@ async def create_competition(
     participation_points: int = Form(10),
     max_participants: Optional[int] = Form(None),
     is_public: bool = Form(True),
+    enroll_all_users: bool = Form(False),
     current_user: User = Depends(require_admin_cookie),
     db: Session = Depends(get_db)
 ):
@@ -270,7 +277,8 @@ async def create_competition(
             "third_place_points": third_place_points,
             "participation_points": participation_points,
             "max_participants": max_participants,
-            "is_public": is_public
+            "is_public": is_public,
+            "enroll_all_users": enroll_all_users
         }
         
         competition = AchievementService.create_competition(db, current_user.id, competition_data)
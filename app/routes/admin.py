@@ -5,13 +5,14 @@ from sqlalchemy.orm import Session
 from typing import Optional, List
 import logging
 from datetime import datetime as dt, timezone, timedelta
-from app.database import get_db
+from app.database import get_db, get_read_db
 from app.utils.auth import verify_token
 from app.services.user_service import UserService
 from app.services.request_service import RequestService
 from app.services.achievement_service import AchievementService
 from app.services.avatar_service import AvatarService
 from app.services.activity_service import ActivityService
+from app.services.bulk_requests import BulkRequestService
 from app.models.user import User, UserRole, UserStatus
 from app.models.request import RequestStatus
 
@@ -36,7 +37,8 @@ from reportlab.pdfgen import canvas
 from reportlab.lib.utils import ImageReader
 
 router = APIRouter(prefix="/admin")
-from app.utils.templates import templates
+from app.utils.templates import templates, is_htmx_request, bulk_action_response
+from app.utils.fragments import render_fragment
 
 
 async def require_admin_cookie(request: Request, db: Session = Depends(get_db)) -> User:
@@ -120,44 +122,14 @@ async def require_user_access_or_admin(request: Request, user_id: int, db: Sessi
 @router.get("/dashboard", response_class=HTMLResponse)
 async def admin_dashboard(
     request: Request,
-    current_user: User = Depends(require_admin_cookie),
-    db: Session = Depends(get_db)
+    current_user: User = Depends(require_admin_cookie)
 ):
-    """Admin dashboard"""
-    # Get system statistics
-    request_stats = RequestService.get_request_statistics(db)
-
-    # Get recent requests
-    recent_requests = RequestService.get_all_requests(db, limit=10)
-
-    # Get all users count
-    all_users = UserService.get_all_users(db, limit=1000)
-    user_count = len(all_users)
-    admin_count = len([u for u in all_users if u.role == UserRole.ADMIN])
-    active_users = len([u for u in all_users if u.is_active])
-
-    # Get user monthly chart data
-    user_chart_data = RequestService.get_user_monthly_chart_data(db)
-
-    # Get user progress tracking data
-    user_progress_data = RequestService.get_user_progress_tracking(db)
-
-
-
+    """Admin dashboard; the widgets load from /admin/fragments/dashboard/*"""
     return templates.TemplateResponse(
         "admin/dashboard.html",
         {
             "request": request,
-            "current_user": current_user,
-            "request_stats": request_stats,
-            "recent_requests": recent_requests,
-            "user_stats": {
-                "total": user_count,
-                "admins": admin_count,
-                "active": active_users
-            },
-            "user_chart_data": user_chart_data,
-            "user_progress_data": user_progress_data
+            "current_user": current_user
         }
     )
 
@@ -165,25 +137,14 @@ async def admin_dashboard(
 @router.get("/stats", response_class=HTMLResponse)
 async def admin_stats_dashboard(
     request: Request,
-    current_user: User = Depends(require_admin_cookie),
-    db: Session = Depends(get_db)
+    current_user: User = Depends(require_admin_cookie)
 ):
-    """Admin Stats Dashboard with comprehensive analytics"""
-    from app.services.achievement_service import AchievementService
-
-    # Get comprehensive stats data
-    stats_data = AchievementService.get_admin_stats_dashboard_data(db)
-
-    # Get users competition data for the bubble chart
-    users_competition_data = RequestService.get_users_competition_data(db)
-
+    """Admin Stats Dashboard with comprehensive analytics; the widgets load from /admin/fragments/stats/*"""
     return templates.TemplateResponse(
         "admin/stats.html",
         {
             "request": request,
-            "current_user": current_user,
-            "stats_data": stats_data,
-            "users_competition_data": users_competition_data
+            "current_user": current_user
         }
     )
 
@@ -234,19 +195,7 @@ async def manage_users(
         has_prev = page > 1
         has_next = page < total_pages
 
-        # Get request statistics for the upload section
-        request_stats = RequestService.get_request_statistics(db)
-
-        # Get recent requests for display
-        recent_requests = RequestService.get_all_requests(db, limit=10)
-
-        # Get approval statistics
-        all_users = UserService.get_all_users(db, limit=1000)
-        approval_stats = {
-            "pending": len([u for u in all_users if u.approval_status == UserStatus.PENDING]),
-            "approved": len([u for u in all_users if u.approval_status == UserStatus.APPROVED]),
-            "rejected": len([u for u in all_users if u.approval_status == UserStatus.REJECTED])
-        }
+        # Statistics cards and recent requests load from /admin/fragments/users/*
 
         return templates.TemplateResponse(
             "admin/users_with_upload.html",
@@ -254,8 +203,6 @@ async def manage_users(
                 "request": request,
                 "current_user": current_user,
                 "users": users,
-                "request_stats": request_stats,
-                "recent_requests": recent_requests,
                 # Pagination data
                 "current_page": page,
                 "per_page": per_page,
@@ -268,8 +215,6 @@ async def manage_users(
                 "current_role_filter": role_filter,
                 "current_status_filter": status_filter,
                 "current_approval_filter": approval_filter,
-                # Approval statistics
-                "approval_stats": approval_stats,
                 "available_roles": [role.value for role in UserRole]
             }
         )
@@ -283,8 +228,6 @@ async def manage_users(
                 "request": request,
                 "current_user": current_user,
                 "users": [],
-                "request_stats": {"total": 0, "pending": 0, "completed": 0, "in_progress": 0},
-                "recent_requests": [],
                 "current_page": 1,
                 "per_page": per_page,
                 "total_pages": 1,
@@ -300,6 +243,119 @@ async def manage_users(
         )
 
 
+# Widgets of the admin pages, loaded with hx-trigger="load" (see app.utils.fragments)
+
+@router.get("/fragments/dashboard/request-stats", response_class=HTMLResponse)
+async def dashboard_request_stats_fragment(
+    request: Request,
+    current_user: User = Depends(require_admin_cookie),
+    read_db: Session = Depends(get_read_db)
+):
+    """Request counters of the admin dashboard"""
+    return await render_fragment(
+        request, "dashboard/request-stats", "admin/partials/dashboard_request_stats.html",
+        lambda: {"request_stats": RequestService.get_request_statistics(read_db)}
+    )
+
+
+@router.get("/fragments/dashboard/recent-requests", response_class=HTMLResponse)
+async def dashboard_recent_requests_fragment(
+    request: Request,
+    current_user: User = Depends(require_admin_cookie),
+    read_db: Session = Depends(get_read_db)
+):
+    """Latest requests table of the admin dashboard"""
+    return await render_fragment(
+        request, "dashboard/recent-requests", "admin/partials/dashboard_recent_requests.html",
+        lambda: {"recent_requests": RequestService.get_all_requests(read_db, limit=10)}
+    )
+
+
+@router.get("/fragments/stats/overview", response_class=HTMLResponse)
+async def stats_overview_fragment(
+    request: Request,
+    current_user: User = Depends(require_admin_cookie),
+    read_db: Session = Depends(get_read_db)
+):
+    """KPI cards, charts and tables of the stats dashboard"""
+    return await render_fragment(
+        request, "stats/overview", "admin/partials/stats_overview.html",
+        lambda: {"stats_data": AchievementService.get_admin_stats_dashboard_data(read_db)}
+    )
+
+
+@router.get("/fragments/stats/competition", response_class=HTMLResponse)
+async def stats_competition_fragment(
+    request: Request,
+    current_user: User = Depends(require_admin_cookie),
+    read_db: Session = Depends(get_read_db)
+):
+    """Top performers and the data of the users competition chart"""
+    return await render_fragment(
+        request, "stats/competition", "admin/partials/stats_competition.html",
+        lambda: {"users_competition_data": RequestService.get_users_competition_data(read_db)}
+    )
+
+
+@router.get("/fragments/users/stats", response_class=HTMLResponse)
+async def users_stats_fragment(
+    request: Request,
+    current_user: User = Depends(require_admin_cookie),
+    read_db: Session = Depends(get_read_db)
+):
+    """Approval and request counters of the users page"""
+    return await render_fragment(
+        request, "users/stats", "admin/partials/users_stats.html",
+        lambda: {
+            "approval_stats": UserService.get_approval_statistics(read_db),
+            "request_stats": RequestService.get_request_statistics(read_db)
+        }
+    )
+
+
+@router.get("/fragments/users/recent-requests", response_class=HTMLResponse)
+async def users_recent_requests_fragment(
+    request: Request,
+    current_user: User = Depends(require_admin_cookie),
+    read_db: Session = Depends(get_read_db)
+):
+    """Recent requests tab of the users page"""
+    return await render_fragment(
+        request, "users/recent-requests", "admin/partials/users_recent_requests.html",
+        lambda: {"recent_requests": RequestService.get_all_requests(read_db, limit=10)}
+    )
+
+
+@router.get("/fragments/requests-records/system-stats", response_class=HTMLResponse)
+async def requests_records_system_stats_fragment(
+    request: Request,
+    shown: int = Query(0, ge=0),
+    current_user: User = Depends(require_admin_cookie),
+    read_db: Session = Depends(get_read_db)
+):
+    """System statistics of the requests records page; the details section is swapped out of band"""
+    return await render_fragment(
+        request, "requests-records/system-stats", "admin/partials/records_system_stats.html",
+        lambda: {"system_stats": ActivityService.get_system_activity_statistics(read_db)},
+        params={"shown": shown}
+    )
+
+
+@router.get("/fragments/requests-records/user-options", response_class=HTMLResponse)
+async def requests_records_user_options_fragment(
+    request: Request,
+    selected: Optional[int] = Query(None),
+    current_user: User = Depends(require_admin_cookie),
+    read_db: Session = Depends(get_read_db)
+):
+    """<option>s of the user filter on the requests records page"""
+    return await render_fragment(
+        request, "requests-records/user-options", "admin/partials/records_user_options.html",
+        lambda: {"users": UserService.get_user_choices(read_db)},
+        params={"selected": selected}
+    )
+
+
 @router.post("/users/upload-request")
 async def upload_request_for_user(
     request: Request,
@@ -2339,8 +2395,10 @@ async def bulk_request_action(
     current_user: User = Depends(require_admin_cookie),
     db: Session = Depends(get_db)
 ):
-    """Perform bulk action on requests"""
-    if not request_ids:
+    """Perform bulk action on requests (one transaction, see BulkRequestService)"""
+    def respond(success=None, error=None, result=None, status_code=200):
+        if is_htmx_request(request):
+            return bulk_action_response(request, result, action, success=success, error=error, status_code=status_code)
         return templates.TemplateResponse(
             "admin/requests.html",
             {
@@ -2348,78 +2406,39 @@ async def bulk_request_action(
                 "current_user": current_user,
                 "requests": RequestService.get_all_requests(db, limit=100),
                 "statuses": [s.value for s in RequestStatus],
-                "error": "لم يتم اختيار أي طلبات"
+                "success": success,
+                "error": error
             },
-            status_code=400
+            status_code=status_code
         )
 
-    success_count = 0
-    total_count = len(request_ids)
+    if not request_ids:
+        return respond(error="لم يتم اختيار أي طلبات", status_code=400)
+
+    action_names = {
+        "pending": "تحويل إلى قيد المراجعة",
+        "in_progress": "تحويل إلى قيد التنفيذ",
+        "completed": "تحويل إلى مكتمل",
+        "rejected": "تحويل إلى مرفوض",
+        "archive": "أرشفة"
+    }
+    if action not in action_names:
+        return respond(error="إجراء غير معروف", status_code=400)
 
     try:
-        for request_id in request_ids:
-            req = RequestService.get_request_by_id(db, request_id)
-            if not req:
-                continue
-
-            if action == "pending":
-                RequestService.update_request(db, request_id, status=RequestStatus.PENDING)
-                success_count += 1
-            elif action == "in_progress":
-                RequestService.update_request(db, request_id, status=RequestStatus.IN_PROGRESS)
-                success_count += 1
-            elif action == "completed":
-                RequestService.update_request(db, request_id, status=RequestStatus.COMPLETED)
-                success_count += 1
-            elif action == "rejected":
-                RequestService.update_request(db, request_id, status=RequestStatus.REJECTED)
-                success_count += 1
-            elif action == "archive":
-                RequestService.archive_request(db, request_id)
-                success_count += 1
-
-        # Log activity
-        UserService.log_activity(
-            db=db,
-            user_id=current_user.id,
-            activity_type=ActivityType.REQUEST_UPDATED,
-            description=f"Admin performed bulk action '{action}' on {success_count} requests",
+        result = BulkRequestService.apply(
+            db, action, request_ids,
+            actor_id=current_user.id,
             ip_address=request.client.host if request.client else None,
             user_agent=request.headers.get("user-agent")
         )
-
-        action_names = {
-            "pending": "تحويل إلى قيد المراجعة",
-            "in_progress": "تحويل إلى قيد التنفيذ",
-            "completed": "تحويل إلى مكتمل",
-            "rejected": "تحويل إلى مرفوض",
-            "archive": "أرشفة"
-        }
-
-        requests = RequestService.get_all_requests(db, limit=100)
-        return templates.TemplateResponse(
-            "admin/requests.html",
-            {
-                "request": request,
-                "current_user": current_user,
-                "requests": requests,
-                "statuses": [s.value for s in RequestStatus],
-                "success": f"تم {action_names.get(action, action)} {success_count} من أصل {total_count} طلب"
-            }
+        return respond(
+            success=f"تم {action_names[action]} {result.count} من أصل {result.requested} طلب",
+            result=result
         )
 
     except Exception as e:
-        return templates.TemplateResponse(
-            "admin/requests.html",
-            {
-                "request": request,
-                "current_user": current_user,
-                "requests": RequestService.get_all_requests(db, limit=100),
-                "statuses": [s.value for s in RequestStatus],
-                "error": f"حدث خطأ أثناء تنفيذ العملية: {str(e)}"
-            },
-            status_code=500
-        )
+        return respond(error=f"حدث خطأ أثناء تنفيذ العملية: {str(e)}", status_code=500)
 
 
 @router.get("/requests-records", response_class=HTMLResponse)
@@ -2454,9 +2473,6 @@ async def admin_requests_records(
         date_to = date_to if date_to and date_to.strip() else None
         search = search if search and search.strip() else None
 
-        # Get all users for filter dropdown
-        all_users = UserService.get_all_users(db, limit=1000)
-
         # Get activities based on filters
         if user_id_int:
             # Get activities for specific user
@@ -2487,8 +2503,7 @@ async def admin_requests_records(
             user_stats = None
             target_user = None
 
-        # Get comprehensive system statistics
-        system_stats = ActivityService.get_system_activity_statistics(db)
+        # The user filter options and the system statistics load from /admin/fragments/requests-records/*
 
         # Get activity type options
         activity_types = [
@@ -2514,7 +2529,6 @@ async def admin_requests_records(
                 "request": request,
                 "current_user": current_user,
                 "activities": activities,
-                "all_users": all_users,
                 "target_user": target_user,
                 "user_stats": user_stats,
                 "activity_types": activity_types,
@@ -2531,8 +2545,7 @@ async def admin_requests_records(
                     "has_next": has_next,
                     "has_prev": has_prev,
                     "total": total_activities
-                },
-                "system_stats": system_stats
+                }
             }
         )
 
@@ -2975,13 +2988,13 @@ async def user_activity_report(
     period: int = Query(3, ge=1, le=24),  # Period in months, 1-24 months
     format: str = Query("html", regex="^(html|pdf|csv|arabic)$"),
     current_user: User = Depends(require_admin_cookie),
-    db: Session = Depends(get_db)
+    read_db: Session = Depends(get_read_db)
 ):
     """Generate user activity report for specified period"""
     try:
         logger.info(f"Generating user activity report for period: {period} months")
         # Generate the report
-        report_data = ActivityService.generate_user_activity_report(db, period_months=period)
+        report_data = ActivityService.generate_user_activity_report(read_db, period_months=period)
         logger.info(f"Report generated successfully with {len(report_data.get('user_reports', []))} users")
 
         if format == "pdf":
@@ -3535,13 +3548,13 @@ async def view_activities(
 @router.get("/stats/export")
 async def export_stats_data(
     request: Request,
-    db: Session = Depends(get_db),
+    read_db: Session = Depends(get_read_db),
     current_user: User = Depends(require_admin_cookie)
 ):
     """Export admin stats data to Excel file"""
     try:
         # Get comprehensive stats data
-        stats_data = AchievementService.get_admin_stats_dashboard_data(db)
+        stats_data = AchievementService.get_admin_stats_dashboard_data(read_db)
 
         # Create Excel file in memory
         output = io.BytesIO()
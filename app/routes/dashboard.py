@@ -1,22 +1,26 @@
 from fastapi import APIRouter, Depends, Request, Form, UploadFile, File as FastAPIFile, HTTPException, Query
-from fastapi.responses import HTMLResponse, JSONResponse, FileResponse, StreamingResponse, RedirectResponse
+from fastapi.responses import HTMLResponse, JSONResponse, StreamingResponse, RedirectResponse
 
-from sqlalchemy.orm import Session
+from sqlalchemy.orm import Session, joinedload
+from sqlalchemy.ext.asyncio import AsyncSession
+from starlette.concurrency import run_in_threadpool
 from typing import List, Optional
 import uuid
-import threading
 import os
 import csv
 import io
 import logging
 from datetime import datetime
-from app.database import get_db, engine
-from app.utils.auth import verify_token
+from app.database import get_db, get_async_db, engine
+from app.utils.auth import verify_token, get_current_user_cookie_async
 from sqlalchemy import text
 from app.services.user_service import UserService
 from app.services.request_service import RequestService
+from app.services.bulk_requests import BulkRequestService
 from app.services.avatar_service import AvatarService
+from app.services.preview_service import PreviewService
 from app.services.activity_service import ActivityService
+from app.services.request_numbers import request_number_allocator
 from app.models.user import User, UserRole
 from app.models.request import RequestStatus
 from app.models.activity import ActivityType
@@ -24,7 +28,8 @@ from app.models.file import File
 from app.config import settings
 
 router = APIRouter()
-from app.utils.templates import templates
+from app.utils.templates import templates, is_htmx_request, bulk_action_response
+from app.utils.file_responses import serve_file
 
 # Initialize logger
 logger = logging.getLogger(__name__)
@@ -40,35 +45,13 @@ async def test_dropdown(request: Request):
 
 
 
-# Thread-safe request ID generation
-_request_id_lock = threading.Lock()
-_request_id_counter = 0
-
 def generate_unique_request_number():
-    """Generate a thread-safe unique request number that will be used in database"""
-    global _request_id_counter
-
-    with _request_id_lock:
-        # Get current timestamp
-        now = datetime.now()
-        timestamp = now.strftime("%Y%m%d%H%M%S")
-
-        # Increment counter for uniqueness within the same second
-        _request_id_counter += 1
-
-        # Reset counter if it gets too large (prevent overflow)
-        if _request_id_counter > 9999:
-            _request_id_counter = 1
-
-        # Generate request number with counter for uniqueness
-        # This will be the actual request_number stored in database
-        request_number = f"REQ-{timestamp}-{_request_id_counter:04d}"
-
-        return {
-            "request_number": request_number,
-            "timestamp": timestamp,
-            "counter": _request_id_counter
-        }
+    """Reserve a request number from the shared daily counter for use in database and file naming"""
+    request_number = request_number_allocator.allocate()
+    return {
+        "request_number": request_number,
+        "timestamp": datetime.now().strftime("%Y%m%d%H%M%S")
+    }
 
 
 async def get_current_user_cookie(request: Request, db: Session = Depends(get_db)) -> User:
@@ -341,11 +324,9 @@ async def bento_dashboard(
         from app.models.request import Request as RequestModel
         all_requests = db.query(RequestModel).order_by(RequestModel.created_at.desc()).limit(5).all()
 
-        # Get overall system stats
-        total_requests = db.query(RequestModel).count()
-        completed_requests = db.query(RequestModel).filter(RequestModel.status == RequestStatus.COMPLETED).count()
-        pending_requests = db.query(RequestModel).filter(RequestModel.status == RequestStatus.PENDING).count()
-        in_progress_requests = db.query(RequestModel).filter(RequestModel.status == RequestStatus.IN_PROGRESS).count()
+        # Overall system stats from the cached KPI figures (dropped whenever requests change)
+        from app.services.kpi import KpiSnapshotService
+        status_counts = KpiSnapshotService.get(db)["status_distribution"]
 
         return templates.TemplateResponse(
             "dashboard/bento.html",
@@ -354,10 +335,10 @@ async def bento_dashboard(
                 "current_user": current_user,
                 "requests": all_requests,
                 "stats": {
-                    "total": total_requests,
-                    "completed": completed_requests,
-                    "pending": pending_requests,
-                    "in_progress": in_progress_requests
+                    "total": sum(status_counts.values()),
+                    "completed": status_counts["completed"],
+                    "pending": status_counts["pending"],
+                    "in_progress": status_counts["in_progress"]
                 },
                 "leaderboard_data": leaderboard_data,
                 "is_admin": True,
@@ -420,7 +401,8 @@ async def bento_dashboard(
 @router.get("/api/bento/stats", response_class=JSONResponse)
 async def get_bento_stats(
     current_user: User = Depends(get_current_user_cookie),
-    db: Session = Depends(get_db)
+    db: Session = Depends(get_db),
+    async_db: AsyncSession = Depends(get_async_db)
 ):
     """API endpoint for bento dashboard statistics"""
     from app.services.achievement_service import AchievementService
@@ -431,7 +413,7 @@ async def get_bento_stats(
 
     if is_admin_or_manager:
         # For administrators/managers, return leaderboard data
-        leaderboard_data = AchievementService.get_admin_leaderboard_data(db)
+        leaderboard_data = await run_in_threadpool(AchievementService.get_admin_leaderboard_data, db)
         return {
             "is_admin": True,
             "leaderboard_data": leaderboard_data,
@@ -439,34 +421,36 @@ async def get_bento_stats(
             "user_progress": {}
         }
 
-    # For regular users, sync progress and return personal data
-    AchievementService._sync_user_progress_with_requests(db, current_user.id)
+    def load_personal_data():
+        # For regular users, sync progress and return personal data
+        AchievementService._sync_user_progress_with_requests(db, current_user.id)
+
+        # Get achievement data
+        achievement_data = AchievementService.get_user_dashboard_data(db, current_user.id)
 
-    # Get request statistics
-    user_requests = RequestService.get_user_requests(db, current_user.id, limit=1000)
-    total_requests = len(user_requests)
-    pending_requests = len([r for r in user_requests if r.status == RequestStatus.PENDING])
-    completed_requests = len([r for r in user_requests if r.status == RequestStatus.COMPLETED])
+        # Get user stats
+        user_stats = db.query(UserStats).filter(UserStats.user_id == current_user.id).first()
+        if not user_stats:
+            user_stats = UserStats(user_id=current_user.id)
+            db.add(user_stats)
+            db.commit()
+            db.refresh(user_stats)
 
-    # Get achievement data
-    achievement_data = AchievementService.get_user_dashboard_data(db, current_user.id)
+        # Get user progress
+        user_progress = RequestService.get_user_personal_progress(db, current_user.id)
+        return achievement_data, user_stats, user_progress
 
-    # Get user stats
-    user_stats = db.query(UserStats).filter(UserStats.user_id == current_user.id).first()
-    if not user_stats:
-        user_stats = UserStats(user_id=current_user.id)
-        db.add(user_stats)
-        db.commit()
-        db.refresh(user_stats)
+    # Achievement services are sync, so run them off the event loop
+    achievement_data, user_stats, user_progress = await run_in_threadpool(load_personal_data)
 
-    # Get user progress
-    user_progress = RequestService.get_user_personal_progress(db, current_user.id)
+    # Get request statistics (counted in the database instead of loading every request)
+    request_stats = await RequestService.get_user_request_statistics_async(async_db, current_user.id)
 
     return {
         "stats": {
-            "total": total_requests,
-            "pending": pending_requests,
-            "completed": completed_requests
+            "total": request_stats["total"],
+            "pending": request_stats["pending"],
+            "completed": request_stats["completed"]
         },
         "achievement_data": {
             "daily": achievement_data.get("current_progress", {}).get("daily", {"target": 10, "current": 0, "percentage": 0, "status": "لم يبدأ"}),
@@ -487,18 +471,18 @@ async def get_bento_stats(
 @router.get("/api/bento/recent-requests", response_class=JSONResponse)
 async def get_recent_requests(
     limit: int = Query(5, le=20),
-    current_user: User = Depends(get_current_user_cookie),
-    db: Session = Depends(get_db)
+    current_user: User = Depends(get_current_user_cookie_async),
+    db: AsyncSession = Depends(get_async_db)
 ):
     """API endpoint for recent requests data"""
-    user_requests = RequestService.get_user_requests(db, current_user.id, limit=limit)
+    user_requests = await RequestService.get_user_requests_async(db, current_user.id, limit=limit)
 
     requests_data = []
     for request in user_requests:
         requests_data.append({
             "id": request.id,
             "request_number": request.request_number,
-            "title": request.title or "طلب جديد",
+            "title": request.request_title or "طلب جديد",
             "status": request.status.value,
             "created_at": request.created_at.strftime('%Y-%m-%d %H:%M'),
             "updated_at": request.updated_at.strftime('%Y-%m-%d %H:%M') if request.updated_at else None
@@ -516,7 +500,8 @@ async def generate_request_number_endpoint(
 ):
     """Generate a unique request number that will be used in database and file naming"""
     try:
-        request_info = generate_unique_request_number()
+        # Allocation is a database round trip, so keep it off the event loop
+        request_info = await run_in_threadpool(generate_unique_request_number)
         return JSONResponse(content={
             "success": True,
             "request_number": request_info["request_number"],
@@ -1029,96 +1014,42 @@ async def user_bulk_request_action(
     current_user: User = Depends(get_current_user_cookie),
     db: Session = Depends(get_db)
 ):
-    """Perform bulk action on user's own requests only"""
+    """Perform bulk action on user's own requests only (one transaction, see BulkRequestService)"""
+    def respond(success=None, error=None, result=None, status_code=200):
+        if is_htmx_request(request):
+            return bulk_action_response(request, result, action, success=success, error=error, status_code=status_code)
+        context = {
+            "request": request,
+            "current_user": current_user,
+            "requests": RequestService.get_user_requests_enhanced(db, current_user.id, limit=20),
+            "statuses": [s.value for s in RequestStatus],
+            "success": success,
+            "error": error
+        }
+        if result is not None:
+            context["user_stats"] = RequestService.get_user_request_statistics(db, current_user.id)
+        return templates.TemplateResponse("requests/list_requests.html", context, status_code=status_code)
+
     if not request_ids:
-        return templates.TemplateResponse(
-            "requests/list_requests.html",
-            {
-                "request": request,
-                "current_user": current_user,
-                "requests": RequestService.get_user_requests_enhanced(db, current_user.id, limit=20),
-                "statuses": [s.value for s in RequestStatus],
-                "error": "لم يتم اختيار أي طلبات"
-            },
-            status_code=400
-        )
+        return respond(error="لم يتم اختيار أي طلبات", status_code=400)
 
     # Verify all requests belong to current user
-    user_request_ids = [r.id for r in RequestService.get_user_requests(db, current_user.id, limit=1000)]
-    invalid_ids = [rid for rid in request_ids if rid not in user_request_ids]
-
-    if invalid_ids:
-        return templates.TemplateResponse(
-            "requests/list_requests.html",
-            {
-                "request": request,
-                "current_user": current_user,
-                "requests": RequestService.get_user_requests_enhanced(db, current_user.id, limit=20),
-                "statuses": [s.value for s in RequestStatus],
-                "error": "غير مسموح بالوصول لبعض الطلبات المحددة"
-            },
-            status_code=403
-        )
-
-    success_count = 0
-    total_count = len(request_ids)
+    if len(BulkRequestService.owned_ids(db, request_ids, current_user.id)) != len(set(request_ids)):
+        return respond(error="غير مسموح بالوصول لبعض الطلبات المحددة", status_code=403)
 
     try:
-        if action == "delete":
-            # Only allow deletion of pending requests
-            for request_id in request_ids:
-                req = RequestService.get_request_by_id(db, request_id)
-                if req and req.user_id == current_user.id and req.status == RequestStatus.PENDING:
-                    if RequestService.delete_request(db, request_id):
-                        success_count += 1
-
-        elif action == "mark_completed":
-            # Allow users to mark their own requests as completed
-            for request_id in request_ids:
-                req = RequestService.get_request_by_id(db, request_id)
-                if req and req.user_id == current_user.id and req.status in [RequestStatus.PENDING, RequestStatus.IN_PROGRESS]:
-                    if RequestService.update_request_status(db, request_id, RequestStatus.COMPLETED, current_user.id):
-                        success_count += 1
-
-        # Log activity
-        UserService.log_activity(
-            db=db,
-            user_id=current_user.id,
-            activity_type=ActivityType.REQUEST_UPDATED,
-            description=f"Bulk action '{action}' performed on {success_count} requests",
+        # delete: pending requests only; mark_completed: pending or in-progress requests only
+        result = BulkRequestService.apply(
+            db, action, request_ids,
+            actor_id=current_user.id,
+            owner_id=current_user.id,
             ip_address=request.client.host if request.client else None,
             user_agent=request.headers.get("user-agent")
         )
-
-        # Redirect back to requests page with success message
-        requests = RequestService.get_user_requests_enhanced(db, current_user.id, limit=20)
-        user_stats = RequestService.get_user_request_statistics(db, current_user.id)
-
-        return templates.TemplateResponse(
-            "requests/list_requests.html",
-            {
-                "request": request,
-                "current_user": current_user,
-                "requests": requests,
-                "user_stats": user_stats,
-                "statuses": [s.value for s in RequestStatus],
-                "success": f"تم تنفيذ العملية على {success_count} من أصل {total_count} طلب"
-            }
-        )
+        return respond(success=f"تم تنفيذ العملية على {result.count} من أصل {result.requested} طلب", result=result)
 
     except Exception as e:
-        requests = RequestService.get_user_requests_enhanced(db, current_user.id, limit=20)
-        return templates.TemplateResponse(
-            "requests/list_requests.html",
-            {
-                "request": request,
-                "current_user": current_user,
-                "requests": requests,
-                "statuses": [s.value for s in RequestStatus],
-                "error": f"حدث خطأ أثناء تنفيذ العملية: {str(e)}"
-            },
-            status_code=500
-        )
+        return respond(error=f"حدث خطأ أثناء تنفيذ العملية: {str(e)}", status_code=500)
 
 
 @router.delete("/requests/{request_id}")
@@ -2295,13 +2226,14 @@ async def file_upload_test(request: Request):
 
 @router.get("/files/download/{file_id}")
 async def download_file(
+    request: Request,
     file_id: int,
     current_user: User = Depends(get_current_user_cookie),
     db: Session = Depends(get_db)
 ):
     """Download file by ID with permission check"""
-    # Get file from database
-    file = db.query(File).filter(File.id == file_id).first()
+    # Get file with its request (for the ownership check) in one query
+    file = db.query(File).options(joinedload(File.request)).filter(File.id == file_id).first()
     if not file:
         raise HTTPException(status_code=404, detail="File not found")
 
@@ -2325,27 +2257,20 @@ async def download_file(
             }
         )
 
-    # Check if file exists on disk
-    if not os.path.exists(file.file_path):
-        raise HTTPException(status_code=404, detail="File not found on disk")
-
-    # Return file for download
-    return FileResponse(
-        path=file.file_path,
-        filename=file.original_filename,
-        media_type=file.mime_type
-    )
+    # Return file for download (404 if missing on disk)
+    return serve_file(request, file.file_path, file.mime_type, filename=file.original_filename)
 
 
 @router.get("/files/view/{file_id}")
 async def view_file(
+    request: Request,
     file_id: int,
     current_user: User = Depends(get_current_user_cookie),
     db: Session = Depends(get_db)
 ):
     """View file in browser by ID with permission check"""
-    # Get file from database
-    file = db.query(File).filter(File.id == file_id).first()
+    # Get file with its request (for the ownership check) in one query
+    file = db.query(File).options(joinedload(File.request)).filter(File.id == file_id).first()
     if not file:
         raise HTTPException(status_code=404, detail="File not found")
 
@@ -2369,17 +2294,51 @@ async def view_file(
             }
         )
 
-    # Check if file exists on disk
-    if not os.path.exists(file.file_path):
-        raise HTTPException(status_code=404, detail="File not found on disk")
+    # Return file for viewing in browser (404 if missing on disk)
+    return serve_file(request, file.file_path, file.mime_type, filename=file.original_filename, inline=True)
 
-    # Return file for viewing in browser
-    return FileResponse(
-        path=file.file_path,
-        filename=file.original_filename,
-        media_type=file.mime_type,
-        headers={"Content-Disposition": "inline"}
-    )
+
+@router.get("/files/preview/{file_id}")
+async def preview_file(
+    request: Request,
+    file_id: int,
+    size: str = Query("preview", pattern="^(thumb|preview)$"),
+    v: Optional[str] = None,
+    current_user: User = Depends(get_current_user_cookie),
+    db: Session = Depends(get_db)
+):
+    """Thumbnail or screen-sized preview of a file; falls back to the original until generated"""
+    file = db.query(File).options(joinedload(File.request)).filter(File.id == file_id).first()
+    if not file:
+        raise HTTPException(status_code=404, detail="File not found")
+
+    # Log cross-user access for the full preview (thumbnails are part of listing the request)
+    if size == "preview" and file.request.user_id != current_user.id:
+        from app.utils.request_utils import log_cross_user_activity
+        log_cross_user_activity(
+            db=db,
+            request_owner_id=file.request.user_id,
+            accessing_user_id=current_user.id,
+            accessing_user_name=current_user.full_name or current_user.username,
+            activity_type="cross_user_file_accessed",
+            description=f"تم عرض الملف {file.original_filename} من الطلب {file.request.request_number} بواسطة {current_user.full_name or current_user.username}",
+            request=None,  # No request object available here
+            details={
+                "request_id": file.request.id,
+                "request_number": file.request.request_number,
+                "file_id": file.id,
+                "filename": file.original_filename,
+                "action": "direct_file_preview"
+            }
+        )
+
+    preview_path = PreviewService.path_for(file, size)
+    if not preview_path or not os.path.exists(preview_path):
+        return RedirectResponse(url=f"/files/view/{file.id}", status_code=307)
+
+    # Versioned URLs never change content; unversioned ones must revalidate
+    cache_control = "private, max-age=31536000, immutable" if v == PreviewService.version(file) else "private, no-cache"
+    return serve_file(request, preview_path, "image/jpeg", inline=True, cache_control=cache_control)
 
 
 @router.get("/test-file-upload", response_class=HTMLResponse)
@@ -4,12 +4,13 @@ Message routes for user-to-user messaging functionality
 from fastapi import APIRouter, Depends, HTTPException, Request, Query
 from fastapi.responses import HTMLResponse, JSONResponse
 from sqlalchemy.orm import Session
+from sqlalchemy.ext.asyncio import AsyncSession
 from typing import Optional
 
-from app.database import get_db
+from app.database import get_db, get_async_db
 from app.models.user import User
 from app.services.message_service import MessageService
-from app.utils.auth import verify_token
+from app.utils.auth import verify_token, get_current_user_cookie_async
 
 from pydantic import BaseModel
 
@@ -272,11 +273,11 @@ async def delete_message(
 
 @router.get("/api/messages/unread-count")
 async def get_unread_count(
-    current_user: User = Depends(get_current_user_cookie),
-    db: Session = Depends(get_db)
+    current_user: User = Depends(get_current_user_cookie_async),
+    db: AsyncSession = Depends(get_async_db)
 ):
-    """Get unread messages count"""
-    count = MessageService.get_unread_count(db, current_user.id)
+    """Get unread messages count (polled by every page, so uses the async session)"""
+    count = await MessageService.get_unread_count_async(db, current_user.id)
     return {"unread_count": count}
 
 
@@ -2,15 +2,17 @@ from fastapi import APIRouter, Depends, HTTPException, Request, Form, Query
 from fastapi.responses import HTMLResponse, JSONResponse, RedirectResponse
 
 from sqlalchemy.orm import Session
+from sqlalchemy.ext.asyncio import AsyncSession
 from sqlalchemy import and_
-from typing import Optional, Dict, Any
+from typing import Optional, Dict, Any, List
 import logging
 
-from app.database import get_db
+from app.database import get_db, get_async_db
 from app.models.user import User, UserRole
 from app.models.notification import NotificationType, NotificationPriority, Notification
 from app.services.notification_service import NotificationService
 from app.services.push_service import PushService
+from app.services.notification_fanout import Audience, NotificationFanout
 from app.utils.auth import verify_token
 from app.services.user_service import UserService
 from pydantic import BaseModel
@@ -78,6 +80,15 @@ class NotificationPreferencesData(BaseModel):
     quiet_hours_end: Optional[str] = None
 
 
+class AnnouncementData(BaseModel):
+    title: str
+    message: str
+    priority: NotificationPriority = NotificationPriority.NORMAL
+    action_url: Optional[str] = None
+    role: Optional[UserRole] = None  # Everyone when neither role nor user_ids is given
+    user_ids: Optional[List[int]] = None
+
+
 @router.get("/notifications", response_class=HTMLResponse)
 async def notifications_page(
     request: Request,
@@ -235,9 +246,9 @@ async def mark_all_notifications_read(
 @router.get("/api/notifications/unread-count")
 async def get_unread_count(
     request: Request,
-    db: Session = Depends(get_db)
+    db: AsyncSession = Depends(get_async_db)
 ):
-    """Get unread notifications count"""
+    """Get unread notifications count (polled by every page, so uses the async session)"""
     try:
         # Try to get current user from cookie without raising exceptions
         token = request.cookies.get("access_token")
@@ -265,14 +276,14 @@ async def get_unread_count(
                 "unread_count": 0
             })
 
-        user = UserService.get_user_by_username(db, username)
+        user = await UserService.get_user_by_username_async(db, username)
         if not user or not user.is_active:
             return JSONResponse({
                 "success": True,
                 "unread_count": 0
             })
 
-        unread_count = NotificationService.get_unread_count(db, user.id)
+        unread_count = await NotificationService.get_unread_count_async(db, user.id)
 
         return JSONResponse({
             "success": True,
@@ -493,6 +504,46 @@ async def update_notification_preferences(
         }, status_code=500)
 
 
+@router.post("/api/admin/notifications/announce")
+async def send_announcement(
+    announcement: AnnouncementData,
+    current_user: User = Depends(require_admin_cookie),
+    db: Session = Depends(get_db)
+):
+    """Send a system announcement to all users, one role or selected users"""
+    if announcement.user_ids is not None:
+        audience = Audience.users(announcement.user_ids)
+    elif announcement.role is not None:
+        audience = Audience.with_role(announcement.role)
+    else:
+        audience = Audience.everyone()
+
+    try:
+        result = NotificationFanout.send(
+            db,
+            audience,
+            NotificationType.SYSTEM_ANNOUNCEMENT,
+            title=announcement.title,
+            message=announcement.message,
+            priority=announcement.priority,
+            action_url=announcement.action_url,
+            related_user_id=current_user.id
+        )
+        return JSONResponse({
+            "success": True,
+            "message": f"تم إرسال الإعلان إلى {result.created} مستخدم",
+            "recipients": result.created,
+            "push_recipients": result.push_recipients
+        })
+
+    except Exception as e:
+        logger.error(f"Error sending announcement: {str(e)}")
+        return JSONResponse({
+            "success": False,
+            "error": "فشل في إرسال الإعلان"
+        }, status_code=500)
+
+
 @router.get("/notifications/{notification_id}", response_class=HTMLResponse)
 async def notification_detail_page(
     request: Request,
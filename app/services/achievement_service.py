@@ -1,23 +1,23 @@
 from typing import Optional, List, Dict, Any
-from sqlalchemy.orm import Session
-from sqlalchemy import desc, func, and_, or_
+from sqlalchemy.orm import Session, contains_eager
+from sqlalchemy import desc, func, and_, or_, case, literal, select, update
+from sqlalchemy.dialects.postgresql import insert as pg_insert
 from datetime import datetime, timedelta, date
 import calendar
 from app.models.achievement import (
     Achievement, UserAchievement, Competition, CompetitionParticipant, 
     UserStats, AchievementType, CompetitionStatus
 )
-from app.models.user import User, UserRole
+from app.models.user import User
 from app.models.request import Request, RequestStatus
-import threading
+from app.services.competitions import CompetitionLifecycle, CompetitionStandings
+from app.services.periods import PeriodCounter, PeriodCounts, bahrain_date, current_period_bounds
+from app.utils.timezone_utils import utc_to_bahrain
 
 
 class AchievementService:
     """Service for managing achievements and competitions"""
-    
-    # Thread-safe lock for achievement updates
-    _achievement_lock = threading.Lock()
-    
+
     @staticmethod
     def initialize_default_achievements(db: Session):
         """Initialize default achievement templates"""
@@ -145,120 +145,94 @@ class AchievementService:
         db.commit()
     
     @staticmethod
-    def update_user_progress(db: Session, user_id: int, completed_requests: int = 1):
-        """Update user progress for all applicable achievements"""
-        with AchievementService._achievement_lock:
-            now = datetime.utcnow()
-            today = now.date()
-            
-            # Get or create user stats
-            user_stats = db.query(UserStats).filter(UserStats.user_id == user_id).first()
-            if not user_stats:
-                user_stats = UserStats(user_id=user_id)
-                db.add(user_stats)
-                db.commit()
-                db.refresh(user_stats)
-            
-            # Update daily achievements
-            AchievementService._update_daily_achievements(db, user_id, today, completed_requests)
-            
-            # Update weekly achievements
-            AchievementService._update_weekly_achievements(db, user_id, now, completed_requests)
-            
-            # Update monthly achievements
-            AchievementService._update_monthly_achievements(db, user_id, now, completed_requests)
-            
-            # Update milestone achievements
-            AchievementService._update_milestone_achievements(db, user_id)
-            
-            # Update streak achievements
-            AchievementService._update_streak_achievements(db, user_id, user_stats)
-            
-            # Update user stats
-            AchievementService._update_user_stats(db, user_id, user_stats)
-            
-            # Update competition progress
-            AchievementService._update_competition_progress(db, user_id, completed_requests)
-            
+    def update_user_progress(db: Session, user_id: int, completed_requests: int = 1,
+                             commit: bool = True) -> Dict[int, int]:
+        """Update user progress for all applicable achievements
+
+        Each step is one set-based statement (upserts on the unique user/achievement/period
+        indexes and UPDATE ... FROM), so completions from any worker add up correctly without
+        a lock. The number of statements does not depend on how many achievements exist.
+
+        With commit=False the changes join the caller's transaction; the caller commits and
+        then passes the returned competition progress to publish_progress.
+        """
+        now = datetime.utcnow()
+
+        # Make a pending status change visible to the milestone count
+        db.flush()
+
+        # Create/update user stats and the daily streak. The upsert also locks this user's
+        # stats row until commit, so concurrent completions for one user apply in turn
+        current_streak = AchievementService._upsert_user_stats_streak(db, user_id, now)
+
+        # Daily, weekly and monthly achievements
+        AchievementService._upsert_period_achievements(db, user_id, now, completed_requests)
+
+        # Milestone and streak achievements
+        AchievementService._upsert_lifetime_achievements(db, user_id, current_streak)
+
+        # Mark achievements that reached their target
+        AchievementService._complete_reached_achievements(db, user_id, now)
+
+        # Update point and achievement totals
+        AchievementService._refresh_user_stats_totals(db, user_id)
+
+        # Update competition progress
+        competition_progress = AchievementService._update_competition_progress(
+            db, user_id, completed_requests, now
+        )
+
+        if commit:
             db.commit()
+            AchievementService.publish_progress(db, user_id, competition_progress, now)
+        return competition_progress
+
+    @staticmethod
+    def publish_progress(db: Session, user_id: int, competition_progress: Dict[int, int],
+                         now: Optional[datetime] = None):
+        """Write committed progress to the leaderboard and competition standings sorted sets"""
+        from app.services.leaderboard import LeaderboardService
+        LeaderboardService.record_progress(db, user_id, now)
+        CompetitionStandings.record_progress(user_id, competition_progress)
 
     @staticmethod
     def _sync_user_progress_with_requests(db: Session, user_id: int):
         """Sync achievement progress with actual request completion data"""
         now = datetime.utcnow()
-        today = now.date()
+        periods = AchievementService._current_periods(now)
 
         # Get actual request completion counts
-        daily_completed = db.query(Request).filter(
-            Request.user_id == user_id,
-            Request.status == RequestStatus.COMPLETED,
-            func.date(Request.updated_at) == today
-        ).count()
-
-        # Get weekly completed (current week)
-        week_start = now - timedelta(days=now.weekday())
-        week_start = week_start.replace(hour=0, minute=0, second=0, microsecond=0)
-        weekly_completed = db.query(Request).filter(
-            Request.user_id == user_id,
-            Request.status == RequestStatus.COMPLETED,
-            Request.updated_at >= week_start
-        ).count()
-
-        # Get monthly completed (current month)
-        month_start = now.replace(day=1, hour=0, minute=0, second=0, microsecond=0)
-        monthly_completed = db.query(Request).filter(
-            Request.user_id == user_id,
-            Request.status == RequestStatus.COMPLETED,
-            Request.updated_at >= month_start
-        ).count()
-
-        # Update daily achievements with actual data
-        daily_achievements = db.query(UserAchievement).join(Achievement).filter(
-            UserAchievement.user_id == user_id,
-            Achievement.achievement_type == AchievementType.DAILY,
-            func.date(UserAchievement.period_start) == today
-        ).all()
-
-        for ua in daily_achievements:
-            if ua.current_progress != daily_completed:
-                ua.current_progress = daily_completed
-                # Check if achievement should be completed
-                if daily_completed >= ua.achievement.target_value and not ua.is_completed:
-                    ua.is_completed = True
-                    ua.completed_at = now
-                    ua.points_earned = ua.achievement.points
-
-        # Update weekly achievements with actual data
-        weekly_achievements = db.query(UserAchievement).join(Achievement).filter(
-            UserAchievement.user_id == user_id,
-            Achievement.achievement_type == AchievementType.WEEKLY,
-            UserAchievement.period_start == week_start
-        ).all()
+        counts = PeriodCounter.for_user(db, user_id)
+        completed_by_type = {
+            AchievementType.DAILY: counts.completed_daily,
+            AchievementType.WEEKLY: counts.completed_weekly,
+            AchievementType.MONTHLY: counts.completed_monthly,
+        }
 
-        for ua in weekly_achievements:
-            if ua.current_progress != weekly_completed:
-                ua.current_progress = weekly_completed
-                # Check if achievement should be completed
-                if weekly_completed >= ua.achievement.target_value and not ua.is_completed:
-                    ua.is_completed = True
-                    ua.completed_at = now
-                    ua.points_earned = ua.achievement.points
-
-        # Update monthly achievements with actual data
-        monthly_achievements = db.query(UserAchievement).join(Achievement).filter(
-            UserAchievement.user_id == user_id,
-            Achievement.achievement_type == AchievementType.MONTHLY,
-            UserAchievement.period_start == month_start
-        ).all()
+        # Update this period's daily, weekly and monthly achievements with actual data
+        actual_progress = case(*[
+            (Achievement.achievement_type == achievement_type, completed)
+            for achievement_type, completed in completed_by_type.items()
+        ])
+        period_start = case(*[
+            (Achievement.achievement_type == achievement_type, start)
+            for achievement_type, (start, _) in periods.items()
+        ])
+        db.execute(
+            update(UserAchievement)
+            .where(
+                UserAchievement.user_id == user_id,
+                UserAchievement.achievement_id == Achievement.id,
+                Achievement.achievement_type.in_(list(periods)),
+                UserAchievement.period_start == period_start,
+                UserAchievement.current_progress.is_distinct_from(actual_progress)
+            )
+            .values(current_progress=actual_progress, updated_at=func.now())
+            .execution_options(synchronize_session=False)
+        )
 
-        for ua in monthly_achievements:
-            if ua.current_progress != monthly_completed:
-                ua.current_progress = monthly_completed
-                # Check if achievement should be completed
-                if monthly_completed >= ua.achievement.target_value and not ua.is_completed:
-                    ua.is_completed = True
-                    ua.completed_at = now
-                    ua.points_earned = ua.achievement.points
+        # Check if achievements should be completed
+        AchievementService._complete_reached_achievements(db, user_id, now)
 
         db.commit()
 
@@ -266,38 +240,22 @@ class AchievementService:
     def _get_user_performance_stats(db: Session, user_id: int) -> Dict[str, Any]:
         """Calculate comprehensive and intuitive performance statistics for a user"""
         now = datetime.utcnow()
-        today = now.date()
-
-        # Total requests and completion rate
-        total_requests = db.query(Request).filter(Request.user_id == user_id).count()
-        completed_requests = db.query(Request).filter(
-            Request.user_id == user_id,
-            Request.status == RequestStatus.COMPLETED
-        ).count()
+        today = current_period_bounds(now).day
 
-        pending_requests = db.query(Request).filter(
-            Request.user_id == user_id,
-            Request.status == RequestStatus.PENDING
-        ).count()
+        # All period counts in one grouped query
+        counts = PeriodCounter.for_user(db, user_id)
 
-        in_progress_requests = db.query(Request).filter(
-            Request.user_id == user_id,
-            Request.status == RequestStatus.IN_PROGRESS
-        ).count()
+        # Total requests and completion rate
+        total_requests = counts.total
+        completed_requests = counts.completed
+        pending_requests = counts.pending
+        in_progress_requests = counts.in_progress
 
         completion_rate = (completed_requests / total_requests * 100) if total_requests > 0 else 0
 
         # Today's performance
-        today_total = db.query(Request).filter(
-            Request.user_id == user_id,
-            func.date(Request.created_at) == today
-        ).count()
-
-        today_completed = db.query(Request).filter(
-            Request.user_id == user_id,
-            Request.status == RequestStatus.COMPLETED,
-            func.date(Request.updated_at) == today
-        ).count()
+        today_total = counts.created_daily
+        today_completed = counts.completed_daily
 
         today_target = 10
         today_progress = min(100, (today_completed / today_target * 100)) if today_target > 0 else 0
@@ -315,19 +273,8 @@ class AchievementService:
             today_level = {"text": "يحتاج تحسين", "color": "#8B5CF6", "icon": "🎯"}
 
         # This week's performance
-        week_start = now - timedelta(days=now.weekday())
-        week_start = week_start.replace(hour=0, minute=0, second=0, microsecond=0)
-
-        week_total = db.query(Request).filter(
-            Request.user_id == user_id,
-            Request.created_at >= week_start
-        ).count()
-
-        week_completed = db.query(Request).filter(
-            Request.user_id == user_id,
-            Request.status == RequestStatus.COMPLETED,
-            Request.updated_at >= week_start
-        ).count()
+        week_total = counts.created_weekly
+        week_completed = counts.completed_weekly
 
         week_target = 50
         week_progress = min(100, (week_completed / week_target * 100)) if week_target > 0 else 0
@@ -345,18 +292,8 @@ class AchievementService:
             week_level = {"text": "يحتاج تحسين", "color": "#8B5CF6", "icon": "🎯"}
 
         # This month's performance
-        month_start = now.replace(day=1, hour=0, minute=0, second=0, microsecond=0)
-
-        month_total = db.query(Request).filter(
-            Request.user_id == user_id,
-            Request.created_at >= month_start
-        ).count()
-
-        month_completed = db.query(Request).filter(
-            Request.user_id == user_id,
-            Request.status == RequestStatus.COMPLETED,
-            Request.updated_at >= month_start
-        ).count()
+        month_total = counts.created_monthly
+        month_completed = counts.completed_monthly
 
         month_target = 200
         month_progress = min(100, (month_completed / month_target * 100)) if month_target > 0 else 0
@@ -373,24 +310,18 @@ class AchievementService:
         else:
             month_level = {"text": "يحتاج تحسين", "color": "#8B5CF6", "icon": "🎯"}
 
-        # Average completion time (in days)
-        completed_requests_with_times = db.query(Request).filter(
+        # Average completion time (in days), averaged in the database
+        avg_completion_days = float(db.query(
+            func.avg(func.date_part("day", Request.updated_at - Request.created_at))
+        ).filter(
             Request.user_id == user_id,
             Request.status == RequestStatus.COMPLETED,
             Request.updated_at.isnot(None)
-        ).all()
-
-        avg_completion_days = 0
-        if completed_requests_with_times:
-            total_days = sum([
-                (req.updated_at - req.created_at).days
-                for req in completed_requests_with_times
-            ])
-            avg_completion_days = total_days / len(completed_requests_with_times)
+        ).scalar() or 0)
 
         # Calculate productivity metrics
         user = db.query(User).filter(User.id == user_id).first()
-        days_since_registration = (now.date() - user.created_at.date()).days if user else 1
+        days_since_registration = (today - utc_to_bahrain(user.created_at).date()).days if user else 1
         daily_average = completed_requests / max(days_since_registration, 1)
 
         # Calculate efficiency score (0-100)
@@ -478,297 +409,227 @@ class AchievementService:
             return max(0, last_day - today.day)
 
     @staticmethod
-    def _update_daily_achievements(db: Session, user_id: int, today: date, completed_requests: int):
-        """Update daily achievement progress"""
-        daily_achievements = db.query(Achievement).filter(
-            Achievement.achievement_type == AchievementType.DAILY,
-            Achievement.is_active == True
-        ).all()
-        
-        for achievement in daily_achievements:
-            # Get or create user achievement for today
-            user_achievement = db.query(UserAchievement).filter(
-                UserAchievement.user_id == user_id,
-                UserAchievement.achievement_id == achievement.id,
-                func.date(UserAchievement.period_start) == today
-            ).first()
-            
-            if not user_achievement:
-                # Create new daily achievement tracking
-                user_achievement = UserAchievement(
-                    user_id=user_id,
-                    achievement_id=achievement.id,
-                    period_start=datetime.combine(today, datetime.min.time()),
-                    period_end=datetime.combine(today, datetime.max.time()),
-                    current_progress=0
-                )
-                db.add(user_achievement)
-            
-            # Update progress
-            user_achievement.current_progress += completed_requests
-            
-            # Check if achievement is completed
-            if (user_achievement.current_progress >= achievement.target_value and 
-                not user_achievement.is_completed):
-                user_achievement.is_completed = True
-                user_achievement.completed_at = datetime.utcnow()
-                user_achievement.points_earned = achievement.points
-    
-    @staticmethod
-    def _update_weekly_achievements(db: Session, user_id: int, now: datetime, completed_requests: int):
-        """Update weekly achievement progress"""
-        # Get start of current week (Monday)
-        week_start = now - timedelta(days=now.weekday())
-        week_start = week_start.replace(hour=0, minute=0, second=0, microsecond=0)
-        week_end = week_start + timedelta(days=6, hours=23, minutes=59, seconds=59)
-        
-        weekly_achievements = db.query(Achievement).filter(
-            Achievement.achievement_type == AchievementType.WEEKLY,
-            Achievement.is_active == True
-        ).all()
-        
-        for achievement in weekly_achievements:
-            # Get or create user achievement for this week
-            user_achievement = db.query(UserAchievement).filter(
-                UserAchievement.user_id == user_id,
-                UserAchievement.achievement_id == achievement.id,
-                UserAchievement.period_start == week_start
-            ).first()
-            
-            if not user_achievement:
-                user_achievement = UserAchievement(
-                    user_id=user_id,
-                    achievement_id=achievement.id,
-                    period_start=week_start,
-                    period_end=week_end,
-                    current_progress=0
-                )
-                db.add(user_achievement)
-            
-            # Update progress
-            user_achievement.current_progress += completed_requests
-            
-            # Check if achievement is completed
-            if (user_achievement.current_progress >= achievement.target_value and 
-                not user_achievement.is_completed):
-                user_achievement.is_completed = True
-                user_achievement.completed_at = datetime.utcnow()
-                user_achievement.points_earned = achievement.points
-    
-    @staticmethod
-    def _update_monthly_achievements(db: Session, user_id: int, now: datetime, completed_requests: int):
-        """Update monthly achievement progress"""
-        # Get start of current month
-        month_start = now.replace(day=1, hour=0, minute=0, second=0, microsecond=0)
-        # Get end of current month
-        if month_start.month == 12:
-            month_end = month_start.replace(year=month_start.year + 1, month=1) - timedelta(seconds=1)
-        else:
-            month_end = month_start.replace(month=month_start.month + 1) - timedelta(seconds=1)
-        
-        monthly_achievements = db.query(Achievement).filter(
-            Achievement.achievement_type == AchievementType.MONTHLY,
-            Achievement.is_active == True
-        ).all()
-        
-        for achievement in monthly_achievements:
-            # Get or create user achievement for this month
-            user_achievement = db.query(UserAchievement).filter(
-                UserAchievement.user_id == user_id,
-                UserAchievement.achievement_id == achievement.id,
-                UserAchievement.period_start == month_start
-            ).first()
-            
-            if not user_achievement:
-                user_achievement = UserAchievement(
-                    user_id=user_id,
-                    achievement_id=achievement.id,
-                    period_start=month_start,
-                    period_end=month_end,
-                    current_progress=0
-                )
-                db.add(user_achievement)
-            
-            # Update progress
-            user_achievement.current_progress += completed_requests
-            
-            # Check if achievement is completed
-            if (user_achievement.current_progress >= achievement.target_value and
-                not user_achievement.is_completed):
-                user_achievement.is_completed = True
-                user_achievement.completed_at = datetime.utcnow()
-                user_achievement.points_earned = achievement.points
+    def _current_periods(now: datetime) -> Dict[AchievementType, tuple]:
+        """(period_start, period_end) of the current Bahrain day, week (from Monday) and month"""
+        bounds = current_period_bounds(now)
+        last_second = timedelta(seconds=1)
+
+        return {
+            AchievementType.DAILY: (bounds.day_start, bounds.day_end - last_second),
+            AchievementType.WEEKLY: (bounds.week_start, bounds.week_end - last_second),
+            AchievementType.MONTHLY: (bounds.month_start, bounds.month_end - last_second),
+        }
 
     @staticmethod
-    def _update_milestone_achievements(db: Session, user_id: int):
-        """Update milestone achievement progress"""
-        # Get total completed requests for user
-        total_completed = db.query(Request).filter(
-            Request.user_id == user_id,
-            Request.status == RequestStatus.COMPLETED
-        ).count()
+    def _upsert_user_stats_streak(db: Session, user_id: int, now: datetime) -> int:
+        """Create the stats row or advance the daily streak, returning the current streak"""
+        today = current_period_bounds(now).day
+        last_completion_date = bahrain_date(UserStats.last_daily_completion)
+        current_streak = func.coalesce(UserStats.current_daily_streak, 0)
+
+        # Already completed today: no change; completed yesterday: continue; otherwise reset
+        new_streak = case(
+            (last_completion_date == today, current_streak),
+            (last_completion_date == today - timedelta(days=1), current_streak + 1),
+            else_=1
+        )
 
-        milestone_achievements = db.query(Achievement).filter(
-            Achievement.achievement_type == AchievementType.MILESTONE,
-            Achievement.is_active == True
-        ).all()
+        stmt = pg_insert(UserStats).values(
+            user_id=user_id,
+            current_daily_streak=1,
+            longest_daily_streak=1,
+            last_daily_completion=now
+        )
+        stmt = stmt.on_conflict_do_update(
+            index_elements=[UserStats.user_id],
+            set_={
+                "current_daily_streak": new_streak,
+                "longest_daily_streak": func.greatest(func.coalesce(UserStats.longest_daily_streak, 0), new_streak),
+                "last_daily_completion": case(
+                    (last_completion_date == today, UserStats.last_daily_completion),
+                    else_=now
+                ),
+                "updated_at": func.now()
+            }
+        ).returning(UserStats.current_daily_streak)
 
-        for achievement in milestone_achievements:
-            # Check if user already has this achievement
-            user_achievement = db.query(UserAchievement).filter(
-                UserAchievement.user_id == user_id,
-                UserAchievement.achievement_id == achievement.id
-            ).first()
+        return db.execute(stmt).scalar_one()
 
-            if not user_achievement:
-                user_achievement = UserAchievement(
-                    user_id=user_id,
-                    achievement_id=achievement.id,
-                    current_progress=total_completed
-                )
-                db.add(user_achievement)
-            else:
-                user_achievement.current_progress = total_completed
+    @staticmethod
+    def _upsert_period_achievements(db: Session, user_id: int, now: datetime, completed_requests: int):
+        """Add completions to every active daily, weekly and monthly achievement of the current period"""
+        periods = AchievementService._current_periods(now)
+        period_start = case(*[
+            (Achievement.achievement_type == achievement_type, start)
+            for achievement_type, (start, _) in periods.items()
+        ])
+        period_end = case(*[
+            (Achievement.achievement_type == achievement_type, end)
+            for achievement_type, (_, end) in periods.items()
+        ])
+
+        rows = select(
+            literal(user_id), Achievement.id, literal(completed_requests),
+            period_start, period_end, literal(False), literal(0)
+        ).where(
+            Achievement.is_active == True,
+            Achievement.achievement_type.in_(list(periods))
+        )
 
-            # Check if achievement is completed
-            if (user_achievement.current_progress >= achievement.target_value and
-                not user_achievement.is_completed):
-                user_achievement.is_completed = True
-                user_achievement.completed_at = datetime.utcnow()
-                user_achievement.points_earned = achievement.points
+        stmt = pg_insert(UserAchievement).from_select(
+            ["user_id", "achievement_id", "current_progress", "period_start", "period_end",
+             "is_completed", "points_earned"],
+            rows
+        )
+        stmt = stmt.on_conflict_do_update(
+            index_elements=[UserAchievement.user_id, UserAchievement.achievement_id, UserAchievement.period_start],
+            set_={
+                "current_progress": func.coalesce(UserAchievement.current_progress, 0) + stmt.excluded.current_progress,
+                "updated_at": func.now()
+            }
+        )
+        db.execute(stmt)
 
     @staticmethod
-    def _update_streak_achievements(db: Session, user_id: int, user_stats: UserStats):
-        """Update streak achievement progress"""
-        streak_achievements = db.query(Achievement).filter(
-            Achievement.achievement_type == AchievementType.STREAK,
-            Achievement.is_active == True
-        ).all()
-
-        for achievement in streak_achievements:
-            # Check current streak against achievement target
-            current_streak = user_stats.current_daily_streak
+    def _upsert_lifetime_achievements(db: Session, user_id: int, current_streak: int):
+        """Set milestone progress to total completed requests and streak progress to the daily streak"""
+        total_completed = select(func.count(Request.id)).where(
+            Request.user_id == user_id,
+            Request.status == RequestStatus.COMPLETED
+        ).scalar_subquery()
 
-            # Check if user already has this achievement
-            user_achievement = db.query(UserAchievement).filter(
-                UserAchievement.user_id == user_id,
-                UserAchievement.achievement_id == achievement.id
-            ).first()
+        progress = case(
+            (Achievement.achievement_type == AchievementType.MILESTONE, total_completed),
+            else_=literal(current_streak)
+        )
 
-            if not user_achievement:
-                user_achievement = UserAchievement(
-                    user_id=user_id,
-                    achievement_id=achievement.id,
-                    current_progress=current_streak
-                )
-                db.add(user_achievement)
-            else:
-                user_achievement.current_progress = current_streak
+        rows = select(
+            literal(user_id), Achievement.id, progress, literal(False), literal(0)
+        ).where(
+            Achievement.is_active == True,
+            Achievement.achievement_type.in_([AchievementType.MILESTONE, AchievementType.STREAK])
+        )
 
-            # Check if achievement is completed
-            if (user_achievement.current_progress >= achievement.target_value and
-                not user_achievement.is_completed):
-                user_achievement.is_completed = True
-                user_achievement.completed_at = datetime.utcnow()
-                user_achievement.points_earned = achievement.points
+        stmt = pg_insert(UserAchievement).from_select(
+            ["user_id", "achievement_id", "current_progress", "is_completed", "points_earned"],
+            rows
+        )
+        stmt = stmt.on_conflict_do_update(
+            index_elements=[UserAchievement.user_id, UserAchievement.achievement_id],
+            index_where=UserAchievement.period_start.is_(None),
+            set_={
+                "current_progress": stmt.excluded.current_progress,
+                "updated_at": func.now()
+            }
+        )
+        db.execute(stmt)
 
     @staticmethod
-    def _update_user_stats(db: Session, user_id: int, user_stats: UserStats):
-        """Update user statistics"""
-        now = datetime.utcnow()
-        today = now.date()
-
-        # Calculate daily streak
-        if user_stats.last_daily_completion:
-            last_completion_date = user_stats.last_daily_completion.date()
-            if last_completion_date == today:
-                # Already completed today, no change to streak
-                pass
-            elif last_completion_date == today - timedelta(days=1):
-                # Completed yesterday, continue streak
-                user_stats.current_daily_streak += 1
-                user_stats.last_daily_completion = now
-            else:
-                # Gap in completion, reset streak
-                user_stats.current_daily_streak = 1
-                user_stats.last_daily_completion = now
-        else:
-            # First completion
-            user_stats.current_daily_streak = 1
-            user_stats.last_daily_completion = now
-
-        # Update longest streak
-        if user_stats.current_daily_streak > user_stats.longest_daily_streak:
-            user_stats.longest_daily_streak = user_stats.current_daily_streak
-
-        # Calculate total points from completed achievements
-        total_points = db.query(func.sum(UserAchievement.points_earned)).filter(
-            UserAchievement.user_id == user_id,
-            UserAchievement.is_completed == True
-        ).scalar() or 0
-
-        user_stats.total_points = total_points
+    def _complete_reached_achievements(db: Session, user_id: int, now: datetime):
+        """Mark the user's achievements at or above target as completed and award their points"""
+        db.execute(
+            update(UserAchievement)
+            .where(
+                UserAchievement.user_id == user_id,
+                UserAchievement.achievement_id == Achievement.id,
+                UserAchievement.is_completed.isnot(True),
+                UserAchievement.current_progress >= Achievement.target_value
+            )
+            .values(is_completed=True, completed_at=now, points_earned=Achievement.points)
+            .execution_options(synchronize_session=False)
+        )
 
-        # Update achievement counts
-        user_stats.total_achievements = db.query(UserAchievement).filter(
-            UserAchievement.user_id == user_id,
-            UserAchievement.is_completed == True
-        ).count()
+    @staticmethod
+    def _refresh_user_stats_totals(db: Session, user_id: int) -> int:
+        """Recalculate total points and completed achievements in user stats, returning total points"""
+        completed = and_(UserAchievement.user_id == user_id, UserAchievement.is_completed == True)
+
+        return db.execute(
+            update(UserStats)
+            .where(UserStats.user_id == user_id)
+            .values(
+                total_points=select(func.coalesce(func.sum(UserAchievement.points_earned), 0))
+                .where(completed).scalar_subquery(),
+                total_achievements=select(func.count(UserAchievement.id)).where(completed).scalar_subquery()
+            )
+            .returning(UserStats.total_points)
+            .execution_options(synchronize_session=False)
+        ).scalar_one()
 
     @staticmethod
-    def _update_competition_progress(db: Session, user_id: int, completed_requests: int):
-        """Update progress in active competitions"""
-        # Get active competitions
-        active_competitions = db.query(Competition).filter(
-            Competition.status == CompetitionStatus.ACTIVE,
-            Competition.start_date <= datetime.utcnow(),
-            Competition.end_date >= datetime.utcnow()
+    def _update_competition_progress(db: Session, user_id: int, completed_requests: int,
+                                     now: datetime) -> Dict[int, int]:
+        """Increment progress in active competitions the user participates in
+
+        Returns {competition_id: new progress} for updating the standings after commit.
+        """
+        rows = db.execute(
+            update(CompetitionParticipant)
+            .where(
+                CompetitionParticipant.user_id == user_id,
+                CompetitionParticipant.competition_id == Competition.id,
+                Competition.status == CompetitionStatus.ACTIVE,
+                Competition.start_date <= now,
+                Competition.end_date >= now
+            )
+            .values(
+                current_progress=func.coalesce(CompetitionParticipant.current_progress, 0) + completed_requests,
+                last_updated=now
+            )
+            .returning(CompetitionParticipant.competition_id, CompetitionParticipant.current_progress)
+            .execution_options(synchronize_session=False)
         ).all()
-
-        for competition in active_competitions:
-            # Check if user is participating
-            participant = db.query(CompetitionParticipant).filter(
-                CompetitionParticipant.competition_id == competition.id,
-                CompetitionParticipant.user_id == user_id
-            ).first()
-
-            if participant:
-                participant.current_progress += completed_requests
-                participant.last_updated = datetime.utcnow()
+        return {competition_id: progress for competition_id, progress in rows}
 
     @staticmethod
     def get_all_users_progress_data(db: Session) -> List[Dict[str, Any]]:
         """Get comprehensive progress data for all users for admin charts"""
         now = datetime.utcnow()
-        today = now.date()
 
         # Get all active users
         users = db.query(User).filter(User.is_active == True).all()
         users_progress = []
 
-        for user in users:
-            # Get user stats
-            user_stats = db.query(UserStats).filter(UserStats.user_id == user.id).first()
-            if not user_stats:
-                user_stats = UserStats(user_id=user.id)
-                db.add(user_stats)
-                db.commit()
-                db.refresh(user_stats)
+        user_ids = [user.id for user in users]
 
-            # Get performance statistics
-            performance_stats = AchievementService._get_user_performance_stats(db, user.id)
+        # Current period achievements of every user in one query
+        all_period_achievements = AchievementService._get_period_achievements(db, user_ids, now)
 
-            # Get current period progress
-            daily_progress = AchievementService._get_daily_progress(db, user.id, today)
-            weekly_progress = AchievementService._get_weekly_progress(db, user.id, now)
-            monthly_progress = AchievementService._get_monthly_progress(db, user.id, now)
+        # Stats rows, creating the missing ones in one statement
+        all_stats = {stats.user_id: stats for stats in db.query(UserStats).filter(UserStats.user_id.in_(user_ids))} if user_ids else {}
+        missing = [user_id for user_id in user_ids if user_id not in all_stats]
+        if missing:
+            db.execute(pg_insert(UserStats).values([{"user_id": user_id} for user_id in missing])
+                       .on_conflict_do_nothing(index_elements=[UserStats.user_id]))
+            db.commit()
+            all_stats.update({stats.user_id: stats for stats in db.query(UserStats).filter(UserStats.user_id.in_(missing))})
+
+        # Request counts, average completion time and recent achievements per user, one grouped query each
+        all_counts = PeriodCounter.counts(db, user_ids)
+        avg_completion_days = dict(db.query(
+            Request.user_id,
+            func.avg(func.date_part("day", Request.updated_at - Request.created_at))
+        ).filter(
+            Request.user_id.in_(user_ids),
+            Request.status == RequestStatus.COMPLETED,
+            Request.updated_at.isnot(None)
+        ).group_by(Request.user_id).all()) if user_ids else {}
+        recent_achievements = dict(db.query(UserAchievement.user_id, func.count(UserAchievement.id)).filter(
+            UserAchievement.user_id.in_(user_ids),
+            UserAchievement.is_completed == True,
+            UserAchievement.completed_at >= now - timedelta(days=30)
+        ).group_by(UserAchievement.user_id).all()) if user_ids else {}
 
-            # Get recent achievements count
-            recent_achievements_count = db.query(UserAchievement).filter(
-                UserAchievement.user_id == user.id,
-                UserAchievement.is_completed == True,
-                UserAchievement.completed_at >= now - timedelta(days=30)
-            ).count()
+        for user in users:
+            user_stats = all_stats[user.id]
+            counts = all_counts.get(user.id, PeriodCounts())
+            completion_rate = (counts.completed / counts.total * 100) if counts.total > 0 else 0
+
+            # Get current period progress
+            period_achievements = all_period_achievements[user.id]
+            daily_progress = AchievementService._get_daily_progress(period_achievements[AchievementType.DAILY])
+            weekly_progress = AchievementService._get_weekly_progress(period_achievements[AchievementType.WEEKLY])
+            monthly_progress = AchievementService._get_monthly_progress(period_achievements[AchievementType.MONTHLY])
 
             # Calculate overall performance score
             daily_score = (daily_progress["achievements"][0]["current_progress"] / daily_progress["achievements"][0]["target_value"] * 100) if daily_progress["achievements"] else 0
@@ -815,13 +676,13 @@ class AchievementService:
                     "global_rank": user_stats.global_rank or len(users)
                 },
                 "performance": {
-                    "daily_completed": performance_stats["today"]["completed"],
-                    "weekly_completed": performance_stats["week"]["completed"],
-                    "monthly_completed": performance_stats["month"]["completed"],
-                    "completion_rate": performance_stats["completion_rate"],
-                    "avg_completion_days": performance_stats["avg_completion_days"],
-                    "total_requests": performance_stats["total_requests"],
-                    "completed_requests": performance_stats["completed_requests"]
+                    "daily_completed": counts.completed_daily,
+                    "weekly_completed": counts.completed_weekly,
+                    "monthly_completed": counts.completed_monthly,
+                    "completion_rate": round(completion_rate, 1),
+                    "avg_completion_days": round(float(avg_completion_days.get(user.id) or 0), 1),
+                    "total_requests": counts.total,
+                    "completed_requests": counts.completed
                 },
                 "progress_scores": {
                     "daily": min(daily_score, 100),
@@ -834,7 +695,7 @@ class AchievementService:
                     "color": performance_color,
                     "icon": performance_icon
                 },
-                "recent_achievements_count": recent_achievements_count
+                "recent_achievements_count": recent_achievements.get(user.id, 0)
             })
 
         # Sort by overall performance score
@@ -845,249 +706,33 @@ class AchievementService:
     @staticmethod
     def get_admin_stats_dashboard_data(db: Session) -> dict:
         """Get comprehensive statistics for admin stats dashboard"""
-        from app.models.request import Request as RequestModel
-        from app.models.user import User, UserRole
         from app.models.activity import Activity
-        from datetime import datetime, timedelta
-        from sqlalchemy import func, extract
-
-        # Get current date and calculate periods
-        now = datetime.now()
-        thirty_days_ago = now - timedelta(days=30)
-        seven_days_ago = now - timedelta(days=7)
-
-        # Total Users (equivalent to subscribers)
-        total_users = db.query(User).filter(User.role == UserRole.USER).count()
-        total_users_30_days_ago = db.query(User).filter(
-            User.role == UserRole.USER,
-            User.created_at <= thirty_days_ago
-        ).count()
-
-        # Request completion rate (equivalent to open rate)
-        total_requests = db.query(RequestModel).count()
-        completed_requests = db.query(RequestModel).filter(RequestModel.status == 'COMPLETED').count()
-        completion_rate = (completed_requests / total_requests * 100) if total_requests > 0 else 0
-
-        # Previous period completion rate
-        total_requests_30_days_ago = db.query(RequestModel).filter(
-            RequestModel.created_at <= thirty_days_ago
-        ).count()
-        completed_requests_30_days_ago = db.query(RequestModel).filter(
-            RequestModel.status == 'COMPLETED',
-            RequestModel.created_at <= thirty_days_ago
-        ).count()
-        completion_rate_30_days_ago = (completed_requests_30_days_ago / total_requests_30_days_ago * 100) if total_requests_30_days_ago > 0 else 0
-
-        # User engagement rate (equivalent to click rate)
-        active_users_30_days = db.query(User).filter(
-            User.role == UserRole.USER,
-            User.updated_at >= thirty_days_ago
-        ).count()
-        engagement_rate = (active_users_30_days / total_users * 100) if total_users > 0 else 0
-
-        # Previous engagement rate
-        active_users_60_to_30_days = db.query(User).filter(
-            User.role == UserRole.USER,
-            User.updated_at >= (thirty_days_ago - timedelta(days=30)),
-            User.updated_at < thirty_days_ago
-        ).count()
-        total_users_60_days_ago = db.query(User).filter(
-            User.role == UserRole.USER,
-            User.created_at <= (thirty_days_ago - timedelta(days=30))
-        ).count()
-        engagement_rate_prev = (active_users_60_to_30_days / total_users_60_days_ago * 100) if total_users_60_days_ago > 0 else 0
-
-        # System efficiency score (equivalent to revenue)
-        pending_requests = db.query(RequestModel).filter(RequestModel.status == 'PENDING').count()
-        in_progress_requests = db.query(RequestModel).filter(RequestModel.status == 'IN_PROGRESS').count()
-        efficiency_score = max(0, 100 - (pending_requests + in_progress_requests) / total_requests * 100) if total_requests > 0 else 100
-
-        # Previous efficiency score
-        pending_requests_30_days_ago = db.query(RequestModel).filter(
-            RequestModel.status == 'PENDING',
-            RequestModel.created_at <= thirty_days_ago
-        ).count()
-        in_progress_requests_30_days_ago = db.query(RequestModel).filter(
-            RequestModel.status == 'IN_PROGRESS',
-            RequestModel.created_at <= thirty_days_ago
-        ).count()
-        efficiency_score_prev = max(0, 100 - (pending_requests_30_days_ago + in_progress_requests_30_days_ago) / total_requests_30_days_ago * 100) if total_requests_30_days_ago > 0 else 100
-
-        # Monthly requests growth data for chart
-        monthly_growth = []
-        for i in range(7):
-            month_start = now.replace(day=1) - timedelta(days=30*i)
-            month_end = (month_start + timedelta(days=32)).replace(day=1) - timedelta(days=1)
-
-            requests_count = db.query(RequestModel).filter(
-                RequestModel.created_at <= month_end
-            ).count()
-
-            monthly_growth.insert(0, {
-                'month': month_start.strftime('%b'),
-                'count': requests_count
-            })
-
-        # Request status distribution for doughnut chart
-        status_distribution = {
-            'completed': completed_requests,
-            'pending': pending_requests,
-            'in_progress': in_progress_requests,
-            'rejected': db.query(RequestModel).filter(RequestModel.status == 'REJECTED').count()
-        }
-
-        # Top performing request types
-        top_request_types = db.query(
-            RequestModel.request_name,
-            func.count(RequestModel.id).label('count')
-        ).group_by(RequestModel.request_name).order_by(func.count(RequestModel.id).desc()).limit(3).all()
+        from app.services.kpi import KpiSnapshotService
 
-        # Recent activities
+        # Counters come from the cached KPI snapshot; recent activity is always fresh
+        data = dict(KpiSnapshotService.get(db))
         recent_activities = db.query(Activity).order_by(Activity.created_at.desc()).limit(3).all()
-
-        return {
-            'kpi_cards': {
-                'total_users': {
-                    'current': total_users,
-                    'previous': total_users_30_days_ago,
-                    'change_percent': round(((total_users - total_users_30_days_ago) / total_users_30_days_ago * 100), 2) if total_users_30_days_ago > 0 else 0,
-                    'trend': 'up' if total_users > total_users_30_days_ago else 'down'
-                },
-                'completion_rate': {
-                    'current': round(completion_rate, 2),
-                    'previous': round(completion_rate_30_days_ago, 2),
-                    'change_percent': round(completion_rate - completion_rate_30_days_ago, 2),
-                    'trend': 'up' if completion_rate > completion_rate_30_days_ago else 'down'
-                },
-                'engagement_rate': {
-                    'current': round(engagement_rate, 2),
-                    'previous': round(engagement_rate_prev, 2),
-                    'change_percent': round(engagement_rate - engagement_rate_prev, 2),
-                    'trend': 'up' if engagement_rate > engagement_rate_prev else 'down'
-                },
-                'efficiency_score': {
-                    'current': round(efficiency_score, 2),
-                    'previous': round(efficiency_score_prev, 2),
-                    'change_percent': round(efficiency_score - efficiency_score_prev, 2),
-                    'trend': 'up' if efficiency_score > efficiency_score_prev else 'down'
-                }
-            },
-            'monthly_growth': monthly_growth,
-            'status_distribution': status_distribution,
-            'top_request_types': [
-                {
-                    'name': req_type.request_name or 'غير محدد',
-                    'count': req_type.count,
-                    'completion_rate': round((completed_requests / total_requests * 100) if total_requests > 0 else 0, 1),
-                    'category': 'طلب خدمة'
-                }
-                for req_type in top_request_types
-            ],
-            'recent_activities': [
-                {
-                    'title': activity.activity_type.value if activity.activity_type else 'نشاط',
-                    'description': activity.description or f"تم تنفيذ {activity.activity_type.value if activity.activity_type else 'نشاط'}",
-                    'time': activity.created_at,
-                    'type': activity.activity_type.value if activity.activity_type else 'info'
-                }
-                for activity in recent_activities
-            ]
-        }
+        data['recent_activities'] = [
+            {
+                'title': activity.activity_type.value if activity.activity_type else 'نشاط',
+                'description': activity.description or f"تم تنفيذ {activity.activity_type.value if activity.activity_type else 'نشاط'}",
+                'time': activity.created_at,
+                'type': activity.activity_type.value if activity.activity_type else 'info'
+            }
+            for activity in recent_activities
+        ]
+        return data
 
     @staticmethod
     def get_admin_leaderboard_data(db: Session) -> Dict[str, Any]:
         """Get top users leaderboard data for administrator dashboard"""
-        from app.models.user import User, UserRole
-
-        now = datetime.utcnow()
-        today = now.date()
-
-        # Get all regular users (exclude admin and manager)
-        regular_users = db.query(User).filter(
-            User.role == UserRole.USER,
-            User.is_active == True
-        ).all()
-
-        daily_leaders = []
-        weekly_leaders = []
-        monthly_leaders = []
-
-        print(f"Processing {len(regular_users)} regular users for leaderboard")
-
-        for user in regular_users:
-            try:
-                # Sync user progress first
-                AchievementService._sync_user_progress_with_requests(db, user.id)
-
-                # Get user's current progress
-                user_data = AchievementService.get_user_dashboard_data(db, user.id)
-                current_progress = user_data.get("current_progress", {})
-
-                # Extract progress for each timeframe with defaults
-                daily_progress = current_progress.get("daily", {
-                    "target": 10, "current": 0, "percentage": 0, "status": "لم يبدأ"
-                })
-                weekly_progress = current_progress.get("weekly", {
-                    "target": 50, "current": 0, "percentage": 0, "status": "لم يبدأ"
-                })
-                monthly_progress = current_progress.get("monthly", {
-                    "target": 200, "current": 0, "percentage": 0, "status": "لم يبدأ"
-                })
-
-                # Add all users to leaderboards (including those with 0 progress)
-                daily_leaders.append({
-                    "user": user,
-                    "progress": daily_progress,
-                    "sort_key": daily_progress.get("current", 0)
-                })
-
-                weekly_leaders.append({
-                    "user": user,
-                    "progress": weekly_progress,
-                    "sort_key": weekly_progress.get("current", 0)
-                })
-
-                monthly_leaders.append({
-                    "user": user,
-                    "progress": monthly_progress,
-                    "sort_key": monthly_progress.get("current", 0)
-                })
-
-            except Exception as e:
-                print(f"Error processing user {user.username}: {e}")
-                continue
-
-        # Sort by current progress (descending), then by percentage, then by user ID for consistency
-        def sort_key(item):
-            return (
-                item["sort_key"],  # Primary: current progress
-                item["progress"].get("percentage", 0),  # Secondary: percentage
-                -item["user"].id  # Tertiary: user ID (negative for consistent ordering)
-            )
-
-        daily_leaders.sort(key=sort_key, reverse=True)
-        weekly_leaders.sort(key=sort_key, reverse=True)
-        monthly_leaders.sort(key=sort_key, reverse=True)
-
-        # Get top 3 for each category
-        top_daily = daily_leaders[:3]
-        top_weekly = weekly_leaders[:3]
-        top_monthly = monthly_leaders[:3]
-
-        print(f"Daily leaders: {len(top_daily)}, Weekly leaders: {len(top_weekly)}, Monthly leaders: {len(top_monthly)}")
-
-        return {
-            "daily_leaders": top_daily,
-            "weekly_leaders": top_weekly,
-            "monthly_leaders": top_monthly,
-            "total_users": len(regular_users)
-        }
+        from app.services.leaderboard import LeaderboardService
+        return LeaderboardService.get_period_leaders(db, limit=3)
 
     @staticmethod
     def get_user_dashboard_data(db: Session, user_id: int) -> Dict[str, Any]:
         """Get comprehensive achievement data for user dashboard"""
         now = datetime.utcnow()
-        today = now.date()
 
         # Sync achievement progress with actual request data
         AchievementService._sync_user_progress_with_requests(db, user_id)
@@ -1101,9 +746,10 @@ class AchievementService:
             db.refresh(user_stats)
 
         # Get current period progress
-        daily_progress = AchievementService._get_daily_progress(db, user_id, today)
-        weekly_progress = AchievementService._get_weekly_progress(db, user_id, now)
-        monthly_progress = AchievementService._get_monthly_progress(db, user_id, now)
+        period_achievements = AchievementService._get_period_achievements(db, [user_id], now)[user_id]
+        daily_progress = AchievementService._get_daily_progress(period_achievements[AchievementType.DAILY])
+        weekly_progress = AchievementService._get_weekly_progress(period_achievements[AchievementType.WEEKLY])
+        monthly_progress = AchievementService._get_monthly_progress(period_achievements[AchievementType.MONTHLY])
 
         # Get recent achievements
         recent_achievements = db.query(UserAchievement).join(Achievement).filter(
@@ -1150,15 +796,31 @@ class AchievementService:
         }
 
     @staticmethod
-    def _get_daily_progress(db: Session, user_id: int, today: date) -> Dict[str, Any]:
-        """Get daily progress for user"""
-        # Get daily achievements for today
-        daily_achievements = db.query(UserAchievement).join(Achievement).filter(
-            UserAchievement.user_id == user_id,
-            Achievement.achievement_type == AchievementType.DAILY,
-            func.date(UserAchievement.period_start) == today
-        ).all()
+    def _get_period_achievements(db: Session, user_ids: List[int],
+                                 now: datetime) -> Dict[int, Dict[AchievementType, List[UserAchievement]]]:
+        """Current daily, weekly and monthly achievements of the given users, in one query"""
+        periods = AchievementService._current_periods(now)
+        period_start = case(*[
+            (Achievement.achievement_type == achievement_type, start)
+            for achievement_type, (start, _) in periods.items()
+        ])
+
+        rows = db.query(UserAchievement).join(Achievement).options(
+            contains_eager(UserAchievement.achievement)
+        ).filter(
+            UserAchievement.user_id.in_(user_ids),
+            Achievement.achievement_type.in_(list(periods)),
+            UserAchievement.period_start == period_start
+        ).order_by(UserAchievement.id).all() if user_ids else []
+
+        by_user = {user_id: {achievement_type: [] for achievement_type in periods} for user_id in user_ids}
+        for ua in rows:
+            by_user[ua.user_id][ua.achievement.achievement_type].append(ua)
+        return by_user
 
+    @staticmethod
+    def _get_daily_progress(daily_achievements: List[UserAchievement]) -> Dict[str, Any]:
+        """Get daily progress for user"""
         if not daily_achievements:
             return {
                 "target": 10,
@@ -1205,18 +867,8 @@ class AchievementService:
         }
 
     @staticmethod
-    def _get_weekly_progress(db: Session, user_id: int, now: datetime) -> Dict[str, Any]:
+    def _get_weekly_progress(weekly_achievements: List[UserAchievement]) -> Dict[str, Any]:
         """Get weekly progress for user"""
-        # Get start of current week
-        week_start = now - timedelta(days=now.weekday())
-        week_start = week_start.replace(hour=0, minute=0, second=0, microsecond=0)
-
-        weekly_achievements = db.query(UserAchievement).join(Achievement).filter(
-            UserAchievement.user_id == user_id,
-            Achievement.achievement_type == AchievementType.WEEKLY,
-            UserAchievement.period_start == week_start
-        ).all()
-
         if not weekly_achievements:
             return {
                 "target": 50,
@@ -1265,17 +917,8 @@ class AchievementService:
         }
 
     @staticmethod
-    def _get_monthly_progress(db: Session, user_id: int, now: datetime) -> Dict[str, Any]:
+    def _get_monthly_progress(monthly_achievements: List[UserAchievement]) -> Dict[str, Any]:
         """Get monthly progress for user"""
-        # Get start of current month
-        month_start = now.replace(day=1, hour=0, minute=0, second=0, microsecond=0)
-
-        monthly_achievements = db.query(UserAchievement).join(Achievement).filter(
-            UserAchievement.user_id == user_id,
-            Achievement.achievement_type == AchievementType.MONTHLY,
-            UserAchievement.period_start == month_start
-        ).all()
-
         if not monthly_achievements:
             return {
                 "target": 200,
@@ -1336,31 +979,18 @@ class AchievementService:
             Competition.end_date >= now
         ).all()
 
+        # One query for the user's participation, ranks come from the standings
+        progress_by_competition = dict(db.query(
+            CompetitionParticipant.competition_id, CompetitionParticipant.current_progress
+        ).filter(
+            CompetitionParticipant.user_id == user_id,
+            CompetitionParticipant.competition_id.in_([competition.id for competition in active_competitions])
+        ).all()) if active_competitions else {}
+
         competitions_data = []
         for competition in active_competitions:
-            # Check if user is participating
-            participant = db.query(CompetitionParticipant).filter(
-                CompetitionParticipant.competition_id == competition.id,
-                CompetitionParticipant.user_id == user_id
-            ).first()
-
-            # Get total participants
-            total_participants = db.query(CompetitionParticipant).filter(
-                CompetitionParticipant.competition_id == competition.id
-            ).count()
-
-            # Get user's rank if participating
-            user_rank = None
-            if participant:
-                # Get participants ordered by progress
-                participants = db.query(CompetitionParticipant).filter(
-                    CompetitionParticipant.competition_id == competition.id
-                ).order_by(desc(CompetitionParticipant.current_progress)).all()
-
-                for i, p in enumerate(participants, 1):
-                    if p.user_id == user_id:
-                        user_rank = i
-                        break
+            user_rank, total_participants = CompetitionStandings.position(db, competition.id, user_id)
+            is_participating = competition.id in progress_by_competition
 
             competitions_data.append({
                 "id": competition.id,
@@ -1369,8 +999,8 @@ class AchievementService:
                 "type": competition.competition_type.value,
                 "target": competition.target_value,
                 "end_date": competition.end_date,
-                "is_participating": participant is not None,
-                "user_progress": participant.current_progress if participant else 0,
+                "is_participating": is_participating,
+                "user_progress": progress_by_competition.get(competition.id) or 0,
                 "user_rank": user_rank,
                 "total_participants": total_participants,
                 "time_remaining": competition.end_date - now
@@ -1381,170 +1011,14 @@ class AchievementService:
     @staticmethod
     def get_user_leaderboard_position(db: Session, user_id: int) -> Dict[str, Any]:
         """Get user's position in various leaderboards"""
-        # Global leaderboard (by total points)
-        global_rank_query = db.query(UserStats).order_by(desc(UserStats.total_points)).all()
-        global_rank = None
-        for i, stats in enumerate(global_rank_query, 1):
-            if stats.user_id == user_id:
-                global_rank = i
-                break
-
-        # Daily leaderboard (by daily achievements today)
-        today = datetime.utcnow().date()
-        daily_progress = db.query(
-            UserAchievement.user_id,
-            func.sum(UserAchievement.current_progress).label('daily_total')
-        ).join(Achievement).filter(
-            Achievement.achievement_type == AchievementType.DAILY,
-            func.date(UserAchievement.period_start) == today
-        ).group_by(UserAchievement.user_id).order_by(desc('daily_total')).all()
-
-        daily_rank = None
-        for i, (uid, total) in enumerate(daily_progress, 1):
-            if uid == user_id:
-                daily_rank = i
-                break
-
-        return {
-            "global_rank": global_rank or "غير مصنف",
-            "daily_rank": daily_rank or "غير مصنف",
-            "total_users": len(global_rank_query)
-        }
+        from app.services.leaderboard import LeaderboardService
+        return LeaderboardService.get_user_position(db, user_id)
 
     @staticmethod
     def get_leaderboard_data(db: Session, period: str = "global", limit: int = 50) -> List[Dict[str, Any]]:
         """Get leaderboard data for different periods"""
-        if period == "global":
-            return AchievementService._get_global_leaderboard(db, limit)
-        elif period == "daily":
-            return AchievementService._get_daily_leaderboard(db, limit)
-        elif period == "weekly":
-            return AchievementService._get_weekly_leaderboard(db, limit)
-        elif period == "monthly":
-            return AchievementService._get_monthly_leaderboard(db, limit)
-        else:
-            return []
-
-    @staticmethod
-    def _get_global_leaderboard(db: Session, limit: int) -> List[Dict[str, Any]]:
-        """Get global leaderboard by total points"""
-        leaderboard = db.query(UserStats, User).join(User).filter(
-            User.role == UserRole.USER,
-            User.is_active == True
-        ).order_by(desc(UserStats.total_points)).limit(limit).all()
-
-        return [
-            {
-                "rank": i + 1,
-                "user_id": stats.user_id,
-                "full_name": user.full_name,
-                "username": user.username,
-                "total_points": stats.total_points,
-                "total_achievements": stats.total_achievements,
-                "current_streak": stats.current_daily_streak,
-                "longest_streak": stats.longest_daily_streak
-            }
-            for i, (stats, user) in enumerate(leaderboard)
-        ]
-
-    @staticmethod
-    def _get_daily_leaderboard(db: Session, limit: int) -> List[Dict[str, Any]]:
-        """Get daily leaderboard by today's progress"""
-        today = datetime.utcnow().date()
-
-        daily_progress = db.query(
-            UserAchievement.user_id,
-            User.full_name,
-            User.username,
-            func.sum(UserAchievement.current_progress).label('daily_total')
-        ).join(Achievement).join(User).filter(
-            Achievement.achievement_type == AchievementType.DAILY,
-            func.date(UserAchievement.period_start) == today,
-            User.role == UserRole.USER,
-            User.is_active == True
-        ).group_by(
-            UserAchievement.user_id, User.full_name, User.username
-        ).order_by(desc('daily_total')).limit(limit).all()
-
-        return [
-            {
-                "rank": i + 1,
-                "user_id": user_id,
-                "full_name": full_name,
-                "username": username,
-                "daily_progress": int(daily_total),
-                "target": 10,
-                "percentage": min(100, (daily_total / 10) * 100)
-            }
-            for i, (user_id, full_name, username, daily_total) in enumerate(daily_progress)
-        ]
-
-    @staticmethod
-    def _get_weekly_leaderboard(db: Session, limit: int) -> List[Dict[str, Any]]:
-        """Get weekly leaderboard by this week's progress"""
-        now = datetime.utcnow()
-        week_start = now - timedelta(days=now.weekday())
-        week_start = week_start.replace(hour=0, minute=0, second=0, microsecond=0)
-
-        weekly_progress = db.query(
-            UserAchievement.user_id,
-            User.full_name,
-            User.username,
-            func.sum(UserAchievement.current_progress).label('weekly_total')
-        ).join(Achievement).join(User).filter(
-            Achievement.achievement_type == AchievementType.WEEKLY,
-            UserAchievement.period_start == week_start,
-            User.role == UserRole.USER,
-            User.is_active == True
-        ).group_by(
-            UserAchievement.user_id, User.full_name, User.username
-        ).order_by(desc('weekly_total')).limit(limit).all()
-
-        return [
-            {
-                "rank": i + 1,
-                "user_id": user_id,
-                "full_name": full_name,
-                "username": username,
-                "weekly_progress": int(weekly_total),
-                "target": 50,
-                "percentage": min(100, (weekly_total / 50) * 100)
-            }
-            for i, (user_id, full_name, username, weekly_total) in enumerate(weekly_progress)
-        ]
-
-    @staticmethod
-    def _get_monthly_leaderboard(db: Session, limit: int) -> List[Dict[str, Any]]:
-        """Get monthly leaderboard by this month's progress"""
-        now = datetime.utcnow()
-        month_start = now.replace(day=1, hour=0, minute=0, second=0, microsecond=0)
-
-        monthly_progress = db.query(
-            UserAchievement.user_id,
-            User.full_name,
-            User.username,
-            func.sum(UserAchievement.current_progress).label('monthly_total')
-        ).join(Achievement).join(User).filter(
-            Achievement.achievement_type == AchievementType.MONTHLY,
-            UserAchievement.period_start == month_start,
-            User.role == UserRole.USER,
-            User.is_active == True
-        ).group_by(
-            UserAchievement.user_id, User.full_name, User.username
-        ).order_by(desc('monthly_total')).limit(limit).all()
-
-        return [
-            {
-                "rank": i + 1,
-                "user_id": user_id,
-                "full_name": full_name,
-                "username": username,
-                "monthly_progress": int(monthly_total),
-                "target": 200,
-                "percentage": min(100, (monthly_total / 200) * 100)
-            }
-            for i, (user_id, full_name, username, monthly_total) in enumerate(monthly_progress)
-        ]
+        from app.services.leaderboard import LeaderboardService
+        return LeaderboardService.get_leaderboard(db, period, limit)
 
     @staticmethod
     def create_competition(db: Session, creator_id: int, competition_data: Dict[str, Any]) -> Competition:
@@ -1570,70 +1044,95 @@ class AchievementService:
         db.commit()
         db.refresh(competition)
 
+        if competition_data.get("enroll_all_users"):
+            CompetitionLifecycle.enroll_all_users(db, competition.id)
+
         return competition
 
     @staticmethod
     def join_competition(db: Session, competition_id: int, user_id: int) -> bool:
-        """Join a competition"""
-        # Check if competition exists and is joinable
-        competition = db.query(Competition).filter(Competition.id == competition_id).first()
+        """Join a competition; False if it is not joinable, full, or the user already joined"""
+        # Locking the competition row makes concurrent joins check the participant limit in turn
+        competition = db.query(Competition).filter(Competition.id == competition_id).with_for_update().first()
         if not competition or competition.status not in [CompetitionStatus.UPCOMING, CompetitionStatus.ACTIVE]:
-            return False
-
-        # Check if user is already participating
-        existing = db.query(CompetitionParticipant).filter(
-            CompetitionParticipant.competition_id == competition_id,
-            CompetitionParticipant.user_id == user_id
-        ).first()
-
-        if existing:
+            db.rollback()
             return False
 
         # Check participant limit
         if competition.max_participants:
-            current_participants = db.query(CompetitionParticipant).filter(
+            current_participants = db.query(func.count(CompetitionParticipant.id)).filter(
                 CompetitionParticipant.competition_id == competition_id
-            ).count()
+            ).scalar()
 
             if current_participants >= competition.max_participants:
+                db.rollback()
                 return False
 
-        # Add participant
-        participant = CompetitionParticipant(
-            competition_id=competition_id,
-            user_id=user_id
-        )
-
-        db.add(participant)
+        # A second click or tab finds the existing row and inserts nothing
+        joined = db.execute(
+            pg_insert(CompetitionParticipant)
+            .values(competition_id=competition_id, user_id=user_id)
+            .on_conflict_do_nothing(index_elements=["competition_id", "user_id"])
+            .returning(CompetitionParticipant.id)
+        ).scalar()
         db.commit()
 
+        if joined is None:
+            return False
+        CompetitionStandings.add_participant(competition_id, user_id)
         return True
 
     @staticmethod
-    def get_competition_leaderboard(db: Session, competition_id: int) -> List[Dict[str, Any]]:
+    def get_competition_leaderboard(db: Session, competition_id: int, limit: int = 100) -> List[Dict[str, Any]]:
         """Get leaderboard for a specific competition"""
-        participants = db.query(CompetitionParticipant, User).join(User).filter(
-            CompetitionParticipant.competition_id == competition_id
-        ).order_by(desc(CompetitionParticipant.current_progress)).all()
+        competition = db.query(Competition).filter(Competition.id == competition_id).first()
+        if not competition:
+            return []
+
+        if competition.status == CompetitionStatus.COMPLETED:
+            # Final ranks were assigned by the finalizer
+            participants = db.query(CompetitionParticipant, User).join(User).filter(
+                CompetitionParticipant.competition_id == competition_id
+            ).order_by(CompetitionParticipant.rank, CompetitionParticipant.user_id).limit(limit).all()
+
+            return [
+                {
+                    "rank": participant.rank,
+                    "user_id": participant.user_id,
+                    "full_name": user.full_name,
+                    "username": user.username,
+                    "progress": participant.final_score,
+                    "points_earned": participant.points_earned,
+                    "last_updated": participant.last_updated
+                }
+                for participant, user in participants
+            ]
+
+        standings = CompetitionStandings.top(db, competition_id, limit)
+        user_ids = [user_id for user_id, _, _ in standings]
+        rows = {
+            participant.user_id: (participant, user)
+            for participant, user in db.query(CompetitionParticipant, User).join(User).filter(
+                CompetitionParticipant.competition_id == competition_id,
+                CompetitionParticipant.user_id.in_(user_ids)
+            ).all()
+        } if user_ids else {}
 
         return [
             {
-                "rank": i + 1,
-                "user_id": participant.user_id,
-                "full_name": user.full_name,
-                "username": user.username,
-                "progress": participant.current_progress,
-                "last_updated": participant.last_updated
+                "rank": rank,
+                "user_id": user_id,
+                "full_name": rows[user_id][1].full_name,
+                "username": rows[user_id][1].username,
+                "progress": progress,
+                "last_updated": rows[user_id][0].last_updated
             }
-            for i, (participant, user) in enumerate(participants)
+            for user_id, progress, rank in standings
+            if user_id in rows
         ]
 
     @staticmethod
     def update_rankings(db: Session):
-        """Update global rankings for all users"""
-        # Update global rankings
-        users_by_points = db.query(UserStats).order_by(desc(UserStats.total_points)).all()
-        for i, user_stats in enumerate(users_by_points, 1):
-            user_stats.global_rank = i
-
-        db.commit()
+        """Update global, daily, weekly and monthly rankings for all users"""
+        from app.services.leaderboard import LeaderboardService
+        LeaderboardService.refresh_rankings(db)
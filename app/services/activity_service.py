@@ -6,6 +6,8 @@ import logging
 from app.models.user import User
 from app.models.request import Request, RequestStatus
 from app.models.activity import Activity, ActivityType
+from app.services.activity_sink import activity_sink
+from app.config import settings
 
 class ActivityService:
     _logger = logging.getLogger(__name__)
@@ -93,7 +95,7 @@ class ActivityService:
 
         try:
             # Debug logging
-            ActivityService._logger.info(f"Getting request activities for user_id: {user_id}")
+            ActivityService._logger.debug(f"Getting request activities for user_id: {user_id}")
 
             # Base query for user's requests
             query = db.query(Request).filter(Request.user_id == user_id)
@@ -105,17 +107,17 @@ class ActivityService:
                 query = query.filter(Request.created_at <= date_to)
 
             requests = query.order_by(desc(Request.created_at)).limit(50).all()
-            ActivityService._logger.info(f"Found {len(requests)} requests for user_id: {user_id}")
+            ActivityService._logger.debug(f"Found {len(requests)} requests for user_id: {user_id}")
 
-            if not requests:
+            if not requests and ActivityService._logger.isEnabledFor(logging.DEBUG):
                 # If no requests found, let's check if there are any requests at all for debugging
                 all_requests = db.query(Request).limit(5).all()
-                ActivityService._logger.info(f"No requests found for user {user_id}. Total requests in DB: {db.query(Request).count()}")
+                ActivityService._logger.debug(f"No requests found for user {user_id}. Total requests in DB: {db.query(Request).count()}")
                 if all_requests:
-                    ActivityService._logger.info(f"Sample requests: {[(r.id, r.user_id, r.request_number) for r in all_requests]}")
+                    ActivityService._logger.debug(f"Sample requests: {[(r.id, r.user_id, r.request_number) for r in all_requests]}")
 
             for req in requests:
-                ActivityService._logger.info(f"Processing request {req.id} - {req.request_number} - Status: {req.status.value}")
+                ActivityService._logger.debug(f"Processing request {req.id} - {req.request_number} - Status: {req.status.value}")
 
                 # Request created activity
                 if not activity_type or activity_type == 'request_created':
@@ -139,13 +141,13 @@ class ActivityService:
                         'bg_color': 'bg-green-50'
                     }
                     activities.append(activity)
-                    ActivityService._logger.info(f"Added request_created activity for request {req.id}")
+                    ActivityService._logger.debug(f"Added request_created activity for request {req.id}")
                 
                 # Request updated activity (if updated_at differs from created_at)
                 if (not activity_type or activity_type == 'request_updated') and req.updated_at and req.updated_at != req.created_at:
                     # Calculate time difference to show meaningful updates
                     time_diff = (req.updated_at - req.created_at).total_seconds()
-                    ActivityService._logger.info(f"Request {req.id} update check: time_diff={time_diff}, updated_at={req.updated_at}, created_at={req.created_at}")
+                    ActivityService._logger.debug(f"Request {req.id} update check: time_diff={time_diff}, updated_at={req.updated_at}, created_at={req.created_at}")
                     if time_diff > 60:  # Only show updates that are more than 1 minute after creation
                         activity = {
                             'id': f"req_updated_{req.id}",
@@ -167,7 +169,7 @@ class ActivityService:
                             'bg_color': 'bg-blue-50'
                         }
                         activities.append(activity)
-                        ActivityService._logger.info(f"Added request_updated activity for request {req.id}")
+                        ActivityService._logger.debug(f"Added request_updated activity for request {req.id}")
 
                 # Request completed activity
                 if (not activity_type or activity_type == 'request_completed') and req.status.value == 'completed':
@@ -195,7 +197,7 @@ class ActivityService:
                         'bg_color': 'bg-green-50'
                     }
                     activities.append(activity)
-                    ActivityService._logger.info(f"Added request_completed activity for request {req.id}")
+                    ActivityService._logger.debug(f"Added request_completed activity for request {req.id}")
 
                 # Request rejected activity
                 if (not activity_type or activity_type == 'request_rejected') and req.status.value == 'rejected':
@@ -225,7 +227,7 @@ class ActivityService:
         except Exception as e:
             ActivityService._logger.error(f"Error getting request activities: {e}")
 
-        ActivityService._logger.info(f"Generated {len(activities)} request activities for user {user_id}")
+        ActivityService._logger.debug(f"Generated {len(activities)} request activities for user {user_id}")
         return activities
 
     @staticmethod
@@ -836,6 +838,13 @@ class ActivityService:
             else:
                 activity_type_enum = activity_type
 
+            # Written in the next batch, without a commit on the caller's session
+            if settings.activity_write_behind:
+                return activity_sink.record(
+                    user_id, activity_type_enum, description,
+                    details=details or {}, ip_address=ip_address, user_agent=user_agent
+                )
+
             # Create new activity record
             new_activity = Activity(
                 user_id=user_id,
@@ -0,0 +1,288 @@
+"""
+Write-behind activity logging
+Activity rows are buffered in memory and written by a background thread with one
+multi-row INSERT every activity_flush_interval_ms, or sooner once
+activity_flush_batch_size events are waiting, so logging an action costs the request
+no extra commit. Each event keeps the time it was recorded as created_at. The buffer is
+flushed on shutdown and at interpreter exit.
+
+While the database is unavailable, failed batches are retried on the next flush. A
+batch the database rejects (an IntegrityError or DataError, e.g. a deleted user) is
+retried one row per savepoint instead; rows that fail on their own are logged and
+dropped so they cannot block the rest.
+
+In the default mode, events beyond activity_buffer_limit are dropped. In strict mode
+(activity_strict_mode), every event is first appended to a WAL segment in
+activity_wal_directory, named <pid>-<random token>-<seq>.jsonl so a reused pid never
+reopens another process's segment. The writing process holds an exclusive flock on a
+segment until its events are committed and the segment deleted; segments nobody holds
+a lock on were left by a crashed process and are replayed at the next startup
+(recover()), which claims each one by taking the lock itself.
+"""
+
+import atexit
+import json
+import logging
+import os
+import threading
+import uuid
+from datetime import datetime, timezone
+from pathlib import Path
+from typing import IO, Any, Dict, List, Optional, Tuple
+
+try:
+    import fcntl
+    FLOCK_AVAILABLE = True
+except ImportError:
+    FLOCK_AVAILABLE = False
+
+from sqlalchemy import insert
+from sqlalchemy.exc import DataError, IntegrityError
+
+from app.config import settings
+from app.models.activity import Activity, ActivityType
+
+logger = logging.getLogger(__name__)
+
+
+def _wal_line(row: Dict[str, Any]) -> str:
+    return json.dumps(dict(
+        row, activity_type=row["activity_type"].name, created_at=row["created_at"].isoformat()
+    ), ensure_ascii=False, default=str) + "\n"
+
+
+def _from_wal_line(line: str) -> Dict[str, Any]:
+    row = json.loads(line)
+    row["activity_type"] = ActivityType[row["activity_type"]]
+    row["created_at"] = datetime.fromisoformat(row["created_at"])
+    return row
+
+
+def _try_lock(segment: IO) -> bool:
+    """Take an exclusive flock on an open segment without waiting"""
+    if not FLOCK_AVAILABLE:
+        return True
+    try:
+        fcntl.flock(segment.fileno(), fcntl.LOCK_EX | fcntl.LOCK_NB)
+    except BlockingIOError:
+        return False
+    return True
+
+
+def _insert(rows: List[Dict[str, Any]]) -> List[Tuple[Dict[str, Any], Exception]]:
+    """Insert rows in one transaction; returns the rows the database rejected, with the error"""
+    from app.database import SessionLocal
+    db = SessionLocal()
+    rejected = []
+    try:
+        try:
+            db.execute(insert(Activity), rows)
+        except (IntegrityError, DataError):
+            # Find the offending rows; connection errors still fail the whole batch
+            db.rollback()
+            for row in rows:
+                try:
+                    with db.begin_nested():
+                        db.execute(insert(Activity), [row])
+                except (IntegrityError, DataError) as e:
+                    rejected.append((row, e))
+        db.commit()
+    except Exception:
+        db.rollback()
+        raise
+    finally:
+        db.close()
+    return rejected
+
+
+def _log_rejected(rejected: List[Tuple[Dict[str, Any], Exception]]):
+    for row, error in rejected:
+        logger.error(f"Dropping activity rejected by the database ({getattr(error, 'orig', error)}): {_wal_line(row).strip()}")
+
+
+class ActivitySink:
+    """Buffers activity rows and writes them in batches from a background thread"""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._flush_lock = threading.Lock()
+        self._wake = threading.Event()
+        self._buffer: List[Dict[str, Any]] = []
+        # Batches not yet committed, with the open (locked) WAL segments holding them (strict mode)
+        self._pending: List[Tuple[List[Dict[str, Any]], List[IO]]] = []
+        self._held = 0
+        self._segment: Optional[IO] = None
+        self._segment_seq = 0
+        self._thread: Optional[threading.Thread] = None
+        self._pid: Optional[int] = None
+        self._token: Optional[str] = None
+        self._stopping = False
+        self.dropped = 0
+        self.rejected = 0
+
+    @property
+    def wal_directory(self) -> Path:
+        return Path(settings.activity_wal_directory)
+
+    def record(
+        self,
+        user_id: int,
+        activity_type: ActivityType,
+        description: str,
+        details: Optional[Dict[str, Any]] = None,
+        ip_address: Optional[str] = None,
+        user_agent: Optional[str] = None
+    ) -> bool:
+        """Queue one activity row; False if it was dropped because the buffer is full"""
+        row = {
+            "user_id": user_id,
+            "activity_type": activity_type,
+            "description": description,
+            "details": details,
+            "ip_address": ip_address,
+            "user_agent": user_agent,
+            "created_at": datetime.now(timezone.utc),
+        }
+        with self._lock:
+            self._ensure_started()
+            if not settings.activity_strict_mode and self._held >= settings.activity_buffer_limit:
+                self.dropped += 1
+                if self.dropped % 1000 == 1:
+                    logger.warning(f"Activity buffer full, {self.dropped} events dropped so far")
+                return False
+            if settings.activity_strict_mode:
+                self._append_wal(row)
+            self._buffer.append(row)
+            self._held += 1
+            if len(self._buffer) >= settings.activity_flush_batch_size:
+                self._wake.set()
+        return True
+
+    def _ensure_started(self):
+        # A forked worker inherits the parent's state but not its thread
+        if self._pid != os.getpid():
+            # The parent still owns its segments; closing our copies leaves its locks in place
+            for segment in [self._segment] + [s for _, segments in self._pending for s in segments]:
+                if segment is not None:
+                    segment.close()
+            self._buffer, self._pending, self._held = [], [], 0
+            self._segment, self._thread, self._segment_seq = None, None, 0
+            self._pid = os.getpid()
+            self._token = f"{self._pid}-{uuid.uuid4().hex[:12]}"
+        if self._thread is None and not self._stopping:
+            self._thread = threading.Thread(target=self._run, name="activity-sink", daemon=True)
+            self._thread.start()
+            atexit.register(self.stop)
+
+    def _append_wal(self, row: Dict[str, Any]):
+        if self._segment is None:
+            self.wal_directory.mkdir(parents=True, exist_ok=True)
+            self._segment_seq += 1
+            segment = open(self.wal_directory / f"{self._token}-{self._segment_seq}.jsonl", "x", encoding="utf-8")
+            # Held until the segment is deleted, so recover() in another worker leaves it alone
+            _try_lock(segment)
+            self._segment = segment
+        self._segment.write(_wal_line(row))
+        # Reaches the OS before the caller continues, so it survives a process crash
+        self._segment.flush()
+
+    def _rotate_segment(self) -> List[IO]:
+        """Stop appending to the current WAL segment; its events are exactly the buffer being taken"""
+        if self._segment is None:
+            return []
+        segment, self._segment = self._segment, None
+        return [segment]
+
+    def _run(self):
+        interval = settings.activity_flush_interval_ms / 1000
+        while not self._stopping:
+            self._wake.wait(interval)
+            self._wake.clear()
+            self.flush()
+        self.flush()
+
+    def flush(self) -> int:
+        """Write everything buffered so far; returns the number of rows committed"""
+        with self._flush_lock:
+            with self._lock:
+                if self._buffer:
+                    self._pending.append((self._buffer, self._rotate_segment()))
+                    self._buffer = []
+                pending, self._pending = self._pending, []
+            if not pending:
+                return 0
+
+            rows = [row for batch, _ in pending for row in batch]
+            try:
+                rejected = _insert(rows)
+            except Exception as e:
+                logger.error(f"Error writing {len(rows)} activities, will retry: {e}")
+                with self._lock:
+                    self._pending = pending + self._pending
+                return 0
+
+            with self._lock:
+                self._held -= len(rows)
+                self.rejected += len(rejected)
+            _log_rejected(rejected)
+            for _, segments in pending:
+                for segment in segments:
+                    # Deleted before the lock is released, so nobody can claim it in between
+                    Path(segment.name).unlink(missing_ok=True)
+                    segment.close()
+            return len(rows) - len(rejected)
+
+    def stop(self, timeout: float = 10):
+        """Stop the flusher after a final flush"""
+        self._stopping = True
+        self._wake.set()
+        thread = self._thread
+        if thread is not None and thread.is_alive() and thread is not threading.current_thread():
+            thread.join(timeout)
+        if thread is None or not thread.is_alive():
+            self.flush()
+        self._thread = None
+
+    def recover(self) -> int:
+        """Replay WAL segments that no running process holds a lock on"""
+        if not self.wal_directory.is_dir():
+            return 0
+        if not FLOCK_AVAILABLE:
+            logger.warning("Activity WAL replay needs flock, which this platform lacks; segments left in place")
+            return 0
+        replayed = 0
+        for path in sorted(self.wal_directory.glob("*.jsonl")):
+            try:
+                segment = open(path, encoding="utf-8")
+            except FileNotFoundError:
+                continue
+            with segment:
+                # Locked: still being written, or claimed by a worker recovering at the same time
+                if not _try_lock(segment):
+                    continue
+                # Deleted after we opened it: its owner committed it and released the lock
+                if os.fstat(segment.fileno()).st_nlink == 0:
+                    continue
+
+                rows = []
+                for line in segment:
+                    try:
+                        rows.append(_from_wal_line(line))
+                    except (ValueError, KeyError):
+                        logger.warning(f"Skipping unreadable activity WAL line in {path.name}")
+                try:
+                    rejected = _insert(rows) if rows else []
+                except Exception as e:
+                    # Unlocked again on close, so the next startup retries it
+                    logger.error(f"Error replaying activity WAL {path.name}: {e}")
+                    continue
+                _log_rejected(rejected)
+                path.unlink()
+                replayed += len(rows) - len(rejected)
+
+        if replayed:
+            logger.info(f"Replayed {replayed} activities from the WAL")
+        return replayed
+
+
+activity_sink = ActivitySink()
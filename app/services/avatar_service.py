@@ -1,12 +1,13 @@
 import os
 import uuid
-from typing import Optional
+from typing import Dict, Optional
 from fastapi import UploadFile, HTTPException
-from PIL import Image
-import io
 from sqlalchemy.orm import Session
 from app.config import settings
 from app.models.user_avatar import UserAvatar
+from app.services.metrics import prometheus_metrics
+from app.services.preview_service import PreviewService
+from app.utils.previews import render_avatar
 
 
 class AvatarService:
@@ -43,31 +44,12 @@ class AvatarService:
     
     @staticmethod
     async def _process_image(file: UploadFile) -> bytes:
-        """Process and resize image"""
+        """Process and resize image (in the preview process pool, off the event loop)"""
         try:
             # Read file content
             content = await file.read()
-            
-            # Open image with PIL
-            image = Image.open(io.BytesIO(content))
-            
-            # Convert to RGB if necessary (for PNG with transparency)
-            if image.mode in ('RGBA', 'LA', 'P'):
-                # Create white background
-                background = Image.new('RGB', image.size, (255, 255, 255))
-                if image.mode == 'P':
-                    image = image.convert('RGBA')
-                background.paste(image, mask=image.split()[-1] if image.mode == 'RGBA' else None)
-                image = background
-            
-            # Resize image to standard avatar size
-            image = image.resize(AvatarService.AVATAR_SIZE, Image.Resampling.LANCZOS)
-            
-            # Save to bytes
-            output = io.BytesIO()
-            image.save(output, format='JPEG', quality=85, optimize=True)
-            return output.getvalue()
-            
+            return await PreviewService.run_in_pool(render_avatar, content, AvatarService.AVATAR_SIZE)
+
         except Exception as e:
             raise HTTPException(status_code=400, detail=f"Invalid image file: {str(e)}")
     
@@ -95,6 +77,7 @@ class AvatarService:
         # Save processed image
         with open(file_path, 'wb') as f:
             f.write(processed_image)
+        prometheus_metrics.record_upload(len(processed_image), category="avatar")
 
         # Save to database (use forward slashes for web URLs)
         relative_path = f"{AvatarService.AVATAR_DIRECTORY}/{filename}"
@@ -147,16 +130,33 @@ class AvatarService:
         """Get avatar URL from database or generate default avatar"""
         # Try to get avatar from database
         avatar_record = db.query(UserAvatar).filter(UserAvatar.user_id == user_id).first()
+        return AvatarService._resolve_avatar_url(user_id, full_name, avatar_record.avatar_url if avatar_record else None)
+
+    @staticmethod
+    def get_avatar_urls(users, db: Session) -> Dict[int, str]:
+        """Avatar URL of each user in one query; users are objects with id and full_name"""
+        users = list(users)
+        stored = dict(
+            db.query(UserAvatar.user_id, UserAvatar.avatar_url)
+            .filter(UserAvatar.user_id.in_([user.id for user in users]))
+            .all()
+        ) if users else {}
+        return {
+            user.id: AvatarService._resolve_avatar_url(user.id, user.full_name, stored.get(user.id))
+            for user in users
+        }
 
-        if avatar_record and avatar_record.avatar_url:
+    @staticmethod
+    def _resolve_avatar_url(user_id: int, full_name: str, avatar_url: Optional[str]) -> str:
+        if avatar_url:
             # Check if it's already a full URL (external service)
-            if avatar_record.avatar_url.startswith('http'):
-                return avatar_record.avatar_url
+            if avatar_url.startswith('http'):
+                return avatar_url
             # Check if local file exists (convert path separators for file system check)
-            file_path = os.path.join(settings.upload_directory, avatar_record.avatar_url.replace('/', os.sep))
+            file_path = os.path.join(settings.upload_directory, avatar_url.replace('/', os.sep))
             if os.path.exists(file_path):
                 # Return URL with forward slashes for web
-                return f"/static/uploads/{avatar_record.avatar_url}"
+                return f"/static/uploads/{avatar_url}"
 
         # Generate default avatar based on user initials
         return AvatarService.generate_default_avatar_url(user_id, full_name)
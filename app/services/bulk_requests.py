@@ -0,0 +1,206 @@
+"""
+Set-based bulk actions on requests
+A bulk action changes every selected request with one UPDATE (or DELETE) ... WHERE
+id = ANY(:ids) RETURNING, committed together with a single activity row for the batch.
+Follow-on work is batched too: achievement progress is applied once per user for the
+requests that became completed, in the same transaction, so a completion is never
+committed without its credit; status notifications use one preference query and one
+multi-row insert.
+"""
+
+import logging
+from collections import Counter
+from typing import Iterable, List, NamedTuple, Optional
+
+from sqlalchemy import Integer, any_, bindparam, delete, func, select, update
+from sqlalchemy.dialects.postgresql import ARRAY
+from sqlalchemy.orm import Session
+
+from app.models.activity import Activity, ActivityType
+from app.models.file import File
+from app.models.notification import Notification
+from app.models.request import Request, RequestStatus
+from app.utils.file_handler import FileHandler
+
+logger = logging.getLogger(__name__)
+
+STATUS_ACTIONS = {
+    "pending": RequestStatus.PENDING,
+    "in_progress": RequestStatus.IN_PROGRESS,
+    "completed": RequestStatus.COMPLETED,
+    "rejected": RequestStatus.REJECTED,
+}
+
+# Owners may complete their own open requests and delete their own pending ones
+OWNER_COMPLETABLE = (RequestStatus.PENDING, RequestStatus.IN_PROGRESS)
+
+
+class ChangedRequest(NamedTuple):
+    id: int
+    request_number: str
+    user_id: int
+    old_status: RequestStatus
+
+
+class BulkActionResult(NamedTuple):
+    action: str
+    requested: int
+    changed: List[ChangedRequest]
+    new_status: Optional[RequestStatus] = None
+
+    @property
+    def count(self) -> int:
+        return len(self.changed)
+
+
+def _ids(request_ids: Iterable[int]):
+    """All IDs as one array parameter, so the statement is the same for any batch size"""
+    return any_(bindparam("ids", sorted(set(request_ids)), type_=ARRAY(Integer)))
+
+
+class BulkRequestService:
+    """Bulk status transitions, archiving and deletion"""
+
+    @staticmethod
+    def owned_ids(db: Session, request_ids: List[int], owner_id: int) -> set:
+        """The subset of request_ids that belong to owner_id"""
+        return set(db.scalars(
+            select(Request.id).where(Request.id == _ids(request_ids), Request.user_id == owner_id)
+        ))
+
+    @staticmethod
+    def _transition(db: Session, request_ids: List[int], new_status: RequestStatus,
+                    owner_id: Optional[int], from_statuses) -> List[ChangedRequest]:
+        conditions = [Request.id == _ids(request_ids), Request.status != new_status]
+        if owner_id is not None:
+            conditions.append(Request.user_id == owner_id)
+        if from_statuses:
+            conditions.append(Request.status.in_(from_statuses))
+
+        # Lock the rows and remember their old status, then update them all at once
+        target = select(Request.id, Request.status.label("old_status")).where(*conditions).with_for_update().cte("target")
+        rows = db.execute(
+            update(Request)
+            .where(Request.id == target.c.id)
+            .values(status=new_status, updated_at=func.now())
+            .returning(Request.id, Request.request_number, Request.user_id, target.c.old_status)
+            .execution_options(synchronize_session=False)
+        )
+        return [ChangedRequest(*row) for row in rows]
+
+    @staticmethod
+    def _archive(db: Session, request_ids: List[int], owner_id: Optional[int]) -> List[ChangedRequest]:
+        conditions = [Request.id == _ids(request_ids), Request.is_archived == False]
+        if owner_id is not None:
+            conditions.append(Request.user_id == owner_id)
+        rows = db.execute(
+            update(Request)
+            .where(*conditions)
+            .values(is_archived=True)
+            .returning(Request.id, Request.request_number, Request.user_id, Request.status)
+            .execution_options(synchronize_session=False)
+        )
+        return [ChangedRequest(*row) for row in rows]
+
+    @staticmethod
+    def _delete_pending(db: Session, request_ids: List[int], owner_id: int):
+        """Delete pending requests and their file rows; returns (changed, file paths)"""
+        target_ids = db.scalars(
+            select(Request.id).where(
+                Request.id == _ids(request_ids),
+                Request.user_id == owner_id,
+                Request.status == RequestStatus.PENDING
+            ).with_for_update()
+        ).all()
+        if not target_ids:
+            return [], []
+
+        file_paths = db.scalars(
+            delete(File).where(File.request_id == _ids(target_ids))
+            .returning(File.file_path).execution_options(synchronize_session=False)
+        ).all()
+        # Same as the ORM delete of a request: notifications are kept, unlinked
+        db.execute(
+            update(Notification).where(Notification.request_id == _ids(target_ids))
+            .values(request_id=None).execution_options(synchronize_session=False)
+        )
+        rows = db.execute(
+            delete(Request).where(Request.id == _ids(target_ids))
+            .returning(Request.id, Request.request_number, Request.user_id, Request.status)
+            .execution_options(synchronize_session=False)
+        )
+        return [ChangedRequest(*row) for row in rows], file_paths
+
+    @staticmethod
+    def apply(
+        db: Session,
+        action: str,
+        request_ids: List[int],
+        actor_id: int,
+        owner_id: Optional[int] = None,
+        ip_address: Optional[str] = None,
+        user_agent: Optional[str] = None
+    ) -> BulkActionResult:
+        """
+        Apply a bulk action in one transaction. With owner_id only that user's requests
+        are changed and only the owner actions (mark_completed, delete) are allowed.
+        """
+        new_status, file_paths = None, []
+        try:
+            if owner_id is None and action in STATUS_ACTIONS:
+                new_status = STATUS_ACTIONS[action]
+                changed = BulkRequestService._transition(db, request_ids, new_status, None, None)
+            elif owner_id is None and action == "archive":
+                changed = BulkRequestService._archive(db, request_ids, None)
+            elif owner_id is not None and action == "mark_completed":
+                new_status = RequestStatus.COMPLETED
+                changed = BulkRequestService._transition(db, request_ids, new_status, owner_id, OWNER_COMPLETABLE)
+            elif owner_id is not None and action == "delete":
+                changed, file_paths = BulkRequestService._delete_pending(db, request_ids, owner_id)
+            else:
+                raise ValueError(f"Unsupported bulk action: {action}")
+
+            progress = {}
+            if new_status == RequestStatus.COMPLETED and changed:
+                from app.services.achievement_service import AchievementService
+                # In user id order, so concurrent bulk actions lock the stats rows in the same order
+                for user_id, completed in sorted(Counter(change.user_id for change in changed).items()):
+                    progress[user_id] = AchievementService.update_user_progress(
+                        db, user_id, completed_requests=completed, commit=False
+                    )
+
+            db.add(Activity(
+                user_id=actor_id,
+                activity_type=ActivityType.REQUEST_UPDATED,
+                description=f"Bulk action '{action}' performed on {len(changed)} requests",
+                details={"action": action, "request_ids": [change.id for change in changed]},
+                ip_address=ip_address,
+                user_agent=user_agent
+            ))
+            db.commit()
+        except Exception:
+            db.rollback()
+            raise
+
+        for file_path in file_paths:
+            FileHandler.delete_file(file_path)
+
+        if progress:
+            from app.services.achievement_service import AchievementService
+            for user_id, competition_progress in progress.items():
+                AchievementService.publish_progress(db, user_id, competition_progress)
+
+        if new_status is not None and changed:
+            BulkRequestService._after_transition(db, changed, new_status, actor_id)
+
+        return BulkActionResult(action, len(set(request_ids)), changed, new_status)
+
+    @staticmethod
+    def _after_transition(db: Session, changed: List[ChangedRequest], new_status: RequestStatus, actor_id: int):
+        """One batch of notifications; a failure doesn't undo the action"""
+        try:
+            from app.services.notification_service import NotificationService
+            NotificationService.create_request_status_notifications(db, changed, new_status, actor_id)
+        except Exception as e:
+            db.rollback()
+            logger.error(f"Failed to send bulk status change notifications: {e}")
@@ -7,6 +7,7 @@ import json
 import pickle
 import hashlib
 import logging
+import time
 from typing import Any, Optional, Dict, Union
 from datetime import datetime, timedelta
 from functools import wraps
@@ -19,6 +20,8 @@ except ImportError:
     REDIS_AVAILABLE = False
 
 from app.config import settings
+from app.services.metrics import prometheus_metrics
+from app.services.profiling import current_profile
 
 logger = logging.getLogger(__name__)
 
@@ -99,6 +102,11 @@ class RedisCache:
             logger.error(f"Failed to connect to Redis: {e}")
             self._client = None
     
+    @property
+    def client(self):
+        """Underlying Redis client (None when not connected)"""
+        return self._client
+
     def get(self, key: str) -> Optional[Any]:
         """Get value from Redis cache"""
         if not self._client:
@@ -177,10 +185,24 @@ class CacheManager:
     def _get_cache(self):
         """Get the appropriate cache backend"""
         return self.redis_cache if self.redis_cache else self.memory_cache
+
+    @property
+    def redis_client(self):
+        """Redis client for data structures beyond key/value (None without Redis)"""
+        return self.redis_cache.client if self.redis_cache else None
     
     def get(self, key: str) -> Optional[Any]:
-        """Get value from cache"""
-        return self._get_cache().get(key)
+        """Get value from cache, counting the hit or miss for every caller"""
+        start = time.perf_counter()
+        value = self._get_cache().get(key)
+        if value is not None:
+            cache_stats.record_hit()
+        else:
+            cache_stats.record_miss()
+        profile = current_profile()
+        if profile is not None:
+            profile.record_cache(value is not None, (time.perf_counter() - start) * 1000)
+        return value
     
     def set(self, key: str, value: Any, ttl: int = 300) -> bool:
         """Set value in cache"""
@@ -315,9 +337,11 @@ class CacheStats:
     
     def record_hit(self):
         self.hits += 1
+        prometheus_metrics.record_cache_result(hit=True)
     
     def record_miss(self):
         self.misses += 1
+        prometheus_metrics.record_cache_result(hit=False)
     
     def record_set(self):
         self.sets += 1
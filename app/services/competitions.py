@@ -0,0 +1,296 @@
+"""
+Competition standings and lifecycle for CMSVS
+Participant progress is incremented by completion events (see
+AchievementService._update_competition_progress). Each running competition also has a
+Redis sorted set of standings that every event updates in O(log n), so leaderboards and
+a participant's rank do not re-sort all participants. Without Redis, standings are read
+from the (competition_id, current_progress) index.
+A background scheduler starts competitions at start_date and finalizes them at end_date,
+assigning ranks and points to every participant in one statement.
+"""
+
+import asyncio
+import logging
+from datetime import datetime
+from typing import Dict, List, Optional, Tuple
+
+from sqlalchemy import bindparam, desc, func, literal, select, text, update
+from sqlalchemy.dialects.postgresql import insert as pg_insert
+from sqlalchemy.orm import Session
+from starlette.concurrency import run_in_threadpool
+
+from app.config import settings
+from app.models.achievement import Competition, CompetitionParticipant, CompetitionStatus
+from app.models.user import User, UserRole, UserStatus
+from app.services.cache import cache
+
+logger = logging.getLogger(__name__)
+
+# Standings sets are rebuilt from the database at least this often
+_STANDINGS_TTL = 86400
+
+_FINALIZE_SQL = text("""
+    WITH finished AS (
+        UPDATE competitions
+        SET status = :completed, updated_at = now()
+        WHERE status = :active AND end_date <= :now
+        RETURNING id, first_place_points, second_place_points, third_place_points, participation_points
+    ),
+    ranked AS (
+        SELECT p.id,
+               RANK() OVER (PARTITION BY p.competition_id ORDER BY COALESCE(p.current_progress, 0) DESC) AS final_rank,
+               f.first_place_points, f.second_place_points, f.third_place_points, f.participation_points
+        FROM competition_participants p
+        JOIN finished f ON f.id = p.competition_id
+    )
+    UPDATE competition_participants p
+    SET rank = r.final_rank,
+        final_score = COALESCE(p.current_progress, 0),
+        points_earned = CASE r.final_rank
+            WHEN 1 THEN r.first_place_points
+            WHEN 2 THEN r.second_place_points
+            WHEN 3 THEN r.third_place_points
+            ELSE r.participation_points
+        END
+    FROM ranked r
+    WHERE p.id = r.id
+    RETURNING p.competition_id
+""").bindparams(
+    bindparam("completed", type_=Competition.__table__.c.status.type),
+    bindparam("active", type_=Competition.__table__.c.status.type),
+)
+
+
+class CompetitionStandings:
+    """Per-competition standings kept in Redis sorted sets"""
+
+    @staticmethod
+    def _key(competition_id: int) -> str:
+        return f"competition:{competition_id}:standings"
+
+    @staticmethod
+    def _ensure_built(db: Session, competition_id: int):
+        """Return the Redis client with the competition's standings loaded, or None"""
+        client = cache.redis_client
+        if client is None:
+            return None
+
+        key = CompetitionStandings._key(competition_id)
+        try:
+            if not client.exists(key):
+                participants = db.query(
+                    CompetitionParticipant.user_id, CompetitionParticipant.current_progress
+                ).filter(CompetitionParticipant.competition_id == competition_id).all()
+                if participants:
+                    pipe = client.pipeline(transaction=True)
+                    pipe.delete(key)
+                    pipe.zadd(key, {str(user_id): progress or 0 for user_id, progress in participants})
+                    pipe.expire(key, _STANDINGS_TTL)
+                    pipe.execute()
+            return client
+        except Exception as e:
+            logger.error(f"Error loading standings for competition {competition_id}: {e}")
+            return None
+
+    @staticmethod
+    def record_progress(user_id: int, progress_by_competition: Dict[int, int]):
+        """Apply committed participant progress to the standings sets"""
+        client = cache.redis_client
+        if client is None or not progress_by_competition:
+            return
+        try:
+            pipe = client.pipeline(transaction=False)
+            for competition_id, progress in progress_by_competition.items():
+                # XX: only update sets that are already built, a missing set is rebuilt on read
+                pipe.zadd(CompetitionStandings._key(competition_id), {str(user_id): progress}, xx=True)
+            pipe.execute()
+        except Exception as e:
+            logger.error(f"Error updating competition standings for user {user_id}: {e}")
+
+    @staticmethod
+    def add_participant(competition_id: int, user_id: int):
+        """Add a new participant to built standings"""
+        client = cache.redis_client
+        if client is None:
+            return
+        try:
+            key = CompetitionStandings._key(competition_id)
+            if client.exists(key):
+                client.zadd(key, {str(user_id): 0}, nx=True)
+        except Exception as e:
+            logger.error(f"Error adding participant to competition {competition_id}: {e}")
+
+    @staticmethod
+    def discard(competition_ids):
+        client = cache.redis_client
+        if client is None or not competition_ids:
+            return
+        try:
+            client.delete(*[CompetitionStandings._key(competition_id) for competition_id in competition_ids])
+        except Exception as e:
+            logger.error(f"Error discarding competition standings: {e}")
+
+    @staticmethod
+    def top(db: Session, competition_id: int, limit: int) -> List[Tuple[int, int, int]]:
+        """[(user_id, progress, rank)] for the leading participants; tied progress shares a rank"""
+        client = CompetitionStandings._ensure_built(db, competition_id)
+        members = None
+        if client is not None:
+            try:
+                members = [
+                    (int(member), int(score))
+                    for member, score in client.zrevrange(CompetitionStandings._key(competition_id),
+                                                          0, limit - 1, withscores=True)
+                ]
+            except Exception as e:
+                logger.error(f"Error reading standings for competition {competition_id}: {e}")
+
+        if members is None:
+            members = [
+                (user_id, progress or 0)
+                for user_id, progress in db.query(
+                    CompetitionParticipant.user_id, CompetitionParticipant.current_progress
+                ).filter(
+                    CompetitionParticipant.competition_id == competition_id
+                ).order_by(desc(CompetitionParticipant.current_progress)).limit(limit).all()
+            ]
+
+        standings = []
+        previous_progress, rank = None, 0
+        for position, (user_id, progress) in enumerate(members, 1):
+            if progress != previous_progress:
+                rank, previous_progress = position, progress
+            standings.append((user_id, progress, rank))
+        return standings
+
+    @staticmethod
+    def position(db: Session, competition_id: int, user_id: int) -> Tuple[Optional[int], int]:
+        """(rank, total participants) for one user; rank is None when not participating"""
+        client = CompetitionStandings._ensure_built(db, competition_id)
+        if client is not None:
+            try:
+                key = CompetitionStandings._key(competition_id)
+                pipe = client.pipeline(transaction=False)
+                pipe.zscore(key, str(user_id))
+                pipe.zcard(key)
+                score, total = pipe.execute()
+                if score is None:
+                    return None, total
+                return client.zcount(key, f"({score}", "+inf") + 1, total
+            except Exception as e:
+                logger.error(f"Error reading standings for competition {competition_id}: {e}")
+
+        total = db.query(func.count(CompetitionParticipant.id)).filter(
+            CompetitionParticipant.competition_id == competition_id
+        ).scalar()
+        progress = db.query(CompetitionParticipant.current_progress).filter(
+            CompetitionParticipant.competition_id == competition_id,
+            CompetitionParticipant.user_id == user_id
+        ).scalar()
+        if progress is None:
+            return None, total
+        higher = db.query(func.count(CompetitionParticipant.id)).filter(
+            CompetitionParticipant.competition_id == competition_id,
+            CompetitionParticipant.current_progress > progress
+        ).scalar()
+        return higher + 1, total
+
+
+class CompetitionLifecycle:
+    """Enrolls, starts and finalizes competitions"""
+
+    @staticmethod
+    def enroll_all_users(db: Session, competition_id: int) -> int:
+        """Enroll every active, approved clerk in an org-wide competition with one statement
+
+        With max_participants set, only the free places are filled, in user id order.
+        """
+        # Locked like join_competition, so the free places are counted once
+        competition = db.query(Competition).filter(Competition.id == competition_id).with_for_update().first()
+        if not competition:
+            return 0
+
+        clerks = select(literal(competition_id), User.id).where(
+            User.role == UserRole.USER,
+            User.is_active == True,
+            User.approval_status == UserStatus.APPROVED,
+            User.id.notin_(
+                select(CompetitionParticipant.user_id).where(CompetitionParticipant.competition_id == competition_id)
+            )
+        ).order_by(User.id)
+        if competition.max_participants:
+            enrolled = db.query(func.count(CompetitionParticipant.id)).filter(
+                CompetitionParticipant.competition_id == competition_id
+            ).scalar()
+            clerks = clerks.limit(max(0, competition.max_participants - enrolled))
+
+        result = db.execute(
+            pg_insert(CompetitionParticipant)
+            .from_select(["competition_id", "user_id"], clerks)
+            .on_conflict_do_nothing(index_elements=["competition_id", "user_id"])
+        )
+        db.commit()
+
+        # Rebuilt with the new participants on the next read
+        CompetitionStandings.discard([competition_id])
+        return result.rowcount
+
+    @staticmethod
+    def start_due_competitions(db: Session, now: Optional[datetime] = None) -> int:
+        """Activate upcoming competitions whose start date has passed"""
+        now = now or datetime.utcnow()
+        result = db.execute(
+            update(Competition)
+            .where(
+                Competition.status == CompetitionStatus.UPCOMING,
+                Competition.start_date <= now,
+                Competition.end_date > now
+            )
+            .values(status=CompetitionStatus.ACTIVE)
+            .execution_options(synchronize_session=False)
+        )
+        db.commit()
+        return result.rowcount
+
+    @staticmethod
+    def finalize_ended_competitions(db: Session, now: Optional[datetime] = None) -> List[int]:
+        """Complete ended competitions and assign every participant's rank and points in one statement"""
+        now = now or datetime.utcnow()
+        competition_ids = sorted({
+            row[0] for row in db.execute(_FINALIZE_SQL, {
+                "completed": CompetitionStatus.COMPLETED,
+                "active": CompetitionStatus.ACTIVE,
+                "now": now
+            })
+        })
+        db.commit()
+
+        # Final standings are read from the participant rows from now on
+        CompetitionStandings.discard(competition_ids)
+        return competition_ids
+
+    @staticmethod
+    def run_once():
+        from app.database import SessionLocal
+        db = SessionLocal()
+        try:
+            started = CompetitionLifecycle.start_due_competitions(db)
+            finalized = CompetitionLifecycle.finalize_ended_competitions(db)
+            if started or finalized:
+                logger.info(f"Competitions started: {started}, finalized: {finalized}")
+        finally:
+            db.close()
+
+
+async def run_competition_scheduler():
+    """Background task: run the competition lifecycle every competition_scheduler_interval seconds"""
+    # Both statements only touch competitions still in the earlier state,
+    # so every worker can run this loop without double-processing
+    while True:
+        try:
+            await run_in_threadpool(CompetitionLifecycle.run_once)
+        except asyncio.CancelledError:
+            raise
+        except Exception as e:
+            logger.error(f"Competition scheduler error: {e}")
+        await asyncio.sleep(settings.competition_scheduler_interval)
@@ -0,0 +1,286 @@
+"""
+KPI snapshots for the admin stats dashboard
+All dashboard counters come from two aggregate scans, one over requests and one over
+users, using COUNT(*) FILTER (WHERE ...) for every counter. Today's counters are stored
+as one kpi_snapshots row per Bahrain day, so the 30-day comparisons read the snapshot
+from 30 days ago instead of rescanning (until that snapshot exists, they fall back to
+counters from the same scans).
+
+The assembled figures are cached and dropped whenever a committed transaction inserts,
+updates or deletes requests or adds or removes users (see the session listeners below).
+"""
+
+import logging
+from datetime import date, datetime, time, timedelta
+from itertools import chain
+from typing import Any, Dict, List, Optional
+
+from sqlalchemy import and_, event, func, inspect, select
+from sqlalchemy.dialects.postgresql import insert as pg_insert
+from sqlalchemy.orm import Session
+
+from app.config import settings
+from app.models.kpi_snapshot import KpiSnapshot
+from app.models.request import Request, RequestStatus
+from app.models.user import User, UserRole
+from app.services.cache import cache
+from app.utils.timezone_utils import BAHRAIN_TZ, now_bahrain
+
+logger = logging.getLogger(__name__)
+
+CACHE_KEY = "kpi:admin_stats"
+COMPARISON_DAYS = 30
+GROWTH_MONTHS = 7
+
+SNAPSHOT_FIELDS = (
+    "total_users", "active_users_30d", "total_requests", "completed_requests",
+    "pending_requests", "in_progress_requests", "rejected_requests",
+)
+
+
+def _month_starts(today: date, count: int) -> List[date]:
+    """First days of the last count calendar months, oldest first, ending with today's month"""
+    starts = [today.replace(day=1)]
+    while len(starts) < count:
+        starts.insert(0, (starts[0] - timedelta(days=1)).replace(day=1))
+    return starts
+
+
+def _next_month(day: date) -> date:
+    return (day.replace(day=1) + timedelta(days=32)).replace(day=1)
+
+
+def _midnight(day: date) -> datetime:
+    return datetime.combine(day, time.min, tzinfo=BAHRAIN_TZ)
+
+
+def _percent(part: int, whole: int, default: float = 0) -> float:
+    return part / whole * 100 if whole > 0 else default
+
+
+def _efficiency(open_requests: int, total: int) -> float:
+    return max(0, 100 - _percent(open_requests, total)) if total > 0 else 100
+
+
+def _card(current: float, previous: float, relative: bool = False) -> Dict[str, Any]:
+    if relative:
+        change = round((current - previous) / previous * 100, 2) if previous > 0 else 0
+    else:
+        change = round(current - previous, 2)
+    return {
+        "current": round(current, 2),
+        "previous": round(previous, 2),
+        "change_percent": change,
+        "trend": "up" if current > previous else "down",
+    }
+
+
+class KpiSnapshotService:
+    """Computes, stores and caches the admin dashboard counters"""
+
+    @staticmethod
+    def _scan(db: Session, now: datetime) -> Dict[str, Any]:
+        """Every counter from one scan of requests and one of users"""
+        today = now.date()
+        cutoff = now - timedelta(days=COMPARISON_DAYS)
+        previous_cutoff = cutoff - timedelta(days=COMPARISON_DAYS)
+        months = _month_starts(today, GROWTH_MONTHS)
+
+        def count(*conditions):
+            return func.count().filter(and_(*conditions)) if conditions else func.count()
+
+        status = Request.status
+        old = Request.created_at <= cutoff
+        request_counts = db.execute(select(
+            count(),
+            count(status == RequestStatus.COMPLETED),
+            count(status == RequestStatus.PENDING),
+            count(status == RequestStatus.IN_PROGRESS),
+            count(status == RequestStatus.REJECTED),
+            count(old),
+            count(old, status == RequestStatus.COMPLETED),
+            count(old, status.in_([RequestStatus.PENDING, RequestStatus.IN_PROGRESS])),
+            *[count(Request.created_at < _midnight(_next_month(month))) for month in months]
+        )).one()
+
+        user_counts = db.execute(
+            select(
+                count(),
+                count(User.updated_at >= cutoff),
+                count(User.created_at <= cutoff),
+                count(User.updated_at >= previous_cutoff, User.updated_at < cutoff),
+                count(User.created_at <= previous_cutoff),
+            ).where(User.role == UserRole.USER)
+        ).one()
+
+        return {
+            "snapshot": dict(zip(SNAPSHOT_FIELDS, (
+                user_counts[0], user_counts[1], *request_counts[0:5]
+            ))),
+            # Approximations for when no snapshot from COMPARISON_DAYS ago exists
+            "fallback_previous": {
+                "total_users": user_counts[2],
+                "active_users_30d": user_counts[3],
+                "engagement_base": user_counts[4],
+                "total_requests": request_counts[5],
+                "completed_requests": request_counts[6],
+                "open_requests": request_counts[7],
+            },
+            "monthly_growth": [
+                {"month": month.strftime("%b"), "count": total}
+                for month, total in zip(months, request_counts[8:])
+            ],
+        }
+
+    @staticmethod
+    def _store(snapshot_date: date, snapshot: Dict[str, int]):
+        """Upsert today's snapshot on the primary (the dashboard may read from a replica)"""
+        from app.database import SessionLocal
+        db = SessionLocal()
+        try:
+            db.execute(
+                pg_insert(KpiSnapshot)
+                .values(snapshot_date=snapshot_date, **snapshot)
+                .on_conflict_do_update(
+                    index_elements=[KpiSnapshot.snapshot_date],
+                    set_=dict(snapshot, updated_at=func.now())
+                )
+            )
+            db.commit()
+        except Exception as e:
+            db.rollback()
+            logger.error(f"Error storing KPI snapshot for {snapshot_date}: {e}")
+        finally:
+            db.close()
+
+    @staticmethod
+    def _previous(db: Session, today: date, fallback: Dict[str, int]) -> Dict[str, int]:
+        stored = db.get(KpiSnapshot, today - timedelta(days=COMPARISON_DAYS))
+        if stored is not None:
+            return {
+                "total_users": stored.total_users,
+                "active_users_30d": stored.active_users_30d,
+                "engagement_base": stored.total_users,
+                "total_requests": stored.total_requests,
+                "completed_requests": stored.completed_requests,
+                "open_requests": stored.pending_requests + stored.in_progress_requests,
+            }
+        return fallback
+
+    @staticmethod
+    def _top_request_types(db: Session, completion_rate: float) -> List[Dict[str, Any]]:
+        rows = db.execute(
+            select(Request.request_name, func.count().label("count"))
+            .group_by(Request.request_name)
+            .order_by(func.count().desc())
+            .limit(3)
+        ).all()
+        return [
+            {
+                "name": row.request_name or "غير محدد",
+                "count": row.count,
+                "completion_rate": round(completion_rate, 1),
+                "category": "طلب خدمة",
+            }
+            for row in rows
+        ]
+
+    @staticmethod
+    def compute(db: Session, now: Optional[datetime] = None) -> Dict[str, Any]:
+        """Build the dashboard figures and store today's snapshot"""
+        now = now or now_bahrain()
+        today = now.date()
+        scan = KpiSnapshotService._scan(db, now)
+        current = scan["snapshot"]
+        KpiSnapshotService._store(today, current)
+        previous = KpiSnapshotService._previous(db, today, scan["fallback_previous"])
+
+        completion_rate = _percent(current["completed_requests"], current["total_requests"])
+        open_requests = current["pending_requests"] + current["in_progress_requests"]
+
+        return {
+            "kpi_cards": {
+                "total_users": _card(current["total_users"], previous["total_users"], relative=True),
+                "completion_rate": _card(
+                    completion_rate,
+                    _percent(previous["completed_requests"], previous["total_requests"])
+                ),
+                "engagement_rate": _card(
+                    _percent(current["active_users_30d"], current["total_users"]),
+                    _percent(previous["active_users_30d"], previous["engagement_base"])
+                ),
+                "efficiency_score": _card(
+                    _efficiency(open_requests, current["total_requests"]),
+                    _efficiency(previous["open_requests"], previous["total_requests"])
+                ),
+            },
+            "monthly_growth": scan["monthly_growth"],
+            "status_distribution": {
+                "completed": current["completed_requests"],
+                "pending": current["pending_requests"],
+                "in_progress": current["in_progress_requests"],
+                "rejected": current["rejected_requests"],
+            },
+            "top_request_types": KpiSnapshotService._top_request_types(db, completion_rate),
+        }
+
+    @staticmethod
+    def get(db: Session) -> Dict[str, Any]:
+        """Cached dashboard figures (recomputed after invalidation or kpi_cache_ttl seconds)"""
+        figures = cache.get(CACHE_KEY)
+        if figures is None:
+            figures = KpiSnapshotService.compute(db)
+            cache.set(CACHE_KEY, figures, settings.kpi_cache_ttl)
+        return figures
+
+    @staticmethod
+    def invalidate():
+        cache.delete(CACHE_KEY)
+
+    @staticmethod
+    def history(db: Session, days: int = 90) -> List[KpiSnapshot]:
+        """Stored snapshots of the last days, oldest first"""
+        since = now_bahrain().date() - timedelta(days=days)
+        return db.query(KpiSnapshot).filter(KpiSnapshot.snapshot_date >= since).order_by(KpiSnapshot.snapshot_date).all()
+
+
+# Event-driven invalidation: flag sessions that change requests or the user population,
+# and drop the cached figures once their transaction commits
+
+def _changes_kpis(session) -> bool:
+    for obj in chain(session.new, session.deleted):
+        if isinstance(obj, (Request, User)):
+            return True
+    for obj in session.dirty:
+        if isinstance(obj, Request):
+            return True
+        if isinstance(obj, User) and inspect(obj).attrs.role.history.has_changes():
+            return True
+    return False
+
+
+@event.listens_for(Session, "after_flush")
+def _flag_kpi_changes(session, flush_context):
+    if not session.info.get("kpi_stale") and _changes_kpis(session):
+        session.info["kpi_stale"] = True
+
+
+@event.listens_for(Session, "do_orm_execute")
+def _flag_kpi_statements(orm_execute_state):
+    # Bulk UPDATE/DELETE/INSERT statements bypass the flush
+    if orm_execute_state.is_select:
+        return
+    mapper = orm_execute_state.bind_mapper
+    if mapper is not None and mapper.class_ in (Request, User):
+        orm_execute_state.session.info["kpi_stale"] = True
+
+
+@event.listens_for(Session, "after_commit")
+def _invalidate_after_commit(session):
+    if session.info.pop("kpi_stale", False):
+        KpiSnapshotService.invalidate()
+
+
+@event.listens_for(Session, "after_rollback")
+def _discard_flag_after_rollback(session):
+    session.info.pop("kpi_stale", None)
@@ -0,0 +1,449 @@
+"""
+Leaderboard and ranking engine for CMSVS
+Ranks active regular users on four boards: global (total points) and the current day,
+week and month (completed requests). Ranks follow RANK() semantics, so ties share a rank.
+
+With Redis, every board is a sorted set that each progress change updates with the
+user's scores read back from the database, and pages and positions are O(log n) reads;
+a board whose set is missing (flushed or evicted) is read from the rank columns instead.
+Without Redis, a single window-function UPDATE stores all four ranks in user_stats and
+reads use the indexed rank columns. Either way, a background task runs the
+window-function refresh every leaderboard_refresh_interval seconds and at period
+rollover, in a session of its own; it also rebuilds the sorted sets. Reads never write.
+"""
+
+import asyncio
+import logging
+import time
+from datetime import date, datetime
+from typing import Any, Dict, List, Optional
+
+from sqlalchemy import and_, case, func, or_, select, update
+from sqlalchemy.orm import Session
+from starlette.concurrency import run_in_threadpool
+
+from app.config import settings
+from app.models.achievement import Achievement, AchievementType, UserAchievement, UserStats
+from app.models.user import User, UserRole
+from app.services.cache import cache
+from app.services.periods import current_period_bounds
+
+logger = logging.getLogger(__name__)
+
+PERIOD_BOARDS = {
+    "daily": AchievementType.DAILY,
+    "weekly": AchievementType.WEEKLY,
+    "monthly": AchievementType.MONTHLY,
+}
+BOARDS = ("global",) + tuple(PERIOD_BOARDS)
+
+# Targets shown next to period scores (the main daily/weekly/monthly achievements)
+PERIOD_TARGETS = {"daily": 10, "weekly": 50, "monthly": 200}
+
+RANK_COLUMNS = {
+    "global": UserStats.global_rank,
+    "daily": UserStats.daily_rank,
+    "weekly": UserStats.weekly_rank,
+    "monthly": UserStats.monthly_rank,
+}
+
+# Advisory lock id that keeps concurrent refreshes (which update every stats row) apart
+_REFRESH_LOCK_ID = 734201
+
+# Period sorted sets are kept a while after their period ends, then expire
+_PERIOD_KEY_TTL = {"daily": 2 * 86400, "weekly": 14 * 86400, "monthly": 62 * 86400}
+
+# The refresh task wakes at least this often, so a new day is ranked promptly
+_SCHEDULER_TICK = 60
+
+
+class LeaderboardService:
+    """Computes, stores and serves leaderboard rankings"""
+
+    # Per-worker refresh state
+    _refreshed_at: float = 0.0
+    _refreshed_day: Optional[date] = None
+    _ranked_users: int = 0
+
+    @staticmethod
+    def _periods(now: datetime) -> Dict[str, tuple]:
+        from app.services.achievement_service import AchievementService
+        periods = AchievementService._current_periods(now)
+        return {board: periods[achievement_type] for board, achievement_type in PERIOD_BOARDS.items()}
+
+    @staticmethod
+    def _redis_key(board: str, now: datetime) -> str:
+        if board == "global":
+            return "leaderboard:global"
+        period_start = LeaderboardService._periods(now)[board][0]
+        return f"leaderboard:{board}:{period_start:%Y%m%d}"
+
+    @staticmethod
+    def _eligible_users():
+        """Users that appear on leaderboards"""
+        return select(User.id).where(User.role == UserRole.USER, User.is_active == True)
+
+    @staticmethod
+    def _score_query(now: datetime):
+        """One row per eligible user: global points and current day/week/month completions"""
+        periods = LeaderboardService._periods(now)
+
+        # All achievements of one period type share the same progress, so MAX is the completion count
+        period_progress = select(
+            UserAchievement.user_id,
+            *[
+                func.max(case(
+                    (and_(Achievement.achievement_type == achievement_type,
+                          UserAchievement.period_start == periods[board][0]),
+                     UserAchievement.current_progress),
+                    else_=0
+                )).label(board)
+                for board, achievement_type in PERIOD_BOARDS.items()
+            ]
+        ).join(Achievement).where(
+            UserAchievement.period_start.in_([start for start, _ in periods.values()])
+        ).group_by(UserAchievement.user_id).subquery()
+
+        return select(
+            UserStats.user_id,
+            func.coalesce(UserStats.total_points, 0).label("global"),
+            *[func.coalesce(period_progress.c[board], 0).label(board) for board in PERIOD_BOARDS]
+        ).outerjoin(
+            period_progress, period_progress.c.user_id == UserStats.user_id
+        ).where(UserStats.user_id.in_(LeaderboardService._eligible_users()))
+
+    @staticmethod
+    def refresh_rankings(db: Session, now: Optional[datetime] = None) -> int:
+        """Recompute every rank column with one RANK() OVER UPDATE and rebuild the sorted sets"""
+        now = now or datetime.utcnow()
+
+        # Another worker is already refreshing; its result is as good as ours
+        if not db.execute(select(func.pg_try_advisory_xact_lock(_REFRESH_LOCK_ID))).scalar():
+            LeaderboardService._ranked_users = db.query(func.count(UserStats.user_id)).filter(
+                UserStats.global_rank.isnot(None)
+            ).scalar() or 0
+            db.rollback()
+            LeaderboardService._refreshed_at = time.monotonic()
+            LeaderboardService._refreshed_day = current_period_bounds(now).day
+            return LeaderboardService._ranked_users
+
+        scores = LeaderboardService._score_query(now).subquery()
+
+        ranks = {"global_rank": func.rank().over(order_by=scores.c["global"].desc())}
+        for board in PERIOD_BOARDS:
+            # Users without completions in the period are unranked on that board
+            ranks[f"{board}_rank"] = case(
+                (scores.c[board] > 0, func.rank().over(order_by=scores.c[board].desc())),
+                else_=None
+            )
+        ranked = select(scores.c.user_id, *[rank.label(name) for name, rank in ranks.items()]).subquery()
+
+        result = db.execute(
+            update(UserStats)
+            .where(UserStats.user_id == ranked.c.user_id)
+            .values({name: ranked.c[name] for name in ranks})
+            .execution_options(synchronize_session=False)
+        )
+        # Users deactivated or moved to another role since the last refresh leave every board
+        db.execute(
+            update(UserStats)
+            .where(
+                UserStats.user_id.notin_(LeaderboardService._eligible_users()),
+                or_(*[column.isnot(None) for column in RANK_COLUMNS.values()])
+            )
+            .values({name: None for name in ranks})
+            .execution_options(synchronize_session=False)
+        )
+        db.commit()
+
+        LeaderboardService._ranked_users = result.rowcount
+        LeaderboardService._refreshed_at = time.monotonic()
+        LeaderboardService._refreshed_day = current_period_bounds(now).day
+
+        LeaderboardService._rebuild_sorted_sets(db, now)
+        return result.rowcount
+
+    @staticmethod
+    def _rebuild_sorted_sets(db: Session, now: datetime):
+        client = cache.redis_client
+        if client is None:
+            return
+
+        rows = db.execute(LeaderboardService._score_query(now)).all()
+        try:
+            pipe = client.pipeline(transaction=True)
+            for board in BOARDS:
+                key = LeaderboardService._redis_key(board, now)
+                members = {str(row.user_id): row._mapping[board] for row in rows
+                           if board == "global" or row._mapping[board] > 0}
+                pipe.delete(key)
+                if members:
+                    pipe.zadd(key, members)
+                if board in _PERIOD_KEY_TTL:
+                    pipe.expire(key, _PERIOD_KEY_TTL[board])
+            pipe.execute()
+        except Exception as e:
+            logger.error(f"Error rebuilding leaderboard sorted sets: {e}")
+
+    @staticmethod
+    def run_once(now: Optional[datetime] = None):
+        """Refresh rankings if this worker's copy is older than the interval or from another day"""
+        now = now or datetime.utcnow()
+        stale = time.monotonic() - LeaderboardService._refreshed_at > settings.leaderboard_refresh_interval
+        if (not stale and LeaderboardService._refreshed_day == current_period_bounds(now).day
+                and not LeaderboardService._sorted_sets_missing(now)):
+            return
+
+        from app.database import SessionLocal
+        db = SessionLocal()
+        try:
+            LeaderboardService.refresh_rankings(db, now)
+        finally:
+            db.close()
+
+    @staticmethod
+    def _sorted_sets_missing(now: datetime) -> bool:
+        """Whether Redis is in use but lost the global set (flush or eviction) since the last rebuild"""
+        client = cache.redis_client
+        if client is None or LeaderboardService._ranked_users == 0:
+            return False
+        try:
+            return not client.exists(LeaderboardService._redis_key("global", now))
+        except Exception:
+            return False
+
+    @staticmethod
+    def record_progress(db: Session, user_id: int, now: Optional[datetime] = None):
+        """Write a user's committed scores to the sorted sets"""
+        client = cache.redis_client
+        if client is None:
+            return
+
+        # The scores are read back rather than incremented, so the sets match what a refresh computes
+        now = now or datetime.utcnow()
+        row = db.execute(LeaderboardService._score_query(now).where(UserStats.user_id == user_id)).first()
+        if row is None:
+            return
+
+        try:
+            pipe = client.pipeline(transaction=False)
+            pipe.zadd(LeaderboardService._redis_key("global", now), {str(user_id): row._mapping["global"]})
+            for board in PERIOD_BOARDS:
+                key = LeaderboardService._redis_key(board, now)
+                if row._mapping[board] > 0:
+                    pipe.zadd(key, {str(user_id): row._mapping[board]})
+                else:
+                    pipe.zrem(key, str(user_id))
+                pipe.expire(key, _PERIOD_KEY_TTL[board])
+            pipe.execute()
+        except Exception as e:
+            # The next refresh rebuilds the sets from the database
+            logger.error(f"Error updating leaderboard for user {user_id}: {e}")
+
+    @staticmethod
+    def _top_from_redis(board: str, limit: int, now: datetime) -> Optional[List[tuple]]:
+        """[(user_id, score, rank)] from the sorted set, or None to read the rank columns instead"""
+        client = cache.redis_client
+        if client is None:
+            return None
+        key = LeaderboardService._redis_key(board, now)
+        try:
+            pipe = client.pipeline(transaction=False)
+            pipe.exists(key)
+            pipe.zrevrange(key, 0, limit - 1, withscores=True)
+            exists, members = pipe.execute()
+        except Exception as e:
+            logger.error(f"Error reading leaderboard {board}: {e}")
+            return None
+        # Flushed, evicted or not built yet: the rank columns hold the last refresh
+        if not exists:
+            return None
+
+        entries = []
+        previous_score, rank = None, 0
+        for position, (member, score) in enumerate(members, 1):
+            # Tied scores share the rank of the first member with that score
+            if score != previous_score:
+                rank, previous_score = position, score
+            entries.append((int(member), int(score), rank))
+        return entries
+
+    @staticmethod
+    def _top_from_database(db: Session, board: str, limit: int, now: datetime) -> List[tuple]:
+        """[(user_id, score, rank)] from the precomputed rank columns"""
+        rank_column = RANK_COLUMNS[board]
+        rows = db.query(UserStats.user_id, UserStats.total_points, rank_column).filter(
+            rank_column.isnot(None)
+        ).order_by(rank_column, UserStats.user_id).limit(limit).all()
+
+        if board == "global":
+            return [(user_id, points or 0, rank) for user_id, points, rank in rows]
+
+        scores = LeaderboardService._period_scores(db, [row[0] for row in rows], board, now)
+        return [(user_id, scores.get(user_id, 0), rank) for user_id, _, rank in rows]
+
+    @staticmethod
+    def _period_scores(db: Session, user_ids: List[int], board: str, now: datetime) -> Dict[int, int]:
+        if not user_ids:
+            return {}
+        period_start = LeaderboardService._periods(now)[board][0]
+        rows = db.query(UserAchievement.user_id, func.max(UserAchievement.current_progress)).join(Achievement).filter(
+            UserAchievement.user_id.in_(user_ids),
+            Achievement.achievement_type == PERIOD_BOARDS[board],
+            UserAchievement.period_start == period_start
+        ).group_by(UserAchievement.user_id).all()
+        return {user_id: progress or 0 for user_id, progress in rows}
+
+    @staticmethod
+    def get_top(db: Session, board: str, limit: int) -> List[tuple]:
+        """[(user_id, score, rank)] for the first `limit` users of a board"""
+        now = datetime.utcnow()
+        entries = LeaderboardService._top_from_redis(board, limit, now)
+        if entries is None:
+            entries = LeaderboardService._top_from_database(db, board, limit, now)
+        return entries
+
+    @staticmethod
+    def get_leaderboard(db: Session, board: str, limit: int = 50) -> List[Dict[str, Any]]:
+        """Leaderboard page entries for a board"""
+        if board not in BOARDS:
+            return []
+
+        entries = LeaderboardService.get_top(db, board, limit)
+        user_ids = [user_id for user_id, _, _ in entries]
+        rows = db.query(User, UserStats).outerjoin(UserStats, UserStats.user_id == User.id).filter(
+            User.id.in_(user_ids)
+        ).all() if user_ids else []
+        by_id = {user.id: (user, stats) for user, stats in rows}
+
+        leaderboard = []
+        for user_id, score, rank in entries:
+            if user_id not in by_id:
+                continue
+            user, stats = by_id[user_id]
+            entry = {
+                "rank": rank,
+                "user_id": user_id,
+                "full_name": user.full_name,
+                "username": user.username,
+            }
+            if board == "global":
+                entry.update({
+                    "total_points": score,
+                    "total_achievements": stats.total_achievements if stats else 0,
+                    "current_streak": stats.current_daily_streak if stats else 0,
+                    "longest_streak": stats.longest_daily_streak if stats else 0
+                })
+            else:
+                target = PERIOD_TARGETS[board]
+                entry.update({
+                    f"{board}_progress": score,
+                    "target": target,
+                    "percentage": min(100, (score / target) * 100)
+                })
+            leaderboard.append(entry)
+        return leaderboard
+
+    @staticmethod
+    def get_user_position(db: Session, user_id: int) -> Dict[str, Any]:
+        """A user's rank on every board"""
+        now = datetime.utcnow()
+        ranks = LeaderboardService._position_from_redis(user_id, now)
+        if ranks is None:
+            stats = db.query(UserStats).filter(UserStats.user_id == user_id).first()
+            ranks = {board: getattr(stats, f"{board}_rank") if stats else None for board in BOARDS}
+            total_users = LeaderboardService._ranked_users
+        else:
+            total_users = ranks.pop("total_users")
+
+        position = {f"{board}_rank": ranks[board] or "غير مصنف" for board in BOARDS}
+        position["total_users"] = total_users
+        return position
+
+    @staticmethod
+    def _position_from_redis(user_id: int, now: datetime) -> Optional[Dict[str, Any]]:
+        client = cache.redis_client
+        if client is None:
+            return None
+        try:
+            keys = {board: LeaderboardService._redis_key(board, now) for board in BOARDS}
+            pipe = client.pipeline(transaction=False)
+            pipe.exists(*keys.values())
+            for key in keys.values():
+                pipe.zscore(key, str(user_id))
+            pipe.zcard(keys["global"])
+            existing, *scores, total_users = pipe.execute()
+            if existing < len(keys):
+                return None
+
+            # Rank = 1 + members with a strictly higher score
+            pipe = client.pipeline(transaction=False)
+            for key, score in zip(keys.values(), scores):
+                if score is not None:
+                    pipe.zcount(key, f"({score}", "+inf")
+            higher = iter(pipe.execute())
+        except Exception as e:
+            logger.error(f"Error reading leaderboard position for user {user_id}: {e}")
+            return None
+
+        ranks = {board: (next(higher) + 1 if score is not None else None) for board, score in zip(keys, scores)}
+        ranks["total_users"] = total_users
+        return ranks
+
+    @staticmethod
+    def get_period_leaders(db: Session, limit: int = 3) -> Dict[str, Any]:
+        """Top users of the day, week and month with their progress, for the admin dashboard
+
+        Cached for template_fragment_ttl seconds, like the dashboard blocks that show it;
+        users are plain dicts so the result survives the JSON round trip through Redis.
+        """
+        key = f"leaderboard:leaders:{limit}"
+        result = cache.get(key)
+        if result is not None:
+            return result
+
+        leaders = {}
+        user_ids = set()
+        for board in PERIOD_BOARDS:
+            leaders[board] = LeaderboardService.get_top(db, board, limit)
+            user_ids.update(user_id for user_id, _, _ in leaders[board])
+
+        users = {user.id: user for user in db.query(User).filter(User.id.in_(user_ids)).all()} if user_ids else {}
+
+        result = {}
+        for board, entries in leaders.items():
+            target = PERIOD_TARGETS[board]
+            result[f"{board}_leaders"] = [
+                {
+                    "user": {
+                        "id": user_id,
+                        "username": users[user_id].username,
+                        "full_name": users[user_id].full_name
+                    },
+                    "rank": rank,
+                    "progress": {
+                        "target": target,
+                        "current": score,
+                        "percentage": round(min(100, (score / target) * 100), 1),
+                        "status": "مكتمل ✅" if score >= target else "في التقدم 🔥"
+                    },
+                    "sort_key": score
+                }
+                for user_id, score, rank in entries if user_id in users
+            ]
+        result["total_users"] = LeaderboardService._ranked_users
+        cache.set(key, result, settings.template_fragment_ttl)
+        return result
+
+
+async def run_leaderboard_scheduler():
+    """Background task: refresh rankings every leaderboard_refresh_interval seconds and at rollover"""
+    # Concurrent refreshes in other workers are skipped through the advisory lock
+    while True:
+        try:
+            await run_in_threadpool(LeaderboardService.run_once)
+        except asyncio.CancelledError:
+            raise
+        except Exception as e:
+            logger.error(f"Leaderboard scheduler error: {e}")
+        await asyncio.sleep(min(settings.leaderboard_refresh_interval, _SCHEDULER_TICK))
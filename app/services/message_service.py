@@ -2,8 +2,9 @@
 Message service for handling user-to-user messaging functionality
 """
 from typing import List, Optional, Dict, Any
-from sqlalchemy.orm import Session
-from sqlalchemy import and_, or_, desc
+from sqlalchemy.orm import Session, aliased, joinedload
+from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy import and_, or_, desc, func, select
 from datetime import datetime
 
 from app.models.message import Message, Conversation
@@ -58,27 +59,27 @@ class MessageService:
         include_read: bool = True
     ) -> Dict[str, Any]:
         """Get user's inbox messages"""
-        query = db.query(Message).filter(
+        filters = [
             Message.recipient_id == user_id,
             Message.is_deleted_by_recipient == False
-        )
+        ]
         
         if not include_read:
-            query = query.filter(Message.is_read == False)
+            filters.append(Message.is_read == False)
         
         # Get total count
-        total_count = query.count()
+        total_count = db.query(func.count(Message.id)).filter(*filters).scalar()
         
-        # Apply pagination
-        messages = query.order_by(desc(Message.created_at)).offset(
-            (page - 1) * per_page
-        ).limit(per_page).all()
+        # Apply pagination (sender/recipient names come from the same SELECT)
+        rows = MessageService._message_rows_query(db).filter(*filters).order_by(
+            desc(Message.created_at)
+        ).offset((page - 1) * per_page).limit(per_page).all()
         
         # Calculate pagination info
         total_pages = (total_count + per_page - 1) // per_page
         
         return {
-            "messages": [msg.to_dict(user_id) for msg in messages],
+            "messages": [MessageService._row_to_dict(row, user_id) for row in rows],
             "total_count": total_count,
             "current_page": page,
             "total_pages": total_pages,
@@ -94,24 +95,24 @@ class MessageService:
         per_page: int = 20
     ) -> Dict[str, Any]:
         """Get user's sent messages"""
-        query = db.query(Message).filter(
+        filters = [
             Message.sender_id == user_id,
             Message.is_deleted_by_sender == False
-        )
+        ]
         
         # Get total count
-        total_count = query.count()
+        total_count = db.query(func.count(Message.id)).filter(*filters).scalar()
         
         # Apply pagination
-        messages = query.order_by(desc(Message.created_at)).offset(
-            (page - 1) * per_page
-        ).limit(per_page).all()
+        rows = MessageService._message_rows_query(db).filter(*filters).order_by(
+            desc(Message.created_at)
+        ).offset((page - 1) * per_page).limit(per_page).all()
         
         # Calculate pagination info
         total_pages = (total_count + per_page - 1) // per_page
         
         return {
-            "messages": [msg.to_dict(user_id) for msg in messages],
+            "messages": [MessageService._row_to_dict(row, user_id) for row in rows],
             "total_count": total_count,
             "current_page": page,
             "total_pages": total_pages,
@@ -121,7 +122,10 @@ class MessageService:
     @staticmethod
     def get_message_by_id(db: Session, message_id: int, user_id: int) -> Optional[Message]:
         """Get a specific message if user has access"""
-        message = db.query(Message).filter(Message.id == message_id).first()
+        message = db.query(Message).options(
+            joinedload(Message.sender),
+            joinedload(Message.recipient)
+        ).filter(Message.id == message_id).first()
         
         if not message or not message.can_view(user_id):
             return None
@@ -165,6 +169,18 @@ class MessageService:
             Message.is_deleted_by_recipient == False
         ).count()
 
+    @staticmethod
+    async def get_unread_count_async(db: AsyncSession, user_id: int) -> int:
+        """Get count of unread messages for user without blocking the event loop"""
+        result = await db.execute(
+            select(func.count(Message.id)).where(
+                Message.recipient_id == user_id,
+                Message.is_read == False,
+                Message.is_deleted_by_recipient == False
+            )
+        )
+        return result.scalar_one()
+
     @staticmethod
     def get_user_conversations(
         db: Session,
@@ -183,8 +199,13 @@ class MessageService:
         # Get total count
         total_count = query.count()
         
-        # Apply pagination
-        conversations = query.order_by(desc(Conversation.updated_at)).offset(
+        # Apply pagination; participants and last message are joined so to_dict
+        # (including last_message.sender/recipient) is served from the identity map
+        conversations = query.options(
+            joinedload(Conversation.participant_1),
+            joinedload(Conversation.participant_2),
+            joinedload(Conversation.last_message)
+        ).order_by(desc(Conversation.updated_at)).offset(
             (page - 1) * per_page
         ).limit(per_page).all()
         
@@ -209,7 +230,11 @@ class MessageService:
     ) -> Dict[str, Any]:
         """Get messages in a conversation"""
         # Verify user is participant
-        conversation = db.query(Conversation).filter(
+        conversation = db.query(Conversation).options(
+            joinedload(Conversation.participant_1),
+            joinedload(Conversation.participant_2),
+            joinedload(Conversation.last_message)
+        ).filter(
             Conversation.id == conversation_id
         ).first()
         
@@ -217,39 +242,42 @@ class MessageService:
             return {"messages": [], "total_count": 0, "current_page": 1, "total_pages": 0}
         
         # Get messages between the two participants
-        other_participant = conversation.get_other_participant(user_id)
+        if conversation.participant_1_id == user_id:
+            other_participant_id = conversation.participant_2_id
+        else:
+            other_participant_id = conversation.participant_1_id
         
-        query = db.query(Message).filter(
+        filters = [
             or_(
                 and_(
                     Message.sender_id == user_id,
-                    Message.recipient_id == other_participant.id,
+                    Message.recipient_id == other_participant_id,
                     Message.is_deleted_by_sender == False
                 ),
                 and_(
-                    Message.sender_id == other_participant.id,
+                    Message.sender_id == other_participant_id,
                     Message.recipient_id == user_id,
                     Message.is_deleted_by_recipient == False
                 )
             )
-        )
+        ]
         
         # Get total count
-        total_count = query.count()
+        total_count = db.query(func.count(Message.id)).filter(*filters).scalar()
         
         # Apply pagination (newest first)
-        messages = query.order_by(desc(Message.created_at)).offset(
-            (page - 1) * per_page
-        ).limit(per_page).all()
+        rows = MessageService._message_rows_query(db).filter(*filters).order_by(
+            desc(Message.created_at)
+        ).offset((page - 1) * per_page).limit(per_page).all()
         
         # Reverse to show oldest first in conversation view
-        messages.reverse()
+        rows.reverse()
         
         # Calculate pagination info
         total_pages = (total_count + per_page - 1) // per_page
         
         return {
-            "messages": [msg.to_dict(user_id) for msg in messages],
+            "messages": [MessageService._row_to_dict(row, user_id) for row in rows],
             "conversation": conversation.to_dict(user_id),
             "total_count": total_count,
             "current_page": page,
@@ -260,18 +288,12 @@ class MessageService:
     @staticmethod
     def _update_conversation(db: Session, user1_id: int, user2_id: int, message_id: int):
         """Update or create conversation between two users"""
-        # Find existing conversation
+        # Participants are stored in min/max order, so this hits the unique index directly
+        participant_1_id = min(user1_id, user2_id)
+        participant_2_id = max(user1_id, user2_id)
         conversation = db.query(Conversation).filter(
-            or_(
-                and_(
-                    Conversation.participant_1_id == user1_id,
-                    Conversation.participant_2_id == user2_id
-                ),
-                and_(
-                    Conversation.participant_1_id == user2_id,
-                    Conversation.participant_2_id == user1_id
-                )
-            )
+            Conversation.participant_1_id == participant_1_id,
+            Conversation.participant_2_id == participant_2_id
         ).first()
         
         if conversation:
@@ -281,8 +303,8 @@ class MessageService:
         else:
             # Create new conversation
             conversation = Conversation(
-                participant_1_id=min(user1_id, user2_id),  # Consistent ordering
-                participant_2_id=max(user1_id, user2_id),
+                participant_1_id=participant_1_id,  # Consistent ordering
+                participant_2_id=participant_2_id,
                 last_message_id=message_id
             )
             db.add(conversation)
@@ -290,6 +312,46 @@ class MessageService:
         db.commit()
         return conversation
 
+    @staticmethod
+    def _message_rows_query(db: Session):
+        """Message columns plus sender/recipient names as lightweight rows (no ORM lazy loads)"""
+        sender = aliased(User)
+        recipient = aliased(User)
+        return db.query(
+            Message.id,
+            Message.sender_id,
+            Message.recipient_id,
+            Message.subject,
+            Message.content,
+            Message.is_read,
+            Message.created_at,
+            Message.updated_at,
+            sender.full_name.label("sender_name"),
+            recipient.full_name.label("recipient_name")
+        ).outerjoin(
+            sender, sender.id == Message.sender_id
+        ).outerjoin(
+            recipient, recipient.id == Message.recipient_id
+        )
+
+    @staticmethod
+    def _row_to_dict(row, current_user_id: int = None) -> Dict[str, Any]:
+        """Convert a message row to the same shape as Message.to_dict"""
+        return {
+            "id": row.id,
+            "sender_id": row.sender_id,
+            "recipient_id": row.recipient_id,
+            "sender_name": row.sender_name or "Unknown",
+            "recipient_name": row.recipient_name or "Unknown",
+            "subject": row.subject,
+            "content": row.content,
+            "is_read": row.is_read,
+            "created_at": row.created_at.isoformat() if row.created_at else None,
+            "updated_at": row.updated_at.isoformat() if row.updated_at else None,
+            "is_sent_by_me": current_user_id == row.sender_id if current_user_id else False,
+            "is_received_by_me": current_user_id == row.recipient_id if current_user_id else False
+        }
+
     @staticmethod
     def get_available_recipients(db: Session, current_user_id: int) -> List[Dict[str, Any]]:
         """Get list of users that can receive messages"""
@@ -0,0 +1,185 @@
+"""
+Prometheus metrics service for CMSVS Internal System
+Provides fixed-bucket latency histograms and counters exported in Prometheus text format,
+aggregated across gunicorn workers through prometheus_client multiprocess mode
+"""
+
+import os
+import logging
+import threading
+from typing import Optional, Tuple
+
+from app.config import settings
+
+# Multiprocess mode is selected by prometheus_client at import time, so the
+# directory must be exported before the client library is loaded
+if settings.prometheus_multiproc_dir and "PROMETHEUS_MULTIPROC_DIR" not in os.environ:
+    os.makedirs(settings.prometheus_multiproc_dir, exist_ok=True)
+    os.environ["PROMETHEUS_MULTIPROC_DIR"] = settings.prometheus_multiproc_dir
+
+try:
+    from prometheus_client import (
+        CollectorRegistry,
+        Counter,
+        Histogram,
+        generate_latest,
+        CONTENT_TYPE_LATEST,
+        multiprocess,
+    )
+    PROMETHEUS_AVAILABLE = True
+except ImportError:
+    PROMETHEUS_AVAILABLE = False
+    CONTENT_TYPE_LATEST = "text/plain; version=0.0.4; charset=utf-8"
+
+logger = logging.getLogger(__name__)
+
+# Fixed histogram buckets (seconds)
+REQUEST_LATENCY_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+QUERY_LATENCY_BUCKETS = (0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5)
+
+# Label used for statements beyond the label cardinality limit
+OVERFLOW_STATEMENT_LABEL = "other"
+UNMATCHED_ROUTE_LABEL = "unmatched"
+
+
+def is_multiprocess_mode() -> bool:
+    """Check whether metrics are shared across worker processes"""
+    return bool(os.environ.get("PROMETHEUS_MULTIPROC_DIR"))
+
+
+def get_route_template(scope: dict) -> str:
+    """Get the route template (e.g. /requests/{request_id}) for an ASGI scope"""
+    route = scope.get("route")
+    if route is not None:
+        template = getattr(route, "path_format", None) or getattr(route, "path", None)
+        if template:
+            return template
+    return UNMATCHED_ROUTE_LABEL
+
+
+class PrometheusMetrics:
+    """Prometheus metric definitions and recording helpers"""
+
+    def __init__(self):
+        self.enabled = settings.metrics_enabled and PROMETHEUS_AVAILABLE
+        self.max_statement_labels = settings.metrics_max_statement_labels
+        self._statement_labels = set()
+        self._statement_lock = threading.Lock()
+        self._registry = None
+
+        if settings.metrics_enabled and not PROMETHEUS_AVAILABLE:
+            logger.warning("prometheus_client not installed, Prometheus metrics disabled")
+
+        if not self.enabled:
+            return
+
+        # In multiprocess mode values live in the shared directory and are
+        # collected by a fresh registry on each scrape
+        if not is_multiprocess_mode():
+            self._registry = CollectorRegistry()
+
+        registry_kwargs = {"registry": self._registry} if self._registry else {}
+
+        self.request_latency = Histogram(
+            "cmsvs_http_request_duration_seconds",
+            "HTTP request latency by route template",
+            ["method", "route", "status"],
+            buckets=REQUEST_LATENCY_BUCKETS,
+            **registry_kwargs
+        )
+        self.query_latency = Histogram(
+            "cmsvs_db_query_duration_seconds",
+            "Database query latency by normalized statement",
+            ["statement"],
+            buckets=QUERY_LATENCY_BUCKETS,
+            **registry_kwargs
+        )
+        self.cache_requests = Counter(
+            "cmsvs_cache_requests_total",
+            "Cache lookups by result",
+            ["result"],
+            **registry_kwargs
+        )
+        self.upload_bytes = Counter(
+            "cmsvs_upload_bytes_total",
+            "Bytes written by file uploads",
+            ["category"],
+            **registry_kwargs
+        )
+        self.uploads = Counter(
+            "cmsvs_uploads_total",
+            "Number of uploaded files",
+            ["category"],
+            **registry_kwargs
+        )
+        self.retention_rows = Counter(
+            "cmsvs_retention_rows_total",
+            "Rows moved to archive tables or dropped by retention",
+            ["table", "action"],
+            **registry_kwargs
+        )
+
+    def observe_request(self, method: str, route: str, status_code: int, duration: float):
+        """Record HTTP request latency"""
+        if not self.enabled:
+            return
+        status = f"{status_code // 100}xx"
+        self.request_latency.labels(method, route, status).observe(duration)
+
+    def observe_query(self, statement: str, duration: float):
+        """Record database query latency for a normalized statement"""
+        if not self.enabled:
+            return
+        self.query_latency.labels(self._statement_label(statement)).observe(duration)
+
+    def record_cache_result(self, hit: bool):
+        """Record a cache hit or miss"""
+        if not self.enabled:
+            return
+        self.cache_requests.labels("hit" if hit else "miss").inc()
+
+    def record_upload(self, size: int, category: str = "general"):
+        """Record an uploaded file and its size"""
+        if not self.enabled:
+            return
+        self.uploads.labels(category).inc()
+        self.upload_bytes.labels(category).inc(size)
+
+    def record_retention(self, table: str, action: str, rows: int):
+        """Record rows archived or dropped by the retention job"""
+        if not self.enabled or not rows:
+            return
+        self.retention_rows.labels(table, action).inc(rows)
+
+    def _statement_label(self, statement: str) -> str:
+        """Bound label cardinality by collapsing new statements into one label once full"""
+        if statement in self._statement_labels:
+            return statement
+        with self._statement_lock:
+            if len(self._statement_labels) >= self.max_statement_labels:
+                return OVERFLOW_STATEMENT_LABEL
+            self._statement_labels.add(statement)
+        return statement
+
+    def render(self) -> Tuple[bytes, str]:
+        """Render all metrics in Prometheus text exposition format"""
+        if not self.enabled:
+            return b"", CONTENT_TYPE_LATEST
+
+        if is_multiprocess_mode():
+            registry = CollectorRegistry()
+            multiprocess.MultiProcessCollector(registry)
+        else:
+            registry = self._registry
+
+        return generate_latest(registry), CONTENT_TYPE_LATEST
+
+
+def mark_process_dead(pid: int, path: Optional[str] = None):
+    """Clean up live metric files of an exited worker (gunicorn child_exit hook)"""
+    if PROMETHEUS_AVAILABLE and is_multiprocess_mode():
+        multiprocess.mark_process_dead(pid, path)
+
+
+# Global Prometheus metrics instance
+prometheus_metrics = PrometheusMetrics()
@@ -0,0 +1,272 @@
+"""
+Notification fan-out for announcements and batched events
+An audience (everyone, a role or explicit user IDs) is resolved together with each
+recipient's preferences in one query: users LEFT JOIN notification_preferences, where a
+missing preferences row counts as the defaults (notify, push enabled) and is not created.
+The notifications are then written in one statement, a multi-row INSERT or, for large
+batches on psycopg2, COPY, and committed once.
+
+Push delivery is handed to a small thread pool after the commit, so the caller never
+waits on push endpoints; it loads the recipients' subscriptions with one query and
+does nothing when pywebpush or the VAPID keys are missing.
+"""
+
+import io
+import json
+import logging
+from collections import defaultdict
+from concurrent.futures import ThreadPoolExecutor
+from typing import Any, Dict, Iterable, List, NamedTuple, Optional
+
+from sqlalchemy import Integer, any_, bindparam, func, insert, select, true
+from sqlalchemy.dialects.postgresql import ARRAY
+from sqlalchemy.orm import Session
+
+from app.config import settings
+from app.models.notification import (
+    Notification,
+    NotificationPreference,
+    NotificationPriority,
+    NotificationType,
+    PushSubscription,
+)
+from app.models.user import User, UserRole
+
+logger = logging.getLogger(__name__)
+
+# Preference flag that controls each notification type
+PREFERENCE_COLUMNS = {
+    NotificationType.REQUEST_STATUS_CHANGED: NotificationPreference.request_status_notifications,
+    NotificationType.REQUEST_CREATED: NotificationPreference.request_updates_notifications,
+    NotificationType.REQUEST_UPDATED: NotificationPreference.request_updates_notifications,
+    NotificationType.REQUEST_ARCHIVED: NotificationPreference.request_updates_notifications,
+    NotificationType.REQUEST_DELETED: NotificationPreference.request_updates_notifications,
+    NotificationType.ADMIN_MESSAGE: NotificationPreference.admin_message_notifications,
+    NotificationType.SYSTEM_ANNOUNCEMENT: NotificationPreference.system_announcement_notifications,
+}
+
+ROW_COLUMNS = (
+    "user_id", "type", "priority", "title", "message", "action_url",
+    "request_id", "related_user_id", "extra_data", "is_read", "is_sent",
+)
+
+# NULL marker of the COPY path (csv.writer cannot tell None from "")
+COPY_NULL = r"\N"
+
+
+class Audience(NamedTuple):
+    """Who receives a notification: everyone, one role, or explicit user IDs"""
+    role: Optional[UserRole] = None
+    user_ids: Optional[frozenset] = None
+
+    @classmethod
+    def everyone(cls) -> "Audience":
+        return cls()
+
+    @classmethod
+    def with_role(cls, role: UserRole) -> "Audience":
+        return cls(role=role)
+
+    @classmethod
+    def users(cls, user_ids: Iterable[int]) -> "Audience":
+        return cls(user_ids=frozenset(user_ids))
+
+
+class FanoutResult(NamedTuple):
+    recipients: int
+    created: int
+    push_recipients: int
+
+
+def _notification_row(fields: Dict[str, Any]) -> Dict[str, Any]:
+    """Every column for one row, so the batch is one statement shape"""
+    row = dict.fromkeys(ROW_COLUMNS)
+    row.update(priority=NotificationPriority.NORMAL, is_read=False, is_sent=False)
+    row.update(fields)
+    return row
+
+
+def _copy_value(column: str, value) -> str:
+    """One CSV field for COPY: NULL as the bare COPY_NULL marker, everything else quoted
+
+    A quoted field never matches the NULL marker, so an empty message stays an empty string
+    (and a literal \\N stays text) instead of becoming NULL.
+    """
+    if value is None:
+        return COPY_NULL
+    if column == "extra_data":
+        value = json.dumps(value, ensure_ascii=False, default=str)
+    elif column in ("type", "priority"):
+        value = value.name  # Enum columns store member names
+    elif isinstance(value, bool):
+        value = "t" if value else "f"
+    return '"' + str(value).replace('"', '""') + '"'
+
+
+class NotificationFanout:
+    """Resolve an audience, write its notifications in one batch and hand them to push"""
+
+    _push_executor: Optional[ThreadPoolExecutor] = None
+
+    @staticmethod
+    def recipients(db: Session, audience: Audience, notification_type: NotificationType) -> Dict[int, bool]:
+        """Users in the audience who accept this type, mapped to whether they accept push
+
+        Broadcasts (everyone, a role) reach active users only; explicit user IDs are taken
+        as given, so a deactivated owner still gets the status notifications of their requests.
+        """
+        if audience.user_ids is not None and not audience.user_ids:
+            return {}
+
+        preference = NotificationPreference
+        query = (
+            select(User.id, func.coalesce(preference.push_notifications_enabled, true()))
+            .outerjoin(preference, preference.user_id == User.id)
+            .where(
+                func.coalesce(preference.in_app_notifications_enabled, true()),
+                func.coalesce(PREFERENCE_COLUMNS[notification_type], true())
+            )
+        )
+        if audience.role is not None:
+            query = query.where(User.role == audience.role)
+        if audience.user_ids is not None:
+            query = query.where(User.id == any_(bindparam("user_ids", sorted(audience.user_ids), type_=ARRAY(Integer))))
+        else:
+            query = query.where(User.is_active == True)
+        return dict(db.execute(query).all())
+
+    @staticmethod
+    def insert(db: Session, rows: List[Dict[str, Any]], use_copy: Optional[bool] = None) -> int:
+        """Write notification rows in the session's transaction (the caller commits)"""
+        if not rows:
+            return 0
+        rows = [_notification_row(row) for row in rows]
+        if use_copy is None:
+            use_copy = len(rows) >= settings.notification_copy_threshold
+        if use_copy and db.get_bind().dialect.driver == "psycopg2":
+            NotificationFanout._copy(db, rows)
+        else:
+            db.execute(insert(Notification), rows)
+        return len(rows)
+
+    @staticmethod
+    def _copy(db: Session, rows: List[Dict[str, Any]]):
+        buffer = io.StringIO()
+        for row in rows:
+            buffer.write(",".join(_copy_value(column, row[column]) for column in ROW_COLUMNS) + "\n")
+        buffer.seek(0)
+
+        # COPY runs on the session's own connection, inside its transaction
+        cursor = db.connection().connection.cursor()
+        try:
+            cursor.copy_expert(
+                f"COPY {Notification.__tablename__} ({', '.join(ROW_COLUMNS)}) FROM STDIN WITH (FORMAT csv, NULL '{COPY_NULL}')",
+                buffer
+            )
+        finally:
+            cursor.close()
+
+    @staticmethod
+    def deliver(db: Session, rows: List[Dict[str, Any]], recipients: Dict[int, bool]) -> FanoutResult:
+        """Insert and commit rows for resolved recipients, then queue their push delivery"""
+        rows = [row for row in rows if row["user_id"] in recipients]
+        try:
+            created = NotificationFanout.insert(db, rows)
+            db.commit()
+        except Exception:
+            db.rollback()
+            raise
+
+        push_rows = [row for row in rows if recipients[row["user_id"]]]
+        NotificationFanout.push(push_rows)
+        if created:
+            logger.info(f"Created {created} notifications ({len(push_rows)} queued for push)")
+        return FanoutResult(len(recipients), created, len({row["user_id"] for row in push_rows}))
+
+    @staticmethod
+    def send(
+        db: Session,
+        audience: Audience,
+        notification_type: NotificationType,
+        title: str,
+        message: str,
+        priority: NotificationPriority = NotificationPriority.NORMAL,
+        action_url: Optional[str] = None,
+        related_user_id: Optional[int] = None,
+        extra_data: Optional[Dict[str, Any]] = None
+    ) -> FanoutResult:
+        """The same notification to every user in the audience"""
+        recipients = NotificationFanout.recipients(db, audience, notification_type)
+        fields = {
+            "type": notification_type,
+            "priority": priority,
+            "title": title,
+            "message": message,
+            "action_url": action_url,
+            "related_user_id": related_user_id,
+            "extra_data": extra_data,
+        }
+        rows = [dict(fields, user_id=user_id) for user_id in recipients]
+        return NotificationFanout.deliver(db, rows, recipients)
+
+    @staticmethod
+    def push(rows: List[Dict[str, Any]]):
+        """Queue push delivery for committed rows; a no-op without pywebpush or VAPID keys"""
+        from app.services.push_service import WEBPUSH_AVAILABLE
+        if not rows:
+            return
+        if not WEBPUSH_AVAILABLE or not (settings.vapid_private_key and settings.vapid_public_key):
+            logger.debug(f"Push delivery not configured, skipping {len(rows)} notifications")
+            return
+
+        # Group identical messages so each subscription list is walked once per message
+        messages = defaultdict(list)
+        for row in rows:
+            messages[(row["title"], row["message"], row["action_url"])].append(row["user_id"])
+
+        if NotificationFanout._push_executor is None:
+            NotificationFanout._push_executor = ThreadPoolExecutor(
+                max_workers=settings.notification_push_workers,
+                thread_name_prefix="notification-push"
+            )
+        NotificationFanout._push_executor.submit(NotificationFanout._deliver_push, dict(messages))
+
+    @staticmethod
+    def _deliver_push(messages: Dict[tuple, List[int]]):
+        from app.database import SessionLocal
+        from app.services.push_service import PushService
+
+        user_ids = sorted({user_id for recipients in messages.values() for user_id in recipients})
+        db = SessionLocal()
+        try:
+            subscriptions = defaultdict(list)
+            for subscription in db.scalars(
+                select(PushSubscription).where(
+                    PushSubscription.user_id == any_(bindparam("user_ids", user_ids, type_=ARRAY(Integer))),
+                    PushSubscription.is_active == True
+                )
+            ):
+                subscriptions[subscription.user_id].append(subscription)
+
+            sent = failed = 0
+            for (title, message, action_url), recipients in messages.items():
+                for user_id in recipients:
+                    for subscription in subscriptions[user_id]:
+                        if PushService.send_push_notification(subscription, title, message, action_url):
+                            sent += 1
+                        else:
+                            failed += 1
+            # Persists subscriptions that send_push_notification marked inactive
+            db.commit()
+            logger.info(f"Push fan-out: {sent} sent, {failed} failed")
+        except Exception as e:
+            db.rollback()
+            logger.error(f"Error delivering push notifications: {e}")
+        finally:
+            db.close()
+
+    @staticmethod
+    def shutdown():
+        if NotificationFanout._push_executor is not None:
+            NotificationFanout._push_executor.shutdown(wait=False)
+            NotificationFanout._push_executor = None
@@ -1,5 +1,6 @@
 from sqlalchemy.orm import Session
-from sqlalchemy import desc, and_, or_
+from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy import desc, and_, or_, select, func
 from typing import List, Optional, Dict, Any
 from datetime import datetime, timedelta
 import json
@@ -17,6 +18,20 @@ from app.models.request import Request, RequestStatus
 
 logger = logging.getLogger(__name__)
 
+REQUEST_STATUS_MESSAGES = {
+    RequestStatus.PENDING: "تم تحديث حالة طلبك إلى: قيد الانتظار",
+    RequestStatus.IN_PROGRESS: "تم تحديث حالة طلبك إلى: قيد المعالجة",
+    RequestStatus.COMPLETED: "تم إكمال طلبك بنجاح! 🎉",
+    RequestStatus.REJECTED: "تم رفض طلبك. يرجى مراجعة التفاصيل"
+}
+
+REQUEST_STATUS_PRIORITIES = {
+    RequestStatus.COMPLETED: NotificationPriority.HIGH,
+    RequestStatus.REJECTED: NotificationPriority.HIGH,
+    RequestStatus.IN_PROGRESS: NotificationPriority.NORMAL,
+    RequestStatus.PENDING: NotificationPriority.LOW
+}
+
 
 class NotificationService:
     """Service for managing notifications and push notifications"""
@@ -79,50 +94,64 @@ class NotificationService:
             ):
                 return None
 
-            # Generate appropriate message based on status change
-            status_messages = {
-                RequestStatus.PENDING: "تم تحديث حالة طلبك إلى: قيد الانتظار",
-                RequestStatus.IN_PROGRESS: "تم تحديث حالة طلبك إلى: قيد المعالجة",
-                RequestStatus.COMPLETED: "تم إكمال طلبك بنجاح! 🎉",
-                RequestStatus.REJECTED: "تم رفض طلبك. يرجى مراجعة التفاصيل"
-            }
-            
-            priority_map = {
-                RequestStatus.COMPLETED: NotificationPriority.HIGH,
-                RequestStatus.REJECTED: NotificationPriority.HIGH,
-                RequestStatus.IN_PROGRESS: NotificationPriority.NORMAL,
-                RequestStatus.PENDING: NotificationPriority.LOW
-            }
-            
-            title = f"تحديث الطلب {request.request_number}"
-            message = status_messages.get(new_status, f"تم تحديث حالة طلبك إلى: {new_status.value}")
-            priority = priority_map.get(new_status, NotificationPriority.NORMAL)
-            action_url = f"/requests/{request.id}/view"
-            
-            extra_data = {
-                "old_status": old_status.value,
-                "new_status": new_status.value,
-                "request_number": request.request_number,
-                "admin_user_id": admin_user_id
-            }
-            
             return NotificationService.create_notification(
                 db=db,
-                user_id=request.user_id,
-                notification_type=NotificationType.REQUEST_STATUS_CHANGED,
-                title=title,
-                message=message,
-                priority=priority,
-                action_url=action_url,
-                request_id=request.id,
-                related_user_id=admin_user_id,
-                extra_data=extra_data
+                **NotificationService._request_status_fields(request, old_status, new_status, admin_user_id)
             )
             
         except Exception as e:
             logger.error(f"Error creating request status notification: {str(e)}")
             return None
 
+    @staticmethod
+    def _request_status_fields(request, old_status: RequestStatus, new_status: RequestStatus,
+                               admin_user_id: Optional[int]) -> Dict[str, Any]:
+        """Notification fields for a status change (request needs id, request_number and user_id)"""
+        return {
+            "user_id": request.user_id,
+            "notification_type": NotificationType.REQUEST_STATUS_CHANGED,
+            "title": f"تحديث الطلب {request.request_number}",
+            "message": REQUEST_STATUS_MESSAGES.get(new_status, f"تم تحديث حالة طلبك إلى: {new_status.value}"),
+            "priority": REQUEST_STATUS_PRIORITIES.get(new_status, NotificationPriority.NORMAL),
+            "action_url": f"/requests/{request.id}/view",
+            "request_id": request.id,
+            "related_user_id": admin_user_id,
+            "extra_data": {
+                "old_status": old_status.value,
+                "new_status": new_status.value,
+                "request_number": request.request_number,
+                "admin_user_id": admin_user_id
+            }
+        }
+
+    @staticmethod
+    def create_request_status_notifications(
+        db: Session,
+        changes: List[Any],
+        new_status: RequestStatus,
+        admin_user_id: Optional[int] = None
+    ) -> int:
+        """Status change notifications for many requests with one preference query and one insert
+
+        changes are rows with id, request_number, user_id and old_status. Users without
+        preferences get the defaults (notify) without creating a preferences row.
+        """
+        from app.services.notification_fanout import Audience, NotificationFanout
+
+        changes = [change for change in changes if change.old_status != new_status]
+        if not changes:
+            return 0
+
+        recipients = NotificationFanout.recipients(
+            db, Audience.users(change.user_id for change in changes), NotificationType.REQUEST_STATUS_CHANGED
+        )
+        rows = []
+        for change in changes:
+            fields = NotificationService._request_status_fields(change, change.old_status, new_status, admin_user_id)
+            fields["type"] = fields.pop("notification_type")
+            rows.append(fields)
+        return NotificationFanout.deliver(db, rows, recipients).created
+
     @staticmethod
     def create_request_created_notification(
         db: Session,
@@ -342,6 +371,22 @@ class NotificationService:
             logger.error(f"Error getting unread count: {str(e)}")
             return 0
 
+    @staticmethod
+    async def get_unread_count_async(db: AsyncSession, user_id: int) -> int:
+        """Get count of unread notifications for user without blocking the event loop"""
+        try:
+            result = await db.execute(
+                select(func.count(Notification.id)).where(
+                    Notification.user_id == user_id,
+                    Notification.is_read == False
+                )
+            )
+            return result.scalar_one()
+
+        except Exception as e:
+            logger.error(f"Error getting unread count: {str(e)}")
+            return 0
+
     @staticmethod
     def _should_send_notification(db: Session, user_id: int, preference_type: str) -> bool:
         """Check if user wants to receive this type of notification"""
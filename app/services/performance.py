@@ -3,13 +3,17 @@ Performance monitoring and optimization service for CMSVS Internal System
 Provides request timing, database query optimization, and performance metrics
 """
 
+import re
+import math
 import time
 import logging
+import threading
 from typing import Dict, Any, List, Optional
 from datetime import datetime, timedelta
 from functools import wraps
 from contextlib import contextmanager
-from collections import defaultdict, deque
+from contextvars import ContextVar
+from collections import defaultdict, deque, OrderedDict, Counter
 import asyncio
 from sqlalchemy.orm import Session
 from sqlalchemy import text, event
@@ -17,9 +21,125 @@ from sqlalchemy.engine import Engine
 
 from app.config import settings
 from app.services.cache import cache, cache_stats
+from app.services.metrics import prometheus_metrics, get_route_template
 
 logger = logging.getLogger(__name__)
 
+# Per-HTTP-request query fingerprint counts, used for N+1 detection
+_request_query_counts: ContextVar[Optional[Counter]] = ContextVar("request_query_counts", default=None)
+
+
+class QuantileSketch:
+    """Streaming quantile sketch with log-spaced buckets (bounded relative error)"""
+
+    def __init__(self, relative_accuracy: float = 0.02, min_value: float = 1e-6):
+        self._gamma = (1 + relative_accuracy) / (1 - relative_accuracy)
+        self._log_gamma = math.log(self._gamma)
+        self._min_value = min_value
+        self._buckets: Dict[int, int] = {}
+        self.count = 0
+
+    def add(self, value: float):
+        """Add a value (seconds) to the sketch"""
+        index = math.ceil(math.log(max(value, self._min_value)) / self._log_gamma)
+        self._buckets[index] = self._buckets.get(index, 0) + 1
+        self.count += 1
+
+    def quantile(self, q: float) -> float:
+        """Estimate the q-quantile (0 <= q <= 1)"""
+        if not self.count:
+            return 0.0
+        rank = q * (self.count - 1)
+        seen = 0
+        for index in sorted(self._buckets):
+            seen += self._buckets[index]
+            if seen > rank:
+                return 2 * self._gamma ** index / (self._gamma + 1)
+        return 2 * self._gamma ** max(self._buckets) / (self._gamma + 1)
+
+
+class QueryFingerprinter:
+    """Normalize SQL statements into fingerprints, caching results per statement"""
+
+    # String literals and numbers in one pass; identifiers in double quotes are kept
+    _LITERAL_PATTERN = re.compile(r"'(?:[^']|'')*'|\b\d+(?:\.\d+)?\b")
+    _IN_LIST_PATTERN = re.compile(r"\bIN \((?:\s*(?:\?|%\([^)]*\)s|:\w+)\s*,?)+\)", re.IGNORECASE)
+    _WHITESPACE_PATTERN = re.compile(r"\s+")
+
+    def __init__(self, max_size: int = 2000, max_length: int = 200):
+        self._cache: "OrderedDict[str, str]" = OrderedDict()
+        self._max_size = max_size
+        self._max_length = max_length
+        self._lock = threading.Lock()
+
+    def fingerprint(self, statement: str) -> str:
+        """Get the fingerprint for a statement"""
+        # SQLAlchemy reuses the compiled statement string, so this is a cheap dict hit
+        fingerprint = self._cache.get(statement)
+        if fingerprint is not None:
+            return fingerprint
+
+        fingerprint = self._normalize(statement)
+        with self._lock:
+            self._cache[statement] = fingerprint
+            if len(self._cache) > self._max_size:
+                self._cache.popitem(last=False)
+        return fingerprint
+
+    def _normalize(self, statement: str) -> str:
+        """Replace literals and collapse IN lists and whitespace"""
+        normalized = self._LITERAL_PATTERN.sub("?", statement)
+        normalized = self._IN_LIST_PATTERN.sub("IN (...)", normalized)
+        normalized = self._WHITESPACE_PATTERN.sub(" ", normalized).strip()
+        return normalized[:self._max_length]
+
+
+class QueryStatsTable:
+    """Per-fingerprint query statistics bounded by LRU eviction"""
+
+    def __init__(self, max_entries: int = 500):
+        self._entries: "OrderedDict[str, Dict[str, Any]]" = OrderedDict()
+        self._max_entries = max_entries
+        self._lock = threading.Lock()
+        self.evictions = 0
+
+    def record(self, fingerprint: str, duration: float):
+        """Record one execution of a fingerprint"""
+        with self._lock:
+            stats = self._entries.get(fingerprint)
+            if stats is None:
+                stats = {'count': 0, 'total_time': 0.0, 'max_time': 0.0, 'sketch': QuantileSketch()}
+                self._entries[fingerprint] = stats
+                if len(self._entries) > self._max_entries:
+                    self._entries.popitem(last=False)
+                    self.evictions += 1
+            else:
+                self._entries.move_to_end(fingerprint)
+
+            stats['count'] += 1
+            stats['total_time'] += duration
+            stats['max_time'] = max(stats['max_time'], duration)
+            stats['sketch'].add(duration)
+
+    def items(self) -> List[tuple]:
+        """Snapshot of (fingerprint, stats) pairs"""
+        with self._lock:
+            return [
+                (fingerprint, {
+                    'count': stats['count'],
+                    'total_time': stats['total_time'],
+                    'avg_time': stats['total_time'] / stats['count'],
+                    'max_time': stats['max_time'],
+                    'p50': stats['sketch'].quantile(0.50),
+                    'p95': stats['sketch'].quantile(0.95),
+                    'p99': stats['sketch'].quantile(0.99)
+                })
+                for fingerprint, stats in self._entries.items()
+            ]
+
+    def __len__(self):
+        return len(self._entries)
+
 
 class PerformanceMetrics:
     """Performance metrics collection and analysis"""
@@ -34,11 +154,9 @@ class PerformanceMetrics:
             'max_time': 0,
             'avg_time': 0
         })
-        self.query_stats = defaultdict(lambda: {
-            'count': 0,
-            'total_time': 0,
-            'avg_time': 0
-        })
+        self.fingerprinter = QueryFingerprinter(max_size=settings.query_fingerprint_cache_size)
+        self.query_stats = QueryStatsTable(max_entries=settings.query_stats_max_entries)
+        self.n_plus_one_reports = deque(maxlen=100)  # Keep last 100 N+1 reports
     
     def record_request(self, endpoint: str, method: str, duration: float, status_code: int):
         """Record request performance metrics"""
@@ -61,6 +179,8 @@ class PerformanceMetrics:
         stats['min_time'] = min(stats['min_time'], duration)
         stats['max_time'] = max(stats['max_time'], duration)
         stats['avg_time'] = stats['total_time'] / stats['count']
+
+        prometheus_metrics.observe_request(method, endpoint, status_code, duration)
         
         # Log slow requests
         if duration > 2.0:  # Requests taking more than 2 seconds
@@ -68,13 +188,15 @@ class PerformanceMetrics:
     
     def record_query(self, query: str, duration: float):
         """Record database query performance"""
-        # Normalize query for statistics (remove specific values)
-        normalized_query = self._normalize_query(query)
-        
-        stats = self.query_stats[normalized_query]
-        stats['count'] += 1
-        stats['total_time'] += duration
-        stats['avg_time'] = stats['total_time'] / stats['count']
+        fingerprint = self.fingerprinter.fingerprint(query)
+        self.query_stats.record(fingerprint, duration)
+
+        # Count executions within the current HTTP request for N+1 detection
+        request_counts = _request_query_counts.get()
+        if request_counts is not None:
+            request_counts[fingerprint] += 1
+
+        prometheus_metrics.observe_query(fingerprint, duration)
         
         # Record slow queries
         if duration > 1.0:  # Queries taking more than 1 second
@@ -84,16 +206,23 @@ class PerformanceMetrics:
                 'duration': duration
             })
             logger.warning(f"Slow query: {duration:.2f}s - {query[:100]}...")
-    
-    def _normalize_query(self, query: str) -> str:
-        """Normalize SQL query for statistics"""
-        # Simple normalization - replace numbers and strings with placeholders
-        import re
-        normalized = re.sub(r'\d+', '?', query)
-        normalized = re.sub(r"'[^']*'", "'?'", normalized)
-        normalized = re.sub(r'"[^"]*"', '"?"', normalized)
-        return normalized[:200]  # Limit length
-    
+
+    def check_n_plus_one(self, route: str, method: str, query_counts: Counter):
+        """Report fingerprints executed more than the threshold within one request"""
+        threshold = settings.n_plus_one_threshold
+        offenders = [(fingerprint, count) for fingerprint, count in query_counts.items() if count > threshold]
+        if not offenders:
+            return
+
+        for fingerprint, count in offenders:
+            self.n_plus_one_reports.append({
+                'timestamp': datetime.utcnow(),
+                'route': f"{method} {route}",
+                'query': fingerprint,
+                'count': count
+            })
+            logger.warning(f"Possible N+1 query: {method} {route} executed {count}x - {fingerprint[:100]}")
+
     def get_performance_summary(self) -> Dict[str, Any]:
         """Get performance summary statistics"""
         now = datetime.utcnow()
@@ -124,7 +253,7 @@ class PerformanceMetrics:
         
         # Top slow queries
         slow_queries = sorted(
-            [(k, v) for k, v in self.query_stats.items()],
+            self.query_stats.items(),
             key=lambda x: x[1]['avg_time'],
             reverse=True
         )[:5]
@@ -150,10 +279,26 @@ class PerformanceMetrics:
                 {
                     'query': query[:100] + '...' if len(query) > 100 else query,
                     'count': stats['count'],
-                    'avg_time': round(stats['avg_time'], 3)
+                    'avg_time': round(stats['avg_time'], 3),
+                    'p50': round(stats['p50'], 4),
+                    'p95': round(stats['p95'], 4),
+                    'p99': round(stats['p99'], 4)
                 }
                 for query, stats in slow_queries
             ],
+            'query_stats': {
+                'tracked_fingerprints': len(self.query_stats),
+                'evictions': self.query_stats.evictions
+            },
+            'n_plus_one': [
+                {
+                    'timestamp': report['timestamp'].isoformat(),
+                    'route': report['route'],
+                    'query': report['query'][:100] + '...' if len(report['query']) > 100 else report['query'],
+                    'count': report['count']
+                }
+                for report in list(self.n_plus_one_reports)[-10:]
+            ],
             'cache': cache_stats.get_stats()
         }
 
@@ -233,6 +378,33 @@ class DatabaseQueryMonitor:
 db_query_monitor = DatabaseQueryMonitor()
 
 
+class QueryCounter:
+    """Context manager counting statements executed on one or more engines (query budgets and benchmarks)"""
+
+    def __init__(self, *engines: Engine):
+        self.engines = engines
+        self.count = 0
+        self.fingerprints = Counter()
+
+    def _on_execute(self, conn, cursor, statement, parameters, context, executemany):
+        self.count += 1
+        self.fingerprints[performance_metrics.fingerprinter.fingerprint(statement)] += 1
+
+    def __enter__(self):
+        for engine in self.engines:
+            event.listen(engine, "after_cursor_execute", self._on_execute)
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        for engine in self.engines:
+            event.remove(engine, "after_cursor_execute", self._on_execute)
+        return False
+
+    def repeated(self, threshold: int) -> List[tuple]:
+        """Fingerprints executed more than threshold times (likely N+1)"""
+        return [(fingerprint, count) for fingerprint, count in self.fingerprints.most_common() if count > threshold]
+
+
 class RequestPerformanceMiddleware:
     """Middleware to monitor request performance"""
     
@@ -245,6 +417,8 @@ class RequestPerformanceMiddleware:
             return
         
         start_time = time.time()
+        query_counts = Counter()
+        counts_token = _request_query_counts.set(query_counts)
         
         # Wrap send to capture response status
         status_code = 200
@@ -259,12 +433,15 @@ class RequestPerformanceMiddleware:
             await self.app(scope, receive, send_wrapper)
         finally:
             duration = time.time() - start_time
+            _request_query_counts.reset(counts_token)
             
-            # Record performance metrics
-            endpoint = scope.get("path", "unknown")
+            # Record performance metrics by route template so path parameters
+            # don't create a new series per request
+            endpoint = get_route_template(scope)
             method = scope.get("method", "unknown")
             
             performance_metrics.record_request(endpoint, method, duration, status_code)
+            performance_metrics.check_n_plus_one(endpoint, method, query_counts)
 
 
 class PerformanceOptimizer:
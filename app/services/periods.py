@@ -0,0 +1,158 @@
+"""
+Period bucketing for CMSVS progress tracking
+Every daily, weekly and monthly figure (achievements, leaderboards, dashboards, admin
+progress) uses the same boundaries: Bahrain calendar days, weeks starting on Monday and
+calendar months, plus the rolling window of the last five business days used by the admin
+progress goals. Boundaries are computed once per Bahrain day and memoized.
+
+A request counts as completed in a period when its completion time (updated_at, or
+created_at for requests never updated) falls in that period. All counts for one user or
+for every user come from a single grouped query.
+"""
+
+from datetime import date, datetime, time, timedelta
+from functools import lru_cache
+from typing import Dict, Iterable, List, NamedTuple, Optional
+
+from sqlalchemy import and_, func, select
+from sqlalchemy.orm import Session
+
+from app.models.request import Request, RequestStatus
+from app.utils.timezone_utils import BAHRAIN_TZ, BAHRAIN_TZ_NAME, now_bahrain, utc_to_bahrain
+
+BUSINESS_WEEK_DAYS = 5
+
+
+class PeriodBounds(NamedTuple):
+    """Start (inclusive) and end (exclusive) of the periods containing one Bahrain day"""
+    day: date
+    day_start: datetime
+    day_end: datetime
+    week_start: datetime
+    week_end: datetime
+    month_start: datetime
+    month_end: datetime
+    business_week_start: datetime
+
+
+class PeriodCounts(NamedTuple):
+    """Request counts of one user"""
+    total: int = 0
+    completed: int = 0
+    pending: int = 0
+    in_progress: int = 0
+    created_daily: int = 0
+    created_weekly: int = 0
+    created_monthly: int = 0
+    completed_daily: int = 0
+    completed_weekly: int = 0
+    completed_monthly: int = 0
+    completed_business_week: int = 0
+
+
+def _business_week_start(day: date) -> date:
+    """First of the last BUSINESS_WEEK_DAYS business days (Monday to Friday) before day"""
+    counted = 0
+    while counted < BUSINESS_WEEK_DAYS:
+        day -= timedelta(days=1)
+        if day.weekday() < 5:
+            counted += 1
+    return day
+
+
+def _midnight(day: date) -> datetime:
+    return datetime.combine(day, time.min, tzinfo=BAHRAIN_TZ)
+
+
+@lru_cache(maxsize=32)
+def period_bounds(day: date) -> PeriodBounds:
+    """Boundaries of the day, week, month and business week containing a Bahrain day"""
+    week_start = day - timedelta(days=day.weekday())
+    month_start = day.replace(day=1)
+    next_month_start = (month_start + timedelta(days=32)).replace(day=1)
+
+    return PeriodBounds(
+        day=day,
+        day_start=_midnight(day),
+        day_end=_midnight(day + timedelta(days=1)),
+        week_start=_midnight(week_start),
+        week_end=_midnight(week_start + timedelta(days=7)),
+        month_start=_midnight(month_start),
+        month_end=_midnight(next_month_start),
+        business_week_start=_midnight(_business_week_start(day)),
+    )
+
+
+def current_period_bounds(now: Optional[datetime] = None) -> PeriodBounds:
+    """Boundaries for the Bahrain day of now (naive datetimes are taken as UTC)"""
+    return period_bounds(utc_to_bahrain(now).date() if now else now_bahrain().date())
+
+
+def completion_time():
+    """SQL expression for when a request was completed"""
+    return func.coalesce(Request.updated_at, Request.created_at)
+
+
+def bahrain_date(column):
+    """SQL expression for the Bahrain calendar date of a timestamptz column"""
+    return func.date(func.timezone(BAHRAIN_TZ_NAME, column))
+
+
+class PeriodCounter:
+    """Grouped period counts over the requests table"""
+
+    @staticmethod
+    def _counts_query(bounds: PeriodBounds):
+        completed_at = completion_time()
+        is_completed = Request.status == RequestStatus.COMPLETED
+
+        def created_since(start, end):
+            return func.count(Request.id).filter(and_(Request.created_at >= start, Request.created_at < end))
+
+        def completed_since(start, end):
+            return func.count(Request.id).filter(and_(is_completed, completed_at >= start, completed_at < end))
+
+        return select(
+            Request.user_id,
+            func.count(Request.id),
+            func.count(Request.id).filter(is_completed),
+            func.count(Request.id).filter(Request.status == RequestStatus.PENDING),
+            func.count(Request.id).filter(Request.status == RequestStatus.IN_PROGRESS),
+            created_since(bounds.day_start, bounds.day_end),
+            created_since(bounds.week_start, bounds.week_end),
+            created_since(bounds.month_start, bounds.month_end),
+            completed_since(bounds.day_start, bounds.day_end),
+            completed_since(bounds.week_start, bounds.week_end),
+            completed_since(bounds.month_start, bounds.month_end),
+            completed_since(bounds.business_week_start, bounds.day_end),
+        ).group_by(Request.user_id)
+
+    @staticmethod
+    def counts(db: Session, user_ids: Optional[Iterable[int]] = None,
+               bounds: Optional[PeriodBounds] = None) -> Dict[int, PeriodCounts]:
+        """{user_id: PeriodCounts} for the given users (all users when None) in one query"""
+        query = PeriodCounter._counts_query(bounds or current_period_bounds())
+        if user_ids is not None:
+            user_ids = list(user_ids)
+            if not user_ids:
+                return {}
+            query = query.where(Request.user_id.in_(user_ids))
+
+        return {row[0]: PeriodCounts(*row[1:]) for row in db.execute(query)}
+
+    @staticmethod
+    def for_user(db: Session, user_id: int, bounds: Optional[PeriodBounds] = None) -> PeriodCounts:
+        return PeriodCounter.counts(db, [user_id], bounds).get(user_id, PeriodCounts())
+
+    @staticmethod
+    def completion_days(db: Session, user_id: int, since: date) -> List[date]:
+        """Distinct Bahrain days since a date on which the user completed a request, newest first"""
+        completed_day = bahrain_date(completion_time())
+        rows = db.execute(
+            select(completed_day).where(
+                Request.user_id == user_id,
+                Request.status == RequestStatus.COMPLETED,
+                completion_time() >= _midnight(since)
+            ).group_by(completed_day).order_by(completed_day.desc())
+        )
+        return [row[0] for row in rows]
@@ -0,0 +1,102 @@
+"""
+Thumbnail and preview pipeline for uploaded files
+After an upload is committed, each image (and each PDF when PyMuPDF or pdftoppm is
+installed) is hashed and resized in a process pool, off the event loop and outside the
+GIL, into a small thumbnail and a screen-sized preview. The file row then records the
+content hash, which versions the derivative URLs so they can be served as immutable.
+The same pool resizes avatars.
+"""
+
+import asyncio
+import logging
+import multiprocessing
+from concurrent.futures import ProcessPoolExecutor
+from typing import Dict, Iterable, Optional
+
+from sqlalchemy import update
+from starlette.concurrency import run_in_threadpool
+
+from app.config import settings
+from app.models.file import File
+from app.utils.previews import HASH_PREFIX_LENGTH, derivative_path, render_derivatives
+
+logger = logging.getLogger(__name__)
+
+_executor: Optional[ProcessPoolExecutor] = None
+# Running generation tasks (the event loop only keeps weak references)
+_pending = set()
+
+
+class PreviewService:
+    """Schedules derivative generation and resolves derivative paths"""
+
+    @staticmethod
+    def sizes() -> Dict[str, int]:
+        return {"thumb": settings.preview_thumbnail_size, "preview": settings.preview_max_size}
+
+    @staticmethod
+    def _get_executor() -> ProcessPoolExecutor:
+        global _executor
+        if _executor is None:
+            # spawn: children start clean instead of inheriting the app's threads and connections
+            _executor = ProcessPoolExecutor(max_workers=settings.preview_workers,
+                                            mp_context=multiprocessing.get_context("spawn"))
+        return _executor
+
+    @staticmethod
+    async def run_in_pool(func, *args):
+        """Run a CPU-bound function (module-level, picklable arguments) in the preview pool"""
+        loop = asyncio.get_running_loop()
+        return await loop.run_in_executor(PreviewService._get_executor(), func, *args)
+
+    @staticmethod
+    def _record(file_id: int, content_hash: str, has_preview: bool):
+        from app.database import SessionLocal
+        db = SessionLocal()
+        try:
+            db.execute(
+                update(File).where(File.id == file_id)
+                .values(content_hash=content_hash, has_preview=has_preview)
+                .execution_options(synchronize_session=False)
+            )
+            db.commit()
+        finally:
+            db.close()
+
+    @staticmethod
+    async def generate(file_id: int, file_path: str, mime_type: str):
+        try:
+            content_hash, has_preview = await PreviewService.run_in_pool(
+                render_derivatives, file_path, mime_type, PreviewService.sizes()
+            )
+            await run_in_threadpool(PreviewService._record, file_id, content_hash, has_preview)
+        except Exception as e:
+            logger.warning(f"Preview generation failed for file {file_id}: {e}")
+
+    @staticmethod
+    def schedule(files: Iterable[File]):
+        """Generate derivatives for committed file rows in the background"""
+        if not settings.preview_enabled:
+            return
+        for file in files:
+            task = asyncio.create_task(PreviewService.generate(file.id, file.file_path, file.mime_type))
+            _pending.add(task)
+            task.add_done_callback(_pending.discard)
+
+    @staticmethod
+    def path_for(file: File, size_name: str) -> Optional[str]:
+        """Derivative path of a file, or None when it has none (yet)"""
+        if not file.has_preview or not file.content_hash or size_name not in PreviewService.sizes():
+            return None
+        return derivative_path(file.file_path, file.content_hash, size_name)
+
+    @staticmethod
+    def version(file: File) -> Optional[str]:
+        return file.content_hash[:HASH_PREFIX_LENGTH] if file.content_hash else None
+
+    @staticmethod
+    def shutdown():
+        global _executor
+        if _executor is not None:
+            _executor.shutdown(wait=False, cancel_futures=True)
+            _executor = None
@@ -0,0 +1,223 @@
+"""
+Per-request profiling
+RequestProfilingMiddleware gives every HTTP request a RequestProfile (a context
+variable, so it follows the request into the threadpool and into async database
+sessions) that accumulates:
+
+- db: time in cursor execute and the number of statements (instrument_engine)
+- cache: time in CacheManager.get, with hits and misses
+- tpl: template render time (ProfiledTemplate, see app.utils.template_cache)
+- ext: external calls wrapped in timed("ext"), e.g. web push delivery
+
+and sends them as a Server-Timing header, next to the time until the response
+started. Browsers show the breakdown in the network panel. The header reveals query
+counts and timings, so it is only sent on requests profiled as described below,
+unless server_timing_enabled turns it on for every response (development).
+
+A single request can also be profiled as a whole: send an X-Profile header equal to
+profiling_secret, or call POST /performance/profiling as an admin, which sets a
+short-lived cookie. The profile is written to profiling_directory as a pyinstrument
+HTML flame view, or as a cProfile .prof (snakeviz, flameprof) when pyinstrument is not
+installed. cProfile only sees the event loop thread, including other requests' work
+interleaved with this one, so prefer pyinstrument.
+
+With server_timing_enabled off and no profile requested, the middleware only scans the
+request headers, and every hook is a context variable lookup that finds nothing.
+"""
+
+import cProfile
+import hmac
+import logging
+import os
+import re
+import time
+from contextlib import contextmanager
+from contextvars import ContextVar
+from datetime import datetime
+from typing import Optional
+
+from sqlalchemy import event
+from sqlalchemy.engine import Engine
+from starlette.concurrency import run_in_threadpool
+from starlette.requests import cookie_parser
+
+from app.config import settings
+
+try:
+    from pyinstrument import Profiler
+    PYINSTRUMENT_AVAILABLE = True
+except ImportError:
+    PYINSTRUMENT_AVAILABLE = False
+
+logger = logging.getLogger(__name__)
+
+PROFILE_HEADER = b"x-profile"
+PROFILE_COOKIE = "cmsvs_profile"
+
+_current: ContextVar[Optional["RequestProfile"]] = ContextVar("request_profile", default=None)
+
+
+class RequestProfile:
+    """Time and counts accumulated by one HTTP request"""
+
+    __slots__ = ("started", "durations", "queries", "cache_hits", "cache_misses")
+
+    def __init__(self):
+        self.started = time.perf_counter()
+        self.durations = {"db": 0.0, "cache": 0.0, "tpl": 0.0, "ext": 0.0}
+        self.queries = 0
+        self.cache_hits = 0
+        self.cache_misses = 0
+
+    def add(self, metric: str, ms: float):
+        self.durations[metric] = self.durations.get(metric, 0.0) + ms
+
+    def record_query(self, ms: float):
+        self.queries += 1
+        self.durations["db"] += ms
+
+    def record_cache(self, hit: bool, ms: float):
+        if hit:
+            self.cache_hits += 1
+        else:
+            self.cache_misses += 1
+        self.durations["cache"] += ms
+
+    def server_timing(self) -> str:
+        descriptions = {
+            "db": f"{self.queries} queries",
+            "cache": f"{self.cache_hits} hits, {self.cache_misses} misses",
+        }
+        entries = []
+        for metric, ms in self.durations.items():
+            entry = f"{metric};dur={ms:.1f}"
+            if metric in descriptions:
+                entry += f';desc="{descriptions[metric]}"'
+            entries.append(entry)
+        entries.append(f"total;dur={(time.perf_counter() - self.started) * 1000:.1f}")
+        return ", ".join(entries)
+
+
+def current_profile() -> Optional[RequestProfile]:
+    """Profile of the request being handled, None outside a request or when disabled"""
+    return _current.get()
+
+
+@contextmanager
+def timed(metric: str):
+    """Add the time spent in the block to metric of the current request, if any"""
+    profile = _current.get()
+    if profile is None:
+        yield
+        return
+    start = time.perf_counter()
+    try:
+        yield
+    finally:
+        profile.add(metric, (time.perf_counter() - start) * 1000)
+
+
+def instrument_engine(engine: Engine):
+    """Count statements and their execution time into the current request's profile"""
+
+    @event.listens_for(engine, "before_cursor_execute")
+    def receive_before_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+        if _current.get() is not None:
+            context._profile_start = time.perf_counter()
+
+    @event.listens_for(engine, "after_cursor_execute")
+    def receive_after_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+        profile = _current.get()
+        start = getattr(context, "_profile_start", None)
+        if profile is not None and start is not None:
+            profile.record_query((time.perf_counter() - start) * 1000)
+
+
+def _profile_requested(scope) -> bool:
+    """X-Profile header matching profiling_secret, or a valid profiling cookie"""
+    for name, value in scope.get("headers", []):
+        if name == PROFILE_HEADER and settings.profiling_secret:
+            if hmac.compare_digest(value, settings.profiling_secret.encode()):
+                return True
+        elif name == b"cookie" and PROFILE_COOKIE.encode() in value:
+            token = cookie_parser(value.decode("latin-1")).get(PROFILE_COOKIE)
+            if token and _valid_cookie(token):
+                return True
+    return False
+
+
+def _valid_cookie(token: str) -> bool:
+    from app.utils.auth import verify_token
+    payload = verify_token(token)
+    return bool(payload and payload.get("scope") == "profile")
+
+
+def _profile_path(scope, extension: str) -> str:
+    slug = re.sub(r"[^A-Za-z0-9]+", "-", scope.get("path", "")).strip("-") or "root"
+    name = f"{datetime.now():%Y%m%d-%H%M%S}-{scope.get('method', 'GET')}-{slug[:80]}-{os.getpid()}.{extension}"
+    return os.path.join(settings.profiling_directory, name)
+
+
+def _start_profiler():
+    if PYINSTRUMENT_AVAILABLE:
+        profiler = Profiler(async_mode="enabled")
+        profiler.start()
+    else:
+        profiler = cProfile.Profile()
+        profiler.enable()
+    return profiler
+
+
+def _write_profile(profiler, scope) -> str:
+    os.makedirs(settings.profiling_directory, exist_ok=True)
+    if PYINSTRUMENT_AVAILABLE:
+        path = _profile_path(scope, "html")
+        with open(path, "w", encoding="utf-8") as f:
+            f.write(profiler.output_html())
+    else:
+        path = _profile_path(scope, "prof")
+        profiler.dump_stats(path)
+    return path
+
+
+class RequestProfilingMiddleware:
+    """Server-Timing breakdown for every request, and a full profile when one is requested"""
+
+    def __init__(self, app):
+        self.app = app
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+
+        dump = _profile_requested(scope)
+        if not settings.server_timing_enabled and not dump:
+            await self.app(scope, receive, send)
+            return
+
+        profile = RequestProfile()
+        token = _current.set(profile)
+
+        async def send_wrapper(message):
+            if message["type"] == "http.response.start":
+                headers = list(message.get("headers", []))
+                headers.append((b"server-timing", profile.server_timing().encode("latin-1")))
+                message = {**message, "headers": headers}
+            await send(message)
+
+        profiler = _start_profiler() if dump else None
+        try:
+            await self.app(scope, receive, send_wrapper)
+        finally:
+            _current.reset(token)
+            if profiler is not None:
+                if PYINSTRUMENT_AVAILABLE:
+                    profiler.stop()
+                else:
+                    profiler.disable()
+                try:
+                    path = await run_in_threadpool(_write_profile, profiler, scope)
+                    logger.info(f"Request profile written to {path}")
+                except Exception as e:
+                    logger.error(f"Error writing request profile: {e}")
@@ -8,6 +8,7 @@ from datetime import datetime
 from app.models.notification import PushSubscription, NotificationPreference
 from app.models.user import User
 from app.config import settings
+from app.services.profiling import timed
 
 try:
     from pywebpush import webpush, WebPushException
@@ -232,20 +233,21 @@ class PushService:
 
             # Send push notification using pywebpush
             try:
-                webpush(
-                    subscription_info={
-                        "endpoint": subscription.endpoint,
-                        "keys": {
-                            "p256dh": subscription.p256dh_key,
-                            "auth": subscription.auth_key
+                with timed("ext"):
+                    webpush(
+                        subscription_info={
+                            "endpoint": subscription.endpoint,
+                            "keys": {
+                                "p256dh": subscription.p256dh_key,
+                                "auth": subscription.auth_key
+                            }
+                        },
+                        data=json.dumps(payload),
+                        vapid_private_key=settings.vapid_private_key,
+                        vapid_claims={
+                            "sub": f"mailto:{settings.vapid_email}"
                         }
-                    },
-                    data=json.dumps(payload),
-                    vapid_private_key=settings.vapid_private_key,
-                    vapid_claims={
-                        "sub": f"mailto:{settings.vapid_email}"
-                    }
-                )
+                    )
                 logger.info(f"Push notification sent successfully: {title}")
                 return True
 
@@ -0,0 +1,81 @@
+"""
+Collision-free request number allocation for CMSVS
+Numbers look like REQ-YYYYMMDD-NNNNN: the Bahrain date followed by a per-day counter.
+The counter lives in the request_number_counters table and is advanced with a single
+INSERT ... ON CONFLICT DO UPDATE ... RETURNING, so every worker process draws from the
+same row and no two requests can receive the same number.
+"""
+
+import logging
+import threading
+from datetime import date
+from typing import Dict, Optional, Tuple
+
+from sqlalchemy import text
+from sqlalchemy.engine import Engine
+
+from app.config import settings
+from app.utils.timezone_utils import now_bahrain
+
+logger = logging.getLogger(__name__)
+
+_RESERVE_SQL = text("""
+    INSERT INTO request_number_counters (day, last_value)
+    VALUES (:day, :block)
+    ON CONFLICT (day) DO UPDATE
+    SET last_value = request_number_counters.last_value + :block
+    RETURNING last_value
+""")
+
+
+class RequestNumberAllocator:
+    """Hands out request numbers from per-day counter blocks reserved in the database"""
+
+    def __init__(self, engine: Optional[Engine] = None, block_size: int = 1):
+        self._engine = engine
+        self.block_size = max(1, block_size)
+        # Reserved but unused numbers for the current day: day -> (next_value, last_value)
+        self._blocks: Dict[date, Tuple[int, int]] = {}
+        self._lock = threading.Lock()
+
+    @property
+    def engine(self) -> Engine:
+        if self._engine is None:
+            from app.database import engine
+            self._engine = engine
+        return self._engine
+
+    @staticmethod
+    def format_number(day: date, value: int) -> str:
+        return f"REQ-{day:%Y%m%d}-{value:05d}"
+
+    def _reserve_block(self, day: date) -> Tuple[int, int]:
+        """Advance the day's counter by block_size and return the reserved (first, last) values"""
+        # Runs on its own connection and commits immediately, so the counter row is locked
+        # only for this statement and not for the caller's whole transaction
+        with self.engine.begin() as conn:
+            last_value = conn.execute(_RESERVE_SQL, {"day": day, "block": self.block_size}).scalar_one()
+        return last_value - self.block_size + 1, last_value
+
+    def allocate(self) -> str:
+        """Return a request number that no other process has been or will be given"""
+        day = now_bahrain().date()
+
+        if self.block_size == 1:
+            # Nothing is cached locally, so concurrent threads need not wait for each other
+            return self.format_number(day, self._reserve_block(day)[1])
+
+        with self._lock:
+            next_value, last_value = self._blocks.get(day, (1, 0))
+            if next_value > last_value:
+                next_value, last_value = self._reserve_block(day)
+                # Blocks from previous days can never be used again
+                self._blocks = {}
+
+            self._blocks[day] = (next_value + 1, last_value)
+
+        return self.format_number(day, next_value)
+
+
+# Global allocator
+request_number_allocator = RequestNumberAllocator(block_size=settings.request_number_block_size)
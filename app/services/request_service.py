@@ -1,11 +1,14 @@
 from typing import Optional, List, Dict, Any
-from sqlalchemy.orm import Session
-from sqlalchemy import desc, func, extract, or_
+from sqlalchemy.orm import Session, selectinload
+from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy import desc, func, extract, or_, select
 from sqlalchemy.exc import IntegrityError, OperationalError
 from app.models.request import Request, RequestStatus
 from app.models.file import File
 from app.models.user import User, UserRole
 from app.utils.file_handler import FileHandler
+from app.services.periods import PeriodCounter, PeriodCounts, current_period_bounds
+from app.services.preview_service import PreviewService
 from fastapi import UploadFile, HTTPException
 from datetime import datetime, timedelta, date
 import threading
@@ -17,7 +20,6 @@ class RequestService:
     """Service for request operations with multi-user concurrency support - Production Ready"""
 
     # Thread-safe locks for critical operations
-    _request_creation_lock = threading.Lock()
     _file_upload_lock = threading.Lock()
 
     # Production logging
@@ -48,68 +50,64 @@ class RequestService:
         description: Optional[str] = None
     ) -> Request:
         """Create a new request with civil defense form data or legacy data"""
-        # Thread-safe request creation with retry logic
-        max_retries = 3
-        retry_count = 0
+        # Request numbers come from the shared daily counter, so they cannot collide across
+        # workers. A pre-generated number may already be taken; in that case retry once
+        # with an allocated number instead.
+        request_number = pre_generated_request_number or Request.generate_request_number()
 
-        while retry_count < max_retries:
+        for attempt in range(2):
             try:
-                with RequestService._request_creation_lock:
-                    # Use pre-generated request number if provided, otherwise generate new one
-                    request_number = pre_generated_request_number or Request.generate_request_number()
-
-                    request = Request(
-                        request_number=request_number,
-                        unique_code=Request.generate_unique_code(),
-                        user_id=user_id,
-                        # New civil defense fields
-                        full_name=full_name,
-                        personal_number=personal_number,
-                        phone_number=phone_number,
-                        building_name=building_name,
-                        road_name=road_name,
-                        building_number=building_number,
-                        civil_defense_file_number=civil_defense_file_number,
-                        building_permit_number=building_permit_number,
-                        licenses_section=licenses_section,
-                        fire_equipment_section=fire_equipment_section,
-                        commercial_records_section=commercial_records_section,
-                        engineering_offices_section=engineering_offices_section,
-                        hazardous_materials_section=hazardous_materials_section,
-                        # Legacy fields for backward compatibility
-                        request_name=request_name,
-                        request_title=request_title,
-                        description=description
-                    )
+                request = Request(
+                    request_number=request_number,
+                    unique_code=Request.generate_unique_code(),
+                    user_id=user_id,
+                    # New civil defense fields
+                    full_name=full_name,
+                    personal_number=personal_number,
+                    phone_number=phone_number,
+                    building_name=building_name,
+                    road_name=road_name,
+                    building_number=building_number,
+                    civil_defense_file_number=civil_defense_file_number,
+                    building_permit_number=building_permit_number,
+                    licenses_section=licenses_section,
+                    fire_equipment_section=fire_equipment_section,
+                    commercial_records_section=commercial_records_section,
+                    engineering_offices_section=engineering_offices_section,
+                    hazardous_materials_section=hazardous_materials_section,
+                    # Legacy fields for backward compatibility
+                    request_name=request_name,
+                    request_title=request_title,
+                    description=description
+                )
 
-                    db.add(request)
-                    db.commit()
-                    db.refresh(request)
+                db.add(request)
+                db.commit()
+                db.refresh(request)
 
-                    # Send notification for new request
-                    try:
-                        from app.services.notification_service import NotificationService
-                        NotificationService.create_request_created_notification(db=db, request=request)
-                    except Exception as e:
-                        # Don't fail the request creation if notification fails
-                        import logging
-                        logger = logging.getLogger(__name__)
-                        logger.error(f"Failed to send request creation notification: {str(e)}")
+                # Send notification for new request
+                try:
+                    from app.services.notification_service import NotificationService
+                    NotificationService.create_request_created_notification(db=db, request=request)
+                except Exception as e:
+                    # Don't fail the request creation if notification fails
+                    RequestService._logger.error(f"Failed to send request creation notification: {str(e)}")
 
-                    return request
+                return request
 
-            except (IntegrityError, OperationalError) as e:
+            except IntegrityError as e:
                 db.rollback()
-                retry_count += 1
 
-                if retry_count >= max_retries:
-                    raise HTTPException(
-                        status_code=500,
-                        detail=f"Failed to create request after {max_retries} attempts: {str(e)}"
-                    )
+                # Only a taken pre-generated number (or a unique_code clash) is worth retrying
+                if attempt == 0:
+                    RequestService._logger.warning(f"Request number {request_number} rejected, allocating a new one: {e.orig}")
+                    request_number = Request.generate_request_number()
+                    continue
 
-                # Wait before retry with exponential backoff
-                time.sleep(0.1 * (2 ** retry_count))
+                raise HTTPException(
+                    status_code=500,
+                    detail=f"Failed to create request: {str(e)}"
+                )
 
             except Exception as e:
                 db.rollback()
@@ -117,7 +115,7 @@ class RequestService:
                     status_code=500,
                     detail=f"Failed to create request: {str(e)}"
                 )
-    
+
     @staticmethod
     def get_request_by_id(db: Session, request_id: int) -> Optional[Request]:
         """Get request by ID with files loaded"""
@@ -201,6 +199,28 @@ class RequestService:
 
         return query.order_by(desc(Request.created_at)).offset(skip).limit(limit).all()
 
+    @staticmethod
+    async def get_user_requests_async(
+        db: AsyncSession,
+        user_id: int,
+        skip: int = 0,
+        limit: int = 50,
+        include_archived: bool = False,
+        load_files: bool = False
+    ) -> List[Request]:
+        """Get requests for a specific user without blocking the event loop"""
+        query = select(Request).where(Request.user_id == user_id)
+
+        if load_files:
+            query = query.options(selectinload(Request.files))
+
+        # Only show non-archived requests by default
+        if not include_archived:
+            query = query.where(Request.is_archived == False)
+
+        result = await db.execute(query.order_by(desc(Request.created_at)).offset(skip).limit(limit))
+        return list(result.scalars().all())
+
     @staticmethod
     def get_user_requests_enhanced(
         db: Session,
@@ -336,6 +356,24 @@ class RequestService:
             "rejected": rejected_requests
         }
 
+    @staticmethod
+    async def get_user_request_statistics_async(db: AsyncSession, user_id: int) -> dict:
+        """Get non-archived request counts by status for a user in one grouped query"""
+        result = await db.execute(
+            select(Request.status, func.count(Request.id))
+            .where(Request.user_id == user_id, Request.is_archived == False)
+            .group_by(Request.status)
+        )
+        counts = {status: count for status, count in result.all()}
+
+        return {
+            "total": sum(counts.values()),
+            "pending": counts.get(RequestStatus.PENDING, 0),
+            "in_progress": counts.get(RequestStatus.IN_PROGRESS, 0),
+            "completed": counts.get(RequestStatus.COMPLETED, 0),
+            "rejected": counts.get(RequestStatus.REJECTED, 0)
+        }
+
     @staticmethod
     def delete_request(db: Session, request_id: int) -> bool:
         """Delete a request (hard delete)"""
@@ -718,6 +756,9 @@ class RequestService:
         for file in saved_files:
             db.refresh(file)
 
+        # Thumbnails and previews are generated in the background
+        PreviewService.schedule(saved_files)
+
         return {
             "saved_files": saved_files,
             "warnings": warnings,
@@ -1161,9 +1202,6 @@ class RequestService:
         Get comprehensive user progress tracking data for admin dashboard
         Modern implementation with realistic goals and enhanced user experience
         """
-        from sqlalchemy import func
-        from datetime import datetime, timedelta
-
         # Get active users with 'user' role (limit for performance)
         users = db.query(User).filter(
             User.role == UserRole.USER,
@@ -1173,22 +1211,6 @@ class RequestService:
         if not users:
             return []
 
-        # Time period calculations
-        now = datetime.now()
-        today_start = now.replace(hour=0, minute=0, second=0, microsecond=0)
-        today_end = now.replace(hour=23, minute=59, second=59, microsecond=999999)
-
-        # Business week calculations (last 5 business days)
-        business_week_start = RequestService._get_business_days_start(now, 5)
-        week_end = now.replace(hour=23, minute=59, second=59, microsecond=999999)
-
-        # Month calculations
-        month_start = now.replace(day=1, hour=0, minute=0, second=0, microsecond=0)
-        if now.month == 12:
-            month_end = now.replace(year=now.year + 1, month=1, day=1, hour=0, minute=0, second=0, microsecond=0) - timedelta(microseconds=1)
-        else:
-            month_end = now.replace(month=now.month + 1, day=1, hour=0, minute=0, second=0, microsecond=0) - timedelta(microseconds=1)
-
         # Realistic goals configuration
         GOALS = {
             'daily': 3,    # 3 requests per day (achievable)
@@ -1196,39 +1218,8 @@ class RequestService:
             'monthly': 50  # 50 requests per month (challenging but fair)
         }
 
-        # Get all user IDs for optimized queries
-        user_ids = [user.id for user in users]
-
-        # Optimized bulk queries for all time periods
-        daily_counts = dict(db.query(
-            Request.user_id,
-            func.count(Request.id).label('count')
-        ).filter(
-            Request.user_id.in_(user_ids),
-            Request.status == RequestStatus.COMPLETED,
-            Request.created_at >= today_start,
-            Request.created_at <= today_end
-        ).group_by(Request.user_id).all())
-
-        weekly_counts = dict(db.query(
-            Request.user_id,
-            func.count(Request.id).label('count')
-        ).filter(
-            Request.user_id.in_(user_ids),
-            Request.status == RequestStatus.COMPLETED,
-            Request.created_at >= business_week_start,
-            Request.created_at <= week_end
-        ).group_by(Request.user_id).all())
-
-        monthly_counts = dict(db.query(
-            Request.user_id,
-            func.count(Request.id).label('count')
-        ).filter(
-            Request.user_id.in_(user_ids),
-            Request.status == RequestStatus.COMPLETED,
-            Request.created_at >= month_start,
-            Request.created_at <= month_end
-        ).group_by(Request.user_id).all())
+        # All period and total counts for these users in one grouped query
+        counts = PeriodCounter.counts(db, [user.id for user in users])
 
         # Build progress data for each user
         progress_data = []
@@ -1237,9 +1228,10 @@ class RequestService:
             user_id = user.id
 
             # Get completion counts
-            daily_completed = daily_counts.get(user_id, 0)
-            weekly_completed = weekly_counts.get(user_id, 0)
-            monthly_completed = monthly_counts.get(user_id, 0)
+            user_counts = counts.get(user_id, PeriodCounts())
+            daily_completed = user_counts.completed_daily
+            weekly_completed = user_counts.completed_business_week
+            monthly_completed = user_counts.completed_monthly
 
             # Calculate progress metrics
             daily_progress = RequestService._calculate_period_progress(
@@ -1253,11 +1245,8 @@ class RequestService:
             )
 
             # Calculate user achievements
-            total_requests = db.query(Request).filter(Request.user_id == user_id).count()
-            total_completed = db.query(Request).filter(
-                Request.user_id == user_id,
-                Request.status == RequestStatus.COMPLETED
-            ).count()
+            total_requests = user_counts.total
+            total_completed = user_counts.completed
 
             completion_rate = (total_completed / total_requests * 100) if total_requests > 0 else 0
 
@@ -1361,30 +1350,11 @@ class RequestService:
         Get personal progress tracking data for individual user dashboard
         Enhanced with motivational elements and achievements
         """
-        from datetime import datetime, timedelta
-
         # Get user
         user = db.query(User).filter(User.id == user_id).first()
         if not user:
             return None
 
-        # Time period calculations (same as admin version)
-        now = datetime.now()
-        today_start = now.replace(hour=0, minute=0, second=0, microsecond=0)
-        today_end = now.replace(hour=23, minute=59, second=59, microsecond=999999)
-
-        # Week calculations (Monday to Sunday)
-        days_since_monday = now.weekday()
-        week_start = (now - timedelta(days=days_since_monday)).replace(hour=0, minute=0, second=0, microsecond=0)
-        week_end = (week_start + timedelta(days=6)).replace(hour=23, minute=59, second=59, microsecond=999999)
-
-        # Month calculations
-        month_start = now.replace(day=1, hour=0, minute=0, second=0, microsecond=0)
-        if now.month == 12:
-            month_end = now.replace(year=now.year + 1, month=1, day=1, hour=0, minute=0, second=0, microsecond=0) - timedelta(microseconds=1)
-        else:
-            month_end = now.replace(month=now.month + 1, day=1, hour=0, minute=0, second=0, microsecond=0) - timedelta(microseconds=1)
-
         # Realistic goals configuration
         GOALS = {
             'daily': 3,    # 3 requests per day
@@ -1392,27 +1362,11 @@ class RequestService:
             'monthly': 50  # 50 requests per month
         }
 
-        # Count completed requests for each period
-        daily_completed = db.query(Request).filter(
-            Request.user_id == user_id,
-            Request.status == RequestStatus.COMPLETED,
-            Request.created_at >= today_start,
-            Request.created_at <= today_end
-        ).count()
-
-        weekly_completed = db.query(Request).filter(
-            Request.user_id == user_id,
-            Request.status == RequestStatus.COMPLETED,
-            Request.created_at >= week_start,
-            Request.created_at <= week_end
-        ).count()
-
-        monthly_completed = db.query(Request).filter(
-            Request.user_id == user_id,
-            Request.status == RequestStatus.COMPLETED,
-            Request.created_at >= month_start,
-            Request.created_at <= month_end
-        ).count()
+        # Count requests for each period in one grouped query
+        counts = PeriodCounter.for_user(db, user_id)
+        daily_completed = counts.completed_daily
+        weekly_completed = counts.completed_weekly
+        monthly_completed = counts.completed_monthly
 
         # Calculate progress for each period
         daily_progress = RequestService._calculate_period_progress(
@@ -1426,11 +1380,8 @@ class RequestService:
         )
 
         # Calculate overall achievements
-        total_requests = db.query(Request).filter(Request.user_id == user_id).count()
-        total_completed = db.query(Request).filter(
-            Request.user_id == user_id,
-            Request.status == RequestStatus.COMPLETED
-        ).count()
+        total_requests = counts.total
+        total_completed = counts.completed
 
         completion_rate = (total_completed / total_requests * 100) if total_requests > 0 else 0
 
@@ -1477,30 +1428,16 @@ class RequestService:
         """
         Calculate consecutive days with completed requests (activity streak)
         """
-        from datetime import datetime, timedelta
+        today = current_period_bounds().day
 
-        now = datetime.now()
-        streak_days = 0
-        current_date = now.date()
-
-        # Check last 30 days for streak calculation
-        for i in range(30):
-            day_start = datetime.combine(current_date, datetime.min.time())
-            day_end = datetime.combine(current_date, datetime.max.time())
-
-            # Check if user had any completed requests on this day
-            daily_count = db.query(Request).filter(
-                Request.user_id == user_id,
-                Request.status == RequestStatus.COMPLETED,
-                Request.created_at >= day_start,
-                Request.created_at <= day_end
-            ).count()
+        # Check last 30 days for streak calculation, one query for all of them
+        active_days = set(PeriodCounter.completion_days(db, user_id, today - timedelta(days=29)))
 
-            if daily_count > 0:
-                streak_days += 1
-                current_date -= timedelta(days=1)
-            else:
-                break  # Streak broken
+        streak_days = 0
+        current_date = today
+        while current_date in active_days:
+            streak_days += 1
+            current_date -= timedelta(days=1)
 
         return streak_days
 
@@ -1868,43 +1805,21 @@ class RequestService:
                 return []
 
             competition_data = []
-            now = datetime.now()
 
-            # Calculate time periods
-            today_start = now.replace(hour=0, minute=0, second=0, microsecond=0)
-            business_week_start = RequestService._get_business_days_start(now, 5)
-            month_start = now.replace(day=1, hour=0, minute=0, second=0, microsecond=0)
+            # All period and total counts in one grouped query, all avatars in another
+            counts = PeriodCounter.counts(db, [user.id for user in users])
+            avatar_urls = AvatarService.get_avatar_urls(users, db)
 
             for user in users:
-                # Get user's avatar URL
-                avatar_url = AvatarService.get_avatar_url(user.id, user.full_name, db)
-
-                # Daily completed requests
-                daily_completed = db.query(Request).filter(
-                    Request.user_id == user.id,
-                    Request.status == RequestStatus.COMPLETED,
-                    Request.created_at >= today_start
-                ).count()
+                avatar_url = avatar_urls[user.id]
 
+                user_counts = counts.get(user.id, PeriodCounts())
+                daily_completed = user_counts.completed_daily
                 # Weekly completed requests (5 business days)
-                weekly_completed = db.query(Request).filter(
-                    Request.user_id == user.id,
-                    Request.status == RequestStatus.COMPLETED,
-                    Request.created_at >= business_week_start
-                ).count()
-
-                # Monthly completed requests
-                monthly_completed = db.query(Request).filter(
-                    Request.user_id == user.id,
-                    Request.status == RequestStatus.COMPLETED,
-                    Request.created_at >= month_start
-                ).count()
-
+                weekly_completed = user_counts.completed_business_week
+                monthly_completed = user_counts.completed_monthly
                 # Total completed requests (all time)
-                total_completed = db.query(Request).filter(
-                    Request.user_id == user.id,
-                    Request.status == RequestStatus.COMPLETED
-                ).count()
+                total_completed = user_counts.completed
 
                 # Calculate performance score (weighted average)
                 # Daily: 40%, Weekly: 35%, Monthly: 25%
@@ -0,0 +1,240 @@
+"""
+Retention for notifications and activities
+Old rows are moved from the hot tables to monthly-partitioned archive tables (see
+app.models.archive), so inbox, unread-count and activity queries only ever touch
+recent data:
+
+- read notifications older than notification_retention_days, and unread ones older
+  than notification_unread_retention_days
+- activities older than activity_retention_days
+
+Rows move in batches of retention_batch_size, each one DELETE ... RETURNING feeding an
+INSERT into the archive in its own short transaction. Batches walk the primary key
+upwards to an ID boundary taken from the created_at index, and skip rows locked by
+other transactions. Archive partitions older than archive_retention_days are detached
+and dropped whole instead of deleted row by row.
+
+Every worker runs the scheduler; a transaction-level advisory lock per step makes the
+others skip the pass while one is working.
+"""
+
+import asyncio
+import logging
+import re
+from datetime import datetime, timedelta, timezone
+from typing import Dict, NamedTuple, Optional
+
+from sqlalchemy import func, select, text
+from sqlalchemy.orm import Session
+from starlette.concurrency import run_in_threadpool
+
+from app.config import settings
+from app.models import archive  # noqa: F401 - archive tables for create_all
+from app.services.metrics import prometheus_metrics
+
+logger = logging.getLogger(__name__)
+
+_RETENTION_LOCK_ID = 741_002
+
+_PARTITION_SUFFIX = re.compile(r"_y(\d{4})m(\d{2})$")
+
+
+class RetentionPolicy(NamedTuple):
+    table: str
+    archive_table: str
+    columns: str  # Archive column list
+    select_columns: str  # Matching expressions over the deleted rows
+    condition: str  # Rows to move; :cutoff is the oldest age kept for any row
+
+
+POLICIES = {
+    "notifications": RetentionPolicy(
+        table="notifications",
+        archive_table="notifications_archive",
+        columns="id, created_at, user_id, type, priority, title, message, action_url, request_id, "
+                "related_user_id, is_read, is_sent, sent_at, read_at, extra_data, updated_at",
+        select_columns="id, created_at, user_id, type::text, priority::text, title, message, action_url, "
+                       "request_id, related_user_id, is_read, is_sent, sent_at, read_at, extra_data, updated_at",
+        condition="created_at < :cutoff AND (is_read OR created_at < :unread_cutoff)",
+    ),
+    "activities": RetentionPolicy(
+        table="activities",
+        archive_table="activities_archive",
+        columns="id, created_at, activity_type, description, details, ip_address, user_agent, user_id",
+        select_columns="id, created_at, activity_type::text, description, details, ip_address, user_agent, user_id",
+        condition="created_at < :cutoff",
+    ),
+}
+
+
+def _month_start(moment: datetime) -> datetime:
+    moment = moment.astimezone(timezone.utc)
+    return datetime(moment.year, moment.month, 1, tzinfo=timezone.utc)
+
+
+def _next_month(month: datetime) -> datetime:
+    return (month + timedelta(days=32)).replace(day=1)
+
+
+def _locked(db: Session) -> bool:
+    """Take the retention lock for the current transaction; False if another worker holds it"""
+    return db.execute(select(func.pg_try_advisory_xact_lock(_RETENTION_LOCK_ID))).scalar()
+
+
+class RetentionService:
+    """Moves old rows to the archive tables and drops expired archive partitions"""
+
+    @staticmethod
+    def cutoffs(now: Optional[datetime] = None) -> Dict[str, Dict[str, datetime]]:
+        now = now or datetime.now(timezone.utc)
+        return {
+            "notifications": {
+                "cutoff": now - timedelta(days=settings.notification_retention_days),
+                "unread_cutoff": now - timedelta(days=settings.notification_unread_retention_days),
+            },
+            "activities": {
+                "cutoff": now - timedelta(days=settings.activity_retention_days),
+            },
+        }
+
+    @staticmethod
+    def ensure_partitions(db: Session, policy: RetentionPolicy, until: datetime) -> int:
+        """Create the archive's monthly partitions for every month of rows about to move"""
+        oldest = db.execute(text(f"SELECT min(created_at) FROM {policy.table}")).scalar()
+        if oldest is None or oldest >= until:
+            return 0
+
+        created = 0
+        month = _month_start(oldest)
+        while month <= until:
+            following = _next_month(month)
+            name = f"{policy.archive_table}_y{month.year:04d}m{month.month:02d}"
+            db.execute(text(
+                f"CREATE TABLE IF NOT EXISTS {name} PARTITION OF {policy.archive_table} "
+                f"FOR VALUES FROM ('{month.isoformat()}') TO ('{following.isoformat()}')"
+            ))
+            created += 1
+            month = following
+        return created
+
+    @staticmethod
+    def archive_rows(db: Session, policy: RetentionPolicy, params: Dict[str, datetime]) -> Optional[int]:
+        """Move every expired row in batches; None if another worker is already doing it"""
+        if not _locked(db):
+            db.rollback()
+            return None
+        boundary = db.execute(
+            text(f"SELECT max(id) FROM {policy.table} WHERE created_at < :cutoff"),
+            {"cutoff": params["cutoff"]}
+        ).scalar()
+        if boundary is None:
+            db.commit()
+            return 0
+        RetentionService.ensure_partitions(db, policy, params["cutoff"])
+        db.commit()
+
+        move = text(f"""
+            WITH batch AS (
+                SELECT id FROM {policy.table}
+                WHERE id > :after AND id <= :boundary AND {policy.condition}
+                ORDER BY id
+                LIMIT :batch_size
+                FOR UPDATE SKIP LOCKED
+            ), moved AS (
+                DELETE FROM {policy.table} t USING batch
+                WHERE t.id = batch.id
+                RETURNING t.*
+            )
+            INSERT INTO {policy.archive_table} ({policy.columns})
+            SELECT {policy.select_columns} FROM moved
+            RETURNING id
+        """)
+
+        moved, after = 0, 0
+        while True:
+            try:
+                if not _locked(db):
+                    db.rollback()
+                    break
+                ids = db.execute(move, {
+                    **params, "after": after, "boundary": boundary, "batch_size": settings.retention_batch_size
+                }).scalars().all()
+                db.commit()
+            except Exception:
+                db.rollback()
+                raise
+            if not ids:
+                break
+            moved += len(ids)
+            after = max(ids)
+            prometheus_metrics.record_retention(policy.table, "archived", len(ids))
+        return moved
+
+    @staticmethod
+    def drop_expired_partitions(db: Session, policy: RetentionPolicy, now: Optional[datetime] = None) -> int:
+        """Detach and drop archive partitions whose whole month is past archive_retention_days"""
+        if settings.archive_retention_days <= 0:
+            return 0
+        expiry = (now or datetime.now(timezone.utc)) - timedelta(days=settings.archive_retention_days)
+
+        partitions = db.execute(text("""
+            SELECT child.relname
+            FROM pg_inherits
+            JOIN pg_class child ON child.oid = pg_inherits.inhrelid
+            JOIN pg_class parent ON parent.oid = pg_inherits.inhparent
+            WHERE parent.relname = :parent
+        """), {"parent": policy.archive_table}).scalars().all()
+        db.commit()
+
+        dropped_rows = 0
+        for name in sorted(partitions):
+            match = _PARTITION_SUFFIX.search(name)
+            if not match:
+                continue
+            month = datetime(int(match.group(1)), int(match.group(2)), 1, tzinfo=timezone.utc)
+            if _next_month(month) > expiry:
+                continue
+            try:
+                if not _locked(db):
+                    db.rollback()
+                    break
+                rows = db.execute(text(f"SELECT count(*) FROM {name}")).scalar()
+                db.execute(text(f"ALTER TABLE {policy.archive_table} DETACH PARTITION {name}"))
+                db.execute(text(f"DROP TABLE {name}"))
+                db.commit()
+            except Exception:
+                db.rollback()
+                raise
+            dropped_rows += rows
+            prometheus_metrics.record_retention(policy.archive_table, "dropped", rows)
+            logger.info(f"Dropped archive partition {name} ({rows} rows)")
+        return dropped_rows
+
+    @staticmethod
+    def run_once(now: Optional[datetime] = None) -> Dict[str, Dict[str, Optional[int]]]:
+        from app.database import SessionLocal
+        results = {}
+        cutoffs = RetentionService.cutoffs(now)
+        db = SessionLocal()
+        try:
+            for name, policy in POLICIES.items():
+                archived = RetentionService.archive_rows(db, policy, cutoffs[name])
+                dropped = RetentionService.drop_expired_partitions(db, policy, now)
+                results[name] = {"archived": archived, "dropped": dropped}
+                if archived or dropped:
+                    logger.info(f"Retention for {name}: {archived} rows archived, {dropped} archived rows dropped")
+        finally:
+            db.close()
+        return results
+
+
+async def run_retention_scheduler():
+    """Background task: apply retention every retention_interval seconds"""
+    while True:
+        try:
+            await run_in_threadpool(RetentionService.run_once)
+        except asyncio.CancelledError:
+            raise
+        except Exception as e:
+            logger.error(f"Retention scheduler error: {e}")
+        await asyncio.sleep(settings.retention_interval)
@@ -0,0 +1,260 @@
+"""
+Statistical sampling profiler for live workers
+A StackSampler installs a timer signal handler (SIGPROF on CPU time, or SIGALRM on
+wall-clock time) that records the Python stack of every thread each interval, so real
+traffic can be profiled in production without redeploying or slowing requests down
+noticeably. Threads that are only waiting (idle pool workers, the event loop in
+select) are left out.
+
+GET /performance/profile samples for N seconds and returns collapsed stacks
+(flamegraph.pl, speedscope, inferno) or speedscope JSON. To cover every gunicorn
+worker, the endpoint drops a request file into sampling_profiler_directory. Each
+worker's run_sampling_watcher() polls for request files, samples until the request's
+end time and writes its stacks next to it. The endpoint then merges whatever the
+workers wrote. The directory must be shared by the workers, i.e. local to the host.
+"""
+
+import asyncio
+import json
+import logging
+import os
+import shutil
+import signal
+import sys
+import threading
+import time
+import uuid
+from collections import Counter
+from pathlib import Path
+from typing import Any, Dict, List, Optional, Tuple
+
+from app.config import settings
+
+logger = logging.getLogger(__name__)
+
+SAMPLING_AVAILABLE = hasattr(signal, "setitimer")
+
+TIMERS = {
+    "cpu": ("ITIMER_PROF", "SIGPROF"),
+    "wall": ("ITIMER_REAL", "SIGALRM"),
+}
+
+# Leaf frames of threads that are blocked waiting, not working
+_IDLE_LEAVES = {
+    ("threading.py", "wait"),
+    ("threading.py", "_wait_for_tstate_lock"),
+    ("selectors.py", "select"),
+    ("thread.py", "_worker"),
+}
+
+_STALE_REQUEST_SECONDS = 300
+
+
+class StackSampler:
+    """Counts the stack of every thread on each timer signal"""
+
+    def __init__(self, interval_ms: int, mode: str = "cpu", include_idle: bool = False):
+        timer_name, signal_name = TIMERS[mode]
+        self.timer = getattr(signal, timer_name)
+        self.signum = getattr(signal, signal_name)
+        self.interval = interval_ms / 1000
+        self.include_idle = include_idle
+        self.samples: Counter = Counter()
+        self._labels: Dict[Any, str] = {}
+        self._previous_handler = None
+        self._root = os.getcwd() + os.sep
+
+    def _label(self, code) -> str:
+        label = self._labels.get(code)
+        if label is None:
+            filename = code.co_filename
+            if filename.startswith(self._root):
+                filename = filename[len(self._root):]
+            label = f"{code.co_name} ({filename}:{code.co_firstlineno})"
+            self._labels[code] = label
+        return label
+
+    def _on_signal(self, signum, frame):
+        main_ident = threading.main_thread().ident
+        for ident, top in sys._current_frames().items():
+            # The main thread's own top frame is this handler; use the interrupted frame
+            if ident == main_ident:
+                top = frame
+            if top is None:
+                continue
+            if not self.include_idle and (os.path.basename(top.f_code.co_filename), top.f_code.co_name) in _IDLE_LEAVES:
+                continue
+            stack = []
+            while top is not None:
+                stack.append(self._label(top.f_code))
+                top = top.f_back
+            # Read without the threading lock, which this handler may have interrupted
+            thread = threading._active.get(ident)
+            stack.append(f"thread {thread.name if thread else ident}")
+            stack.reverse()
+            self.samples[";".join(stack)] += 1
+
+    def start(self):
+        self._previous_handler = signal.signal(self.signum, self._on_signal)
+        signal.setitimer(self.timer, self.interval, self.interval)
+
+    def stop(self):
+        signal.setitimer(self.timer, 0)
+        signal.signal(self.signum, self._previous_handler or signal.SIG_DFL)
+
+
+_active: Optional[StackSampler] = None
+
+
+async def sample(seconds: float, interval_ms: int, mode: str = "cpu", include_idle: bool = False) -> Counter:
+    """Sample this process for seconds; must run on the main thread's event loop"""
+    global _active
+    if not SAMPLING_AVAILABLE:
+        raise RuntimeError("Signal-based sampling is not available on this platform")
+    if _active is not None:
+        raise RuntimeError("A sampling session is already running in this worker")
+    sampler = StackSampler(interval_ms, mode, include_idle)
+    _active = sampler
+    sampler.start()
+    try:
+        await asyncio.sleep(seconds)
+    finally:
+        sampler.stop()
+        _active = None
+    return sampler.samples
+
+
+def _directory() -> Path:
+    return Path(settings.sampling_profiler_directory)
+
+
+def _write_atomic(path: Path, content: str):
+    path.parent.mkdir(parents=True, exist_ok=True)
+    temporary = path.with_name(f".{path.name}.{os.getpid()}.tmp")
+    temporary.write_text(content, encoding="utf-8")
+    temporary.replace(path)
+
+
+def request_session(seconds: float, interval_ms: int, mode: str, include_idle: bool) -> Tuple[str, float]:
+    """Ask every worker to sample until now + seconds; returns the session id and end time"""
+    session = f"{int(time.time())}-{uuid.uuid4().hex[:8]}"
+    end = time.time() + seconds
+    _write_atomic(_directory() / "requests" / f"{session}.json", json.dumps({
+        "end": end, "interval_ms": interval_ms, "mode": mode, "include_idle": include_idle
+    }))
+    return session, end
+
+
+def collect_session(session: str) -> Dict[int, Counter]:
+    """Stacks written by each worker for session; removes the session's files"""
+    results = {}
+    session_dir = _directory() / session
+    if session_dir.is_dir():
+        for path in session_dir.glob("*.collapsed"):
+            results[int(path.stem)] = parse_collapsed(path.read_text(encoding="utf-8"))
+    shutil.rmtree(session_dir, ignore_errors=True)
+    (_directory() / "requests" / f"{session}.json").unlink(missing_ok=True)
+    return results
+
+
+def _pending_requests() -> List[Tuple[str, Dict[str, Any]]]:
+    requests_dir = _directory() / "requests"
+    if not requests_dir.is_dir():
+        return []
+    pending = []
+    now = time.time()
+    for path in requests_dir.glob("*.json"):
+        try:
+            spec = json.loads(path.read_text(encoding="utf-8"))
+        except (OSError, ValueError):
+            continue
+        if spec["end"] < now - _STALE_REQUEST_SECONDS:
+            # Left behind by an endpoint that did not finish
+            path.unlink(missing_ok=True)
+            shutil.rmtree(_directory() / path.stem, ignore_errors=True)
+        elif spec["end"] > now:
+            pending.append((path.stem, spec))
+    return pending
+
+
+async def _sample_for_session(session: str, spec: Dict[str, Any]):
+    try:
+        samples = await sample(
+            spec["end"] - time.time(), spec["interval_ms"], spec["mode"], spec.get("include_idle", False)
+        )
+    except RuntimeError as e:
+        logger.warning(f"Skipping sampling session {session}: {e}")
+        return
+    _write_atomic(_directory() / session / f"{os.getpid()}.collapsed", collapsed(samples))
+
+
+async def run_sampling_watcher():
+    """Background task: join sampling sessions requested through the shared directory"""
+    joined, tasks = set(), set()
+    while True:
+        try:
+            for session, spec in _pending_requests():
+                if session not in joined:
+                    joined.add(session)
+                    # Keep a reference so the task is not garbage collected while sampling
+                    task = asyncio.create_task(_sample_for_session(session, spec))
+                    tasks.add(task)
+                    task.add_done_callback(tasks.discard)
+        except asyncio.CancelledError:
+            raise
+        except Exception as e:
+            logger.error(f"Sampling watcher error: {e}")
+        await asyncio.sleep(settings.sampling_profiler_poll_seconds)
+
+
+def merge(results: Dict[int, Counter]) -> Counter:
+    merged = Counter()
+    for samples in results.values():
+        merged.update(samples)
+    return merged
+
+
+def collapsed(samples: Counter) -> str:
+    """One "frame;frame;frame count" line per distinct stack, root first"""
+    return "".join(f"{stack} {count}\n" for stack, count in samples.most_common())
+
+
+def parse_collapsed(text: str) -> Counter:
+    samples = Counter()
+    for line in text.splitlines():
+        stack, _, count = line.rpartition(" ")
+        if stack and count.isdigit():
+            samples[stack] += int(count)
+    return samples
+
+
+def speedscope(samples: Counter, name: str, interval_ms: int) -> Dict[str, Any]:
+    """Speedscope file with one sampled profile; weights are in milliseconds"""
+    frames: List[Dict[str, str]] = []
+    index: Dict[str, int] = {}
+    stacks, weights = [], []
+    for stack, count in samples.most_common():
+        indices = []
+        for label in stack.split(";"):
+            if label not in index:
+                index[label] = len(frames)
+                frames.append({"name": label})
+            indices.append(index[label])
+        stacks.append(indices)
+        weights.append(count * interval_ms)
+    return {
+        "$schema": "https://www.speedscope.app/file-format-schema.json",
+        "name": name,
+        "exporter": "cmsvs",
+        "activeProfileIndex": 0,
+        "shared": {"frames": frames},
+        "profiles": [{
+            "type": "sampled",
+            "name": name,
+            "unit": "milliseconds",
+            "startValue": 0,
+            "endValue": sum(weights),
+            "samples": stacks,
+            "weights": weights,
+        }],
+    }
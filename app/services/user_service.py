@@ -1,10 +1,13 @@
 from typing import Optional, List
 from sqlalchemy.orm import Session
-from sqlalchemy import desc
+from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy import desc, func, select
 from app.models.user import User, UserRole, UserStatus
 from app.models.activity import Activity, ActivityType
 from app.utils.auth import get_password_hash, verify_password
 from app.services.cache import cached, cache
+from app.services.activity_sink import activity_sink
+from app.config import settings
 from fastapi import HTTPException
 import logging
 
@@ -83,6 +86,12 @@ class UserService:
             logger.debug(f"Retrieved user {username} from database")
         return user
 
+    @staticmethod
+    async def get_user_by_username_async(db: AsyncSession, username: str) -> Optional[User]:
+        """Get user by username without blocking the event loop"""
+        result = await db.execute(select(User).where(User.username == username))
+        return result.scalar_one_or_none()
+
     @staticmethod
     @cached(ttl=300, key_prefix="user")
     def get_user_by_email(db: Session, email: str) -> Optional[User]:
@@ -193,6 +202,24 @@ class UserService:
 
         return query.count()
     
+    @staticmethod
+    def get_approval_statistics(db: Session) -> dict:
+        """Users per approval status (and in total) from one grouped count"""
+        counts = dict(
+            db.query(User.approval_status, func.count(User.id)).group_by(User.approval_status).all()
+        )
+        return {
+            "pending": counts.get(UserStatus.PENDING, 0),
+            "approved": counts.get(UserStatus.APPROVED, 0),
+            "rejected": counts.get(UserStatus.REJECTED, 0),
+            "total": sum(counts.values())
+        }
+
+    @staticmethod
+    def get_user_choices(db: Session) -> list:
+        """(id, full_name, email) of every user, for filter dropdowns"""
+        return db.query(User.id, User.full_name, User.email).order_by(User.full_name).all()
+
     @staticmethod
     def update_user(
         db: Session,
@@ -335,8 +362,12 @@ class UserService:
         description: str,
         ip_address: Optional[str] = None,
         user_agent: Optional[str] = None
-    ) -> Activity:
-        """Log user activity"""
+    ) -> Optional[Activity]:
+        """Log user activity (queued for the write-behind sink unless it is disabled)"""
+        if settings.activity_write_behind:
+            activity_sink.record(user_id, activity_type, description, ip_address=ip_address, user_agent=user_agent)
+            return None
+
         activity = Activity(
             user_id=user_id,
             activity_type=activity_type,
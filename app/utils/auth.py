@@ -1,3 +1,4 @@
+import logging
 from datetime import datetime, timedelta
 from typing import Optional, Union
 from jose import JWTError, jwt
@@ -5,10 +6,14 @@ from passlib.context import CryptContext
 from fastapi import HTTPException, status, Depends, Request
 from fastapi.security import HTTPBearer, HTTPAuthorizationCredentials
 from sqlalchemy.orm import Session
+from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy import select
 from app.config import settings
-from app.database import get_db
+from app.database import get_db, get_async_db
 from app.models.user import User, UserRole, UserStatus
 
+logger = logging.getLogger(__name__)
+
 # Password hashing
 pwd_context = CryptContext(schemes=["bcrypt"], deprecated="auto")
 
@@ -100,6 +105,52 @@ def get_current_user(
     return user
 
 
+async def get_current_user_cookie_async(
+    request: Request,
+    db: AsyncSession = Depends(get_async_db)
+) -> User:
+    """Get current active user from the access_token cookie using the async session
+
+    Same rules as get_current_user_cookie in app.routes.dashboard, including the
+    Authorization header fallback for mobile clients without the cookie.
+    """
+    token = request.cookies.get("access_token")
+
+    # Mobile fallback: check for token in headers if cookie is missing
+    if not token:
+        user_agent = request.headers.get("User-Agent", "").lower()
+        if any(indicator in user_agent for indicator in ['mobile', 'android', 'iphone', 'ipad', 'tablet']):
+            auth_header = request.headers.get("Authorization")
+            if auth_header and auth_header.startswith("Bearer "):
+                token = auth_header
+                logger.info(f"Using Authorization header for mobile - IP: {request.client.host if request.client else 'unknown'}")
+
+    if not token:
+        raise HTTPException(status_code=403, detail="Not authenticated")
+
+    # Remove 'Bearer ' prefix if present
+    if token.startswith("Bearer "):
+        token = token[7:]
+
+    payload = verify_token(token)
+    if not payload:
+        raise HTTPException(status_code=403, detail="Invalid token")
+
+    username = payload.get("sub")
+    if not username:
+        raise HTTPException(status_code=403, detail="Invalid token")
+
+    result = await db.execute(select(User).where(User.username == username))
+    user = result.scalar_one_or_none()
+    if not user:
+        raise HTTPException(status_code=403, detail="User not found")
+
+    if not user.is_active:
+        raise HTTPException(status_code=403, detail="Inactive user")
+
+    return user
+
+
 def get_current_active_user(current_user: User = Depends(get_current_user)) -> User:
     """Get current active user"""
     if not current_user.is_active:
@@ -9,6 +9,8 @@ from typing import List, Optional, Dict, Any
 from datetime import datetime
 from fastapi import UploadFile
 from app.config import settings
+from app.services.metrics import prometheus_metrics
+from app.utils.previews import delete_derivatives
 
 
 class FileHandler:
@@ -253,6 +255,8 @@ class FileHandler:
                 "mime_type": mime_type
             })
 
+            prometheus_metrics.record_upload(saved_size, category="request_file")
+
             logging.getLogger(__name__).info(f"File saved successfully: {stored_filename} ({saved_size} bytes)")
 
         except Exception as e:
@@ -278,8 +282,9 @@ class FileHandler:
 
     @staticmethod
     def delete_file(file_path: str) -> bool:
-        """Delete a file from the filesystem"""
+        """Delete a file and its previews from the filesystem"""
         try:
+            delete_derivatives(file_path)
             if os.path.exists(file_path):
                 os.remove(file_path)
                 return True
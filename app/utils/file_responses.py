@@ -0,0 +1,123 @@
+"""
+Responses for authorized file downloads
+Routes check access and hand the file to serve_file. In the default "app" mode the
+worker sends the file itself; with FILE_SERVING_MODE=x_accel it only returns an
+X-Accel-Redirect to nginx's internal location (nginx/conf.d/app.conf) and nginx sends
+the bytes with sendfile, ranges included.
+
+Both modes validate the same way: the ETag uses nginx's own format (hex mtime and hex
+size) and Last-Modified is the file's mtime, so cached copies stay valid across modes.
+Conditional requests are answered with 304 before any redirect or file read.
+"""
+
+import os
+import re
+from email.utils import formatdate, parsedate_to_datetime
+from typing import Optional
+from urllib.parse import quote
+
+from fastapi import HTTPException, Request
+from fastapi.responses import FileResponse, Response, StreamingResponse
+
+from app.config import settings
+
+X_ACCEL = settings.file_serving_mode == "x_accel"
+CHUNK_SIZE = 64 * 1024
+
+_SINGLE_RANGE = re.compile(r"^bytes=(\d*)-(\d*)$")
+
+
+def _etag(stat: os.stat_result) -> str:
+    return f'"{int(stat.st_mtime):x}-{stat.st_size:x}"'
+
+
+def _content_disposition(filename: Optional[str], inline: bool) -> str:
+    disposition = "inline" if inline else "attachment"
+    if not filename:
+        return disposition
+    quoted = quote(filename)
+    if quoted != filename:
+        return f"{disposition}; filename*=utf-8''{quoted}"
+    return f'{disposition}; filename="{filename}"'
+
+
+def _not_modified(request: Request, etag: str, mtime: float) -> bool:
+    if_none_match = request.headers.get("if-none-match")
+    if if_none_match is not None:
+        tags = [tag.strip().removeprefix("W/") for tag in if_none_match.split(",")]
+        return etag in tags or "*" in tags
+
+    if_modified_since = request.headers.get("if-modified-since")
+    if if_modified_since:
+        try:
+            return int(mtime) <= parsedate_to_datetime(if_modified_since).timestamp()
+        except (TypeError, ValueError):
+            return False
+    return False
+
+
+def _internal_uri(path: str) -> Optional[str]:
+    """nginx internal location for a file under the upload directory"""
+    relative = os.path.relpath(os.path.abspath(path), os.path.abspath(settings.upload_directory))
+    if relative.startswith(os.pardir):
+        return None
+    return settings.x_accel_location.rstrip("/") + "/" + quote(relative.replace(os.sep, "/"))
+
+
+def _iter_range(path: str, start: int, length: int):
+    with open(path, "rb") as f:
+        f.seek(start)
+        while length > 0:
+            chunk = f.read(min(CHUNK_SIZE, length))
+            if not chunk:
+                break
+            length -= len(chunk)
+            yield chunk
+
+
+def serve_file(request: Request, path: str, media_type: str, filename: Optional[str] = None,
+               inline: bool = False, cache_control: str = "private, no-cache") -> Response:
+    """Send a file the caller has authorized, honoring conditional and single-range requests"""
+    try:
+        stat = os.stat(path)
+    except FileNotFoundError:
+        raise HTTPException(status_code=404, detail="File not found on disk")
+
+    etag = _etag(stat)
+    headers = {
+        "ETag": etag,
+        "Last-Modified": formatdate(stat.st_mtime, usegmt=True),
+        "Cache-Control": cache_control,
+        "Accept-Ranges": "bytes",
+    }
+    if _not_modified(request, etag, stat.st_mtime):
+        return Response(status_code=304, headers=headers)
+
+    headers["Content-Disposition"] = _content_disposition(filename, inline)
+
+    internal_uri = _internal_uri(path) if X_ACCEL else None
+    if internal_uri:
+        # nginx replaces the body, and handles Range/If-Range itself
+        headers["X-Accel-Redirect"] = internal_uri
+        return Response(media_type=media_type, headers=headers)
+
+    size = stat.st_size
+    range_header = request.headers.get("range")
+    if_range = request.headers.get("if-range")
+    match = _SINGLE_RANGE.match(range_header.strip()) if range_header else None
+    # If-Range with a stale validator, multiple ranges or malformed ranges get the whole file
+    if match and match.groups() != ("", "") and (not if_range or if_range in (etag, headers["Last-Modified"])):
+        first, last = match.groups()
+        if first:
+            start, end = int(first), min(int(last), size - 1) if last else size - 1
+        else:
+            start, end = max(size - int(last), 0), size - 1
+        if start >= size or start > end:
+            return Response(status_code=416, headers={"Content-Range": f"bytes */{size}"})
+
+        headers["Content-Range"] = f"bytes {start}-{end}/{size}"
+        headers["Content-Length"] = str(end - start + 1)
+        return StreamingResponse(_iter_range(path, start, end - start + 1), status_code=206,
+                                 media_type=media_type, headers=headers)
+
+    return FileResponse(path=path, media_type=media_type, headers=headers, stat_result=stat)
@@ -0,0 +1,61 @@
+"""
+Lazily loaded page fragments
+The heavy admin pages render a shell straight away and fetch each widget with
+hx-get="/admin/fragments/..." hx-trigger="load", so the first byte no longer waits for
+the slowest widget and the widgets load concurrently. A fragment endpoint loads its
+data and renders its partial in the threadpool, and keeps the HTML in the shared cache
+for admin_fragment_ttl seconds under the application version and the fragment's
+parameters (see fragment_key; invalidate_fragment in app.utils.template_cache drops one).
+
+Every fragment response has a Server-Timing header (data and render time, or the
+fragment cache lookup as "hit"), which the browser's network panel shows per widget.
+"""
+
+import time
+from typing import Any, Callable, Dict, Optional
+
+from fastapi.responses import HTMLResponse
+from starlette.concurrency import run_in_threadpool
+
+from app.config import settings
+from app.services.cache import cache
+from app.utils.template_cache import fragment_key
+from app.utils.templates import templates
+
+
+def server_timing(**durations: float) -> str:
+    """Server-Timing header value from metric=milliseconds pairs"""
+    return ", ".join(f"{metric};dur={ms:.1f}" for metric, ms in durations.items())
+
+
+async def render_fragment(
+    request,
+    name: str,
+    template: str,
+    load: Callable[[], Dict[str, Any]],
+    params: Optional[Dict[str, Any]] = None,
+    ttl: Optional[int] = None
+) -> HTMLResponse:
+    """Render template with the context returned by load(), cached per name and params"""
+    key = fragment_key(name, params)
+    start = time.perf_counter()
+    html = cache.get(key)
+    if html is not None:
+        return HTMLResponse(html, headers={
+            "Server-Timing": server_timing(hit=(time.perf_counter() - start) * 1000)
+        })
+
+    def build():
+        # Both steps may touch the database (lazy relationships), so neither runs on the event loop
+        loaded = time.perf_counter()
+        context = load()
+        rendered = time.perf_counter()
+        html = templates.get_template(template).render({"request": request, **(params or {}), **context})
+        return html, (rendered - loaded) * 1000, (time.perf_counter() - rendered) * 1000
+
+    html, data_ms, render_ms = await run_in_threadpool(build)
+    cache.set(key, html, ttl or settings.admin_fragment_ttl)
+    return HTMLResponse(html, headers={
+        "Server-Timing": server_timing(data=data_ms, render=render_ms)
+    })
+
@@ -0,0 +1,245 @@
+"""
+Non-blocking logging pipeline for CMSVS application
+Log calls only enqueue records; a background QueueListener thread formats and writes them.
+Includes per-logger rate limiting, sampling of high-volume messages and an orjson formatter.
+"""
+
+import atexit
+import logging
+import logging.handlers
+import queue
+import sys
+import threading
+import time
+from pathlib import Path
+from typing import Dict, List, Optional
+
+try:
+    import orjson
+    ORJSON_AVAILABLE = True
+except ImportError:
+    import json
+    ORJSON_AVAILABLE = False
+
+from app.config import settings
+
+# Attributes every LogRecord has; anything else was passed through `extra`
+_STANDARD_RECORD_ATTRS = frozenset(
+    logging.LogRecord("", 0, "", 0, "", (), None).__dict__.keys()
+) | {"message", "asctime", "taskName"}
+
+_listener: Optional[logging.handlers.QueueListener] = None
+
+
+class OrjsonFormatter(logging.Formatter):
+    """JSON formatter using orjson (falls back to json)"""
+
+    def format(self, record: logging.LogRecord) -> str:
+        log_entry = {
+            "timestamp": self.formatTime(record, self.datefmt),
+            "level": record.levelname,
+            "logger": record.name,
+            "message": record.getMessage(),
+            "module": record.module,
+            "function": record.funcName,
+            "line": record.lineno
+        }
+
+        # Add exception info if present
+        if record.exc_info:
+            log_entry["exception"] = self.formatException(record.exc_info)
+
+        # Add extra fields
+        for key in record.__dict__.keys() - _STANDARD_RECORD_ATTRS:
+            log_entry[key] = record.__dict__[key]
+
+        if ORJSON_AVAILABLE:
+            return orjson.dumps(log_entry, default=str).decode()
+        return json.dumps(log_entry, default=str, ensure_ascii=False)
+
+
+class RateLimitFilter(logging.Filter):
+    """Per-logger token bucket for records below WARNING"""
+
+    def __init__(self, rate_per_second: float, burst: int):
+        super().__init__()
+        self.rate = rate_per_second
+        self.burst = burst
+        self._buckets: Dict[str, List[float]] = {}  # logger -> [tokens, last_refill]
+        self._suppressed: Dict[str, int] = {}
+        self._lock = threading.Lock()
+
+    def filter(self, record: logging.LogRecord) -> bool:
+        if record.levelno >= logging.WARNING:
+            return True
+
+        now = time.monotonic()
+        with self._lock:
+            bucket = self._buckets.get(record.name)
+            if bucket is None:
+                bucket = self._buckets[record.name] = [float(self.burst), now]
+            else:
+                bucket[0] = min(self.burst, bucket[0] + (now - bucket[1]) * self.rate)
+                bucket[1] = now
+
+            if bucket[0] < 1:
+                self._suppressed[record.name] = self._suppressed.get(record.name, 0) + 1
+                return False
+            bucket[0] -= 1
+
+            # Report what was dropped once the logger is allowed through again
+            suppressed = self._suppressed.pop(record.name, 0)
+        if suppressed:
+            record.msg = f"{record.getMessage()} [rate limited: {suppressed} earlier messages suppressed]"
+            record.args = None
+        return True
+
+
+class SamplingFilter(logging.Filter):
+    """Keep 1 in N records below WARNING for configured high-volume loggers"""
+
+    def __init__(self, sample_rates: Dict[str, float]):
+        super().__init__()
+        # Store as "keep every Nth record" so no random numbers are drawn per record
+        self._intervals = {
+            name: max(1, round(1 / rate)) for name, rate in sample_rates.items() if 0 < rate < 1
+        }
+        self._dropped = {name for name, rate in sample_rates.items() if rate <= 0}
+        self._counters: Dict[str, int] = {}
+
+    def filter(self, record: logging.LogRecord) -> bool:
+        if record.levelno >= logging.WARNING:
+            return True
+        if record.name in self._dropped:
+            return False
+
+        interval = self._intervals.get(record.name)
+        if interval is None:
+            return True
+
+        count = self._counters.get(record.name, 0)
+        self._counters[record.name] = count + 1
+        return count % interval == 0
+
+
+class NonBlockingQueueHandler(logging.handlers.QueueHandler):
+    """QueueHandler that never blocks the caller and defers formatting to the listener thread"""
+
+    def __init__(self, log_queue: queue.Queue):
+        super().__init__(log_queue)
+        self.dropped = 0
+
+    def prepare(self, record: logging.LogRecord) -> logging.LogRecord:
+        # The listener runs in this process, so the record can be passed as-is.
+        # Only merge args now in case they are mutated after the call returns.
+        if record.args:
+            record.msg = record.getMessage()
+            record.args = None
+        return record
+
+    def enqueue(self, record: logging.LogRecord):
+        try:
+            self.queue.put_nowait(record)
+        except queue.Full:
+            self.dropped += 1
+
+
+def _create_formatter() -> logging.Formatter:
+    if settings.log_format == "json":
+        # JSON formatter for production
+        return OrjsonFormatter()
+    # Standard formatter for development
+    return logging.Formatter("%(asctime)s - %(name)s - %(levelname)s - %(message)s")
+
+
+def _create_output_handlers(formatter: logging.Formatter, log_level: int) -> List[logging.Handler]:
+    """Console and rotating file handlers, run by the listener thread"""
+    handlers = []
+
+    # Console handler
+    console_handler = logging.StreamHandler(sys.stdout)
+    console_handler.setFormatter(formatter)
+    console_handler.setLevel(log_level)
+    handlers.append(console_handler)
+
+    # File handler with rotation
+    if settings.log_file:
+        try:
+            # Ensure the log file exists and is writable
+            log_file_path = Path(settings.log_file)
+            if not log_file_path.exists():
+                log_file_path.touch(mode=0o666, exist_ok=True)
+
+            file_handler = logging.handlers.RotatingFileHandler(
+                settings.log_file,
+                maxBytes=settings.log_max_size,
+                backupCount=settings.log_backup_count
+            )
+            file_handler.setFormatter(formatter)
+            file_handler.setLevel(log_level)
+            handlers.append(file_handler)
+        except (PermissionError, OSError) as e:
+            # If we can't write to the log file, just log to console
+            console_handler.setLevel(logging.WARNING)
+            logging.getLogger(__name__).warning(
+                f"Could not create log file {settings.log_file}: {e}. Logging to console only."
+            )
+
+    return handlers
+
+
+def setup_logging() -> logging.Logger:
+    """Configure the root logger with a queue handler and a background writer thread"""
+    global _listener
+
+    # Ensure log directory exists
+    Path(settings.log_file).parent.mkdir(parents=True, exist_ok=True)
+
+    # Configure log level
+    log_level = getattr(logging, settings.log_level.upper(), logging.INFO)
+
+    root_logger = logging.getLogger()
+    root_logger.setLevel(log_level)
+
+    # Remove existing handlers (and stop a previous listener on re-configuration)
+    stop_logging()
+    for handler in root_logger.handlers[:]:
+        root_logger.removeHandler(handler)
+
+    log_queue = queue.Queue(maxsize=settings.log_queue_size)
+    queue_handler = NonBlockingQueueHandler(log_queue)
+    if settings.log_sample_rates_map:
+        queue_handler.addFilter(SamplingFilter(settings.log_sample_rates_map))
+    if settings.log_rate_limit_per_second > 0:
+        queue_handler.addFilter(RateLimitFilter(settings.log_rate_limit_per_second, settings.log_rate_limit_burst))
+    root_logger.addHandler(queue_handler)
+
+    # Handlers added before the listener starts so early warnings are kept
+    output_handlers = _create_output_handlers(_create_formatter(), log_level)
+    _listener = logging.handlers.QueueListener(log_queue, *output_handlers, respect_handler_level=True)
+    _listener.start()
+
+    # Set specific logger levels
+    logging.getLogger("uvicorn.access").setLevel(logging.WARNING if settings.is_production else logging.INFO)
+    logging.getLogger("sqlalchemy.engine").setLevel(logging.WARNING if settings.is_production else logging.INFO)
+
+    return root_logger
+
+
+def stop_logging():
+    """Flush queued records and stop the writer thread"""
+    global _listener
+    if _listener is not None:
+        _listener.stop()
+        _listener = None
+
+
+def get_dropped_count() -> int:
+    """Records dropped because the queue was full"""
+    for handler in logging.getLogger().handlers:
+        if isinstance(handler, NonBlockingQueueHandler):
+            return handler.dropped
+    return 0
+
+
+atexit.register(stop_logging)
@@ -0,0 +1,149 @@
+"""
+Image derivatives for uploaded files
+These functions run in the preview process pool (see app.services.preview_service), so
+they only use the file system and PIL: every path and option is an argument, and they
+never query the database or read settings. Importing the module still loads app.config,
+through the app.utils package (its __init__ imports FileHandler).
+
+Derivatives are stored next to the original in a previews/ directory and named after
+the stored file and its content hash, e.g.
+    uploads/42/previews/photos_20250614_1.jpg.3f9a0c1b2d4e5f60.thumb.jpg
+so a URL that carries the hash can be cached forever.
+"""
+
+import glob
+import hashlib
+import io
+import os
+import shutil
+import subprocess
+import tempfile
+from typing import Dict, Optional, Tuple
+
+from PIL import Image, ImageOps
+
+try:
+    import fitz  # PyMuPDF, optional first-page renderer for PDFs
+    PYMUPDF_AVAILABLE = True
+except ImportError:
+    fitz = None
+    PYMUPDF_AVAILABLE = False
+
+PREVIEW_DIRECTORY = "previews"
+HASH_PREFIX_LENGTH = 16
+IMAGE_MIME_PREFIX = "image/"
+PDF_MIME_TYPE = "application/pdf"
+PDFTOPPM_TIMEOUT = 30
+
+
+def content_hash(file_path: str) -> str:
+    """sha256 of a file, read in 1MB chunks"""
+    digest = hashlib.sha256()
+    with open(file_path, "rb") as f:
+        for chunk in iter(lambda: f.read(1024 * 1024), b""):
+            digest.update(chunk)
+    return digest.hexdigest()
+
+
+def derivative_path(file_path: str, file_hash: str, size_name: str) -> str:
+    directory, filename = os.path.split(file_path)
+    return os.path.join(directory, PREVIEW_DIRECTORY,
+                        f"{filename}.{file_hash[:HASH_PREFIX_LENGTH]}.{size_name}.jpg")
+
+
+def delete_derivatives(file_path: str):
+    """Remove every derivative of an original"""
+    directory, filename = os.path.split(file_path)
+    for path in glob.glob(os.path.join(directory, PREVIEW_DIRECTORY, glob.escape(filename) + ".*.jpg")):
+        try:
+            os.remove(path)
+        except OSError:
+            pass
+
+
+def pdf_renderer_available() -> bool:
+    return PYMUPDF_AVAILABLE or shutil.which("pdftoppm") is not None
+
+
+def _flatten(image: Image.Image) -> Image.Image:
+    """RGB on a white background (JPEG has no transparency)"""
+    if image.mode in ('RGBA', 'LA', 'P'):
+        if image.mode == 'P':
+            image = image.convert('RGBA')
+        background = Image.new('RGB', image.size, (255, 255, 255))
+        background.paste(image, mask=image.split()[-1] if image.mode in ('RGBA', 'LA') else None)
+        return background
+    if image.mode != 'RGB':
+        return image.convert('RGB')
+    return image
+
+
+def _render_pdf_page(file_path: str, max_side: int) -> Optional[Image.Image]:
+    """First page of a PDF as an image, or None without a renderer"""
+    if PYMUPDF_AVAILABLE:
+        with fitz.open(file_path) as document:
+            if document.page_count == 0:
+                return None
+            page = document.load_page(0)
+            zoom = max_side / max(page.rect.width, page.rect.height)
+            pixmap = page.get_pixmap(matrix=fitz.Matrix(zoom, zoom), alpha=False)
+            return Image.frombytes("RGB", (pixmap.width, pixmap.height), pixmap.samples)
+
+    pdftoppm = shutil.which("pdftoppm")
+    if pdftoppm is None:
+        return None
+    with tempfile.TemporaryDirectory() as tmp:
+        prefix = os.path.join(tmp, "page")
+        subprocess.run(
+            [pdftoppm, "-f", "1", "-l", "1", "-singlefile", "-png", "-scale-to", str(max_side), file_path, prefix],
+            check=True, capture_output=True, timeout=PDFTOPPM_TIMEOUT
+        )
+        with Image.open(prefix + ".png") as page:
+            page.load()
+            return page.copy()
+
+
+def _open_source(file_path: str, mime_type: str, max_side: int) -> Optional[Image.Image]:
+    if mime_type == PDF_MIME_TYPE:
+        return _render_pdf_page(file_path, max_side)
+    if mime_type.startswith(IMAGE_MIME_PREFIX):
+        image = Image.open(file_path)
+        # Let the JPEG decoder downscale while decoding instead of loading full resolution
+        image.draft('RGB', (max_side, max_side))
+        return ImageOps.exif_transpose(image)
+    return None
+
+
+def render_derivatives(file_path: str, mime_type: str, sizes: Dict[str, int]) -> Tuple[str, bool]:
+    """
+    Hash an original and write a JPEG derivative per {size_name: max_side}.
+    Returns (content hash, whether derivatives exist); unsupported types only get the hash.
+    """
+    file_hash = content_hash(file_path)
+    targets = {name: derivative_path(file_path, file_hash, name) for name in sizes}
+    if all(os.path.exists(target) for target in targets.values()):
+        return file_hash, True
+
+    source = _open_source(file_path, mime_type, max(sizes.values()))
+    if source is None:
+        return file_hash, False
+
+    source = _flatten(source)
+    os.makedirs(os.path.dirname(next(iter(targets.values()))), exist_ok=True)
+    # Largest first, each smaller size is resized from the previous result
+    for name, max_side in sorted(sizes.items(), key=lambda item: -item[1]):
+        source.thumbnail((max_side, max_side), Image.Resampling.LANCZOS)
+        target = targets[name]
+        tmp_path = f"{target}.tmp"
+        source.save(tmp_path, format='JPEG', quality=82, optimize=True, progressive=True)
+        os.replace(tmp_path, target)
+    return file_hash, True
+
+
+def render_avatar(content: bytes, size: Tuple[int, int]) -> bytes:
+    """Resize uploaded avatar bytes to a fixed-size JPEG"""
+    image = _flatten(Image.open(io.BytesIO(content)))
+    image = image.resize(size, Image.Resampling.LANCZOS)
+    output = io.BytesIO()
+    image.save(output, format='JPEG', quality=85, optimize=True)
+    return output.getvalue()
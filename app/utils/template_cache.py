@@ -0,0 +1,109 @@
+"""
+Template compilation and fragment caching
+Compiled templates are stored as bytecode in template_cache_directory, which every
+worker shares: the first worker to compile a template writes it (atomically, via a
+rename), and the others load it instead of parsing the source. warm_templates() loads
+every template at startup, so no request pays for compilation.
+
+{% cache key, ttl %}...{% endcache %} stores the rendered HTML of a block in the shared
+cache (Redis in production, see CacheManager) under the application version, so a
+deploy never serves fragments rendered by the previous templates. Keys must contain
+everything the fragment depends on, e.g. {% cache "leaders:daily:" ~ role, 60 %}.
+
+Rendering is timed into the current request's profile (the tpl entry of its
+Server-Timing header, see app.services.profiling).
+"""
+
+import json
+import logging
+import os
+import tempfile
+import time
+from typing import Any, Dict, Optional
+
+from jinja2 import Environment, FileSystemBytecodeCache, Template, nodes
+from jinja2.ext import Extension
+from markupsafe import Markup
+
+from app.config import settings
+from app.services.cache import cache
+from app.services.profiling import timed
+
+logger = logging.getLogger(__name__)
+
+
+class ProfiledTemplate(Template):
+    """Template whose top-level renders count as template time of the current request"""
+
+    def render(self, *args, **kwargs):
+        with timed("tpl"):
+            return super().render(*args, **kwargs)
+
+
+def fragment_key(name: str, params: Optional[Dict[str, Any]] = None) -> str:
+    """Cache key of a rendered fragment: {% cache %} blocks and lazily loaded widgets alike"""
+    key = f"fragment:{settings.app_version}:{name}"
+    if params:
+        key += f":{json.dumps(params, sort_keys=True, default=str)}"
+    return key
+
+
+class FragmentCacheExtension(Extension):
+    """{% cache key[, ttl] %} ... {% endcache %}, backed by CacheManager"""
+
+    tags = {"cache"}
+
+    def parse(self, parser):
+        lineno = next(parser.stream).lineno
+        args = [parser.parse_expression()]
+        if parser.stream.skip_if("comma"):
+            args.append(parser.parse_expression())
+        else:
+            args.append(nodes.Const(None))
+        body = parser.parse_statements(("name:endcache",), drop_needle=True)
+        return nodes.CallBlock(self.call_method("_cached_fragment", args), [], [], body).set_lineno(lineno)
+
+    def _cached_fragment(self, name, ttl, caller):
+        key = fragment_key(name)
+        html = cache.get(key)
+        if html is not None:
+            return Markup(html)
+        html = caller()
+        cache.set(key, str(html), ttl or settings.template_fragment_ttl)
+        return html
+
+
+def invalidate_fragment(name: str, params: Optional[Dict[str, Any]] = None):
+    """Drop a cached fragment before its TTL (e.g. after the data it shows changed)"""
+    cache.delete(fragment_key(name, params))
+
+
+def bytecode_cache() -> FileSystemBytecodeCache:
+    directory = settings.template_cache_directory or os.path.join(tempfile.gettempdir(), "cmsvs-jinja")
+    os.makedirs(directory, exist_ok=True)
+    return FileSystemBytecodeCache(directory)
+
+
+def warm_templates(env: Environment) -> Dict[str, float]:
+    """Load (compile or read from the bytecode cache) every template; returns ms per template"""
+    timings = {}
+    for name in env.list_templates(extensions=["html"]):
+        start = time.perf_counter()
+        try:
+            env.get_template(name)
+        except Exception as e:
+            # A broken template fails on first use as before; don't block startup
+            logger.warning(f"Template {name} failed to compile: {e}")
+            continue
+        timings[name] = (time.perf_counter() - start) * 1000
+    logger.info(f"Warmed {len(timings)} templates in {sum(timings.values()):.0f} ms")
+    return timings
+
+
+def configure(env: Environment):
+    """Bytecode cache, fragment caching, render timing and, outside debug, no per-render source checks"""
+    env.template_class = ProfiledTemplate
+    env.add_extension(FragmentCacheExtension)
+    if settings.template_bytecode_cache:
+        env.bytecode_cache = bytecode_cache()
+    env.auto_reload = settings.debug
@@ -5,13 +5,18 @@ Provides a centralized Jinja2Templates instance with all global functions and va
 
 from fastapi.templating import Jinja2Templates
 from datetime import datetime as dt, timezone, timedelta
+from functools import lru_cache
+import json
 import time
 import logging
 
+from app.utils.template_cache import configure
+
 logger = logging.getLogger(__name__)
 
 # Create the shared templates instance
 templates = Jinja2Templates(directory="app/templates")
+configure(templates.env)
 
 # Add global template variables
 templates.env.globals["cache_bust"] = str(int(time.time()))
@@ -45,10 +50,34 @@ def get_now_bahrain():
 templates.env.globals["utc_to_bahrain"] = utc_to_bahrain
 templates.env.globals["now_bahrain"] = get_now_bahrain
 
-# Add simple avatar URL function for templates
+# Add simple avatar URL function for templates (pure, called for every user row)
+@lru_cache(maxsize=4096)
 def get_avatar_url_simple(user_id: int, full_name: str) -> str:
     """Simple template function to generate avatar URL without database access"""
     from app.services.avatar_service import AvatarService
     return AvatarService.generate_default_avatar_url(user_id, full_name or "User")
 
 templates.env.globals['get_avatar_url_simple'] = get_avatar_url_simple
+
+def is_htmx_request(request) -> bool:
+    """True for requests sent by htmx (hx-get, hx-post...), which expect an HTML fragment"""
+    return request.headers.get("HX-Request") == "true"
+
+def bulk_action_response(request, result, action: str, success=None, error=None, status_code: int = 200):
+    """Fragment for the bulk request actions; HX-Trigger tells the page which rows changed"""
+    changed_ids = [change.id for change in result.changed] if result else []
+    new_status = result.new_status.value if result and result.new_status else None
+    trigger = {"requestsBulkUpdated": {"action": action, "status": new_status, "ids": changed_ids}}
+    return templates.TemplateResponse(
+        "requests/partials/bulk_action_result.html",
+        {
+            "request": request,
+            "action": action,
+            "new_status": new_status,
+            "changed_ids": changed_ids,
+            "success": success,
+            "error": error
+        },
+        status_code=status_code,
+        headers={"HX-Trigger": json.dumps(trigger)}
+    )
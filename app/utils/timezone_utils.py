@@ -11,6 +11,8 @@ logger = logging.getLogger(__name__)
 
 # Bahrain timezone (UTC+3)
 BAHRAIN_TZ = timezone(timedelta(hours=3))
+# Same zone by name, for timezone() in PostgreSQL
+BAHRAIN_TZ_NAME = "Asia/Bahrain"
 
 def utc_to_bahrain(dt: Optional[datetime]) -> Optional[datetime]:
     """
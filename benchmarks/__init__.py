@@ -0,0 +1 @@
+"""Benchmark suite: seeded dataset, service micro-benchmarks and scenario load tests (see run.py)"""
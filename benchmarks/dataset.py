@@ -0,0 +1,415 @@
+"""
+Deterministic benchmark dataset
+generate() wipes the database and seeds it from a DatasetSpec. The same spec always
+produces the same rows, with dates relative to the time of seeding, so the daily,
+weekly and monthly windows the services compute over are populated the same way on
+every run:
+
+- users: one admin and spec.users clerks; most approved, a few pending, rejected or
+  inactive. Clerk workload follows a log-normal distribution, so a few clerks own
+  most of the requests, as in production.
+- requests: spread over spec.days, denser towards today, on business days and office
+  hours. Status depends on age (new requests are mostly pending, old ones completed or
+  rejected) and old completed requests are sometimes archived.
+- files for the required categories and the selected license sections, activities
+  for each step of a request plus logins, status-change and new-request
+  notifications (read unless recent), and messages between the admin and clerks
+  with their conversations.
+
+Rows are written with multi-row INSERTs in batches, then the tables are analyzed.
+"""
+
+import math
+import random
+from datetime import datetime, timedelta, timezone
+from typing import Any, Dict, List, NamedTuple
+
+from sqlalchemy import func, insert, select, text
+
+from app.config import settings
+from app.database import Base, SessionLocal, engine
+from app.models import achievement, archive, kpi_snapshot, user_avatar  # noqa: F401 - register mappers
+from app.models.achievement import AchievementType, Competition, CompetitionParticipant, CompetitionStatus
+from app.models.activity import Activity, ActivityType
+from app.models.file import File
+from app.models.message import Conversation, Message
+from app.models.notification import Notification, NotificationPreference, NotificationType
+from app.models.request import Request, RequestNumberCounter, RequestStatus
+from app.models.user import User, UserRole, UserStatus
+from app.services.achievement_service import AchievementService
+from app.utils.auth import get_password_hash
+
+BATCH_SIZE = 5000
+PASSWORD = "bench-password"
+
+FIRST_NAMES = ["محمد", "أحمد", "علي", "حسن", "حسين", "عبدالله", "يوسف", "إبراهيم", "خالد", "فاطمة", "مريم", "زينب", "نورة", "سارة", "عائشة"]
+FAMILY_NAMES = ["الخليفة", "البوعينين", "الدوسري", "المناعي", "الحداد", "السيد", "الكوهجي", "العلوي", "الجلاهمة", "الشيخ", "المطوع", "الزياني"]
+BUILDINGS = ["مجمع السيف", "برج المؤيد", "مبنى الريف", "عمارة النخيل", "مجمع الواحة", "برج الخليج", "مبنى المنامة التجاري"]
+ROADS = ["شارع الملك فيصل", "شارع الاستقلال", "شارع الشيخ عيسى", "شارع الحورة", "طريق البديع", "شارع الجفير"]
+
+# Required categories of a new request, and the optional ones tied to a license section
+REQUIRED_CATEGORIES = ["architectural_plans", "electrical_mechanical_plans", "inspection_department"]
+SECTION_CATEGORIES = {
+    "fire_equipment_section": "fire_equipment_files",
+    "commercial_records_section": "commercial_records_files",
+    "engineering_offices_section": "engineering_offices_files",
+    "hazardous_materials_section": "hazardous_materials_files",
+}
+SECTION_SHARES = {
+    "licenses_section": 0.7,
+    "fire_equipment_section": 0.45,
+    "commercial_records_section": 0.3,
+    "engineering_offices_section": 0.15,
+    "hazardous_materials_section": 0.08,
+}
+FILE_TYPES = [("pdf", "application/pdf", 70), ("jpg", "image/jpeg", 15), ("png", "image/png", 10),
+              ("docx", "application/vnd.openxmlformats-officedocument.wordprocessingml.document", 5)]
+
+# (max age in days, status weights): pending, in progress, completed, rejected
+STATUS_BY_AGE = [
+    (2, (60, 30, 10, 0)),
+    (14, (25, 30, 35, 10)),
+    (math.inf, (3, 4, 80, 13)),
+]
+
+
+class DatasetSpec(NamedTuple):
+    """Size and shape of the seeded dataset"""
+    users: int = 100
+    requests: int = 10000
+    days: int = 365
+    messages_per_user: int = 5
+    seed: int = 42
+
+    @classmethod
+    def from_args(cls, args) -> "DatasetSpec":
+        return cls(args.users, args.requests, args.days, args.messages_per_user, args.seed)
+
+
+def reset_database():
+    """Recreate schema objects and empty all tables"""
+    Base.metadata.create_all(bind=engine)
+    table_names = ", ".join(f'"{table.name}"' for table in Base.metadata.sorted_tables)
+    with engine.begin() as conn:
+        conn.execute(text(f"TRUNCATE {table_names} RESTART IDENTITY CASCADE"))
+
+
+def _insert(db, model, rows: List[Dict[str, Any]], returning: bool = False) -> List[int]:
+    """Multi-row INSERT in batches; returns the new ids in row order when asked"""
+    ids = []
+    for start in range(0, len(rows), BATCH_SIZE):
+        batch = rows[start:start + BATCH_SIZE]
+        if returning:
+            ids.extend(db.scalars(insert(model).returning(model.id, sort_by_parameter_order=True), batch).all())
+        else:
+            db.execute(insert(model), batch)
+    return ids
+
+
+def _business_time(rng: random.Random, now: datetime, days: int) -> datetime:
+    """A moment in the last days, denser towards now, on a weekday during office hours"""
+    while True:
+        moment = now - timedelta(days=days * rng.random() ** 1.6)
+        moment = moment.replace(hour=rng.choices(range(7, 16), weights=[4, 9, 10, 10, 8, 9, 8, 5, 2])[0],
+                                minute=rng.randrange(60), second=rng.randrange(60), microsecond=0)
+        if moment.weekday() < 5 and moment < now:
+            return moment
+
+
+def _status(rng: random.Random, age_days: float) -> RequestStatus:
+    for max_age, weights in STATUS_BY_AGE:
+        if age_days < max_age:
+            return rng.choices(list(RequestStatus), weights=weights)[0]
+
+
+def _name(rng: random.Random) -> str:
+    return f"{rng.choice(FIRST_NAMES)} {rng.choice(FIRST_NAMES)} {rng.choice(FAMILY_NAMES)}"
+
+
+def _seed_users(db, rng: random.Random, spec: DatasetSpec, now: datetime) -> Dict[str, Any]:
+    password = get_password_hash(PASSWORD)
+    rows = [{
+        "username": "admin", "email": settings.admin_email, "full_name": "System Administrator",
+        "hashed_password": password, "role": UserRole.ADMIN, "approval_status": UserStatus.APPROVED,
+        "is_active": True, "created_at": now - timedelta(days=spec.days + 30),
+    }]
+    for i in range(spec.users):
+        status = rng.choices([UserStatus.APPROVED, UserStatus.PENDING, UserStatus.REJECTED], weights=[92, 5, 3])[0]
+        rows.append({
+            "username": f"clerk{i}", "email": f"clerk{i}@example.com", "full_name": _name(rng),
+            "hashed_password": password, "role": UserRole.USER, "approval_status": status,
+            "is_active": status == UserStatus.APPROVED and rng.random() > 0.02,
+            "created_at": now - timedelta(days=rng.uniform(0, spec.days + 30)),
+        })
+    ids = _insert(db, User, rows, returning=True)
+    admin_id = ids[0]
+    clerks = [
+        (user_id, row["username"], rng.lognormvariate(0, 0.8))
+        for user_id, row in zip(ids[1:], rows[1:]) if row["is_active"]
+    ]
+    # Half of the clerks have saved notification preferences
+    _insert(db, NotificationPreference, [{"user_id": user_id} for user_id, _, _ in clerks[::2]])
+    return {"admin_id": admin_id, "clerks": clerks}
+
+
+def _seed_requests(db, rng: random.Random, spec: DatasetSpec, now: datetime, clerks) -> List[Dict[str, Any]]:
+    clerk_ids = [user_id for user_id, _, _ in clerks]
+    cumulative, total = [], 0.0
+    for _, _, weight in clerks:
+        total += weight
+        cumulative.append(total)
+
+    rows = []
+    for user_id in rng.choices(clerk_ids, cum_weights=cumulative, k=spec.requests):
+        created_at = _business_time(rng, now, spec.days)
+        age = (now - created_at).total_seconds() / 86400
+        status = _status(rng, age)
+        updated_at = None
+        if status != RequestStatus.PENDING:
+            updated_at = min(created_at + timedelta(days=rng.uniform(0.05, min(age, 10))), now)
+        sections = {section: rng.random() < share for section, share in SECTION_SHARES.items()}
+        full_name = _name(rng)
+        rows.append({
+            "unique_code": "".join(rng.choices("0123456789ABCDEF", k=12)),
+            "status": status,
+            "is_archived": status == RequestStatus.COMPLETED and age > 180 and rng.random() < 0.05,
+            "user_id": user_id,
+            "created_at": created_at,
+            "updated_at": updated_at,
+            "request_name": f"طلب ترخيص - {full_name}",
+            "full_name": full_name,
+            "personal_number": f"{rng.randrange(10 ** 9):09d}",
+            "phone_number": f"3{rng.randrange(10 ** 7):07d}",
+            "building_name": rng.choice(BUILDINGS),
+            "road_name": rng.choice(ROADS),
+            "building_number": str(rng.randrange(1, 1200)),
+            "civil_defense_file_number": f"CD-{rng.randrange(10 ** 6):06d}" if rng.random() < 0.6 else None,
+            "building_permit_number": f"BP-{rng.randrange(10 ** 6):06d}" if rng.random() < 0.5 else None,
+            **sections,
+        })
+
+    # Request numbers follow creation order within each day, like the daily counter
+    rows.sort(key=lambda row: row["created_at"])
+    per_day: Dict[Any, int] = {}
+    for row in rows:
+        day = row["created_at"].date()
+        per_day[day] = per_day.get(day, 0) + 1
+        row["request_number"] = f"REQ-{day:%Y%m%d}-{per_day[day]:05d}"
+    _insert(db, RequestNumberCounter, [{"day": day, "last_value": count} for day, count in per_day.items()])
+
+    for row, request_id in zip(rows, _insert(db, Request, rows, returning=True)):
+        row["id"] = request_id
+    return rows
+
+
+def _seed_files(db, rng: random.Random, requests) -> int:
+    extensions = [(extension, mime) for extension, mime, _ in FILE_TYPES]
+    weights = [weight for _, _, weight in FILE_TYPES]
+    rows = []
+    for request in requests:
+        categories = REQUIRED_CATEGORIES + [
+            category for section, category in SECTION_CATEGORIES.items() if request[section]
+        ]
+        for category in categories:
+            for _ in range(rng.choices([1, 2, 3], weights=[70, 22, 8])[0]):
+                extension, mime = rng.choices(extensions, weights=weights)[0]
+                stored = f"bench_{request['id']}_{len(rows)}.{extension}"
+                rows.append({
+                    "original_filename": f"{category}_{len(rows)}.{extension}",
+                    "stored_filename": stored,
+                    "file_path": f"{settings.upload_directory}/{request['request_number']}/{stored}",
+                    "file_size": int(rng.lognormvariate(13.5, 1.0)),
+                    "file_type": extension,
+                    "mime_type": mime,
+                    "file_category": category,
+                    "request_id": request["id"],
+                    "uploaded_at": request["created_at"],
+                })
+    _insert(db, File, rows)
+    return len(rows)
+
+
+def _seed_activities(db, rng: random.Random, now: datetime, admin_id: int, clerks, requests) -> int:
+    finished = {
+        RequestStatus.COMPLETED: ActivityType.REQUEST_COMPLETED,
+        RequestStatus.REJECTED: ActivityType.REQUEST_REJECTED,
+    }
+    rows = []
+
+    def add(activity_type, user_id, created_at, description, details=None):
+        rows.append({
+            "activity_type": activity_type, "user_id": user_id, "created_at": created_at,
+            "description": description, "details": details,
+            "ip_address": f"10.0.{user_id % 256}.{rng.randrange(1, 255)}", "user_agent": "Mozilla/5.0 (bench)",
+        })
+
+    for request in requests:
+        details = {"request_id": request["id"], "request_number": request["request_number"]}
+        add(ActivityType.REQUEST_CREATED, request["user_id"], request["created_at"],
+            f"Created civil defense request for: {request['full_name']}", details)
+        add(ActivityType.FILE_UPLOADED, request["user_id"], request["created_at"],
+            f"Uploaded files for request {request['request_number']}", details)
+        if request["updated_at"] is not None:
+            add(ActivityType.CROSS_USER_REQUEST_STATUS_UPDATED, admin_id, request["updated_at"],
+                f"Updated status of request {request['request_number']}",
+                {**details, "new_status": request["status"].value})
+            if request["status"] in finished:
+                add(finished[request["status"]], request["user_id"], request["updated_at"],
+                    f"Request {request['request_number']} {request['status'].value}", details)
+
+    # Roughly one login per clerk per working day in the last month, more for busier clerks
+    for user_id, _, weight in clerks:
+        for _ in range(int(20 * min(weight, 3))):
+            add(ActivityType.LOGIN, user_id, _business_time(rng, now, 30), "User logged in")
+
+    rows.sort(key=lambda row: row["created_at"])
+    _insert(db, Activity, rows)
+    return len(rows)
+
+
+def _seed_notifications(db, rng: random.Random, now: datetime, admin_id: int, requests) -> int:
+    def read(created_at):
+        # Old notifications are almost always read, recent ones often are not
+        return rng.random() < (0.95 if now - created_at > timedelta(days=3) else 0.3)
+
+    rows = []
+    for request in requests:
+        rows.append({
+            "user_id": admin_id, "type": NotificationType.REQUEST_CREATED,
+            "title": "طلب جديد", "message": f"تم إنشاء الطلب {request['request_number']}",
+            "action_url": f"/requests/{request['id']}", "request_id": request["id"],
+            "related_user_id": request["user_id"], "is_read": read(request["created_at"]),
+            "created_at": request["created_at"],
+        })
+        if request["updated_at"] is not None:
+            rows.append({
+                "user_id": request["user_id"], "type": NotificationType.REQUEST_STATUS_CHANGED,
+                "title": "تحديث حالة الطلب", "message": f"تم تحديث حالة الطلب {request['request_number']}",
+                "action_url": f"/requests/{request['id']}", "request_id": request["id"],
+                "related_user_id": admin_id, "is_read": read(request["updated_at"]),
+                "created_at": request["updated_at"],
+            })
+    rows.sort(key=lambda row: row["created_at"])
+    _insert(db, Notification, rows)
+    return len(rows)
+
+
+def _seed_messages(db, rng: random.Random, spec: DatasetSpec, now: datetime, admin_id: int, clerks) -> int:
+    clerk_ids = [user_id for user_id, _, _ in clerks]
+    rows = []
+    for sender_id in clerk_ids:
+        for _ in range(spec.messages_per_user):
+            # Mostly clerk-admin threads, in both directions, some between clerks
+            other = admin_id if rng.random() < 0.7 else rng.choice(clerk_ids)
+            if other == sender_id:
+                other = admin_id
+            pair = (sender_id, other) if rng.random() < 0.5 else (other, sender_id)
+            created_at = now - timedelta(days=spec.days * rng.random() ** 2)
+            rows.append({
+                "sender_id": pair[0], "recipient_id": pair[1],
+                "subject": f"بخصوص الطلب رقم {rng.randrange(1, max(spec.requests, 2))}",
+                "content": "يرجى مراجعة المرفقات وتحديث حالة الطلب عند الانتهاء.",
+                "is_read": now - created_at > timedelta(days=2) or rng.random() < 0.4,
+                "created_at": created_at, "updated_at": created_at,
+            })
+    rows.sort(key=lambda row: row["created_at"])
+    ids = _insert(db, Message, rows, returning=True)
+
+    last: Dict[tuple, tuple] = {}
+    for row, message_id in zip(rows, ids):
+        last[(min(row["sender_id"], row["recipient_id"]), max(row["sender_id"], row["recipient_id"]))] = (
+            message_id, row["created_at"]
+        )
+    _insert(db, Conversation, [
+        {"participant_1_id": first, "participant_2_id": second, "last_message_id": message_id,
+         "created_at": created_at, "updated_at": created_at}
+        for (first, second), (message_id, created_at) in sorted(last.items())
+    ])
+    return len(rows)
+
+
+def _seed_competition(db, now: datetime, admin_id: int, clerks):
+    AchievementService.initialize_default_achievements(db)
+    competition = Competition(
+        name="منافسة الأسبوع", description="Benchmark competition",
+        competition_type=AchievementType.WEEKLY, target_value=20,
+        start_date=now - timedelta(days=2), end_date=now + timedelta(days=5),
+        status=CompetitionStatus.ACTIVE, created_by=admin_id
+    )
+    db.add(competition)
+    db.flush()
+    _insert(db, CompetitionParticipant, [
+        {"competition_id": competition.id, "user_id": user_id} for user_id, _, _ in clerks
+    ])
+
+
+def describe() -> Dict[str, Any]:
+    """Row counts and the users and requests the benchmarks work with, read from the database"""
+    db = SessionLocal()
+    try:
+        counts = {
+            model.__tablename__: db.scalar(select(func.count()).select_from(model))
+            for model in (User, Request, File, Activity, Notification, Message)
+        }
+        admin = db.execute(
+            select(User.id, User.username).where(User.role == UserRole.ADMIN).order_by(User.id).limit(1)
+        ).one()
+        # Active clerks by number of requests; the busiest have the slowest pages
+        request_count = func.count(Request.id)
+        clerks = db.execute(
+            select(User.id, User.username, request_count)
+            .outerjoin(Request, Request.user_id == User.id)
+            .where(User.role == UserRole.USER, User.is_active == True)
+            .group_by(User.id)
+            .order_by(request_count.desc(), User.id)
+        ).all()
+        # Each clerk's ten newest requests, for the request pages of the load tests
+        ranked = select(
+            Request.user_id, Request.id,
+            func.row_number().over(partition_by=Request.user_id, order_by=Request.created_at.desc()).label("rank")
+        ).subquery()
+        recent = {}
+        for user_id, request_id in db.execute(
+            select(ranked.c.user_id, ranked.c.id).where(ranked.c.rank <= 10).order_by(ranked.c.user_id, ranked.c.rank)
+        ):
+            recent.setdefault(user_id, []).append(request_id)
+        sample = db.execute(
+            select(Request.id, Request.request_number, Request.unique_code, Request.user_id, Request.full_name)
+            .order_by(Request.created_at, Request.id)
+            .offset(counts["requests"] // 2).limit(1)
+        ).one()
+    finally:
+        db.close()
+    return {
+        "counts": counts,
+        "admin": {"id": admin.id, "username": admin.username},
+        "clerks": [{"id": user_id, "username": username, "requests": requests,
+                    "recent_request_ids": recent.get(user_id, [])}
+                   for user_id, username, requests in clerks],
+        "sample_request": dict(sample._mapping),
+    }
+
+
+def generate(spec: DatasetSpec) -> Dict[str, Any]:
+    """Wipe the database, seed it from spec and describe() the result"""
+    rng = random.Random(spec.seed)
+    now = datetime.now(timezone.utc)
+    reset_database()
+    db = SessionLocal()
+    try:
+        users = _seed_users(db, rng, spec, now)
+        admin_id, clerks = users["admin_id"], users["clerks"]
+        requests = _seed_requests(db, rng, spec, now, clerks)
+        _seed_files(db, rng, requests)
+        _seed_activities(db, rng, now, admin_id, clerks, requests)
+        _seed_notifications(db, rng, now, admin_id, requests)
+        _seed_messages(db, rng, spec, now, admin_id, clerks)
+        db.commit()
+        _seed_competition(db, now, admin_id, clerks)
+        db.commit()
+    finally:
+        db.close()
+
+    with engine.connect() as conn:
+        conn.execution_options(isolation_level="AUTOCOMMIT").execute(text("ANALYZE"))
+    return {"spec": spec._asdict(), **describe()}
@@ -0,0 +1,212 @@
+"""
+Scenario load tests against the ASGI app
+The app runs in this process behind httpx's ASGI transport, with its startup and
+shutdown events, so no server, proxy or port is involved and the numbers are the
+app's own: routing, dependencies, database and template work on one event loop, like
+one uvicorn worker.
+
+Each scenario starts --concurrency virtual users. A virtual user logs in as one of the
+seeded users (through the access_token cookie, without the password hash) and repeats
+the scenario's steps until --duration has passed, waiting --think-time seconds
+between steps:
+
+- clerk: dashboard, request list, quick search, new request form, creating a request
+  with three small PDFs, and opening one of the clerk's requests
+- admin: the dashboard, statistics, users and request records shells with the
+  fragments they load, and the request list
+- polling: the unread counters and recent notifications that open pages poll
+
+Per step, the result has the latency summary, the request count and the number of
+non-2xx responses; per scenario, the total throughput.
+"""
+
+import asyncio
+import itertools
+import time
+from typing import Any, Callable, Dict, List, Optional, Tuple
+
+import httpx
+
+from app.main import app
+from app.utils.auth import create_access_token
+
+from benchmarks.results import summarize
+
+# A minimal valid PDF; FileHandler checks the extension and size, not the content
+PDF = b"%PDF-1.4\n1 0 obj<</Type/Catalog/Pages 2 0 R>>endobj\n2 0 obj<</Type/Pages/Kids[]/Count 0>>endobj\ntrailer<</Root 1 0 R>>\n%%EOF\n"
+
+# A step is (name, callable building the request kwargs for one virtual user)
+Step = Tuple[str, Callable[["VirtualUser"], Dict[str, Any]]]
+
+
+class VirtualUser:
+    """One logged in user with an HTTP client and a counter for varying its requests"""
+
+    def __init__(self, client: httpx.AsyncClient, user: Dict[str, Any], data: Dict[str, Any]):
+        self.client = client
+        self.user = user
+        self.data = data
+        self.iteration = 0
+
+    def pick(self, values: List[Any]) -> Any:
+        return values[self.iteration % len(values)] if values else None
+
+
+def _get(url: str) -> Callable[[VirtualUser], Dict[str, Any]]:
+    return lambda vu: {"method": "GET", "url": url}
+
+
+def _search(vu: VirtualUser) -> Dict[str, Any]:
+    return {"method": "GET", "url": "/api/search-requests", "params": {"q": vu.data["sample_request"]["full_name"].split()[-1]}}
+
+
+def _create_request(vu: VirtualUser) -> Dict[str, Any]:
+    number = f"{vu.user['id']:03d}{vu.iteration:06d}"[-9:]
+    return {
+        "method": "POST",
+        "url": "/requests/new",
+        "data": {
+            "full_name": "مقدم طلب تجريبي",
+            "personal_number": number,
+            "phone_number": "33334444",
+            "building_name": "مبنى الاختبار",
+            "licenses_section": "true",
+        },
+        "files": [
+            (category, (f"{category}.pdf", PDF, "application/pdf"))
+            for category in ("architectural_plans", "electrical_mechanical_plans", "inspection_department")
+        ],
+    }
+
+
+def _view_request(vu: VirtualUser) -> Dict[str, Any]:
+    return {"method": "GET", "url": f"/requests/{vu.pick(vu.user['recent_request_ids'])}"}
+
+
+SCENARIOS: Dict[str, Dict[str, Any]] = {
+    "clerk": {
+        "users": "clerks",
+        "steps": [
+            ("dashboard", _get("/dashboard")),
+            ("requests", _get("/requests")),
+            ("search", _search),
+            ("new_request_form", _get("/requests/new")),
+            ("create_request", _create_request),
+            ("view_request", _view_request),
+        ],
+    },
+    "admin": {
+        "users": "admin",
+        "steps": [
+            ("dashboard", _get("/admin/dashboard")),
+            ("dashboard_request_stats", _get("/admin/fragments/dashboard/request-stats")),
+            ("dashboard_recent_requests", _get("/admin/fragments/dashboard/recent-requests")),
+            ("stats", _get("/admin/stats")),
+            ("stats_overview", _get("/admin/fragments/stats/overview")),
+            ("stats_competition", _get("/admin/fragments/stats/competition")),
+            ("users", _get("/admin/users")),
+            ("users_stats", _get("/admin/fragments/users/stats")),
+            ("users_recent_requests", _get("/admin/fragments/users/recent-requests")),
+            ("requests", _get("/admin/requests")),
+            ("requests_records", _get("/admin/requests-records")),
+            ("requests_records_system_stats", _get("/admin/fragments/requests-records/system-stats")),
+        ],
+    },
+    "polling": {
+        "users": "clerks",
+        "steps": [
+            ("notifications_unread_count", _get("/api/notifications/unread-count")),
+            ("messages_unread_count", _get("/api/messages/unread-count")),
+            ("notifications_recent", _get("/api/notifications/recent")),
+        ],
+    },
+}
+
+
+def _users(data: Dict[str, Any], kind: str, count: int) -> List[Dict[str, Any]]:
+    """Users for count virtual users: the admin, or the busiest clerks in turn"""
+    if kind == "admin":
+        return [data["admin"]] * count
+    clerks = [clerk for clerk in data["clerks"] if clerk["recent_request_ids"]] or data["clerks"]
+    return list(itertools.islice(itertools.cycle(clerks), count))
+
+
+async def _virtual_user(vu: VirtualUser, steps: List[Step], deadline: float, think_time: float,
+                        timings: Dict[str, List[float]], errors: Dict[str, int]):
+    while time.perf_counter() < deadline:
+        for name, build in steps:
+            if time.perf_counter() >= deadline:
+                return
+            start = time.perf_counter()
+            try:
+                response = await vu.client.request(**build(vu))
+                failed = not 200 <= response.status_code < 300
+            except Exception:
+                failed = True
+            timings[name].append((time.perf_counter() - start) * 1000)
+            if failed:
+                errors[name] += 1
+            if think_time:
+                await asyncio.sleep(think_time)
+        vu.iteration += 1
+
+
+async def run_scenario(name: str, data: Dict[str, Any], concurrency: int, duration: float,
+                       think_time: float, report: bool = True) -> Dict[str, Any]:
+    scenario = SCENARIOS[name]
+    steps = scenario["steps"]
+    timings = {step: [] for step, _ in steps}
+    errors = {step: 0 for step, _ in steps}
+
+    transport = httpx.ASGITransport(app=app)
+    clients = []
+    for user in _users(data, scenario["users"], concurrency):
+        token = create_access_token({"sub": user["username"]})
+        clients.append((httpx.AsyncClient(
+            transport=transport, base_url="http://bench", cookies={"access_token": f"Bearer {token}"},
+            follow_redirects=False, timeout=None
+        ), user))
+    try:
+        start = time.perf_counter()
+        deadline = start + duration
+        await asyncio.gather(*(
+            _virtual_user(VirtualUser(client, user, data), steps, deadline, think_time, timings, errors)
+            for client, user in clients
+        ))
+        elapsed = time.perf_counter() - start
+    finally:
+        for client, _ in clients:
+            await client.aclose()
+
+    total = sum(len(values) for values in timings.values())
+    result = {
+        "concurrency": concurrency,
+        "duration_s": round(elapsed, 2),
+        "requests": total,
+        "requests_per_second": round(total / elapsed, 2) if elapsed else 0.0,
+        "errors": sum(errors.values()),
+        "steps": {step: {**summarize(timings[step]), "errors": errors[step]} for step, _ in steps},
+    }
+    if not report:
+        return result
+    print(f"\n🚦 {name}: {concurrency} users, {result['requests']} requests, "
+          f"{result['requests_per_second']:.1f} req/s, {result['errors']} errors")
+    print(f"  {'step':<32} {'count':>6} {'errors':>6} {'p50':>9} {'p95':>9} {'p99':>9}")
+    for step, summary in result["steps"].items():
+        if summary["count"]:
+            print(f"  {step:<32} {summary['count']:6d} {summary['errors']:6d} "
+                  f"{summary['p50_ms']:7.1f}ms {summary['p95_ms']:7.1f}ms {summary['p99_ms']:7.1f}ms")
+    return result
+
+
+async def run(data: Dict[str, Any], scenarios: List[str], concurrency: int, duration: float,
+              think_time: float, warmup: Optional[float] = None) -> Dict[str, Any]:
+    """Run scenarios one after another inside the app's startup and shutdown events"""
+    results = {}
+    async with app.router.lifespan_context(app):
+        for name in scenarios:
+            if warmup:
+                # Compile templates, fill pools and caches before measuring
+                await run_scenario(name, data, min(concurrency, 2), warmup, 0, report=False)
+            results[name] = await run_scenario(name, data, concurrency, duration, think_time)
+    return results
@@ -0,0 +1,93 @@
+"""
+Service-level micro-benchmarks
+Each benchmark calls one service function against the seeded dataset. Every iteration
+runs in a fresh session with the application cache cleared, so the numbers are the
+uncached cost of the query and the Python around it. The executed statements are
+counted with QueryCounter; a jump in "queries" between commits usually means an N+1.
+"""
+
+import time
+from typing import Any, Callable, Dict, List, Optional, Tuple
+
+from app.database import SessionLocal, engine
+from app.models.request import RequestStatus
+from app.services.activity_service import ActivityService
+from app.services.cache import cache
+from app.services.message_service import MessageService
+from app.services.notification_service import NotificationService
+from app.services.performance import QueryCounter
+from app.services.request_service import RequestService
+from app.services.user_service import UserService
+
+from benchmarks.results import summarize
+
+
+def _busiest(data) -> int:
+    return data["clerks"][0]["id"]
+
+
+def _search_term(data) -> str:
+    # A family name, which matches a share of all requests
+    return data["sample_request"]["full_name"].split()[-1]
+
+
+BENCHMARKS: List[Tuple[str, Callable[[Any, Dict[str, Any]], Any]]] = [
+    ("get_users_competition_data", lambda db, data: RequestService.get_users_competition_data(db)),
+    ("generate_user_activity_report", lambda db, data: ActivityService.generate_user_activity_report(db, 3)),
+    ("get_user_progress_tracking", lambda db, data: RequestService.get_user_progress_tracking(db)),
+    ("get_user_achievements_data", lambda db, data: RequestService.get_user_achievements_data(db)),
+    ("get_request_statistics", lambda db, data: RequestService.get_request_statistics(db)),
+    ("get_approval_statistics", lambda db, data: UserService.get_approval_statistics(db)),
+    ("search_requests_by_name", lambda db, data: RequestService.search_requests(db, _search_term(data))),
+    ("search_requests_by_number", lambda db, data: RequestService.search_requests(
+        db, data["sample_request"]["request_number"])),
+    ("search_requests_own", lambda db, data: RequestService.search_requests(
+        db, _search_term(data), user_id=_busiest(data))),
+    ("get_all_requests", lambda db, data: RequestService.get_all_requests(db, limit=50)),
+    ("get_all_requests_pending", lambda db, data: RequestService.get_all_requests(
+        db, limit=50, status=RequestStatus.PENDING)),
+    ("get_user_requests", lambda db, data: RequestService.get_user_requests(db, _busiest(data))),
+    ("get_user_request_statistics", lambda db, data: RequestService.get_user_request_statistics(db, _busiest(data))),
+    ("get_users_with_pagination", lambda db, data: UserService.get_users_with_pagination(db, limit=20)),
+    ("get_all_activities", lambda db, data: ActivityService.get_all_activities(db, limit=100)),
+    ("get_user_notifications", lambda db, data: NotificationService.get_user_notifications(db, _busiest(data))),
+    ("get_unread_notifications_admin", lambda db, data: NotificationService.get_unread_count(db, data["admin"]["id"])),
+    ("get_user_inbox_admin", lambda db, data: MessageService.get_user_inbox(db, data["admin"]["id"])),
+]
+
+
+def _run_once(func, data) -> Tuple[float, int]:
+    cache.clear()
+    db = SessionLocal()
+    try:
+        with QueryCounter(engine) as counter:
+            start = time.perf_counter()
+            func(db, data)
+            elapsed = (time.perf_counter() - start) * 1000
+    finally:
+        db.close()
+    return elapsed, counter.count
+
+
+def run(data: Dict[str, Any], iterations: int, warmup: int, only: Optional[List[str]] = None) -> Dict[str, Any]:
+    """Run the selected benchmarks; returns {name: summary with the statement count}"""
+    results = {}
+    print(f"{'benchmark':<34} {'queries':>7} {'mean':>10} {'p50':>10} {'p95':>10}")
+    for name, func in BENCHMARKS:
+        if only and not any(part in name for part in only):
+            continue
+        try:
+            for _ in range(warmup):
+                _run_once(func, data)
+            durations, queries = [], 0
+            for _ in range(iterations):
+                elapsed, queries = _run_once(func, data)
+                durations.append(elapsed)
+        except Exception as e:
+            results[name] = {"error": f"{type(e).__name__}: {e}"}
+            print(f"{name:<34} ❌ {type(e).__name__}: {str(e)[:60]}")
+            continue
+        summary = {**summarize(durations), "queries": queries}
+        results[name] = summary
+        print(f"{name:<34} {queries:7d} {summary['mean_ms']:8.1f}ms {summary['p50_ms']:8.1f}ms {summary['p95_ms']:8.1f}ms")
+    return results
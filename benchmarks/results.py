@@ -0,0 +1,113 @@
+"""
+Benchmark result files
+A run is written as one JSON document: the commit it ran on, the dataset spec and row
+counts, and the micro-benchmark and load-test summaries. compare() lines two such
+files up metric by metric, so a change can be checked against the commit before it.
+"""
+
+import json
+import math
+import platform
+import subprocess
+from datetime import datetime
+from pathlib import Path
+from typing import Any, Dict, List, Optional
+
+RESULTS_DIRECTORY = Path(__file__).parent / "results"
+
+# Metrics compared between runs, with the direction that is an improvement
+COMPARED_METRICS = {
+    "mean_ms": "lower",
+    "p95_ms": "lower",
+    "queries": "lower",
+    "requests_per_second": "higher",
+    "errors": "lower",
+}
+
+
+def percentile(sorted_values: List[float], fraction: float) -> float:
+    """Nearest-rank percentile of an ascending list"""
+    if not sorted_values:
+        return 0.0
+    index = min(len(sorted_values) - 1, max(0, math.ceil(fraction * len(sorted_values)) - 1))
+    return sorted_values[index]
+
+
+def summarize(durations_ms: List[float]) -> Dict[str, float]:
+    """Mean, min, max and p50/p95/p99 of a list of durations"""
+    values = sorted(durations_ms)
+    if not values:
+        return {"count": 0}
+    return {
+        "count": len(values),
+        "mean_ms": round(sum(values) / len(values), 3),
+        "min_ms": round(values[0], 3),
+        "p50_ms": round(percentile(values, 0.50), 3),
+        "p95_ms": round(percentile(values, 0.95), 3),
+        "p99_ms": round(percentile(values, 0.99), 3),
+        "max_ms": round(values[-1], 3),
+    }
+
+
+def _git(*args) -> Optional[str]:
+    try:
+        return subprocess.run(["git", *args], capture_output=True, text=True, check=True,
+                              cwd=Path(__file__).parent).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def environment() -> Dict[str, Any]:
+    """Commit and machine the run happened on"""
+    return {
+        "commit": _git("rev-parse", "--short", "HEAD"),
+        "branch": _git("rev-parse", "--abbrev-ref", "HEAD"),
+        "dirty": bool(_git("status", "--porcelain", "--untracked-files=no")),
+        "timestamp": datetime.now().isoformat(timespec="seconds"),
+        "python": platform.python_version(),
+        "machine": f"{platform.system()} {platform.machine()}",
+    }
+
+
+def write(results: Dict[str, Any], output: Optional[str] = None) -> Path:
+    """Write results to output, or to benchmarks/results/<time>-<commit>.json"""
+    if output:
+        path = Path(output)
+    else:
+        env = results["environment"]
+        stamp = datetime.now().strftime("%Y%m%d-%H%M%S")
+        path = RESULTS_DIRECTORY / f"{stamp}-{env['commit'] or 'unknown'}{'-dirty' if env['dirty'] else ''}.json"
+    path.parent.mkdir(parents=True, exist_ok=True)
+    path.write_text(json.dumps(results, indent=2, ensure_ascii=False, default=str), encoding="utf-8")
+    return path
+
+
+def _flatten(results: Dict[str, Any]) -> Dict[str, float]:
+    """{"micro/<name>/mean_ms": value, "load/<scenario>/<step>/p95_ms": value, ...}"""
+    flat = {}
+
+    def walk(prefix, node):
+        for key, value in node.items():
+            if isinstance(value, dict):
+                walk(f"{prefix}/{key}", value)
+            elif key in COMPARED_METRICS and isinstance(value, (int, float)):
+                flat[f"{prefix}/{key}"] = value
+
+    for section in ("micro", "load"):
+        walk(section, results.get(section, {}))
+    return flat
+
+
+def compare(baseline: Dict[str, Any], current: Dict[str, Any], threshold: float) -> List[Dict[str, Any]]:
+    """Per-metric change from baseline to current; regressed is set past threshold percent"""
+    before, after = _flatten(baseline), _flatten(current)
+    rows = []
+    for name in sorted(before.keys() & after.keys()):
+        old, new = before[name], after[name]
+        change = (new - old) / old * 100 if old else (0.0 if new == old else float("inf"))
+        worse = change > 0 if COMPARED_METRICS[name.rsplit("/", 1)[1]] == "lower" else change < 0
+        rows.append({
+            "metric": name, "baseline": old, "current": new, "change_percent": change,
+            "regressed": worse and abs(change) > threshold,
+        })
+    return rows
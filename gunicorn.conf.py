@@ -0,0 +1,50 @@
+"""
+Gunicorn configuration for CMSVS Internal System
+Loaded automatically from the working directory; command line flags still take precedence.
+Sets up the shared Prometheus metrics directory so all workers report into one exporter.
+"""
+
+import os
+import shutil
+
+from app.config import settings
+
+multiproc_dir = os.environ.get("PROMETHEUS_MULTIPROC_DIR") or settings.prometheus_multiproc_dir
+if settings.metrics_enabled and multiproc_dir:
+    # Exported before workers fork so every worker writes into the same directory
+    os.environ["PROMETHEUS_MULTIPROC_DIR"] = multiproc_dir
+
+
+def on_starting(server):
+    """Clear metric files left over from a previous run"""
+    directory = os.environ.get("PROMETHEUS_MULTIPROC_DIR")
+    if directory:
+        shutil.rmtree(directory, ignore_errors=True)
+        os.makedirs(directory, exist_ok=True)
+
+    # Per-worker pool sizes are derived from the budget divided by WORKER_PROCESSES
+    if settings.db_connection_budget and server.cfg.workers != settings.worker_processes:
+        server.log.warning(
+            f"DB_CONNECTION_BUDGET is shared by WORKER_PROCESSES={settings.worker_processes} workers, "
+            f"but {server.cfg.workers} are starting; set WORKER_PROCESSES to the worker count"
+        )
+
+
+def when_ready(server):
+    """Serve aggregated worker metrics from the master process on prometheus_port"""
+    if not (settings.metrics_enabled and os.environ.get("PROMETHEUS_MULTIPROC_DIR")):
+        return
+    try:
+        from prometheus_client import CollectorRegistry, start_http_server, multiprocess
+        registry = CollectorRegistry()
+        multiprocess.MultiProcessCollector(registry)
+        start_http_server(settings.prometheus_port, registry=registry)
+        server.log.info(f"Prometheus exporter listening on port {settings.prometheus_port}")
+    except Exception as e:
+        server.log.warning(f"Could not start Prometheus exporter: {e}")
+
+
+def child_exit(server, worker):
+    """Drop live metric files of exited workers"""
+    from app.services.metrics import mark_process_dead
+    mark_process_dead(worker.pid)
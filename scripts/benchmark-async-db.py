@@ -0,0 +1,106 @@
+#!/usr/bin/env python3
+"""
+Event-loop latency benchmark for the async database layer
+Polls the cheap unread-count endpoints while heavy /admin/stats requests run concurrently
+in the same process, and reports their latency with and without that background load.
+Runs the app in-process through httpx's ASGI transport against an existing database;
+only GET requests are issued.
+
+Usage:
+    python scripts/benchmark-async-db.py --username admin [--polls 200] [--heavy 4]
+"""
+
+import argparse
+import asyncio
+import statistics
+import sys
+import time
+from pathlib import Path
+
+# Add project root to path
+project_root = Path(__file__).parent.parent
+sys.path.insert(0, str(project_root))
+
+import httpx
+
+from app.main import app
+from app.utils.auth import create_access_token
+
+POLLED_ENDPOINTS = [
+    "/api/messages/unread-count",
+    "/api/notifications/unread-count",
+]
+HEAVY_ENDPOINT = "/admin/stats"
+
+
+def parse_args():
+    parser = argparse.ArgumentParser(description="Measure polling latency under heavy concurrent requests")
+    parser.add_argument("--username", default="admin", help="Existing admin user to authenticate as")
+    parser.add_argument("--polls", type=int, default=200, help="Requests per polled endpoint")
+    parser.add_argument("--heavy", type=int, default=4, help="Concurrent /admin/stats requests in the loaded run")
+    return parser.parse_args()
+
+
+def percentile(values, fraction):
+    ordered = sorted(values)
+    return ordered[min(len(ordered) - 1, int(len(ordered) * fraction))]
+
+
+async def poll(client: httpx.AsyncClient, path: str, count: int) -> list:
+    """Request path sequentially and return latencies in ms"""
+    latencies = []
+    for _ in range(count):
+        start = time.perf_counter()
+        response = await client.get(path)
+        latencies.append((time.perf_counter() - start) * 1000)
+        if response.status_code != 200:
+            raise RuntimeError(f"{path} returned {response.status_code}")
+    return latencies
+
+
+async def heavy_load(client: httpx.AsyncClient, stop: asyncio.Event) -> int:
+    """Keep requesting the admin stats page until stop is set"""
+    completed = 0
+    while not stop.is_set():
+        await client.get(HEAVY_ENDPOINT)
+        completed += 1
+    return completed
+
+
+async def run(args, heavy: int) -> dict:
+    transport = httpx.ASGITransport(app=app)
+    cookies = {"access_token": f"Bearer {create_access_token({'sub': args.username})}"}
+    async with httpx.AsyncClient(transport=transport, base_url="http://bench", cookies=cookies) as client:
+        stop = asyncio.Event()
+        heavy_tasks = [asyncio.create_task(heavy_load(client, stop)) for _ in range(heavy)]
+        try:
+            latencies = await asyncio.gather(*(poll(client, path, args.polls) for path in POLLED_ENDPOINTS))
+        finally:
+            stop.set()
+            heavy_completed = sum(await asyncio.gather(*heavy_tasks))
+
+    results = {"heavy_completed": heavy_completed}
+    for path, values in zip(POLLED_ENDPOINTS, latencies):
+        results[path] = {
+            "p50_ms": round(statistics.median(values), 2),
+            "p99_ms": round(percentile(values, 0.99), 2),
+            "max_ms": round(max(values), 2),
+        }
+    return results
+
+
+def main():
+    args = parse_args()
+    print(f"⏱  {args.polls} polls per endpoint, {args.heavy} concurrent {HEAVY_ENDPOINT} requests under load\n")
+
+    for label, heavy in (("idle", 0), ("loaded", args.heavy)):
+        results = asyncio.run(run(args, heavy))
+        print(f"{label} ({results.pop('heavy_completed')} {HEAVY_ENDPOINT} requests completed)")
+        for path, result in results.items():
+            print(f"  {path:<36} p50 {result['p50_ms']:8.2f}ms  p99 {result['p99_ms']:8.2f}ms  "
+                  f"max {result['max_ms']:8.2f}ms")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,138 @@
+#!/usr/bin/env python3
+"""
+Connection checkout benchmark for the database pool modes
+Starts several worker processes (like gunicorn workers) that each run short transactions
+from a thread pool through SessionLocal, and reports session checkout latency (time to
+the first statement's result, which includes pre-ping or connecting) together with the
+peak number of PostgreSQL server connections seen in pg_stat_activity.
+
+Run it once per configuration and compare, e.g. directly against PostgreSQL and through
+PgBouncer in transaction pooling mode:
+
+Usage:
+    python scripts/benchmark-db-connections.py --database-url postgresql://u:p@localhost:5432/cmsvs_db
+    python scripts/benchmark-db-connections.py --database-url postgresql://u:p@localhost:6432/cmsvs_db \\
+        --server-url postgresql://u:p@localhost:5432/cmsvs_db --mode transaction_proxy --budget 40
+    python scripts/benchmark-db-connections.py ... --mode transaction_proxy --pool-size 0   # NullPool
+"""
+
+import argparse
+import multiprocessing
+import os
+import statistics
+import sys
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from pathlib import Path
+
+# Add project root to path
+project_root = Path(__file__).parent.parent
+sys.path.insert(0, str(project_root))
+
+
+def parse_args():
+    parser = argparse.ArgumentParser(description="Measure checkout latency and server connections per pool mode")
+    parser.add_argument("--database-url", default=os.getenv("DATABASE_URL"), help="URL the app connects to")
+    parser.add_argument("--server-url", help="Direct PostgreSQL URL for counting server connections "
+                                             "(defaults to --database-url)")
+    parser.add_argument("--mode", choices=["direct", "transaction_proxy"], default="direct", help="DB_POOL_MODE")
+    parser.add_argument("--budget", type=int, help="DB_CONNECTION_BUDGET shared by all workers")
+    parser.add_argument("--pool-size", type=int, help="DB_POOL_SIZE (0 with transaction_proxy selects NullPool)")
+    parser.add_argument("--no-pre-ping", action="store_true", help="DB_PRE_PING=false in direct mode")
+    parser.add_argument("--processes", type=int, default=4, help="Worker processes")
+    parser.add_argument("--threads", type=int, default=16, help="Threads per process")
+    parser.add_argument("--transactions", type=int, default=500, help="Transactions per process")
+    return parser.parse_args()
+
+
+args = parse_args()
+if not args.database_url:
+    sys.exit("❌ --database-url (or DATABASE_URL) is required")
+
+os.environ["DATABASE_URL"] = args.database_url
+os.environ["DB_POOL_MODE"] = args.mode
+os.environ["WORKER_PROCESSES"] = str(args.processes)
+os.environ.setdefault("DEBUG", "false")
+os.environ.setdefault("LOG_LEVEL", "WARNING")
+if args.budget:
+    os.environ["DB_CONNECTION_BUDGET"] = str(args.budget)
+if args.pool_size is not None:
+    os.environ["DB_POOL_SIZE"] = str(args.pool_size)
+if args.no_pre_ping:
+    os.environ["DB_PRE_PING"] = "false"
+
+from sqlalchemy import create_engine, text
+
+from app.database import POOL_SIZES, SessionLocal, engine
+
+COUNT_SQL = text("SELECT count(*) FROM pg_stat_activity WHERE application_name = 'CMSVS_Internal_System'")
+
+
+def percentile(values, fraction):
+    ordered = sorted(values)
+    return ordered[min(len(ordered) - 1, int(len(ordered) * fraction))]
+
+
+def one_transaction() -> float:
+    """Run a short read transaction and return the checkout latency in ms"""
+    db = SessionLocal()
+    try:
+        start = time.perf_counter()
+        db.execute(text("SELECT 1")).scalar()
+        checkout_ms = (time.perf_counter() - start) * 1000
+        db.execute(text("SELECT pg_sleep(0.002)"))
+        db.commit()
+        return checkout_ms
+    finally:
+        db.close()
+
+
+def worker(transactions: int, threads: int) -> list:
+    """Runs in a child process with its own pool"""
+    engine.dispose(close=False)
+    with ThreadPoolExecutor(max_workers=threads) as executor:
+        return list(executor.map(lambda _: one_transaction(), range(transactions)))
+
+
+def monitor(server_engine, stop: threading.Event, samples: list):
+    with server_engine.connect() as conn:
+        while not stop.is_set():
+            samples.append(conn.execute(COUNT_SQL).scalar())
+            time.sleep(0.05)
+
+
+def main():
+    server_engine = create_engine(args.server_url or args.database_url, pool_size=1, max_overflow=0)
+    print(f"🚀 mode={args.mode} processes={args.processes} threads={args.threads} "
+          f"pool per worker={POOL_SIZES['pool_size']}+{POOL_SIZES['max_overflow']} "
+          f"pool class={type(engine.pool).__name__} pre-ping={engine.pool._pre_ping}")
+
+    stop, samples = threading.Event(), []
+    sampler = threading.Thread(target=monitor, args=(server_engine, stop, samples), daemon=True)
+    sampler.start()
+
+    start = time.perf_counter()
+    with multiprocessing.get_context("fork").Pool(args.processes) as pool:
+        results = pool.starmap(worker, [(args.transactions, args.threads)] * args.processes)
+    elapsed = time.perf_counter() - start
+
+    stop.set()
+    sampler.join()
+    server_engine.dispose()
+
+    latencies = [latency for result in results for latency in result]
+    print(f"   {len(latencies)} transactions in {elapsed:.2f}s ({len(latencies) / elapsed:.0f}/s)")
+    print(f"   checkout latency ms: mean {statistics.mean(latencies):.2f}  p50 {percentile(latencies, 0.5):.2f}  "
+          f"p95 {percentile(latencies, 0.95):.2f}  p99 {percentile(latencies, 0.99):.2f}  max {max(latencies):.2f}")
+    print(f"   server connections: peak {max(samples) if samples else 0}  "
+          f"mean {statistics.mean(samples) if samples else 0:.1f}")
+    if args.budget and samples and max(samples) > args.budget:
+        print(f"❌ peak server connections exceeded the budget of {args.budget}")
+        return 1
+    print("✅ Done")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,151 @@
+#!/usr/bin/env python3
+"""
+Event-loop stall benchmark for the logging pipeline
+Logs bursts of records from a coroutine while a ticker task measures how late the
+event loop wakes it up, once with synchronous file/console handlers (previous setup)
+and once with the queued pipeline from app/utils/logging_pipeline.py.
+
+Usage:
+    python scripts/benchmark-logging.py [--records 20000] [--burst 200] [--json]
+"""
+
+import argparse
+import asyncio
+import json
+import logging
+import logging.handlers
+import os
+import statistics
+import sys
+import tempfile
+import time
+from pathlib import Path
+
+# Add project root to path
+project_root = Path(__file__).parent.parent
+sys.path.insert(0, str(project_root))
+
+
+def parse_args():
+    parser = argparse.ArgumentParser(description="Measure event-loop stalls caused by logging")
+    parser.add_argument("--records", type=int, default=20000, help="Records logged per run")
+    parser.add_argument("--burst", type=int, default=200, help="Records logged between yields")
+    parser.add_argument("--json", action="store_true", help="Use the JSON formatter in both runs")
+    return parser.parse_args()
+
+
+args = parse_args()
+
+# Write logs to a throwaway file and keep every record (no sampling / rate limiting)
+# so both runs do the same amount of formatting and I/O
+log_dir = tempfile.mkdtemp(prefix="cmsvs_log_bench_")
+os.environ["LOG_FILE"] = os.path.join(log_dir, "app.log")
+os.environ["LOG_FORMAT"] = "json" if args.json else "standard"
+os.environ["LOG_RATE_LIMIT_PER_SECOND"] = "0"
+os.environ["LOG_SAMPLE_RATES"] = ""
+os.environ["LOG_LEVEL"] = "INFO"
+
+from app.utils.logging_pipeline import setup_logging, stop_logging, get_dropped_count, _create_formatter
+
+
+class LegacyJSONFormatter(logging.Formatter):
+    """Formatter previously defined inline in app/main.py"""
+
+    def format(self, record):
+        log_entry = {
+            "timestamp": self.formatTime(record, self.datefmt),
+            "level": record.levelname,
+            "logger": record.name,
+            "message": record.getMessage(),
+            "module": record.module,
+            "function": record.funcName,
+            "line": record.lineno
+        }
+        if record.exc_info:
+            log_entry["exception"] = self.formatException(record.exc_info)
+        for key, value in record.__dict__.items():
+            if key not in ['name', 'msg', 'args', 'levelname', 'levelno', 'pathname',
+                           'filename', 'module', 'lineno', 'funcName', 'created', 'msecs',
+                           'relativeCreated', 'thread', 'threadName', 'processName',
+                           'process', 'getMessage', 'exc_info', 'exc_text', 'stack_info']:
+                log_entry[key] = value
+        return json.dumps(log_entry)
+
+
+def setup_synchronous_logging():
+    """Previous setup: handlers attached directly to the root logger"""
+    root_logger = logging.getLogger()
+    for handler in root_logger.handlers[:]:
+        root_logger.removeHandler(handler)
+    root_logger.setLevel(logging.INFO)
+
+    formatter = LegacyJSONFormatter() if args.json else _create_formatter()
+    console_handler = logging.StreamHandler(sys.stdout)
+    file_handler = logging.handlers.RotatingFileHandler(os.environ["LOG_FILE"], maxBytes=10485760, backupCount=5)
+    for handler in (console_handler, file_handler):
+        handler.setFormatter(formatter)
+        root_logger.addHandler(handler)
+
+
+async def measure() -> dict:
+    """Log bursts while a ticker records how late each 1ms sleep wakes up"""
+    logger = logging.getLogger("app.benchmark")
+    stalls = []
+    done = asyncio.Event()
+
+    async def ticker():
+        while not done.is_set():
+            start = time.perf_counter()
+            await asyncio.sleep(0.001)
+            stalls.append((time.perf_counter() - start - 0.001) * 1000)
+
+    async def producer():
+        for i in range(args.records):
+            logger.info("Processing request %d - REQ-%014d - Status: %s", i, i, "pending", extra={"user_id": i % 50})
+            if i % args.burst == 0:
+                await asyncio.sleep(0)
+        done.set()
+
+    started = time.perf_counter()
+    ticker_task = asyncio.create_task(ticker())
+    await producer()
+    logging_time = time.perf_counter() - started
+    await ticker_task
+
+    stalls.sort()
+    return {
+        "logging_seconds": round(logging_time, 3),
+        "stall_max_ms": round(stalls[-1], 2) if stalls else 0,
+        "stall_p99_ms": round(stalls[int(len(stalls) * 0.99)], 2) if stalls else 0,
+        "stall_mean_ms": round(statistics.mean(stalls), 2) if stalls else 0,
+    }
+
+
+def main():
+    # Console output would swamp the results, so send stdout to /dev/null while logging
+    real_stdout = sys.stdout
+    results = {}
+    with open(os.devnull, "w") as devnull:
+        sys.stdout = devnull
+        try:
+            setup_synchronous_logging()
+            results["synchronous"] = asyncio.run(measure())
+
+            setup_logging()
+            results["queued"] = asyncio.run(measure())
+            results["queued"]["dropped"] = get_dropped_count()
+            stop_logging()
+        finally:
+            sys.stdout = real_stdout
+
+    print(f"📝 {args.records} records, yield every {args.burst}, {'json' if args.json else 'standard'} format\n")
+    for name, result in results.items():
+        print(f"  {name:<12} logging {result['logging_seconds']:7.3f}s  "
+              f"stall max {result['stall_max_ms']:8.2f}ms  p99 {result['stall_p99_ms']:7.2f}ms  "
+              f"mean {result['stall_mean_ms']:6.2f}ms"
+              + (f"  dropped {result['dropped']}" if "dropped" in result else ""))
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,123 @@
+#!/usr/bin/env python3
+"""
+Render-time benchmark for the largest templates
+For each template, measures compiling from source, loading from the bytecode cache,
+the first render and the mean of repeated renders (after which {% cache %} fragments
+are warm). Renders use an empty context in which every missing value is a permissive
+placeholder, so they measure template overhead, not data access.
+
+Usage:
+    python scripts/benchmark-templates.py
+    python scripts/benchmark-templates.py --top 10 --iterations 50
+    python scripts/benchmark-templates.py --templates dashboard/bento.html admin/stats.html
+"""
+
+import argparse
+import os
+import sys
+import tempfile
+import time
+from pathlib import Path
+
+# Add project root to path
+project_root = Path(__file__).parent.parent
+sys.path.insert(0, str(project_root))
+os.chdir(project_root)
+os.environ.setdefault("DEBUG", "false")
+
+from jinja2 import ChainableUndefined, FileSystemBytecodeCache
+
+from app.utils.templates import templates
+
+
+def parse_args():
+    parser = argparse.ArgumentParser(description="Benchmark template compile and render times")
+    parser.add_argument("--top", type=int, default=10, help="Largest templates to benchmark")
+    parser.add_argument("--templates", nargs="*", help="Template names instead of the largest ones")
+    parser.add_argument("--iterations", type=int, default=20, help="Renders per template")
+    return parser.parse_args()
+
+
+class Placeholder(ChainableUndefined):
+    """Missing values that compare, add and format quietly"""
+
+    def _self(self, *args, **kwargs):
+        return self
+
+    def _false(self, *args, **kwargs):
+        return False
+
+    __add__ = __radd__ = __sub__ = __rsub__ = __mul__ = __rmul__ = _self
+    __truediv__ = __rtruediv__ = __floordiv__ = __mod__ = __neg__ = _self
+    __lt__ = __le__ = __gt__ = __ge__ = _false
+    __call__ = _self
+
+    def __int__(self):
+        return 0
+
+    def __float__(self):
+        return 0.0
+
+    def __round__(self, ndigits=None):
+        return 0
+
+    def __format__(self, spec):
+        return format(0, spec) if spec else ""
+
+
+class StubRequest:
+    """Enough of a Starlette request for url_for and header lookups"""
+    headers = {}
+    cookies = {}
+    query_params = {}
+
+    def url_for(self, name, **path_params):
+        return f"/{name}/{path_params.get('path', '')}"
+
+
+def largest_templates(count):
+    root = Path("app/templates")
+    names = templates.env.list_templates(extensions=["html"])
+    return sorted(names, key=lambda name: (root / name).stat().st_size, reverse=True)[:count]
+
+
+def timed(func, *args):
+    start = time.perf_counter()
+    result = func(*args)
+    return result, (time.perf_counter() - start) * 1000
+
+
+def main():
+    args = parse_args()
+    names = args.templates or largest_templates(args.top)
+
+    with tempfile.TemporaryDirectory() as bytecode_dir:
+        # cache_size=0 makes every get_template go back to the source or the bytecode cache
+        cold = templates.env.overlay(cache_size=0, bytecode_cache=None)
+        cached = templates.env.overlay(cache_size=0, bytecode_cache=FileSystemBytecodeCache(bytecode_dir))
+        render_env = templates.env.overlay(undefined=Placeholder)
+        render_env.policies = dict(templates.env.policies)
+        render_env.policies["json.dumps_kwargs"] = {"sort_keys": True, "default": lambda value: None}
+        context = {"request": StubRequest()}
+
+        print(f"{'template':<42} {'compile':>9} {'bytecode':>9} {'1st render':>11} {'render':>9}")
+        for name in names:
+            _, compile_ms = timed(cold.get_template, name)
+            cached.get_template(name)  # writes the bytecode
+            _, load_ms = timed(cached.get_template, name)
+
+            template = render_env.get_template(name)
+            try:
+                _, first_ms = timed(template.render, context)
+                total = 0.0
+                for _ in range(args.iterations):
+                    total += timed(template.render, context)[1]
+                render = f"{first_ms:9.1f}ms {total / args.iterations:7.2f}ms"
+            except Exception as e:
+                render = f"  render failed: {type(e).__name__}: {str(e)[:40]}"
+            print(f"{name:<42} {compile_ms:7.1f}ms {load_ms:7.2f}ms {render}")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,87 @@
+#!/usr/bin/env python3
+"""
+Backfill thumbnails and previews for files uploaded before the preview pipeline
+Hashes every file without a content hash (or every file with --all), writes its
+derivatives next to the original and records the hash, using a process pool.
+
+Usage:
+    python scripts/generate-previews.py
+    python scripts/generate-previews.py --workers 4 --all
+"""
+
+import argparse
+import os
+import sys
+from concurrent.futures import ProcessPoolExecutor, as_completed
+from pathlib import Path
+
+# Add project root to path
+project_root = Path(__file__).parent.parent
+sys.path.insert(0, str(project_root))
+
+from sqlalchemy import update
+
+from app.database import SessionLocal
+from app.models import achievement, user_avatar, notification  # noqa: F401 - register mappers
+from app.models.file import File
+from app.services.preview_service import PreviewService
+from app.utils.previews import pdf_renderer_available, render_derivatives
+
+
+def parse_args():
+    parser = argparse.ArgumentParser(description="Generate missing file thumbnails and previews")
+    parser.add_argument("--workers", type=int, default=os.cpu_count() or 2, help="Worker processes")
+    parser.add_argument("--all", action="store_true", help="Regenerate for every file, not only new ones")
+    parser.add_argument("--batch-size", type=int, default=500, help="Rows updated per commit")
+    return parser.parse_args()
+
+
+def main():
+    args = parse_args()
+    sizes = PreviewService.sizes()
+    if not pdf_renderer_available():
+        print("⚠️ Neither PyMuPDF nor pdftoppm is installed, PDFs only get a content hash")
+
+    db = SessionLocal()
+    try:
+        query = db.query(File.id, File.file_path, File.mime_type)
+        if not args.all:
+            query = query.filter(File.content_hash.is_(None))
+        files = [row for row in query.all() if os.path.exists(row.file_path)]
+        print(f"🚀 {len(files)} files, {args.workers} workers")
+
+        done = failed = previews = 0
+        with ProcessPoolExecutor(max_workers=args.workers) as executor:
+            futures = {
+                executor.submit(render_derivatives, row.file_path, row.mime_type, sizes): row.id
+                for row in files
+            }
+            for future in as_completed(futures):
+                file_id = futures[future]
+                try:
+                    content_hash, has_preview = future.result()
+                except Exception as e:
+                    failed += 1
+                    print(f"❌ file {file_id}: {e}")
+                    continue
+
+                db.execute(
+                    update(File).where(File.id == file_id)
+                    .values(content_hash=content_hash, has_preview=has_preview)
+                    .execution_options(synchronize_session=False)
+                )
+                done += 1
+                previews += has_preview
+                if done % args.batch_size == 0:
+                    db.commit()
+                    print(f"   {done}/{len(files)}")
+        db.commit()
+    finally:
+        db.close()
+
+    print(f"✅ {done} files hashed, {previews} with previews, {failed} failed")
+    return 1 if failed else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())